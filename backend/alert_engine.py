@@ -0,0 +1,400 @@
+"""
+Vectorized alert rule evaluation
+
+All enabled alert configurations are compiled into flat NumPy arrays
+(one row per rule, grouped by sensor). Feature updates are queued by
+the analysis loops and evaluated in one pass per batch, so the cost per
+tick is a dictionary lookup per rule plus a few array comparisons.
+
+Each rule has three conditions: above `threshold_max`, below
+`threshold_min` and |d value / dt| above `rate_max`. A condition opens an
+alert once it has held for `min_duration_ms`, stays open (no further
+alerts) until the value falls back past the threshold by the hysteresis
+band, and only then can fire again. Alert volume is therefore bounded by
+the number of threshold crossings rather than the tick rate.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from database_async import db
+from websocket_manager import manager
+
+logger = logging.getLogger(__name__)
+
+# 批次評估間隔（毫秒）
+ALERT_EVAL_INTERVAL_MS = int(os.getenv("ALERT_EVAL_INTERVAL_MS", "250"))
+
+# 未設定 hysteresis 時的預設遲滯帶（閾值的比例）
+ALERT_HYSTERESIS_RATIO = float(os.getenv("ALERT_HYSTERESIS_RATIO", "0.05"))
+
+# 未設定 min_duration_ms 時的預設持續時間
+ALERT_MIN_DURATION_MS = int(os.getenv("ALERT_MIN_DURATION_MS", "0"))
+
+# 待評估特徵更新的上限（超過時丟棄最舊的更新）
+ALERT_QUEUE_MAX = int(os.getenv("ALERT_QUEUE_MAX", "10000"))
+
+# 每條規則的條件（欄位順序）
+CONDITIONS = ('above', 'below', 'rate')
+ABOVE, BELOW, RATE = range(len(CONDITIONS))
+
+
+def _as_float(value) -> float:
+    return np.nan if value is None else float(value)
+
+
+class AlertRules:
+    """
+    Alert configurations compiled into arrays
+    """
+
+    def __init__(self, configs: Dict[int, List[Dict]],
+                 hysteresis_ratio: float = ALERT_HYSTERESIS_RATIO,
+                 min_duration_ms: int = ALERT_MIN_DURATION_MS):
+        """
+        Compile alert configurations
+
+        Args:
+            configs: Dict of sensor_id -> alert configuration rows
+            hysteresis_ratio: Hysteresis band as a fraction of the
+                              threshold when a rule has none
+            min_duration_ms: Minimum duration when a rule has none
+        """
+        rows = [
+            (sensor_id, config)
+            for sensor_id in sorted(configs)
+            for config in configs[sensor_id]
+        ]
+
+        self.keys: List[Tuple[int, object]] = []
+        self.features: List[str] = []
+        self.severity: List[str] = []
+        # sensor_id -> 規則索引範圍（同一感測器的規則連續排列）
+        self.slices: Dict[int, slice] = {}
+
+        for index, (sensor_id, config) in enumerate(rows):
+            self.keys.append((sensor_id, config.get('config_id', config['feature_name'])))
+            self.features.append(config['feature_name'])
+            self.severity.append(config.get('severity') or 'warning')
+            current = self.slices.get(sensor_id)
+            self.slices[sensor_id] = slice(current.start if current else index, index + 1)
+
+        def column(name: str) -> np.ndarray:
+            return np.array([_as_float(config.get(name)) for _, config in rows], dtype=np.float64)
+
+        self.sensor_ids = np.array([sensor_id for sensor_id, _ in rows], dtype=np.int64)
+        # (rules, conditions) 閾值，未設定的條件為 NaN（永不觸發）
+        self.threshold = np.column_stack([
+            column('threshold_max'), column('threshold_min'), column('rate_max')
+        ])
+
+        # 遲滯帶：未設定時為閾值的固定比例；變化率一律使用比例
+        band = np.abs(self.threshold) * hysteresis_ratio
+        hysteresis = column('hysteresis')
+        band[:, :RATE] = np.where(np.isnan(hysteresis)[:, None], band[:, :RATE], hysteresis[:, None])
+        # 解除位準：上限與變化率往下、下限往上
+        self.clear = self.threshold + band * np.array([-1.0, 1.0, -1.0])
+
+        duration = column('min_duration_ms')
+        self.min_duration = np.where(np.isnan(duration), min_duration_ms, duration) / 1000.0
+
+    def __len__(self) -> int:
+        return len(self.features)
+
+
+class AlertEngine:
+    """
+    Batched alert evaluation with hysteresis and deduplication
+    """
+
+    def __init__(self, interval_ms: int = ALERT_EVAL_INTERVAL_MS,
+                 queue_max: int = ALERT_QUEUE_MAX):
+        """
+        Initialize engine
+
+        Args:
+            interval_ms: Batch evaluation interval
+            queue_max: Maximum queued feature updates
+        """
+        self.interval_ms = interval_ms
+        self.queue: Deque[Tuple[int, Dict, float]] = deque(maxlen=queue_max)
+        self.rules = AlertRules({})
+        self._configs: Optional[Dict[int, List[Dict]]] = None
+        self._reset_state(0)
+
+        # 重啟前仍未確認的警報，編譯規則時標記為 open 避免重複發出
+        self._seed_open: set = set()
+
+        self.running = False
+        self.task: Optional[asyncio.Task] = None
+        self.evaluated = 0
+        self.alerts_opened = 0
+        self.alerts_cleared = 0
+
+    def _reset_state(self, n: int):
+        self.open = np.zeros((n, len(CONDITIONS)), dtype=bool)
+        self.since = np.full((n, len(CONDITIONS)), np.nan)
+        self.prev_value = np.full(n, np.nan)
+        self.prev_time = np.full(n, np.nan)
+
+    def compile(self, configs: Dict[int, List[Dict]]):
+        """
+        Replace the rule set, keeping the state of unchanged rules
+
+        Args:
+            configs: Dict of sensor_id -> alert configuration rows
+        """
+        old_index = {key: i for i, key in enumerate(self.rules.keys)}
+        old_state = (self.open, self.since, self.prev_value, self.prev_time)
+
+        self.rules = AlertRules(configs)
+        self._configs = configs
+        self._reset_state(len(self.rules))
+
+        for i, key in enumerate(self.rules.keys):
+            j = old_index.get(key)
+            if j is not None:
+                self.open[i], self.since[i] = old_state[0][j], old_state[1][j]
+                self.prev_value[i], self.prev_time[i] = old_state[2][j], old_state[3][j]
+
+        if self._seed_open:
+            for i, (sensor_id, feature) in enumerate(zip(self.rules.sensor_ids, self.rules.features)):
+                for c, condition in enumerate(CONDITIONS):
+                    if (int(sensor_id), feature, condition) in self._seed_open:
+                        self.open[i, c] = True
+            self._seed_open = set()
+
+        logger.info(f"Compiled {len(self.rules)} alert rules for {len(self.rules.slices)} sensors")
+
+    def submit(self, sensor_id: int, features: Dict, timestamp: Optional[float] = None):
+        """
+        Queue one feature update for the next evaluation batch
+
+        Args:
+            sensor_id: Sensor identifier
+            features: Feature dictionary
+            timestamp: Update time in seconds (defaults to now)
+        """
+        self.queue.append((sensor_id, features, time.time() if timestamp is None else timestamp))
+
+    def evaluate_batch(self, updates: List[Tuple[int, Dict, float]]) -> List[Dict]:
+        """
+        Evaluate a batch of feature updates against all rules
+
+        Updates of different sensors are evaluated in the same vectorized
+        pass; repeated updates of one sensor are applied in order.
+
+        Args:
+            updates: List of (sensor_id, features, timestamp)
+
+        Returns:
+            Alerts that opened in this batch
+        """
+        rules = self.rules
+        alerts = []
+
+        # 每一輪每個感測器最多一筆更新，保持同一感測器的時間順序
+        rounds: List[Dict[int, Tuple[Dict, float]]] = []
+        depth: Dict[int, int] = {}
+        for sensor_id, features, timestamp in updates:
+            if sensor_id not in rules.slices:
+                continue
+            level = depth.get(sensor_id, 0)
+            depth[sensor_id] = level + 1
+            if level == len(rounds):
+                rounds.append({})
+            rounds[level][sensor_id] = (features, timestamp)
+
+        for batch in rounds:
+            index, values, now = [], [], []
+            for sensor_id, (features, timestamp) in batch.items():
+                span = range(rules.slices[sensor_id].start, rules.slices[sensor_id].stop)
+                index.extend(span)
+                values.extend(_as_float(features.get(rules.features[i])) for i in span)
+                now.extend(timestamp for _ in span)
+            alerts.extend(self._evaluate(
+                np.array(index), np.array(values, dtype=np.float64), np.array(now, dtype=np.float64)
+            ))
+            self.evaluated += len(batch)
+
+        return alerts
+
+    def _evaluate(self, index: np.ndarray, values: np.ndarray, now: np.ndarray) -> List[Dict]:
+        rules = self.rules
+        threshold = rules.threshold[index]
+        clear = rules.clear[index]
+        was_open = self.open[index]
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            dt = now - self.prev_time[index]
+            rate = np.where(dt > 0, np.abs(values - self.prev_value[index]) / dt, np.nan)
+
+            # 已開啟的條件需越過遲滯帶才解除
+            active = np.empty_like(was_open)
+            active[:, ABOVE] = np.where(was_open[:, ABOVE], values > clear[:, ABOVE], values > threshold[:, ABOVE])
+            active[:, BELOW] = np.where(was_open[:, BELOW], values < clear[:, BELOW], values < threshold[:, BELOW])
+            active[:, RATE] = np.where(was_open[:, RATE], rate > clear[:, RATE], rate > threshold[:, RATE])
+
+        # 缺少特徵值時維持原狀態
+        valid = np.isfinite(values)
+        active[~valid] = was_open[~valid]
+        # 變化率需要前一筆有效值
+        no_rate = ~np.isfinite(rate)
+        active[no_rate & valid, RATE] = was_open[no_rate & valid, RATE]
+
+        since = np.where(active, np.fmin(self.since[index], now[:, None]), np.nan)
+        fire = active & ~was_open & (now[:, None] - since >= rules.min_duration[index][:, None])
+        cleared = was_open & ~active
+
+        self.open[index] = (was_open & active) | fire
+        self.since[index] = since
+        self.prev_value[index] = np.where(valid, values, self.prev_value[index])
+        self.prev_time[index] = np.where(valid, now, self.prev_time[index])
+
+        self.alerts_cleared += int(cleared.sum())
+        alerts = []
+        for row, c in zip(*np.nonzero(fire)):
+            alerts.append(self._make_alert(index[row], c, values[row], rate[row]))
+        self.alerts_opened += len(alerts)
+        return alerts
+
+    def _make_alert(self, rule: int, condition: int, value: float, rate: float) -> Dict:
+        rules = self.rules
+        feature = rules.features[rule]
+        threshold = float(rules.threshold[rule, condition])
+
+        if condition == RATE:
+            alert_type = 'rate_of_change'
+            current = float(rate)
+            message = f"{feature} is changing too fast ({current:.4f}/s above {threshold:.4f}/s)"
+        else:
+            alert_type = 'threshold'
+            current = float(value)
+            direction = CONDITIONS[condition]
+            message = (
+                f"{feature} is {direction} threshold "
+                f"({current:.4f} {direction} {threshold:.4f})"
+            )
+
+        return {
+            'sensor_id': int(rules.sensor_ids[rule]),
+            'alert_type': alert_type,
+            'severity': rules.severity[rule],
+            'message': message,
+            'feature_name': feature,
+            'current_value': current,
+            'threshold_value': threshold
+        }
+
+    def restore_open_alerts(self, alerts: List[Dict]):
+        """
+        Treat unacknowledged alerts as open so they are not raised again
+
+        Args:
+            alerts: Active alerts (rows of v_active_alerts)
+        """
+        for alert in alerts:
+            if alert.get('alert_type') == 'rate_of_change':
+                condition = 'rate'
+            elif alert.get('alert_type') == 'threshold':
+                current, threshold = alert.get('current_value'), alert.get('threshold_value')
+                if current is None or threshold is None:
+                    continue
+                condition = 'above' if current > threshold else 'below'
+            else:
+                continue
+            self._seed_open.add((alert['sensor_id'], alert.get('feature_name'), condition))
+
+    async def run_once(self) -> List[Dict]:
+        """
+        Evaluate queued updates, then store and broadcast new alerts
+
+        Returns:
+            Alerts opened in this batch
+        """
+        configs = await db.get_all_alert_configurations()
+        if configs is not self._configs:
+            self.compile(configs)
+
+        updates = list(self.queue)
+        self.queue.clear()
+        if not updates or not len(self.rules):
+            return []
+
+        alerts = self.evaluate_batch(updates)
+        if not alerts:
+            return []
+
+        try:
+            for alert, alert_id in zip(alerts, await db.create_alerts(alerts)):
+                alert['alert_id'] = alert_id
+            for alert in alerts:
+                logger.warning(f"Alert created for sensor {alert['sensor_id']}: {alert['message']}")
+        except Exception as e:
+            logger.error(f"Error creating alerts: {e}")
+
+        for alert in alerts:
+            await manager.broadcast_alert(alert)
+        return alerts
+
+    async def start(self):
+        """Start the batch evaluation task"""
+        if self.running:
+            return
+
+        try:
+            self.restore_open_alerts(await db.get_active_alerts(limit=10000))
+        except Exception as e:
+            logger.error(f"Error loading active alerts: {e}")
+
+        self.running = True
+        self.task = asyncio.create_task(self._evaluation_loop())
+        logger.info(f"Alert engine started (interval={self.interval_ms}ms)")
+
+    async def stop(self):
+        """Stop the evaluation task"""
+        if not self.running:
+            return
+
+        self.running = False
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        logger.info("Alert engine stopped")
+
+    async def _evaluation_loop(self):
+        while self.running:
+            try:
+                await asyncio.sleep(self.interval_ms / 1000)
+                await self.run_once()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Error evaluating alerts: {e}")
+
+    def get_status(self) -> Dict:
+        """
+        Get engine status
+
+        Returns:
+            Dictionary with rule and alert counts
+        """
+        return {
+            'running': self.running,
+            'rules': len(self.rules),
+            'queued': len(self.queue),
+            'open': int(self.open.sum()),
+            'evaluated': self.evaluated,
+            'alerts_opened': self.alerts_opened,
+            'alerts_cleared': self.alerts_cleared,
+        }
+
+
+# Global alert engine instance
+alert_engine = AlertEngine()
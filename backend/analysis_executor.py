@@ -0,0 +1,312 @@
+"""
+Sharded feature extraction for real-time analysis
+
+Sensors are hashed to single-worker process pools (sensor_id % N), so
+each sensor's incremental state (sliding statistics, streaming
+spectrum) lives in one worker process and feature extraction for
+different sensors runs on different CPU cores instead of blocking the
+event loop. Each sensor's ring buffer is mirrored into a
+`multiprocessing.shared_memory` block at the same positions: a tick
+copies only the samples that arrived since the previous one, and only
+the small feature dictionary travels back.
+
+With ANALYSIS_WORKERS=0 the same engine runs inline in the event loop.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+try:
+    from backend.sliding_stats import SlidingWindowStats, ring_tail
+    from backend.streaming_spectrum import StreamingSpectrum
+    from backend.feature_registry import feature_registry
+except ModuleNotFoundError:
+    from sliding_stats import SlidingWindowStats, ring_tail
+    from streaming_spectrum import StreamingSpectrum
+    from feature_registry import feature_registry
+
+logger = logging.getLogger(__name__)
+
+# 分析 worker process 數量（0 = 在 event loop 內直接計算）
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "0"))
+
+CHANNELS = ('h', 'v')
+
+
+class SensorFeatureEngine:
+    """
+    Incremental feature state of one sensor
+
+    Holds the sliding statistics and streaming spectra for both
+    channels and evaluates the sensor's enabled features through the
+    feature registry.
+    """
+
+    def __init__(self, window_size: int, sampling_rate: float):
+        """
+        Initialize engine
+
+        Args:
+            window_size: Samples in the analysis window (buffer size)
+            sampling_rate: Sampling rate in Hz
+        """
+        self.window_size = window_size
+        self.sampling_rate = sampling_rate
+        self.tick = 0
+        # 最近一次計算的特徵值，slow tier 未到期時沿用
+        self.values = {c: {} for c in CHANNELS}
+        self._reset_state()
+
+    def _reset_state(self):
+        self.stats = {
+            c: SlidingWindowStats(self.window_size, max_order=8) for c in CHANNELS
+        }
+        self.spectrum = {
+            c: StreamingSpectrum(self.sampling_rate, window_size=self.window_size)
+            for c in CHANNELS
+        }
+
+    def process(self, samples: np.ndarray, head: int, length: int, new_samples: int,
+                enabled: Iterable[str]) -> Dict[str, float]:
+        """
+        Feed the newest samples and evaluate enabled features
+
+        Only the `new_samples` newest samples are read from the ring for
+        the incremental state; the full window is unrolled only on ticks
+        where a due feature needs it (slow tier).
+
+        Args:
+            samples: Ring buffer of shape (2, capacity), rows h / v
+                     (SensorBuffer.samples or its shared-memory mirror)
+            head: Next write position of the ring
+            length: Samples currently in the ring
+            new_samples: Samples added since the previous call
+            enabled: Enabled feature names
+
+        Returns:
+            Dict of '<feature>_<channel>' -> value
+        """
+        # 首次呼叫或新樣本超過窗口時，以整個窗口重建增量狀態
+        if new_samples >= length or self.tick == 0:
+            new_samples = length
+            self._reset_state()
+
+        enabled = list(enabled)
+        due = feature_registry.due_features(enabled, self.tick)
+        self.tick += 1
+
+        new = ring_tail(samples, head, new_samples)
+        window = ring_tail(samples, head, length) if feature_registry.needs_input(due, 'window') else None
+
+        features = {}
+        for row, channel in enumerate(CHANNELS):
+            self.stats[channel].update(new[row])
+            self.spectrum[channel].update(new[row])
+
+            context = {
+                'stats': self.stats[channel],
+                'welch': self.spectrum[channel],
+                'sampling_rate': self.sampling_rate,
+            }
+            if window is not None:
+                context['window'] = window[row]
+            try:
+                self.values[channel].update(feature_registry.compute(due, context))
+            except Exception as e:
+                logger.error(f"Feature computation error ({channel}): {e}")
+
+            for name in enabled:
+                if name in self.values[channel]:
+                    features[f'{name}_{channel}'] = self.values[channel][name]
+
+        return features
+
+
+# ==================== Worker Process ====================
+
+_worker_engines: Dict[int, SensorFeatureEngine] = {}
+_worker_segments: Dict[int, shared_memory.SharedMemory] = {}
+
+
+def _attach_segment(sensor_id: int, name: str) -> shared_memory.SharedMemory:
+    segment = _worker_segments.get(sensor_id)
+    if segment is None or segment.name != name:
+        if segment is not None:
+            segment.close()
+        # worker 只附加使用，由主程序負責 unlink
+        # (spawn 的 worker 與主程序共用 resource tracker，不需另外註冊/取消)
+        segment = shared_memory.SharedMemory(name=name)
+        _worker_segments[sensor_id] = segment
+    return segment
+
+
+def _worker_process(sensor_id: int, segment_name: str, capacity: int, head: int,
+                    length: int, new_samples: int, sampling_rate: float,
+                    enabled: List[str]) -> Dict[str, float]:
+    segment = _attach_segment(sensor_id, segment_name)
+    samples = np.ndarray((2, capacity), dtype=np.float64, buffer=segment.buf)
+
+    engine = _worker_engines.get(sensor_id)
+    if (engine is None or engine.sampling_rate != sampling_rate
+            or engine.window_size != capacity):
+        engine = SensorFeatureEngine(capacity, sampling_rate)
+        _worker_engines[sensor_id] = engine
+
+    return engine.process(samples, head, length, new_samples, enabled)
+
+
+def _worker_release(sensor_id: int):
+    _worker_engines.pop(sensor_id, None)
+    segment = _worker_segments.pop(sensor_id, None)
+    if segment is not None:
+        segment.close()
+
+
+def _mirror_tail(target: np.ndarray, source: np.ndarray, head: int, n: int):
+    """Copy the newest `n` ring positions (ending before `head`) from source to target"""
+    capacity = source.shape[-1]
+    start = (head - n) % capacity
+    if start + n <= capacity:
+        target[:, start:start + n] = source[:, start:start + n]
+    else:
+        target[:, start:] = source[:, start:]
+        target[:, :start + n - capacity] = source[:, :start + n - capacity]
+
+
+# ==================== Executor ====================
+
+class AnalysisExecutor:
+    """
+    Dispatches per-sensor feature extraction to sharded workers
+    """
+
+    def __init__(self, workers: int = ANALYSIS_WORKERS):
+        """
+        Initialize executor
+
+        Args:
+            workers: Number of worker processes (0 = inline)
+        """
+        self.workers = workers
+        self.pools: List[ProcessPoolExecutor] = []
+        self.segments: Dict[int, shared_memory.SharedMemory] = {}
+        # 已同步至 shared memory 的環形緩衝區陣列
+        self.mirrored: Dict[int, np.ndarray] = {}
+        self.engines: Dict[int, SensorFeatureEngine] = {}
+
+    def _get_pool(self, sensor_id: int) -> ProcessPoolExecutor:
+        if not self.pools:
+            context = multiprocessing.get_context("spawn")
+            # 每個 shard 只有一個 worker，同一感測器的狀態固定留在同一程序
+            self.pools = [
+                ProcessPoolExecutor(max_workers=1, mp_context=context)
+                for _ in range(self.workers)
+            ]
+            logger.info(f"Started {self.workers} analysis worker processes")
+        return self.pools[sensor_id % self.workers]
+
+    def _get_segment(self, sensor_id: int, capacity: int) -> shared_memory.SharedMemory:
+        segment = self.segments.get(sensor_id)
+        if segment is None or segment.size < 2 * capacity * 8:
+            if segment is not None:
+                segment.close()
+                segment.unlink()
+            segment = shared_memory.SharedMemory(create=True, size=2 * capacity * 8)
+            self.segments[sensor_id] = segment
+            self.mirrored.pop(sensor_id, None)
+        return segment
+
+    async def process(self, sensor_id: int, samples: np.ndarray, head: int, length: int,
+                      new_samples: int, sampling_rate: float,
+                      enabled: Iterable[str]) -> Dict[str, float]:
+        """
+        Compute features for one analysis tick
+
+        Args:
+            sensor_id: Sensor identifier
+            samples: Sensor ring buffer of shape (2, capacity), rows h / v
+                     (the capacity is the analysis window size)
+            head: Next write position of the ring
+            length: Samples currently in the ring
+            new_samples: Samples added since the previous tick
+            sampling_rate: Sampling rate in Hz
+            enabled: Enabled feature names
+
+        Returns:
+            Dict of '<feature>_<channel>' -> value
+        """
+        capacity = samples.shape[1]
+
+        if self.workers <= 0:
+            engine = self.engines.get(sensor_id)
+            if (engine is None or engine.sampling_rate != sampling_rate
+                    or engine.window_size != capacity):
+                engine = SensorFeatureEngine(capacity, sampling_rate)
+                self.engines[sensor_id] = engine
+            return engine.process(samples, head, length, new_samples, enabled)
+
+        segment = self._get_segment(sensor_id, capacity)
+        shared = np.ndarray((2, capacity), dtype=np.float64, buffer=segment.buf)
+        # 同一個環形緩衝區只需複製新樣本所在的位置；新 segment、換了緩衝區
+        # 或新樣本超過窗口時才整個複製
+        if self.mirrored.get(sensor_id) is samples and new_samples < length:
+            _mirror_tail(shared, samples, head, new_samples)
+        else:
+            shared[:] = samples
+            self.mirrored[sensor_id] = samples
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_pool(sensor_id), _worker_process,
+            sensor_id, segment.name, capacity, head, length, new_samples,
+            float(sampling_rate), sorted(enabled)
+        )
+
+    async def release(self, sensor_id: int):
+        """
+        Drop a sensor's state and shared memory
+
+        Args:
+            sensor_id: Sensor identifier
+        """
+        self.engines.pop(sensor_id, None)
+        self.mirrored.pop(sensor_id, None)
+        segment = self.segments.pop(sensor_id, None)
+
+        if self.pools:
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(
+                    self._get_pool(sensor_id), _worker_release, sensor_id
+                )
+            except Exception as e:
+                logger.error(f"Error releasing worker state for sensor {sensor_id}: {e}")
+
+        if segment is not None:
+            segment.close()
+            segment.unlink()
+
+    def shutdown(self):
+        """Stop worker processes and free shared memory"""
+        for pool in self.pools:
+            pool.shutdown(wait=True, cancel_futures=True)
+        self.pools = []
+
+        for segment in self.segments.values():
+            segment.close()
+            segment.unlink()
+        self.segments.clear()
+        self.mirrored.clear()
+        self.engines.clear()
+
+    def get_status(self) -> Dict:
+        return {
+            'workers': self.workers,
+            'sensors': sorted(set(self.engines) | set(self.segments)),
+        }
@@ -0,0 +1,102 @@
+"""
+Analytic signal service
+
+`AnalyticSignal` computes the analytic signal of one or more signals
+(shape (..., n), optionally band-passed first) once, with the FFT padded
+to a fast length, and derives envelope, phase, instantaneous frequency
+and NB4 from it on first access. One instance per request replaces the
+separate `scipy.signal.hilbert` calls of HilbertTransform,
+TimeFrequency.envelope_analysis and TimeFrequency.instantaneous_frequency.
+"""
+from functools import cached_property
+from typing import Optional, Tuple
+
+import numpy as np
+
+try:
+    from backend import envelope_engine
+    from backend import segment_kernels
+    from backend.precision import working_array
+except ModuleNotFoundError:
+    import envelope_engine
+    import segment_kernels
+    from precision import working_array
+
+# NB4 預設分段數（與 HilbertTransform.calculate_nb4 相同）
+DEFAULT_NB4_SEGMENTS = 10
+
+
+def nb4(envelope, segment_count: int = DEFAULT_NB4_SEGMENTS) -> np.ndarray:
+    """
+    NB4 of one or more envelopes along the last axis
+
+    Same definition as HilbertTransform.calculate_nb4: the first
+    segment_count - 1 segments have n // segment_count samples and the
+    last one takes the remainder. Computed by segment_kernels (compiled
+    with Numba when installed, NumPy otherwise).
+
+    Args:
+        envelope: Envelope(s), shape (..., n)
+        segment_count: Number of segments
+
+    Returns:
+        NB4 values, shape envelope.shape[:-1]
+    """
+    return segment_kernels.nb4(envelope, segment_count)
+
+
+class AnalyticSignal:
+    """
+    Analytic signal with lazily derived quantities
+
+    Every derived quantity is computed on first access and kept on the
+    instance, so creating one object per (signal, band) and passing it
+    around computes the Hilbert transform exactly once.
+    """
+
+    def __init__(self, x, fs: float = 1.0, band: Optional[Tuple[float, float]] = None,
+                 order: int = envelope_engine.DEFAULT_FILTER_ORDER):
+        """
+        Initialize analytic signal
+
+        Args:
+            x: Real signal(s), shape (..., n)
+            fs: Sampling rate; with fs=1 frequencies are in cycles/sample
+            band: Optional (lowcut, highcut) band-pass applied first
+            order: Butterworth order of the band-pass
+        """
+        self.fs = fs
+        self.band = band
+        x = working_array(x)
+        if band is not None:
+            x = envelope_engine.bandpass(x, fs, band[0], band[1], order)
+        self.signal = x
+
+    @cached_property
+    def analytic(self) -> np.ndarray:
+        """Complex analytic signal, same shape as the input"""
+        return envelope_engine.analytic_signal(self.signal)
+
+    @cached_property
+    def envelope(self) -> np.ndarray:
+        """Amplitude envelope |analytic|"""
+        return np.abs(self.analytic)
+
+    @cached_property
+    def phase(self) -> np.ndarray:
+        """Wrapped instantaneous phase (rad)"""
+        return np.angle(self.analytic)
+
+    @cached_property
+    def unwrapped_phase(self) -> np.ndarray:
+        """Unwrapped instantaneous phase (rad)"""
+        return np.unwrap(self.phase, axis=-1)
+
+    @cached_property
+    def instantaneous_frequency(self) -> np.ndarray:
+        """Instantaneous frequency, length n - 1 (Hz, or cycles/sample for fs=1)"""
+        return np.diff(self.unwrapped_phase, axis=-1) / (2.0 * np.pi) * self.fs
+
+    def nb4(self, segment_count: int = DEFAULT_NB4_SEGMENTS) -> np.ndarray:
+        """NB4 of the envelope (see module-level nb4)"""
+        return nb4(self.envelope, segment_count)
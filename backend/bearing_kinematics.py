@@ -0,0 +1,181 @@
+"""
+Bearing kinematics and spectral bin lookup
+
+Fault frequencies (BPFO, BPFI, BSF, FTF) are derived from the PRONOSTIA
+bearing geometry and the shaft speed of each bearing's operating
+condition instead of the condition-1 constants in `InitParameter`, so
+condition 2 / 3 bearings (1650 / 1500 RPM) are analysed at their own
+frequencies.
+
+`SpectrumBins` turns frequency windows on a fixed spectrum grid into
+index arrays once; grids are cached per (fs, n) for plain FFT spectra
+and per (shaft frequency, points, revolutions) for TSA order spectra,
+so FrequencyDomain and HarmonicSildband look bands up instead of
+building boolean masks over the whole spectrum for every file.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+try:
+    from backend import fft_backend
+    from backend.tsa_engine import shaft_frequency
+except ModuleNotFoundError:
+    import fft_backend
+    from tsa_engine import shaft_frequency
+
+# PRONOSTIA (PHM 2012) 測試軸承幾何參數
+BEARING_GEOMETRY = {
+    'n_balls': 13,           # 滾動體數量 Nb
+    'ball_diameter': 6.7,    # 滾動體直徑 d (mm)
+    'pitch_diameter': 34.0,  # 節圓直徑 D (mm)
+    'contact_angle': 0.0,    # 接觸角 (rad)
+}
+
+# 每個頻率網格保留的頻窗索引數上限（超過時清空重建）
+MAX_WINDOWS_PER_GRID = 4096
+
+
+@dataclass(frozen=True)
+class FaultFrequencies:
+    """Characteristic frequencies (Hz) of one shaft speed"""
+    shaft: float
+    bpfo: float
+    bpfi: float
+    bsf: float
+    ftf: float
+
+    def harmonics(self, name: str, count: int) -> np.ndarray:
+        """First `count` harmonics (1x .. count x) of a characteristic frequency"""
+        return getattr(self, name) * np.arange(1, count + 1)
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            'shaft': self.shaft,
+            'bpfo': self.bpfo,
+            'bpfi': self.bpfi,
+            'bsf': self.bsf,
+            'ftf': self.ftf,
+        }
+
+
+@lru_cache(maxsize=16)
+def fault_frequencies(shaft_hz: float) -> FaultFrequencies:
+    """
+    Fault frequencies of the test bearing at a shaft speed
+
+    Args:
+        shaft_hz: Shaft frequency (RPM / 60)
+
+    Returns:
+        FaultFrequencies
+    """
+    n_balls = BEARING_GEOMETRY['n_balls']
+    ratio = (BEARING_GEOMETRY['ball_diameter'] / BEARING_GEOMETRY['pitch_diameter']
+             * np.cos(BEARING_GEOMETRY['contact_angle']))
+
+    return FaultFrequencies(
+        shaft=float(shaft_hz),
+        bpfo=float(n_balls / 2 * (1 - ratio) * shaft_hz),
+        bpfi=float(n_balls / 2 * (1 + ratio) * shaft_hz),
+        bsf=float(BEARING_GEOMETRY['pitch_diameter'] / (2 * BEARING_GEOMETRY['ball_diameter'])
+                  * (1 - ratio ** 2) * shaft_hz),
+        ftf=float(shaft_hz / 2 * (1 - ratio)),
+    )
+
+
+def bearing_fault_frequencies(bearing_name: Optional[str] = None) -> FaultFrequencies:
+    """
+    Fault frequencies of a PHM bearing (speed from its operating condition)
+
+    Args:
+        bearing_name: PHM bearing name; unknown names use condition 1
+
+    Returns:
+        FaultFrequencies
+    """
+    return fault_frequencies(shaft_frequency(bearing_name))
+
+
+class SpectrumBins:
+    """
+    Frequency window -> bin index lookup on a fixed grid
+
+    Windows are evaluated once per (low, high, closed) and reused; the
+    returned index arrays are in grid order, so `DataFrame.iloc[idx]`
+    selects the same rows as the equivalent boolean mask.
+    """
+
+    def __init__(self, freqs: np.ndarray):
+        """
+        Initialize lookup
+
+        Args:
+            freqs: Frequency of every bin (as stored in the spectrum table)
+        """
+        self.freqs = np.asarray(freqs)
+        self._windows: Dict[Tuple[float, float, str], np.ndarray] = {}
+
+    def window(self, low: float, high: float, closed: str = 'both') -> np.ndarray:
+        """
+        Indices of the bins inside a window
+
+        Args:
+            low: Lower edge
+            high: Upper edge
+            closed: 'both' (low <= f <= high), 'left' (low <= f < high)
+                    or 'right' (low < f <= high)
+
+        Returns:
+            Read-only index array
+        """
+        key = (low, high, closed)
+        idx = self._windows.get(key)
+        if idx is None:
+            if closed == 'both':
+                mask = (self.freqs >= low) & (self.freqs <= high)
+            elif closed == 'left':
+                mask = (self.freqs >= low) & (self.freqs < high)
+            else:
+                mask = (self.freqs > low) & (self.freqs <= high)
+            idx = np.flatnonzero(mask)
+            idx.setflags(write=False)
+
+            if len(self._windows) >= MAX_WINDOWS_PER_GRID:
+                self._windows.clear()
+            self._windows[key] = idx
+        return idx
+
+
+@lru_cache(maxsize=16)
+def fft_bins(fs: float, n: int) -> SpectrumBins:
+    """
+    Bin lookup for FrequencyDomain.fft_process spectra ('freqs' column)
+
+    Args:
+        fs: Sampling rate
+        n: FFT length
+
+    Returns:
+        SpectrumBins on np.round(fftfreq(n, 1/fs), 3)
+    """
+    return SpectrumBins(np.round(fft_backend.fftfreq(n, 1. / fs), 3))
+
+
+@lru_cache(maxsize=16)
+def order_bins(shaft_hz: float, points: int, revolutions: int) -> SpectrumBins:
+    """
+    Bin lookup for TSA order spectra ('multiply_freqs' column)
+
+    Args:
+        shaft_hz: Shaft frequency
+        points: Samples per revolution
+        revolutions: Revolutions the order spectrum is padded to
+
+    Returns:
+        SpectrumBins on np.round(orders * shaft_hz, 5)
+    """
+    orders = fft_backend.fftfreq(points * revolutions, 1.0 / points)
+    return SpectrumBins(np.round(orders * shaft_hz, 5))
@@ -5,17 +5,22 @@ This module manages circular buffers for streaming sensor data,
 providing time-windowed data access for real-time analysis.
 """
 import numpy as np
-from collections import deque
 from typing import Dict, List, Optional
 from datetime import datetime, timedelta
 import asyncio
 import logging
+import os
 
 from redis_client import redis_client
 from database_async import db
+from config import DEFAULT_SAMPLING_RATE
+from sliding_stats import ring_tail, ring_write
 
 logger = logging.getLogger(__name__)
 
+# 啟動時只從最近仍有資料寫入的 stream 重建緩衝區（秒）
+BUFFER_RECOVERY_MAX_AGE = float(os.getenv("BUFFER_RECOVERY_MAX_AGE", "600"))
+
 
 class SensorBuffer:
     """
@@ -23,6 +28,11 @@ class SensorBuffer:
 
     Stores high-frequency sensor data (25.6 kHz) in memory
     for efficient time-windowed access.
+
+    原程式碼以 deque 逐樣本保存 {'h', 'v'} dict，每次取窗口都要走訪整個
+    deque 並重建陣列；改為預先配置的 NumPy 環形陣列（samples[0] = h、
+    samples[1] = v，times 為 datetime64[us]），寫入與讀取最新 n 個樣本的
+    成本只與 n 成正比
     """
 
     def __init__(self, sensor_id: int, buffer_size: int = 25600):
@@ -36,10 +46,31 @@ class SensorBuffer:
         """
         self.sensor_id = sensor_id
         self.buffer_size = buffer_size
-        self.buffer = deque(maxlen=buffer_size)
-        self.timestamps = deque(maxlen=buffer_size)
+        self.samples = np.zeros((2, buffer_size))
+        # 時間戳以本地時間 (不含 tzinfo) 保存，讀出時再補回 tzinfo
+        self.times = np.zeros(buffer_size, dtype='datetime64[us]')
+        self.tzinfo = None
+        self.head = 0          # next write position
+        self.size = 0          # samples currently buffered
         self.window_start: Optional[datetime] = None
         self.sample_count = 0
+        self.sampling_rate = float(DEFAULT_SAMPLING_RATE)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _write(self, times: np.ndarray, h_acc: np.ndarray, v_acc: np.ndarray):
+        n = len(times)
+        ring_write(self.times, self.head, times)
+        self.head = ring_write(self.samples, self.head, np.vstack((h_acc, v_acc)))
+        self.size = min(self.buffer_size, self.size + n)
+        self.sample_count += n
+
+        if self.window_start is None:
+            self.window_start = self._to_datetime(times[0])
+
+    def _to_datetime(self, value: np.datetime64) -> datetime:
+        return value.item().replace(tzinfo=self.tzinfo)
 
     def add_sample(self, timestamp: datetime, h_acc: float, v_acc: float):
         """
@@ -50,8 +81,12 @@ class SensorBuffer:
             h_acc: Horizontal acceleration
             v_acc: Vertical acceleration
         """
-        self.buffer.append({'h': h_acc, 'v': v_acc})
-        self.timestamps.append(timestamp)
+        self.tzinfo = timestamp.tzinfo
+        self.times[self.head] = np.datetime64(timestamp.replace(tzinfo=None), 'us')
+        self.samples[0, self.head] = h_acc
+        self.samples[1, self.head] = v_acc
+        self.head = (self.head + 1) % self.buffer_size
+        self.size = min(self.buffer_size, self.size + 1)
         self.sample_count += 1
 
         if self.window_start is None:
@@ -65,8 +100,76 @@ class SensorBuffer:
             samples: List of sample dictionaries with
                      'timestamp', 'h_acc', 'v_acc' keys
         """
-        for sample in samples:
-            self.add_sample(sample['timestamp'], sample['h_acc'], sample['v_acc'])
+        if not samples:
+            return
+
+        n = len(samples)
+        self.tzinfo = samples[-1]['timestamp'].tzinfo
+        times = np.array([s['timestamp'].replace(tzinfo=None) for s in samples],
+                         dtype='datetime64[us]')
+        h_acc = np.fromiter((s['h_acc'] for s in samples), dtype=np.float64, count=n)
+        v_acc = np.fromiter((s['v_acc'] for s in samples), dtype=np.float64, count=n)
+        self._write(times, h_acc, v_acc)
+
+    def add_block(self, start_time: datetime, sampling_rate: float,
+                  h_acc: np.ndarray, v_acc: np.ndarray):
+        """
+        Add a contiguous block of samples at once
+
+        Used to hydrate the buffer from Redis chunks; only the
+        trailing `buffer_size` samples are written.
+
+        Args:
+            start_time: Timestamp of the first sample in the block
+            sampling_rate: Sampling rate in Hz
+            h_acc: Horizontal acceleration samples
+            v_acc: Vertical acceleration samples
+        """
+        n = len(h_acc)
+        first = max(0, n - self.buffer_size)
+        if first >= n:
+            return
+
+        # 與 sample_timestamps 相同的向量化時間戳計算，但不轉成 datetime 物件
+        offsets = np.round((first + np.arange(n - first)) * (1e6 / sampling_rate))
+        times = (np.datetime64(start_time.replace(tzinfo=None), 'us')
+                 + offsets.astype('timedelta64[us]'))
+
+        self.tzinfo = start_time.tzinfo
+        self._write(times, np.asarray(h_acc[first:], dtype=np.float64),
+                    np.asarray(v_acc[first:], dtype=np.float64))
+        self.sampling_rate = float(sampling_rate)
+
+    def latest(self, n: int) -> np.ndarray:
+        """
+        Newest samples in chronological order
+
+        Args:
+            n: Number of samples (clipped to the buffered count)
+
+        Returns:
+            Array of shape (2, n): row 0 = h, row 1 = v
+        """
+        return ring_tail(self.samples, self.head, min(n, self.size))
+
+    def window_info(self) -> Optional[Dict]:
+        """
+        Time range of the buffered samples (without copying them)
+
+        Returns:
+            Dict with sensor_id, window_start, window_end, sample_count
+            and sampling_rate, or None if the buffer is empty
+        """
+        if self.size == 0:
+            return None
+
+        return {
+            'sensor_id': self.sensor_id,
+            'window_start': self._to_datetime(self.times[(self.head - self.size) % self.buffer_size]),
+            'window_end': self._to_datetime(self.times[(self.head - 1) % self.buffer_size]),
+            'sample_count': self.size,
+            'sampling_rate': self.sampling_rate
+        }
 
     def get_window(self, window_seconds: float = 1.0) -> Optional[Dict]:
         """
@@ -78,7 +181,7 @@ class SensorBuffer:
         Returns:
             Dict with arrays and time range, or None if insufficient data
         """
-        if len(self.buffer) == 0:
+        if self.size == 0:
             return None
 
         # 原始：使用嚴格的時間窗口過濾
@@ -86,40 +189,30 @@ class SensorBuffer:
         # 修改：直接返回最近 window_seconds 的數據,不過濾
         # 改進：使用最近 N 個樣本而不是嚴格的時間窗口
 
-        window_end = self.timestamps[-1]
-        window_start = window_end - timedelta(seconds=window_seconds)
+        times = ring_tail(self.times, self.head, self.size)
+        data = self.latest(self.size)
 
-        # 收集符合時間窗口的數據
-        window_data = []
-        window_timestamps = []
+        window_end = times[-1]
+        window_start = window_end - np.timedelta64(int(round(window_seconds * 1e6)), 'us')
 
-        for ts, data in zip(self.timestamps, self.buffer):
-            if ts >= window_start:
-                window_data.append(data)
-                window_timestamps.append(ts)
+        # 收集符合時間窗口的數據
+        mask = times >= window_start
 
         # 如果窗口內數據太少,返回全部數據
         # 原始：如果 window_data 為空就返回 None
         # 修改：如果窗口內數據少於緩衝區的 50%,返回全部數據
-        if len(window_data) < len(self.buffer) * 0.5:
-            # 使用全部數據
-            window_data = list(self.buffer)
-            window_timestamps = list(self.timestamps)
-
-        if len(window_data) == 0:
-            return None
-
-        # Convert to numpy arrays for efficient processing
-        h_array = np.array([d['h'] for d in window_data])
-        v_array = np.array([d['v'] for d in window_data])
+        if np.count_nonzero(mask) >= self.size * 0.5:
+            times = times[mask]
+            data = data[:, mask]
 
         return {
             'sensor_id': self.sensor_id,
-            'window_start': window_timestamps[0],
-            'window_end': window_timestamps[-1],
-            'h_data': h_array,
-            'v_data': v_array,
-            'sample_count': len(window_data)
+            'window_start': self._to_datetime(times[0]),
+            'window_end': self._to_datetime(times[-1]),
+            'h_data': data[0],
+            'v_data': data[1],
+            'sample_count': len(times),
+            'sampling_rate': self.sampling_rate
         }
 
     def is_ready(self, min_samples: int = 10000) -> bool:
@@ -132,12 +225,12 @@ class SensorBuffer:
         Returns:
             True if buffer has sufficient data
         """
-        return len(self.buffer) >= min_samples
+        return self.size >= min_samples
 
     def clear(self):
         """Clear buffer and reset counters"""
-        self.buffer.clear()
-        self.timestamps.clear()
+        self.head = 0
+        self.size = 0
         self.window_start = None
         self.sample_count = 0
 
@@ -148,13 +241,14 @@ class SensorBuffer:
         Returns:
             Dictionary with buffer stats
         """
+        info = self.window_info()
         return {
             'sensor_id': self.sensor_id,
             'buffer_size': self.buffer_size,
-            'current_size': len(self.buffer),
+            'current_size': self.size,
             'sample_count': self.sample_count,
             'window_start': self.window_start.isoformat() if self.window_start else None,
-            'latest_timestamp': self.timestamps[-1].isoformat() if self.timestamps else None
+            'latest_timestamp': info['window_end'].isoformat() if info else None
         }
 
 
@@ -169,6 +263,33 @@ class BufferManager:
     def __init__(self):
         self.buffers: Dict[int, SensorBuffer] = {}
         self.lock = asyncio.Lock()
+        # 每個感測器的資料到達事件，供 RealTimeAnalyzer 以事件驅動取代輪詢
+        self.data_events: Dict[int, asyncio.Event] = {}
+
+    def _get_data_event(self, sensor_id: int) -> asyncio.Event:
+        if sensor_id not in self.data_events:
+            self.data_events[sensor_id] = asyncio.Event()
+        return self.data_events[sensor_id]
+
+    def notify_data(self, sensor_id: int):
+        """
+        Signal that new samples arrived for a sensor
+
+        Args:
+            sensor_id: Sensor identifier
+        """
+        self._get_data_event(sensor_id).set()
+
+    async def wait_for_data(self, sensor_id: int):
+        """
+        Wait until new samples arrive for a sensor
+
+        Args:
+            sensor_id: Sensor identifier
+        """
+        event = self._get_data_event(sensor_id)
+        await event.wait()
+        event.clear()
 
     async def get_buffer(self, sensor_id: int) -> SensorBuffer:
         """
@@ -186,7 +307,8 @@ class BufferManager:
                 logger.info(f"Created buffer for sensor {sensor_id}")
             return self.buffers[sensor_id]
 
-    async def add_data(self, sensor_id: int, data: List[Dict]):
+    async def add_data(self, sensor_id: int, data: List[Dict],
+                       sampling_rate: Optional[float] = None):
         """
         Add data to sensor buffer
 
@@ -195,10 +317,13 @@ class BufferManager:
 
         原程式碼使用循環逐個寫入 Redis，對於大批次數據（如 25600 點）性能極差
         改用批量寫入方法 `add_sensor_data_batch` 以大幅提升性能
+        再改為整個批次打包成單一 stream entry（`add_sensor_chunk`）
 
         Args:
             sensor_id: Sensor identifier
             data: List of data samples
+            sampling_rate: Sampling rate in Hz (inferred from the
+                           timestamps when not given)
         """
         buffer = await self.get_buffer(sensor_id)
 
@@ -210,6 +335,14 @@ class BufferManager:
 
         buffer.add_batch(data)
 
+        if not data:
+            return
+
+        if sampling_rate is None:
+            sampling_rate = self._infer_sampling_rate(data)
+        buffer.sampling_rate = float(sampling_rate)
+        self.notify_data(sensor_id)
+
         # 原程式碼: 逐個寫入 Redis (性能差)
         # for sample in data:
         #     try:
@@ -221,24 +354,62 @@ class BufferManager:
         #     except Exception as e:
         #         logger.error(f"Error storing in Redis stream: {e}")
 
-        # 優化: 批量寫入 Redis
+        # 原程式碼: 每個樣本一筆 XADD (add_sensor_data_batch)
+        # 優化: 整個批次一筆 XADD，攜帶 packed float32 陣列
         try:
-            # 準備批量數據
-            redis_data = [
-                {
-                    'timestamp': sample['timestamp'].isoformat(),
-                    'h_acc': str(sample['h_acc']),
-                    'v_acc': str(sample['v_acc'])
-                }
-                for sample in data
-            ]
-            # 使用批量方法寫入
-            await redis_client.add_sensor_data_batch(sensor_id, redis_data)
+            h_acc = np.fromiter((s['h_acc'] for s in data), dtype=np.float32, count=len(data))
+            v_acc = np.fromiter((s['v_acc'] for s in data), dtype=np.float32, count=len(data))
+            await redis_client.add_sensor_chunk(
+                sensor_id, data[0]['timestamp'], sampling_rate, h_acc, v_acc
+            )
         except Exception as e:
-            logger.error(f"Error batch storing in Redis stream: {e}")
+            logger.error(f"Error storing chunk in Redis stream: {e}")
 
         logger.debug(f"Added {len(data)} samples to buffer for sensor {sensor_id}")
 
+    async def add_chunk(self, sensor_id: int, start_time: datetime,
+                        sampling_rate: float, h_acc: np.ndarray, v_acc: np.ndarray):
+        """
+        Add a packed batch forwarded by another instance
+
+        Args:
+            sensor_id: Sensor identifier
+            start_time: Timestamp of the first sample
+            sampling_rate: Sampling rate in Hz
+            h_acc: Horizontal acceleration samples
+            v_acc: Vertical acceleration samples
+        """
+        if len(h_acc) == 0:
+            return
+
+        buffer = await self.get_buffer(sensor_id)
+        buffer.add_block(start_time, sampling_rate, h_acc, v_acc)
+        self.notify_data(sensor_id)
+
+        try:
+            await redis_client.add_sensor_chunk(
+                sensor_id, start_time, sampling_rate, h_acc, v_acc
+            )
+        except Exception as e:
+            logger.error(f"Error storing chunk in Redis stream: {e}")
+
+    @staticmethod
+    def _infer_sampling_rate(data: List[Dict]) -> float:
+        """
+        Infer sampling rate from first/last sample timestamps
+
+        Args:
+            data: List of data samples
+
+        Returns:
+            Sampling rate in Hz (DEFAULT_SAMPLING_RATE if it cannot be inferred)
+        """
+        if len(data) > 1:
+            span = (data[-1]['timestamp'] - data[0]['timestamp']).total_seconds()
+            if span > 0:
+                return (len(data) - 1) / span
+        return float(DEFAULT_SAMPLING_RATE)
+
     async def get_window(self, sensor_id: int, window_seconds: float = 1.0):
         """
         Get time window data from buffer
@@ -267,29 +438,78 @@ class BufferManager:
         if not window_data or window_data['sample_count'] == 0:
             return
 
-        # Prepare data for batch insert
-        db_data = []
-        sampling_rate = 25600  # Hz
-
-        for i in range(len(window_data['h_data'])):
-            # Calculate timestamp based on sampling rate
-            time_offset = timedelta(microseconds=i * (1000000 / sampling_rate))
-            ts = window_data['window_start'] + time_offset
-
-            db_data.append({
-                'timestamp': ts,
-                'h_acc': float(window_data['h_data'][i]),
-                'v_acc': float(window_data['v_data'][i])
-            })
+        # 原程式碼逐樣本以 timedelta 計算時間戳並組成 dict，再 executemany
+        # 改為向量化計算時間戳，以 COPY 寫入
+        chunk = {
+            'sensor_id': sensor_id,
+            'start_time': window_data['window_start'],
+            'sampling_rate': window_data.get('sampling_rate', DEFAULT_SAMPLING_RATE),
+            'h_acc': window_data['h_data'],
+            'v_acc': window_data['v_data']
+        }
 
         try:
-            await db.insert_sensor_data(sensor_id, db_data)
+            written = await db.archive_sensor_rows([chunk])
             logger.debug(
-                f"Saved {len(db_data)} samples to database for sensor {sensor_id}"
+                f"Saved {written} samples to database for sensor {sensor_id}"
             )
         except Exception as e:
             logger.error(f"Error saving to database: {e}")
 
+    async def recover_from_redis(self, max_age_seconds: float = BUFFER_RECOVERY_MAX_AGE) -> Dict[int, int]:
+        """
+        Rebuild sensor buffers from the Redis chunk streams
+
+        Called once at startup so that analysis can resume without
+        waiting for a fresh buffer's worth of samples.
+
+        Args:
+            max_age_seconds: Only recover streams written within this period
+
+        Returns:
+            Dict mapping sensor_id to number of recovered samples
+        """
+        recovered = {}
+
+        for sensor_id in await redis_client.get_recent_chunk_sensors(max_age_seconds):
+            try:
+                recovered[sensor_id] = await self.recover_sensor(sensor_id)
+            except Exception as e:
+                logger.error(f"Error recovering buffer for sensor {sensor_id}: {e}")
+
+        return recovered
+
+    async def recover_sensor(self, sensor_id: int) -> int:
+        """
+        Rebuild one sensor buffer from its Redis chunk stream
+
+        Also used when a sensor's ownership moves to this instance.
+
+        Args:
+            sensor_id: Sensor identifier
+
+        Returns:
+            Number of samples in the buffer
+        """
+        buffer = await self.get_buffer(sensor_id)
+        chunks = await redis_client.read_recent_sensor_chunks(
+            sensor_id, buffer.buffer_size
+        )
+
+        for chunk in chunks:
+            buffer.add_block(
+                chunk['start_time'], chunk['sampling_rate'],
+                chunk['h_acc'], chunk['v_acc']
+            )
+
+        if chunks:
+            self.notify_data(sensor_id)
+        logger.info(
+            f"Recovered {len(buffer)} samples from "
+            f"{len(chunks)} chunks for sensor {sensor_id}"
+        )
+        return len(buffer)
+
     async def clear_buffer(self, sensor_id: int):
         """
         Clear buffer for a sensor
@@ -42,6 +42,21 @@ SIGNAL_DISPLAY_LIMIT = 1000  # 前端顯示的最大資料點數
 SPECTRUM_DISPLAY_LIMIT = 1000  # 頻譜顯示的最大資料點數
 ENVELOPE_SPECTRUM_DISPLAY_LIMIT = 500  # 包絡頻譜顯示的最大資料點數
 
+# 時頻特徵趨勢配置
+TIME_FREQUENCY_TREND_CHUNK_FILES = 8  # 每批載入並計算的檔案數（限制 CWT 記憶體用量）
+TIME_FREQUENCY_TREND_SEGMENT_DURATION = 0.01  # NE 時間分段長度（秒），每個 0.1 秒檔案分 10 段
+
+# 批次計算精度（precision）："float64"（預設）或 "float32"
+# float32 以單精度載入波形並以 complex64 計算 FFT/STFT/CWT，高階動差仍以 float64 累加
+COMPUTE_PRECISION = os.getenv("COMPUTE_PRECISION", "float64")
+
+# FFT 後端配置（fft_backend）
+# FFT_BACKEND: "auto"（有安裝 pyFFTW 時使用，否則 scipy.fft）、"scipy" 或 "pyfftw"
+FFT_BACKEND = os.getenv("FFT_BACKEND", "auto")
+# FFT_WORKERS: 批次 FFT 的平行執行緒數；0 = 自動（主程序用全部 CPU，子程序如 ANALYSIS_WORKERS 的 worker 只用 1）
+FFT_WORKERS = int(os.getenv("FFT_WORKERS", "0"))
+FFT_WISDOM_PATH = os.getenv("FFT_WISDOM_PATH", os.path.join(BACKEND_DIR, "fftw_wisdom.pkl"))  # pyFFTW wisdom 快取檔
+
 # PHM 數據目錄
 PHM_DATA_DIR = os.path.join(Path(__file__).parent.parent, "phm-ieee-2012-data-challenge-dataset")
 PHM_RESULTS_DIR = os.path.join(Path(__file__).parent.parent, "phm_analysis_results")
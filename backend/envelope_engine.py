@@ -0,0 +1,130 @@
+"""
+Band-pass envelope pipeline
+
+Butterworth band-pass filters are designed once per
+(fs, lowcut, highcut, order) as second-order sections and cached; SOS
+form stays numerically stable at the low (10 Hz) cut-off where the
+(b, a) polynomial form loses precision. Signals of shape (..., n) are
+filtered with one zero-phase `sosfiltfilt` call along the last axis and
+the Hilbert envelope is computed from a real FFT padded to a fast
+length, so both channels of a file, or (files, channels, n), go through
+the pipeline together.
+"""
+from functools import lru_cache
+
+import numpy as np
+from scipy import signal
+
+try:
+    from backend import fft_backend
+    from backend.precision import working_array
+except ModuleNotFoundError:
+    import fft_backend
+    from precision import working_array
+
+# 預設 Butterworth 階數（與原 butter(4, ..., btype='band') 相同）
+DEFAULT_FILTER_ORDER = 4
+
+
+@lru_cache(maxsize=32)
+def _bandpass_sos(fs: float, lowcut: float, highcut: float, order: int) -> np.ndarray:
+    # 注意：不可設為唯讀，scipy 的 sosfilt 需要可寫入的 buffer（不會修改內容）
+    return signal.butter(order, [lowcut, highcut], btype='band', fs=fs, output='sos')
+
+
+def bandpass_sos(fs: float, lowcut: float, highcut: float,
+                 order: int = DEFAULT_FILTER_ORDER) -> np.ndarray:
+    """
+    Cached Butterworth band-pass design
+
+    Args:
+        fs: Sampling rate
+        lowcut: Low cut-off frequency (Hz)
+        highcut: High cut-off frequency (Hz)
+        order: Filter order
+
+    Returns:
+        Second-order sections, shape (n_sections, 6)
+    """
+    return _bandpass_sos(float(fs), float(lowcut), float(highcut), int(order))
+
+
+def bandpass(x, fs: float, lowcut: float, highcut: float,
+             order: int = DEFAULT_FILTER_ORDER) -> np.ndarray:
+    """
+    Zero-phase band-pass filter along the last axis
+
+    Args:
+        x: Signal(s), shape (..., n)
+        fs, lowcut, highcut, order: Filter design (see bandpass_sos)
+
+    Returns:
+        Filtered signal(s), same shape as x
+    """
+    sos = bandpass_sos(fs, lowcut, highcut, order)
+    # 濾波一律以 float64 計算（10 Hz 低截止的極點貼近單位圓，單精度不穩定）
+    return signal.sosfiltfilt(sos, np.asarray(x, dtype=np.float64), axis=-1)
+
+
+def analytic_signal(x, workers: int = None) -> np.ndarray:
+    """
+    Analytic signal along the last axis (scipy.signal.hilbert equivalent)
+
+    The real FFT is zero-padded to the next fast length; for lengths that
+    are already fast (2560 = 2^9 * 5) the result equals scipy.signal.hilbert.
+
+    Args:
+        x: Real signal(s), shape (..., n)
+        workers: Parallel FFT workers (None: config.FFT_WORKERS)
+
+    Returns:
+        Complex analytic signal, same shape as x (complex64 for float32 x)
+    """
+    x = working_array(x)
+    n = x.shape[-1]
+    nfft = fft_backend.next_fast_len(n, real=True)
+
+    spectrum = fft_backend.rfft(x, nfft, axis=-1, workers=workers)
+    # 正頻率乘 2；DC（與偶數長度時的 Nyquist）不變；負頻率為 0
+    if nfft % 2:
+        spectrum[..., 1:] *= 2
+    else:
+        spectrum[..., 1:-1] *= 2
+
+    full = np.zeros(x.shape[:-1] + (nfft,), dtype=spectrum.dtype)
+    full[..., :spectrum.shape[-1]] = spectrum
+    return fft_backend.ifft(full, axis=-1, workers=workers)[..., :n]
+
+
+def envelope(x, fs: float, lowcut: float, highcut: float,
+             order: int = DEFAULT_FILTER_ORDER) -> np.ndarray:
+    """
+    Band-pass Hilbert envelope
+
+    Args:
+        x: Signal(s), shape (..., n)
+        fs, lowcut, highcut, order: Filter design (see bandpass_sos)
+
+    Returns:
+        |analytic(bandpass(x))|, same shape as x
+    """
+    return np.abs(analytic_signal(bandpass(x, fs, lowcut, highcut, order)))
+
+
+def envelope_spectrum(env, fs: float):
+    """
+    Single-sided amplitude spectrum of an envelope
+
+    Args:
+        env: Envelope(s), shape (..., n)
+        fs: Sampling rate
+
+    Returns:
+        (frequencies of length n//2, magnitude of shape (..., n//2));
+        same scaling as 2/n * |fft(env)[:n//2]|
+    """
+    env = np.asarray(env)
+    n = env.shape[-1]
+    freqs = fft_backend.rfftfreq(n, 1 / fs)[:n // 2]
+    magnitude = np.abs(fft_backend.rfft(env, axis=-1)[..., :n // 2]) * (2.0 / n)
+    return freqs, magnitude
@@ -0,0 +1,337 @@
+"""
+Feature registry for real-time analysis
+
+Each feature declares the intermediates it needs (raw window, Welch
+spectrum, full-window spectrum, Hilbert envelope, STFT), a relative
+cost and the realtime tier it runs at. For every tick the registry
+resolves the requested features into a dependency DAG and evaluates it
+with memoization, so shared intermediates (one FFT, one envelope) are
+computed once per channel no matter how many features use them.
+"""
+import os
+import numpy as np
+from typing import Callable, Dict, Iterable, List, Set
+
+try:
+    from backend.analytic_signal import AnalyticSignal
+    from backend.filterprocess import FilterProcess
+    from backend.hilberttransform import HilbertTransform
+    from backend.timefrequency import TimeFrequency
+    from backend.frequencydomain import FrequencyDomain
+    from backend import fft_backend
+except ModuleNotFoundError:
+    from analytic_signal import AnalyticSignal
+    from filterprocess import FilterProcess
+    from hilberttransform import HilbertTransform
+    from timefrequency import TimeFrequency
+    from frequencydomain import FrequencyDomain
+    import fft_backend
+
+
+# 各 tier 每隔幾個 tick 執行一次
+TIER_INTERVALS = {
+    'fast': 1,
+    'slow': int(os.getenv("ANALYSIS_SLOW_TIER_INTERVAL", "4")),
+}
+
+# 由 analyzer 每個 tick 提供的基礎輸入
+BASE_INPUTS = ('window', 'stats', 'welch', 'sampling_rate')
+
+
+class FeatureNode:
+    """
+    A node in the feature DAG (intermediate or feature)
+
+    Attributes:
+        name: Node name
+        inputs: Names of the nodes / base inputs it depends on
+        compute: Callable receiving the input values positionally
+        cost: Relative cost of computing this node alone
+    """
+
+    def __init__(self, name: str, inputs: Iterable[str], compute: Callable,
+                 cost: float = 1.0):
+        self.name = name
+        self.inputs = tuple(inputs)
+        self.compute = compute
+        self.cost = cost
+
+
+class FeatureSpec(FeatureNode):
+    """
+    A realtime feature published as `<name>_<channel>`
+
+    Attributes:
+        tier: 'fast' (every tick) or 'slow' (every TIER_INTERVALS['slow'] ticks)
+        default: Enabled for sensors without an explicit feature set
+        description: Short description for the registry listing
+    """
+
+    def __init__(self, name: str, inputs: Iterable[str], compute: Callable,
+                 cost: float = 1.0, tier: str = 'fast', default: bool = False,
+                 description: str = ''):
+        super().__init__(name, inputs, compute, cost)
+        if tier not in TIER_INTERVALS:
+            raise ValueError(f"Unknown tier: {tier}")
+        self.tier = tier
+        self.default = default
+        self.description = description
+
+
+class FeatureRegistry:
+    """
+    Registry of realtime intermediates and features
+    """
+
+    def __init__(self):
+        self.intermediates: Dict[str, FeatureNode] = {}
+        self.features: Dict[str, FeatureSpec] = {}
+
+    def register_intermediate(self, name: str, inputs: Iterable[str],
+                              compute: Callable, cost: float = 1.0):
+        self.intermediates[name] = FeatureNode(name, inputs, compute, cost)
+
+    def register_feature(self, spec: FeatureSpec):
+        self.features[spec.name] = spec
+
+    def _node(self, name: str) -> FeatureNode:
+        if name in self.features:
+            return self.features[name]
+        return self.intermediates[name]
+
+    def default_features(self) -> Set[str]:
+        return {name for name, spec in self.features.items() if spec.default}
+
+    def validate(self, names: Iterable[str]) -> List[str]:
+        """
+        Check feature names against the registry
+
+        Args:
+            names: Feature names
+
+        Returns:
+            List of unknown names (empty when all are valid)
+        """
+        return sorted(set(names) - set(self.features))
+
+    def due_features(self, names: Iterable[str], tick: int) -> List[str]:
+        """
+        Filter features whose tier is due on this tick
+
+        Args:
+            names: Enabled feature names
+            tick: Tick counter (starting at 0)
+
+        Returns:
+            Sorted list of feature names to compute
+        """
+        return sorted(
+            name for name in names
+            if tick % TIER_INTERVALS[self.features[name].tier] == 0
+        )
+
+    def plan(self, names: Iterable[str]) -> List[str]:
+        """
+        Topologically ordered nodes needed for the given features
+
+        Shared dependencies appear only once.
+
+        Args:
+            names: Feature names
+
+        Returns:
+            Node names in evaluation order (base inputs excluded)
+        """
+        order = []
+        visited = set()
+
+        def visit(name):
+            if name in visited or name in BASE_INPUTS:
+                return
+            visited.add(name)
+            for dep in self._node(name).inputs:
+                visit(dep)
+            order.append(name)
+
+        for name in sorted(names):
+            visit(name)
+        return order
+
+    def needs_input(self, names: Iterable[str], base_input: str) -> bool:
+        """
+        Whether evaluating the features reads a base input
+
+        Args:
+            names: Feature names
+            base_input: Base input name (e.g. 'window')
+
+        Returns:
+            True if any node in the plan depends on it
+        """
+        return any(base_input in self._node(name).inputs for name in self.plan(names))
+
+    def estimate_cost(self, names: Iterable[str]) -> float:
+        """Total cost of one evaluation, counting shared nodes once"""
+        return float(sum(self._node(name).cost for name in self.plan(names)))
+
+    def compute(self, names: Iterable[str], context: Dict) -> Dict[str, float]:
+        """
+        Evaluate features for one channel
+
+        Args:
+            names: Feature names
+            context: Base inputs ('window', 'stats', 'welch', 'sampling_rate')
+
+        Returns:
+            Dict of feature name -> value
+        """
+        names = list(names)
+        values = dict(context)
+
+        for name in self.plan(names):
+            node = self._node(name)
+            values[name] = node.compute(*(values[dep] for dep in node.inputs))
+
+        return {name: float(values[name]) for name in names}
+
+    def describe(self) -> List[Dict]:
+        """
+        Registry listing for the API
+
+        Returns:
+            List of feature descriptions
+        """
+        return [
+            {
+                'name': spec.name,
+                'inputs': list(spec.inputs),
+                'cost': spec.cost,
+                'tier': spec.tier,
+                'default': spec.default,
+                'description': spec.description
+            }
+            for spec in sorted(self.features.values(), key=lambda s: s.name)
+        ]
+
+
+# ==================== Intermediates ====================
+
+def _window_spectrum(window: np.ndarray, fs: float):
+    magnitude = np.abs(fft_backend.rfft(window))
+    freqs = fft_backend.rfftfreq(window.size, 1.0 / fs)
+    return freqs, magnitude
+
+
+def _energy_ratio(spectrum, low_freq: float = 1000, high_freq: float = 5000) -> float:
+    # 與 FilterProcess.ER_simple 相同的定義，重用共用的頻譜
+    freqs, magnitude = spectrum
+    positive = freqs > 0
+    energy = magnitude[positive] ** 2
+    band = (freqs[positive] >= low_freq) & (freqs[positive] <= high_freq)
+    total_energy = np.sum(energy)
+    if not np.any(band) or total_energy <= 0:
+        return 0.0
+    return float(np.sqrt(np.sum(energy[band]) / total_energy))
+
+
+_hilbert = HilbertTransform()
+_frequency_domain = FrequencyDomain()
+
+
+def build_default_registry() -> FeatureRegistry:
+    """
+    Registry with the PHM features used by the batch endpoints
+
+    Returns:
+        FeatureRegistry instance
+    """
+    registry = FeatureRegistry()
+
+    registry.register_intermediate('time_stats', ['stats'], lambda s: s.features(), cost=0.1)
+    registry.register_intermediate('welch_features', ['welch'], lambda w: w.features(), cost=0.1)
+    registry.register_intermediate('spectrum', ['window', 'sampling_rate'], _window_spectrum, cost=2.0)
+    registry.register_intermediate(
+        'envelope', ['window'], lambda x: AnalyticSignal(x).envelope, cost=4.0
+    )
+    registry.register_intermediate(
+        'stft', ['window', 'sampling_rate'],
+        lambda x, fs: TimeFrequency.stft_analysis(x, fs=fs), cost=10.0
+    )
+    registry.register_intermediate(
+        'fm0_si', ['window', 'sampling_rate'],
+        lambda x, fs: _frequency_domain.fft_fm0_si(x, fs), cost=15.0
+    )
+
+    # Fast tier: 由增量統計量與串流頻譜提供，成本與 hop 成正比
+    for name, description in (
+        ('rms', 'Root mean square'),
+        ('peak', 'Maximum absolute value'),
+        ('kurtosis', 'Kurtosis (m4 / m2²)'),
+        ('crest_factor', 'Peak / RMS'),
+    ):
+        registry.register_feature(FeatureSpec(
+            name, ['time_stats'], lambda t, key=name: t[key],
+            cost=0.01, tier='fast', default=True, description=description
+        ))
+
+    for name, description in (
+        ('m6a', '6th moment (N²·Σ(x-μ)⁶ / [Σ(x-μ)²]³)'),
+        ('m8a', '8th moment (N³·Σ(x-μ)⁸ / [Σ(x-μ)²]⁴)'),
+    ):
+        registry.register_feature(FeatureSpec(
+            name, ['time_stats'], lambda t, key=name: t[key],
+            cost=0.01, tier='fast', description=description
+        ))
+
+    # FM4 與母體峰度相同: N·Σ(x-μ)⁴ / [Σ(x-μ)²]²
+    registry.register_feature(FeatureSpec(
+        'fm4', ['time_stats'], lambda t: t['kurtosis'],
+        cost=0.01, tier='fast', description='Fourth moment (FM4)'
+    ))
+
+    for name, description in (
+        ('dominant_freq', 'Dominant frequency of the Welch PSD'),
+        ('shaft_power', 'Band power around the shaft frequency'),
+        ('bpfo_power', 'Band power around BPFO'),
+        ('bpfi_power', 'Band power around BPFI'),
+    ):
+        registry.register_feature(FeatureSpec(
+            name, ['welch_features'], lambda w, key=name: w[key],
+            cost=0.01, tier='fast', default=True, description=description
+        ))
+
+    # Slow tier: 需要整個窗口的中間結果
+    registry.register_feature(FeatureSpec(
+        'na4', ['window'], lambda x: FilterProcess.NA4(x)[0],
+        cost=1.0, tier='slow', description='Normalized 4th moment with segmentation (NA4)'
+    ))
+    registry.register_feature(FeatureSpec(
+        'er', ['spectrum'], _energy_ratio,
+        cost=0.5, tier='slow', description='Energy ratio of the 1-5 kHz band (ER)'
+    ))
+    registry.register_feature(FeatureSpec(
+        'nb4', ['envelope'], lambda e: _hilbert.calculate_nb4(e),
+        cost=1.0, tier='slow', description='NB4 of the Hilbert envelope'
+    ))
+    registry.register_feature(FeatureSpec(
+        'np4', ['stft'], lambda s: s['np4'],
+        cost=0.1, tier='slow', description='NP4 of the STFT magnitude'
+    ))
+    registry.register_feature(FeatureSpec(
+        'fm0', ['fm0_si'], lambda r: r[3],
+        cost=0.1, tier='slow', description='Low-frequency FM0'
+    ))
+    registry.register_feature(FeatureSpec(
+        'mgs', ['fm0_si'], lambda r: r[1],
+        cost=0.1, tier='slow', description='Motor gear sideband index (MGS)'
+    ))
+    registry.register_feature(FeatureSpec(
+        'bi', ['fm0_si'], lambda r: r[2],
+        cost=0.1, tier='slow', description='Bearing sideband index (BI)'
+    ))
+
+    return registry
+
+
+# Global registry instance
+feature_registry = build_default_registry()
@@ -0,0 +1,167 @@
+"""
+Downsampled rollups of realtime features
+
+Every analysis tick contributes to 1 s / 1 min / 1 h buckets holding
+min / max / sum / count / last per sensor and feature. Only the deltas
+accumulated since the last flush are kept in memory; they are merged
+into the rollup tables with an UPSERT (LEAST / GREATEST / + / latest),
+which is associative, so partially filled buckets can be flushed any
+number of times.
+"""
+import math
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+# Rollup level -> bucket length in seconds
+ROLLUP_LEVELS = {
+    '1s': 1,
+    '1m': 60,
+    '1h': 3600,
+}
+
+# 不是特徵值的欄位
+_METADATA_KEYS = {'sensor_id', 'window_start', 'window_end', 'sample_count', 'timestamp'}
+
+
+def rollup_table(level: str) -> str:
+    return f"feature_rollup_{level}"
+
+
+def bucket_start(timestamp: datetime, seconds: int) -> datetime:
+    """
+    Start of the bucket containing a timestamp
+
+    Args:
+        timestamp: Timestamp (naive or aware)
+        seconds: Bucket length in seconds (must divide one day)
+
+    Returns:
+        Bucket start with the same tzinfo
+    """
+    whole = timestamp.replace(microsecond=0)
+    seconds_of_day = whole.hour * 3600 + whole.minute * 60 + whole.second
+    return whole - timedelta(seconds=seconds_of_day % seconds)
+
+
+def select_rollup_level(start: datetime, end: datetime, max_points: int) -> str:
+    """
+    Finest rollup level returning at most `max_points` buckets
+
+    Args:
+        start: Range start
+        end: Range end
+        max_points: Maximum buckets per feature
+
+    Returns:
+        Rollup level name
+    """
+    span = max((end - start).total_seconds(), 0.0)
+    for level, seconds in ROLLUP_LEVELS.items():
+        if span / seconds <= max_points:
+            return level
+    return list(ROLLUP_LEVELS)[-1]
+
+
+def clamp_rollup_start(start: datetime, end: datetime, level: str, max_points: int) -> datetime:
+    """
+    Latest start at which a range returns at most `max_points` buckets
+
+    Ranges too long even for the coarsest level keep their most recent
+    `max_points` buckets.
+
+    Args:
+        start: Range start
+        end: Range end
+        level: Rollup level name
+        max_points: Maximum buckets per feature (>= 1)
+
+    Returns:
+        `start`, or `end - max_points` buckets if that is later
+    """
+    return max(start, end - timedelta(seconds=ROLLUP_LEVELS[level] * max_points))
+
+
+class FeatureRollups:
+    """
+    In-memory rollup deltas waiting to be flushed
+    """
+
+    def __init__(self):
+        # level -> (sensor_id, bucket, feature) -> [min, max, sum, count, last, last_time]
+        self.pending: Dict[str, Dict[Tuple, List]] = {level: {} for level in ROLLUP_LEVELS}
+
+    def add(self, sensor_id: int, timestamp: datetime, features: Dict):
+        """
+        Add one tick of features to every rollup level
+
+        Args:
+            sensor_id: Sensor identifier
+            timestamp: Tick timestamp (window end)
+            features: Feature dictionary; non-numeric and non-finite
+                      values are ignored
+        """
+        values = {
+            name: float(value) for name, value in features.items()
+            if name not in _METADATA_KEYS and isinstance(value, (int, float))
+            and not isinstance(value, bool) and math.isfinite(value)
+        }
+        if not values:
+            return
+
+        for level, seconds in ROLLUP_LEVELS.items():
+            bucket = bucket_start(timestamp, seconds)
+            pending = self.pending[level]
+            for name, value in values.items():
+                key = (sensor_id, bucket, name)
+                stats = pending.get(key)
+                if stats is None:
+                    pending[key] = [value, value, value, 1, value, timestamp]
+                    continue
+                stats[0] = min(stats[0], value)
+                stats[1] = max(stats[1], value)
+                stats[2] += value
+                stats[3] += 1
+                if timestamp >= stats[5]:
+                    stats[4] = value
+                    stats[5] = timestamp
+
+    def drain(self) -> Dict[str, List[Tuple]]:
+        """
+        Take all pending deltas
+
+        Returns:
+            Dict of level -> list of (sensor_id, bucket, feature_name,
+            min, max, sum, count, last, last_time)
+        """
+        drained = {
+            level: [key + tuple(stats) for key, stats in pending.items()]
+            for level, pending in self.pending.items()
+        }
+        self.pending = {level: {} for level in ROLLUP_LEVELS}
+        return drained
+
+    def restore(self, records: Dict[str, List[Tuple]]):
+        """
+        Put drained deltas back after a failed flush
+
+        Args:
+            records: Output of `drain`
+        """
+        for level, rows in records.items():
+            pending = self.pending[level]
+            for sensor_id, bucket, name, low, high, total, count, last, last_time in rows:
+                key = (sensor_id, bucket, name)
+                stats = pending.get(key)
+                if stats is None:
+                    pending[key] = [low, high, total, count, last, last_time]
+                    continue
+                stats[0] = min(stats[0], low)
+                stats[1] = max(stats[1], high)
+                stats[2] += total
+                stats[3] += count
+                if last_time > stats[5]:
+                    stats[4] = last
+                    stats[5] = last_time
+
+    def __len__(self) -> int:
+        return sum(len(pending) for pending in self.pending.values())
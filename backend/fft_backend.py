@@ -0,0 +1,177 @@
+"""
+FFT backend facade
+
+All signal-processing modules call fft / ifft / rfft / irfft from here
+instead of mixing `np.fft` and `scipy.fft`. The backend is chosen once
+(`config.FFT_BACKEND`):
+
+- "pyfftw": pyFFTW's scipy.fft interface with the plan cache enabled and
+  FFTW wisdom loaded from / saved to `config.FFT_WISDOM_PATH`
+- "scipy": scipy.fft (pocketfft)
+- "auto": pyFFTW when installed, otherwise scipy.fft
+
+Every transform accepts `workers`; None means `config.FFT_WORKERS`, so
+batched transforms (files x channels x samples) are split across threads
+without each caller having to thread the setting through. FFT_WORKERS=0
+uses every CPU in the main process but a single thread in child
+processes (ANALYSIS_WORKERS pools, multi-worker servers), so N workers
+do not each start a full-width FFT thread pool.
+
+Wisdom is saved at exit by the main process only, through a temporary
+file and `os.replace`, so a concurrent reader never sees a partial file.
+"""
+import atexit
+import logging
+import multiprocessing
+import os
+import pickle
+import tempfile
+
+from scipy import fft as sp_fft
+
+try:
+    from backend.config import FFT_BACKEND, FFT_WORKERS, FFT_WISDOM_PATH
+except ModuleNotFoundError:
+    from config import FFT_BACKEND, FFT_WORKERS, FFT_WISDOM_PATH
+
+try:
+    import pyfftw
+    import pyfftw.interfaces.scipy_fft as pyfftw_fft
+except ImportError:
+    pyfftw = None
+    pyfftw_fft = None
+
+logger = logging.getLogger(__name__)
+
+# 頻率軸與快速長度不需要後端實作
+fftfreq = sp_fft.fftfreq
+rfftfreq = sp_fft.rfftfreq
+next_fast_len = sp_fft.next_fast_len
+
+
+
+def default_workers(configured: int = FFT_WORKERS) -> int:
+    """
+    Worker count used when a transform is called with workers=None
+
+    Args:
+        configured: FFT_WORKERS setting (0 = automatic)
+
+    Returns:
+        `configured` if positive, otherwise os.cpu_count() in the main
+        process and 1 in child processes
+    """
+    if configured > 0:
+        return configured
+    if multiprocessing.parent_process() is not None:
+        return 1
+    return os.cpu_count() or 1
+
+
+_impl = sp_fft
+_backend = "scipy"
+_workers = default_workers()
+
+
+def load_wisdom(path: str = FFT_WISDOM_PATH) -> bool:
+    """Import FFTW wisdom saved by a previous run (pyFFTW backend only)"""
+    if pyfftw is None or not path or not os.path.exists(path):
+        return False
+    try:
+        with open(path, "rb") as f:
+            pyfftw.import_wisdom(pickle.load(f))
+        return True
+    except Exception as e:
+        logger.warning(f"Failed to load FFTW wisdom from {path}: {e}")
+        return False
+
+
+def save_wisdom(path: str = FFT_WISDOM_PATH) -> bool:
+    """Export the FFTW plans measured in this process (pyFFTW backend only)"""
+    if _backend != "pyfftw" or not path:
+        return False
+    fd, tmp_path = None, None
+    try:
+        # 先寫入同目錄的暫存檔再以 os.replace 原子替換，避免讀到寫了一半的檔案
+        fd, tmp_path = tempfile.mkstemp(prefix=".fftw_wisdom.", dir=os.path.dirname(os.path.abspath(path)))
+        with os.fdopen(fd, "wb") as f:
+            fd = None
+            pickle.dump(pyfftw.export_wisdom(), f)
+        os.replace(tmp_path, path)
+        return True
+    except Exception as e:
+        logger.warning(f"Failed to save FFTW wisdom to {path}: {e}")
+        if fd is not None:
+            os.close(fd)
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+
+
+def set_backend(name: str = "auto", workers: int = None) -> str:
+    """
+    Select the FFT implementation
+
+    Args:
+        name: "auto", "scipy" or "pyfftw"
+        workers: Default worker count (None keeps the current one)
+
+    Returns:
+        Name of the active backend
+    """
+    global _impl, _backend, _workers
+
+    if name not in ("auto", "scipy", "pyfftw"):
+        raise ValueError(f"Unknown FFT backend: {name}")
+    if name == "pyfftw" and pyfftw is None:
+        raise ImportError("FFT_BACKEND=pyfftw requires the pyFFTW package")
+
+    if name == "scipy" or pyfftw is None:
+        _impl, _backend = sp_fft, "scipy"
+    else:
+        # 快取 FFTW 物件，重複的 (shape, dtype, axis) 不再重新規劃
+        pyfftw.interfaces.cache.enable()
+        load_wisdom()
+        _impl, _backend = pyfftw_fft, "pyfftw"
+
+    if workers is not None:
+        _workers = workers
+    return _backend
+
+
+def backend_name() -> str:
+    """Name of the active backend ("scipy" or "pyfftw")"""
+    return _backend
+
+
+def _resolve(workers):
+    return _workers if workers is None else workers
+
+
+def fft(x, n: int = None, axis: int = -1, workers: int = None):
+    """Complex FFT along `axis`"""
+    return _impl.fft(x, n, axis=axis, workers=_resolve(workers))
+
+
+def ifft(x, n: int = None, axis: int = -1, workers: int = None):
+    """Inverse complex FFT along `axis`"""
+    return _impl.ifft(x, n, axis=axis, workers=_resolve(workers))
+
+
+def rfft(x, n: int = None, axis: int = -1, workers: int = None):
+    """Real-input FFT along `axis`"""
+    return _impl.rfft(x, n, axis=axis, workers=_resolve(workers))
+
+
+def irfft(x, n: int = None, axis: int = -1, workers: int = None):
+    """Inverse of rfft along `axis`"""
+    return _impl.irfft(x, n, axis=axis, workers=_resolve(workers))
+
+
+try:
+    set_backend(FFT_BACKEND)
+except (ValueError, ImportError) as e:
+    logger.warning(f"{e}; falling back to scipy.fft")
+# 只由主程序在結束時寫回 wisdom（子程序不寫，避免多個程序同時覆寫）
+if multiprocessing.parent_process() is None:
+    atexit.register(save_wisdom)
@@ -17,9 +17,13 @@ from typing import Tuple, Any
 try:
     from backend.timedomain import TimeDomain as td
     from backend.frequencydomain import FrequencyDomain as fd
+    from backend import fft_backend
+    from backend import segment_kernels
 except ModuleNotFoundError:
     from timedomain import TimeDomain as td
     from frequencydomain import FrequencyDomain as fd
+    import fft_backend
+    import segment_kernels
 
 
 class FilterProcess:
@@ -40,29 +44,11 @@ class FilterProcess:
         Returns:
             Tuple of (na4, total_sum_all, division_total_sum_segment)
         """
-        n = len(signal)
-        segment_size = n // m
-        signal_mean = np.mean(signal)
-
-        # Calculate segmented variance
-        total_sum_segment = 0
-        for i in range(m):
-            start_idx = i * segment_size
-            end_idx = (i + 1) * segment_size if i < m - 1 else n
-            segment = signal[start_idx:end_idx]
-            segment_mean = np.mean(segment)
-            sum_segment = np.sum((segment - segment_mean) ** 2)
-            total_sum_segment += sum_segment
-
-        division_total_sum_segment = (total_sum_segment / m) ** 2
-
-        # Calculate total 4th moment
-        total_sum_all = np.sum((signal - signal_mean) ** 4) * n
+        # 原始：逐段 Python 迴圈計算分段變異
+        # 修改：segment_kernels.na4（Numba 編譯核心，未安裝時為 NumPy 實作，定義相同）
+        na4, total_sum_all, division_total_sum_segment = segment_kernels.na4(signal, m)
 
-        # Calculate NA4
-        na4 = total_sum_all / division_total_sum_segment if division_total_sum_segment != 0 else np.nan
-
-        return na4, total_sum_all, division_total_sum_segment
+        return float(na4), float(total_sum_all), float(division_total_sum_segment)
 
     @staticmethod
     def FM4(signal: np.ndarray) -> float:
@@ -154,8 +140,8 @@ class FilterProcess:
             ER value (ratio)
         """
         # Calculate FFT
-        fft_values = np.fft.fft(signal)
-        freqs = np.fft.fftfreq(len(signal), 1/fs)
+        fft_values = fft_backend.fft(signal)
+        freqs = fft_backend.fftfreq(len(signal), 1/fs)
 
         # Only use positive frequencies
         positive_freq_indices = freqs > 0
@@ -212,3 +198,93 @@ class FilterProcess:
             'rms': float(rms),
             'segment_count': segment_count
         }
+
+    @staticmethod
+    def moment_features_batch(signals: np.ndarray, segment_count: int = 10) -> dict:
+        """
+        Calculate NA4, FM4, M6A and M8A of many signals at once
+
+        Same definitions as NA4, FM4, M6A and M8A along the last axis.
+        Deviations are taken from a float64 mean, so the high-order sums
+        are accumulated in float64 even for float32 input.
+
+        Args:
+            signals: Signal array, shape (..., n)
+            segment_count: Number of segments for NA4
+
+        Returns:
+            Dictionary of arrays with shape signals.shape[:-1]
+        """
+        signals = np.asarray(signals)
+        n = signals.shape[-1]
+        difference = signals - signals.mean(axis=-1, dtype=np.float64, keepdims=True)
+
+        squared = difference ** 2
+        sum_2 = squared.sum(axis=-1)
+        sum_4 = (squared ** 2).sum(axis=-1)
+        sum_6 = (squared ** 3).sum(axis=-1)
+        sum_8 = (squared ** 4).sum(axis=-1)
+
+        # NA4 分段變異：前 m-1 段各 n // m 點，最後一段取剩餘點（與 NA4 相同）
+        total_sum_segment = segment_kernels.segment_moments(difference, segment_count)['segment_ss']
+        division_total_sum_segment = (total_sum_segment / segment_count) ** 2
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return {
+                'na4': np.where(division_total_sum_segment != 0,
+                                sum_4 * n / division_total_sum_segment, np.nan),
+                'fm4': np.where(sum_2 != 0, n * sum_4 / sum_2 ** 2, np.nan),
+                'm6a': np.where(sum_2 != 0, n ** 2 * sum_6 / sum_2 ** 3, np.nan),
+                'm8a': np.where(sum_2 != 0, n ** 3 * sum_8 / sum_2 ** 4, np.nan)
+            }
+
+    @staticmethod
+    def energy_ratio_batch(signals: np.ndarray, fs: int, low_freq: float = 1000,
+                           high_freq: float = 5000) -> np.ndarray:
+        """
+        Calculate ER_simple of many signals with one real FFT
+
+        Args:
+            signals: Signal array, shape (..., n); float32 input is
+                     transformed in complex64
+            fs: Sampling frequency
+            low_freq: Lower frequency bound for energy calculation (Hz)
+            high_freq: Upper frequency bound for energy calculation (Hz)
+
+        Returns:
+            ER values, shape signals.shape[:-1]
+        """
+        signals = np.asarray(signals)
+        n = signals.shape[-1]
+
+        # 只取正頻率（與 ER_simple 的 freqs > 0 相同，不含 DC 與 Nyquist）
+        positive = slice(1, (n + 1) // 2)
+        spectrum = fft_backend.rfft(signals, axis=-1)[..., positive]
+        freqs = fft_backend.rfftfreq(n, 1/fs)[positive]
+        power = spectrum.real ** 2 + spectrum.imag ** 2
+
+        band_mask = (freqs >= low_freq) & (freqs <= high_freq)
+        if not np.any(band_mask):
+            return np.zeros(signals.shape[:-1])
+
+        band_energy = power[..., band_mask].sum(axis=-1, dtype=np.float64)
+        total_energy = power.sum(axis=-1, dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(total_energy > 0, np.sqrt(band_energy / total_energy), 0.0)
+
+    @staticmethod
+    def features_batch(signals: np.ndarray, fs: int = 25600, segment_count: int = 10) -> dict:
+        """
+        Calculate NA4, FM4, M6A, M8A and ER of many signals at once
+
+        Args:
+            signals: Signal array, shape (..., n), e.g. (files, 2, samples)
+            fs: Sampling frequency
+            segment_count: Number of segments for NA4
+
+        Returns:
+            Dictionary of arrays with shape signals.shape[:-1]
+        """
+        features = FilterProcess.moment_features_batch(signals, segment_count)
+        features['er'] = FilterProcess.energy_ratio_batch(signals, fs)
+        return features
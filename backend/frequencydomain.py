@@ -4,10 +4,16 @@ try:
     from backend.initialization import InitParameter as ip
     from backend.timedomain import TimeDomain as td
     from backend.harmonic_sildband_table import HarmonicSildband as hs
+    from backend import tsa_engine
+    from backend import bearing_kinematics
+    from backend import fft_backend
 except ModuleNotFoundError:
     from initialization import InitParameter as ip
     from timedomain import TimeDomain as td
     from harmonic_sildband_table import HarmonicSildband as hs
+    import tsa_engine
+    import bearing_kinematics
+    import fft_backend
 
 ip=ip()
 
@@ -16,7 +22,7 @@ class FrequencyDomain():
 #    計算傅立葉轉換
     @staticmethod
     def fft_process(amp, fs):
-        fft_value=np.fft.fft(amp) #原始的FFT,是複數
+        fft_value=fft_backend.fft(amp) #原始的FFT,是複數
         abs_fft = np.abs(fft_value) #原始的取絕對值的FFT
         abs_fft_n = (np.abs(fft_value/fft_value.size))*2 # 計算用
         abs_fft_segment1 = np.abs(fft_value/fft_value.size)*2 #畫圖用
@@ -26,7 +32,7 @@ class FrequencyDomain():
             abs_fft_segment2 = abs_fft_segment1[0:int(fft_value.size/2+1)]
         abs_fft_segment2[1:-1] = 2 * abs_fft_segment2[1:-1]
         freqs_number_segment = fs*np.arange(0,(fft_value.size/2))/fft_value.size
-        freqs = np.fft.fftfreq(fft_value.size,1./fs) #all freqs
+        freqs = fft_backend.fftfreq(fft_value.size,1./fs) #all freqs
         return fft_value,abs_fft,freqs,abs_fft_n,abs_fft_segment2,freqs_number_segment
     
 #    計算逆傅立葉轉換
@@ -34,13 +40,18 @@ class FrequencyDomain():
     def ifft_process(fft_value):
         
         # 逆FFT的計算
-        ifft_value=np.fft.ifft(fft_value)
+        ifft_value=fft_backend.ifft(fft_value)
         time_value = np.arange(0,np.size(ifft_value)) * (360/ifft_value.size)
         ifft_tsa = pd.DataFrame({'Degree':time_value,'Acc':ifft_value.real})
         return ifft_tsa,time_value
 
     #計算低頻的FM0數值
-    def fft_fm0_si(self, amp, fs):
+    def fft_fm0_si(self, amp, fs, fault=None):
+
+#        fault: bearing_kinematics.FaultFrequencies，依軸承操作條件的故障頻率（預設條件 1）
+#        頻窗以快取的 SpectrumBins 查出索引，不再對整個頻譜建立布林遮罩
+        if fault is None:
+            fault = bearing_kinematics.bearing_fault_frequencies()
 
         fft_value,abs_fft,freqs,abs_fft_n,_,_ = FrequencyDomain.fft_process(amp,fs)
         fftoutput=pd.DataFrame({'freqs':np.round(freqs,3),
@@ -48,166 +59,127 @@ class FrequencyDomain():
                                 'abs_fft':abs_fft,
                                 'abs_fft_n': abs_fft_n,
                                 'fft':fft_value})
+        bins = bearing_kinematics.fft_bins(fs, fft_value.size)
 
 #        先計算mortor gear的主要頻率
-        mask1 = fftoutput['freqs']>=ip.mortor_gear-ip.side_band_range
-        mask2 = fftoutput['freqs']<=ip.mortor_gear+ip.side_band_range
-        max_mortor_gear=fftoutput[mask1 & mask2]
+        window = bins.window(fault.shaft-ip.side_band_range, fault.shaft+ip.side_band_range)
 
-        # Safety check for empty DataFrame
-        if max_mortor_gear.empty:
-            max_mortor_gear = fftoutput.iloc[0:1]  # Use first row as fallback
+        # Safety check for empty window
+        if window.size == 0:
+            max_mortor_gear1 = fftoutput.iloc[0:1]  # Use first row as fallback
         else:
-            max_mortor_gear = fftoutput[fftoutput['abs_fft']==np.max(max_mortor_gear['abs_fft'])]
-        max_mortor_gear1=max_mortor_gear.iloc[0:1]
+            max_mortor_gear1 = hs._peak(fftoutput, window, 'abs_fft')
 
 
 #        先計算培林的主要頻率
-        mask3 = fftoutput['freqs']>=ip.belt_si - ip.side_band_range
-        mask4 = fftoutput['freqs']<=ip.belt_si + ip.side_band_range
-        max_belt_si=fftoutput[mask3 & mask4]
+        window = bins.window(fault.bpfo - ip.side_band_range, fault.bpfo + ip.side_band_range)
 
-        # Safety check for empty DataFrame
-        if max_belt_si.empty:
-            max_belt_si = fftoutput.iloc[0:1]  # Use first row as fallback
+        # Safety check for empty window
+        if window.size == 0:
+            max_belt_si1 = fftoutput.iloc[0:1]  # Use first row as fallback
         else:
-            max_belt_si = fftoutput[fftoutput['abs_fft']==np.max(max_belt_si['abs_fft'])]
-        max_belt_si1=max_belt_si.iloc[0:1]
-
-
-#        用mortor gear的主要頻率來找出周圍的頻率
-        mask7 = fftoutput['freqs']>=float(max_mortor_gear1['freqs'].values[0]) - ip.harmonic_gmf_range
-        mask8 = fftoutput['freqs']<float(max_mortor_gear1['freqs'].values[0])
-        mask9 = fftoutput['freqs']>float(max_mortor_gear1['freqs'].values[0])
-        mask10 = fftoutput['freqs']<=float(max_mortor_gear1['freqs'].values[0]) + ip.harmonic_gmf_range
-
-#        用培林的主要頻率來找出周圍的頻率
-        mask11 = fftoutput['freqs']>=float(max_belt_si1['freqs'].values[0]) - ip.harmonic_gmf_range
-        mask12 = fftoutput['freqs']<float(max_belt_si1['freqs'].values[0])
-        mask13 = fftoutput['freqs']>float(max_belt_si1['freqs'].values[0])
-        mask14 = fftoutput['freqs']<=float(max_belt_si1['freqs'].values[0]) + ip.harmonic_gmf_range
+            max_belt_si1 = hs._peak(fftoutput, window, 'abs_fft')
 
        #呼叫計算harmonic sildband table的方法
-        low_filter_sum,_ = hs.Harmonic(fftoutput)
+        low_filter_sum,_ = hs.Harmonic(fftoutput, fault, bins)
 
         # Safety check: if harmonic sum is 0, use peak value to avoid division by zero
         if low_filter_sum == 0:
             low_filter_sum = 1.0  # Default value to avoid division by zero
 
-#        篩選motor gear和培林的數值
-        fft_mgs1=fftoutput[mask7 & mask8]
-        fft_mgs2=fftoutput[mask9 & mask10]
-
-        fft_bi1=fftoutput[mask11 & mask12]
-        fft_bi2=fftoutput[mask13 & mask14]
+#        用mortor gear和培林的主要頻率篩選周圍的頻率
+        gear_freq = float(max_mortor_gear1['freqs'].values[0])
+        belt_freq = float(max_belt_si1['freqs'].values[0])
+        fft_mgs = np.concatenate([bins.window(gear_freq - ip.harmonic_gmf_range, gear_freq, 'left'),
+                                  bins.window(gear_freq, gear_freq + ip.harmonic_gmf_range, 'right')])
+        fft_bi = np.concatenate([bins.window(belt_freq - ip.harmonic_gmf_range, belt_freq, 'left'),
+                                 bins.window(belt_freq, belt_freq + ip.harmonic_gmf_range, 'right')])
 
 #        計算低頻的FM0的數值
         low_fm0=td.peak(amp)/low_filter_sum
 
 #        計算出motor gear si和belt si的數值
-        len_mgs = len(fft_mgs1) + len(fft_mgs2)
-        len_bi = len(fft_bi1) + len(fft_bi2)
-
-        total_fft_mgs = (np.sum(fft_mgs1['abs_fft_n']) + np.sum(fft_mgs2['abs_fft_n'])) / len_mgs if len_mgs > 0 else 0.0
-        total_fft_bi = (np.sum(fft_bi1['abs_fft_n']) + np.sum(fft_bi2['abs_fft_n'])) / len_bi if len_bi > 0 else 0.0
+        total_fft_mgs = np.sum(abs_fft_n[fft_mgs]) / fft_mgs.size if fft_mgs.size > 0 else 0.0
+        total_fft_bi = np.sum(abs_fft_n[fft_bi]) / fft_bi.size if fft_bi.size > 0 else 0.0
 
         return fftoutput,total_fft_mgs,total_fft_bi,low_fm0
     
-#   計算實時同步訊號(TSA)的高頻FM0
-    def tsa_fft_fm0_slf(self, amp, fs, fft):
-
-        tsa_fft_value,tsa_abs_fft,tsa_freqs,tsa_abs_fft_n,_,_ = FrequencyDomain.fft_process(amp,fs)
-        tsa_fftoutput=pd.DataFrame({'tsa_freqs':np.round(tsa_freqs,3),
-                                    'tsa_freqs1':np.round(tsa_freqs,5),
+#   計算TSA的階次頻譜（角度域平均一圈，頻率 = 階次 x 轉軸頻率）
+    @staticmethod
+    def tsa_fft_process(tsa_signal, shaft_frequency, revolutions=1):
+        orders,tsa_fft_value = tsa_engine.order_spectrum(tsa_signal, revolutions)
+        tsa_abs_fft = np.abs(tsa_fft_value)
+        tsa_abs_fft_n = tsa_abs_fft/tsa_signal.size*2 # 計算用（以一圈的點數正規化）
+        tsa_fftoutput=pd.DataFrame({'tsa_freqs':np.round(orders,3),
+                                    'tsa_freqs1':np.round(orders,5),
+                                    'multiply_freqs':np.round(orders*shaft_frequency,5),
                                     'tsa_abs_fft':tsa_abs_fft,
                                     'tsa_abs_fft_n': tsa_abs_fft_n,
                                     'tsa_fft':tsa_fft_value})
+        return tsa_fftoutput
 
-        fftoutput=fft
-
-
-#        計算TSA FFT和原始FFT頻率的倍率
-        max1=fftoutput[fftoutput['abs_fft']==np.max(fftoutput['abs_fft'])]
-        max2=tsa_fftoutput[tsa_fftoutput['tsa_abs_fft']==np.max(tsa_fftoutput['tsa_abs_fft'])]
-
-        max3=max1.iloc[0:1]
-        max4=max2.iloc[0:1]
-
-        # Safety check for division by zero
-        max4_freq = float(max4['tsa_freqs1'].values[0])
-        if max4_freq == 0:
-            max_freqs = 1.0
-        else:
-            max_freqs = float(max3['freqs1'].values[0]) / max4_freq
-
-        tsa_fftoutput=pd.DataFrame({'tsa_freqs':np.round(tsa_freqs,3),
-                                    'tsa_freqs1':np.round(tsa_freqs,5),
-                                    'multiply_freqs':np.round(tsa_freqs*max_freqs,5),
-                                    'tsa_abs_fft':tsa_abs_fft,
-                                    'tsa_abs_fft_n': tsa_abs_fft_n,
-                                    'tsa_fft':tsa_fft_value})
+#   計算實時同步訊號(TSA)的高頻FM0
+    def tsa_fft_fm0_slf(self, amp, fs, fft=None, shaft_frequency=None, tsa_signal=None, fault=None):
+
+#        原始：對原始信號再做一次 FFT，以 FFT 峰值比例縮放頻率（非真正的 TSA）
+#        修改：依轉軸頻率重採樣到角度域，平均完整轉圈後計算階次頻譜
+#        fft 參數已不再使用，保留以相容舊呼叫；tsa_signal 可傳入批次計算的結果
+#        fault: 依軸承操作條件的故障頻率（預設以 shaft_frequency 計算）
+        if shaft_frequency is None:
+            shaft_frequency = fault.shaft if fault is not None else ip.mortor_gear
+        if fault is None:
+            fault = bearing_kinematics.fault_frequencies(shaft_frequency)
+        _,_,revolutions = tsa_engine.resampling_plan(np.size(amp), fs, shaft_frequency)
+        if tsa_signal is None:
+            tsa_signal = tsa_engine.tsa(amp, fs, shaft_frequency)
+
+        tsa_fftoutput = FrequencyDomain.tsa_fft_process(tsa_signal, shaft_frequency, revolutions)
+        bins = bearing_kinematics.order_bins(shaft_frequency, np.size(tsa_signal), revolutions)
+        tsa_abs_fft_n = tsa_fftoutput['tsa_abs_fft_n'].values
 
 #        先計算mortor gear的主要頻率
-        mask1 = tsa_fftoutput['multiply_freqs']>=ip.mortor_gear-ip.side_band_range
-        mask2 = tsa_fftoutput['multiply_freqs']<=ip.mortor_gear+ip.side_band_range
-        max_mortor_gear=tsa_fftoutput[mask1 & mask2]
+        window = bins.window(fault.shaft-ip.side_band_range, fault.shaft+ip.side_band_range)
 
-        # Safety check for empty DataFrame
-        if max_mortor_gear.empty:
-            max_mortor_gear = tsa_fftoutput.iloc[0:1]
+        # Safety check for empty window
+        if window.size == 0:
+            max_mortor_gear1 = tsa_fftoutput.iloc[0:1]
         else:
-            max_mortor_gear = tsa_fftoutput[tsa_fftoutput['tsa_abs_fft']==np.max(max_mortor_gear['tsa_abs_fft'])]
-        max_mortor_gear1=max_mortor_gear.iloc[0:1]
+            max_mortor_gear1 = hs._peak(tsa_fftoutput, window, 'tsa_abs_fft')
 
 #        先計算培林的主要頻率
-        mask3 = tsa_fftoutput['multiply_freqs']>=ip.belt_si - ip.side_band_range
-        mask4 = tsa_fftoutput['multiply_freqs']<=ip.belt_si + ip.side_band_range
-        max_belt_si=tsa_fftoutput[mask3 & mask4]
+        window = bins.window(fault.bpfo - ip.side_band_range, fault.bpfo + ip.side_band_range)
 
-        # Safety check for empty DataFrame
-        if max_belt_si.empty:
-            max_belt_si = tsa_fftoutput.iloc[0:1]
+        # Safety check for empty window
+        if window.size == 0:
+            max_belt_si1 = tsa_fftoutput.iloc[0:1]
         else:
-            max_belt_si = tsa_fftoutput[tsa_fftoutput['tsa_abs_fft']==np.max(max_belt_si['tsa_abs_fft'])]
-        max_belt_si1=max_belt_si.iloc[0:1]
-
-#         用mortor gear的主要頻率來找出周圍的頻率
-        mask7 = tsa_fftoutput['multiply_freqs']>=float(max_mortor_gear1['multiply_freqs'].values[0]) - ip.mortor_gear_range
-        mask8 = tsa_fftoutput['multiply_freqs']<float(max_mortor_gear1['multiply_freqs'].values[0])
-        mask9 = tsa_fftoutput['multiply_freqs']>float(max_mortor_gear1['multiply_freqs'].values[0])
-        mask10 = tsa_fftoutput['multiply_freqs']<=float(max_mortor_gear1['multiply_freqs'].values[0]) + ip.mortor_gear_range
-
-#        用培林的主要頻率來找出周圍的頻率
-        mask11 = tsa_fftoutput['multiply_freqs']>=float(max_belt_si1['multiply_freqs'].values[0]) - ip.belt_si_range
-        mask12 = tsa_fftoutput['multiply_freqs']<float(max_belt_si1['multiply_freqs'].values[0])
-        mask13 = tsa_fftoutput['multiply_freqs']>float(max_belt_si1['multiply_freqs'].values[0])
-        mask14 = tsa_fftoutput['multiply_freqs']<=float(max_belt_si1['multiply_freqs'].values[0]) + ip.belt_si_range
+            max_belt_si1 = hs._peak(tsa_fftoutput, window, 'tsa_abs_fft')
 
          #---high freqency fm0---
-        high_filter_sum,_ = hs.Sildband(tsa_fftoutput)
+        high_filter_sum,_ = hs.Sildband(tsa_fftoutput, fault, bins)
 
         # Safety check: if sideband sum is 0, use default value to avoid division by zero
         if high_filter_sum == 0:
             high_filter_sum = 1.0
 
+#        用mortor gear和培林的主要頻率篩選周圍的頻率
+        gear_freq = float(max_mortor_gear1['multiply_freqs'].values[0])
+        belt_freq = float(max_belt_si1['multiply_freqs'].values[0])
+        tsa_fft_mgs = np.concatenate([bins.window(gear_freq - ip.mortor_gear_range, gear_freq, 'left'),
+                                      bins.window(gear_freq, gear_freq + ip.mortor_gear_range, 'right')])
+        tsa_fft_bi = np.concatenate([bins.window(belt_freq - ip.belt_si_range, belt_freq, 'left'),
+                                     bins.window(belt_freq, belt_freq + ip.belt_si_range, 'right')])
 
-#        篩選motor gear和培林的數值
-        tsa_fft_mgs1=tsa_fftoutput[mask7 & mask8]
-        tsa_fft_mgs2=tsa_fftoutput[mask9 & mask10]
-#
-        tsa_fft_bi1=tsa_fftoutput[mask11 & mask12]
-        tsa_fft_bi2=tsa_fftoutput[mask13 & mask14]
-
-#        計算高頻的FM0的數值
-        high_fm0 = td.peak(amp)/ high_filter_sum
+#        計算高頻的FM0的數值（以 TSA 信號計算）
+        high_fm0 = td.peak(tsa_signal)/ high_filter_sum
 
 #        計算出motor gear si和belt si的數值
-        rms_val = td.rms(amp)
+        rms_val = td.rms(tsa_signal)
         if rms_val == 0:
             rms_val = 1.0  # Avoid division by zero
 
-        total_tsa_fft_mgs = (np.sum(tsa_fft_mgs1['tsa_abs_fft_n']) + np.sum(tsa_fft_mgs2['tsa_abs_fft_n'])) / rms_val
-        total_tsa_fft_bi = (np.sum(tsa_fft_bi1['tsa_abs_fft_n']) + np.sum(tsa_fft_bi2['tsa_abs_fft_n'])) / rms_val
+        total_tsa_fft_mgs = np.sum(tsa_abs_fft_n[tsa_fft_mgs]) / rms_val
+        total_tsa_fft_bi = np.sum(tsa_abs_fft_n[tsa_fft_bi]) / rms_val
 
         return tsa_fftoutput,total_tsa_fft_mgs,total_tsa_fft_bi,high_fm0
 
@@ -264,6 +236,10 @@ class FrequencyDomain():
 
         total_files = len(files)
 
+        # TSA 轉軸頻率與故障頻率（依軸承操作條件）
+        shaft_frequency = tsa_engine.shaft_frequency(bearing_name)
+        fault = bearing_kinematics.fault_frequencies(shaft_frequency)
+
         # 初始化結果結構
         feature_keys = ["low_fm0", "high_fm0", "mgs_low", "bi_low", "mgs_high", "bi_high"]
 
@@ -306,15 +282,20 @@ class FrequencyDomain():
 
                 # 計算低頻特徵
                 horiz_fftoutput, horiz_mgs_low, horiz_bi_low, horiz_low_fm0 = \
-                    self.fft_fm0_si(horiz, sampling_rate)
+                    self.fft_fm0_si(horiz, sampling_rate, fault)
                 vert_fftoutput, vert_mgs_low, vert_bi_low, vert_low_fm0 = \
-                    self.fft_fm0_si(vert, sampling_rate)
+                    self.fft_fm0_si(vert, sampling_rate, fault)
 
-                # 計算高頻特徵
+                # 計算高頻特徵（兩個通道共用快取的重採樣計畫，一次計算 TSA）
+                horiz_tsa, vert_tsa = tsa_engine.tsa(
+                    np.vstack([horiz, vert]), sampling_rate, shaft_frequency
+                )
                 horiz_tsa_fftoutput, horiz_mgs_high, horiz_bi_high, horiz_high_fm0 = \
-                    self.tsa_fft_fm0_slf(horiz, sampling_rate, horiz_fftoutput)
+                    self.tsa_fft_fm0_slf(horiz, sampling_rate, horiz_fftoutput,
+                                         shaft_frequency, horiz_tsa, fault)
                 vert_tsa_fftoutput, vert_mgs_high, vert_bi_high, vert_high_fm0 = \
-                    self.tsa_fft_fm0_slf(vert, sampling_rate, vert_fftoutput)
+                    self.tsa_fft_fm0_slf(vert, sampling_rate, vert_fftoutput,
+                                         shaft_frequency, vert_tsa, fault)
 
                 # 儲存結果
                 trend_data["horizontal"]["low_fm0"].append(float(horiz_low_fm0))
@@ -2,14 +2,18 @@ import pandas as pd
 import numpy as np
 try:
     from backend.initialization import InitParameter as ip
+    from backend.bearing_kinematics import SpectrumBins, bearing_fault_frequencies
+    from backend import fft_backend
 except ModuleNotFoundError:
     from initialization import InitParameter as ip
+    from bearing_kinematics import SpectrumBins, bearing_fault_frequencies
+    import fft_backend
 
 ip = ip()
 class HarmonicSildband():
     
    def fftoutput(amp,fs):
-        fft_value=np.fft.fft(amp) #原始的FFT,是複數
+        fft_value=fft_backend.fft(amp) #原始的FFT,是複數
         abs_fft = np.abs(fft_value) #原始的取絕對值的FFT
         abs_fft_n = (np.abs(fft_value/fft_value.size))*2 # 計算用
         abs_fft_segment1 = np.abs(fft_value/fft_value.size)*2 #畫圖用
@@ -19,7 +23,7 @@ class HarmonicSildband():
             abs_fft_segment2 = abs_fft_segment1[0:int(fft_value.size/2+1)]
         abs_fft_segment2[1:-1] = 2 * abs_fft_segment2[1:-1]
 
-        freqs = np.fft.fftfreq(fft_value.size,1./fs) #all freqs
+        freqs = fft_backend.fftfreq(fft_value.size,1./fs) #all freqs
         fftoutput=pd.DataFrame({'freqs':np.round(freqs,3),
                                 'freqs1':np.round(freqs,5),
                                 'abs_fft':abs_fft,
@@ -56,35 +60,47 @@ class HarmonicSildband():
         return tsa_fftoutput    
         
     
-   def Sildband(tsa_fft):
+   def _peak(frame, idx, column):
+        """頻窗 idx 內 column 最大值所在的那一列（以位置索引查表，不掃描整個頻譜）"""
+        values = frame[column].values[idx]
+        return frame.iloc[[idx[int(np.argmax(values))]]]
 
+   def Sildband(tsa_fft, fault=None, bins=None):
+        """
+        TSA 階次頻譜上 BPFI 的 2-16 倍邊帶峰值總和
+
+        fault: bearing_kinematics.FaultFrequencies（預設條件 1）
+        bins: 'multiply_freqs' 頻率網格的 SpectrumBins（預設由表格建立）
+        """
         tsa_fftoutput = tsa_fft
+        if fault is None:
+            fault = bearing_fault_frequencies()
+        if bins is None:
+            bins = SpectrumBins(tsa_fftoutput['multiply_freqs'].values)
+        values = tsa_fftoutput['tsa_abs_fft_n'].values
 
-        mask1 = tsa_fftoutput['multiply_freqs']>=ip.mortor-ip.side_band_range
-        mask2 = tsa_fftoutput['multiply_freqs']<=ip.mortor+ip.side_band_range
-        max_mortor=tsa_fftoutput[mask1 & mask2]
+        window = bins.window(fault.bpfi-ip.side_band_range, fault.bpfi+ip.side_band_range)
 
         # Safety check for empty DataFrame
-        if max_mortor.empty:
+        if window.size == 0:
             return 0.0, pd.DataFrame()
 
-        max_mortor = tsa_fftoutput[tsa_fftoutput['tsa_abs_fft']==np.max(max_mortor['tsa_abs_fft'])]
-        max_mortor1=max_mortor.iloc[0:1]
+        max_mortor1 = HarmonicSildband._peak(tsa_fftoutput, window, 'tsa_abs_fft')
+        peak_freq = float(max_mortor1['multiply_freqs'].values[0])
         
 #        計算Sideband的頻率，從2倍到16倍 (整數步長)
 #        [PHM 2012] Physics-Based: 軸承邊帶諧波範圍 2×-16× BPFI
-#        適用於軸承故障檢測，覆蓋 467 Hz - 3735 Hz (基於 BPFI=233.43 Hz)
+#        頻率依軸承操作條件的 BPFI 計算（條件 1 覆蓋 467 Hz - 3735 Hz）
 #        原MFP參數: 2.75-14.25倍，以0.25逐漸增加
         max_filter_list=[]
         max_filter_freq_list=[]
         max_filter_freq_combine=pd.DataFrame()
         for i in np.arange(2,17,1):
-            f1 = tsa_fftoutput['multiply_freqs']>=(float(max_mortor1['multiply_freqs'].values[0]) * i) - ip.high_hamonic_range
-            f2 = tsa_fftoutput['multiply_freqs']<(float(max_mortor1['multiply_freqs'].values[0]) * i) + ip.high_hamonic_range
-            filter_tsa=tsa_fftoutput[f1 & f2]
-            if(filter_tsa.empty==False):
-                max_filter=np.max(filter_tsa['tsa_abs_fft_n'])
-                max_filter_freq=tsa_fftoutput[tsa_fftoutput['tsa_abs_fft_n']==max_filter].iloc[:,2:5] #取欄位
+            idx = bins.window(peak_freq * i - ip.high_hamonic_range,
+                              peak_freq * i + ip.high_hamonic_range, 'left')
+            if idx.size:
+                max_filter=np.max(values[idx])
+                max_filter_freq=tsa_fftoutput.iloc[idx[values[idx]==max_filter], 2:5] #取欄位
                 max_filter_list.append(max_filter)
                 max_filter_freq_list.append(max_filter_freq['multiply_freqs'].tolist())
                 #組合每一段倍率的頻段數值
@@ -92,46 +108,53 @@ class HarmonicSildband():
                                                     axis=0, ignore_index=False)  
             
         #計算例外的頻率
-        f3 = tsa_fftoutput['multiply_freqs']>=(float(max_mortor1['multiply_freqs'].values[0]) * 11.71) - ip.high_hamonic_range
-        f4 = tsa_fftoutput['multiply_freqs']<(float(max_mortor1['multiply_freqs'].values[0]) * 11.71) + ip.high_hamonic_range
-        filter_tsa_other=tsa_fftoutput[f3 & f4]
-        if(filter_tsa_other.empty==False):
-            max_filter_other=np.max(filter_tsa_other['tsa_abs_fft_n'])
-            max_filter_other_freq=tsa_fftoutput[tsa_fftoutput['tsa_abs_fft_n']==max_filter_other].iloc[:,2:5]
+        idx = bins.window(peak_freq * 11.71 - ip.high_hamonic_range,
+                          peak_freq * 11.71 + ip.high_hamonic_range, 'left')
+        if idx.size:
+            max_filter_other=np.max(values[idx])
+            max_filter_other_freq=tsa_fftoutput.iloc[idx[values[idx]==max_filter_other], 2:5]
             max_filter_list.append(max_filter_other)
             max_filter_freq_combine = pd.concat([max_filter_other_freq,max_filter_freq_combine],axis=0, ignore_index=False)
         filter_sum = np.sum(max_filter_list)
         
         return filter_sum,max_filter_freq_combine
     
-   def Harmonic(fft):
+   def Harmonic(fft, fault=None, bins=None):
+        """
+        FFT 頻譜上 BPFI 的 1-10 倍諧波峰值總和
+
+        fault: bearing_kinematics.FaultFrequencies（預設條件 1）
+        bins: 'freqs' 頻率網格的 SpectrumBins（預設由表格建立）
+        """
         fftoutput = fft
+        if fault is None:
+            fault = bearing_fault_frequencies()
+        if bins is None:
+            bins = SpectrumBins(fftoutput['freqs'].values)
+        values = fftoutput['abs_fft_n'].values
 
-        mask1 = fftoutput['freqs']>=ip.mortor - ip.side_band_range
-        mask2 = fftoutput['freqs']<=ip.mortor + ip.side_band_range
-        max_mortor=fftoutput[mask1 & mask2]
+        window = bins.window(fault.bpfi - ip.side_band_range, fault.bpfi + ip.side_band_range)
 
         # If no data found in the mortor range, return zero
-        if max_mortor.empty:
+        if window.size == 0:
             return 0.0, pd.DataFrame()
 
-        max_mortor = fftoutput[fftoutput['abs_fft']==np.max(max_mortor['abs_fft'])]
-        max_mortor1=max_mortor.iloc[0:1]
+        max_mortor1 = HarmonicSildband._peak(fftoutput, window, 'abs_fft')
+        peak_freq = float(max_mortor1['freqs'].values[0])
 
         #計算Harmonic的頻率，從1倍到10倍 (整數步長)
         # [PHM 2012] Physics-Based: 軸承諧波範圍 1×-10× BPFI
-        # 適用於早期軸承故障檢測，覆蓋 233 Hz - 2334 Hz (基於 BPFI=233.43 Hz)
+        # 頻率依軸承操作條件的 BPFI 計算（條件 1 覆蓋 233 Hz - 2334 Hz）
         # 原MFP參數: 0.25-2.75倍，以0.25逐漸增加
         max_harmonic_list=[]
         max_harmonic_freq_list=[]
         max_harmonic_freq_combine = pd.DataFrame()
         for i in np.arange(1,11,1):
-            f1 = fftoutput['freqs']>=(float(max_mortor1['freqs'].values[0]) * i) - ip.harmonic_gmf_range
-            f2 = fftoutput['freqs']<(float(max_mortor1['freqs'].values[0]) * i) + ip.harmonic_gmf_range
-            harmonic_filter=fftoutput[f1 & f2]
-            if(harmonic_filter.empty==False):
-                max_harmonic_filter=np.max(harmonic_filter['abs_fft_n'])
-                max_harmonic_freq=fftoutput[fftoutput['abs_fft_n']==max_harmonic_filter].iloc[:,1:3] #取欄位
+            idx = bins.window(peak_freq * i - ip.harmonic_gmf_range,
+                              peak_freq * i + ip.harmonic_gmf_range, 'left')
+            if idx.size:
+                max_harmonic_filter=np.max(values[idx])
+                max_harmonic_freq=fftoutput.iloc[idx[values[idx]==max_harmonic_filter], 1:3] #取欄位
                 max_harmonic_list.append(max_harmonic_filter)
                 max_harmonic_freq_list.append(max_harmonic_freq['freqs1'].tolist())
                 #組合每一段倍率的頻段數值
@@ -142,39 +165,45 @@ class HarmonicSildband():
         return harmonic_sum,max_harmonic_freq_combine
     
    #計算實時同步訊號的Harmonic
-   def Tsa_Harmonic(tsa_fft):
+   def Tsa_Harmonic(tsa_fft, fault=None, bins=None):
+        """
+        TSA 階次頻譜上 BPFI 的 1-10 倍諧波峰值總和
+
+        fault: bearing_kinematics.FaultFrequencies（預設條件 1）
+        bins: 'multiply_freqs' 頻率網格的 SpectrumBins（預設由表格建立）
+        """
         tsa_fftoutput = tsa_fft
+        if fault is None:
+            fault = bearing_fault_frequencies()
+        if bins is None:
+            bins = SpectrumBins(tsa_fftoutput['multiply_freqs'].values)
+        values = tsa_fftoutput['tsa_abs_fft_n'].values
 
-        mask1 = tsa_fftoutput['multiply_freqs']>=ip.mortor - ip.side_band_range
-        mask2 = tsa_fftoutput['multiply_freqs']<=ip.mortor + ip.side_band_range
-        max_mortor=tsa_fftoutput[mask1 & mask2]
+        window = bins.window(fault.bpfi - ip.side_band_range, fault.bpfi + ip.side_band_range)
 
         # Safety check for empty DataFrame
-        if max_mortor.empty:
+        if window.size == 0:
             return 0.0, pd.DataFrame()
 
-        max_mortor = tsa_fftoutput[tsa_fftoutput['tsa_abs_fft']==np.max(max_mortor['tsa_abs_fft'])]
-        max_mortor1=max_mortor.iloc[0:1]
+        max_mortor1 = HarmonicSildband._peak(tsa_fftoutput, window, 'tsa_abs_fft')
+        peak_freq = float(max_mortor1['multiply_freqs'].values[0])
 
         #計算實時同步訊號的Harmonic，從1倍到10倍 (整數步長)
         # [PHM 2012] Physics-Based: 軸承諧波範圍 1×-10× BPFI
-        # 適用於早期軸承故障檢測，覆蓋 233 Hz - 2334 Hz (基於 BPFI=233.43 Hz)
+        # 頻率依軸承操作條件的 BPFI 計算（條件 1 覆蓋 233 Hz - 2334 Hz）
         # 原MFP參數: 0.25-2.75倍，以0.25逐漸增加
         max_harmonic_list=[]
         max_harmonic_freq_list=[]
         max_harmonic_freq_combine = pd.DataFrame()
         for i in np.arange(1,11,1):
-            f1 = tsa_fftoutput['multiply_freqs']>=(float(max_mortor1['multiply_freqs'].values[0]) * i) - ip.harmonic_gmf_range
-            f2 = tsa_fftoutput['multiply_freqs']<(float(max_mortor1['multiply_freqs'].values[0]) * i) + ip.harmonic_gmf_range
-            harmonic_filter=tsa_fftoutput[f1 & f2]
-            if(harmonic_filter.empty==False):
-                max_harmonic_filter=np.max(harmonic_filter['tsa_abs_fft_n'])
-                max_harmonic_freq=tsa_fftoutput[tsa_fftoutput['tsa_abs_fft_n']==max_harmonic_filter].iloc[:,2:4]
+            idx = bins.window(peak_freq * i - ip.harmonic_gmf_range,
+                              peak_freq * i + ip.harmonic_gmf_range, 'left')
+            if idx.size:
+                max_harmonic_filter=np.max(values[idx])
+                max_harmonic_freq=tsa_fftoutput.iloc[idx[values[idx]==max_harmonic_filter], 2:4]
                 max_harmonic_list.append(max_harmonic_filter)
                 max_harmonic_freq_list.append(max_harmonic_freq['multiply_freqs'].tolist())
                 max_harmonic_freq_combine = pd.concat([max_harmonic_freq,max_harmonic_freq_combine],axis=0, ignore_index=False)
          
         harmonic_sum = np.sum(max_harmonic_list)    
-        return harmonic_sum,max_harmonic_freq_combine    
-    
-    
\ No newline at end of file
+        return harmonic_sum,max_harmonic_freq_combine
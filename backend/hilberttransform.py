@@ -4,7 +4,11 @@ Based on hilbertransfer.py, adapted for PHM database integration
 """
 import pandas as pd
 import numpy as np
-from scipy.signal import hilbert
+
+try:
+    from backend.analytic_signal import AnalyticSignal, nb4
+except ModuleNotFoundError:
+    from analytic_signal import AnalyticSignal, nb4
 
 
 class HilbertTransform:
@@ -24,48 +28,20 @@ class HilbertTransform:
         Returns:
             nb4: NB4 特徵值
         """
-        n = len(envelope_data)
-
-        if n == 0:
-            return 0.0
-
-        # 計算整體平均值
-        amp_mean = np.mean(envelope_data)
-
-        # 分段計算
-        segment_size = n // segment_count
-        total_sum_segment = 0.0
-
-        for i in range(segment_count):
-            start_idx = i * segment_size
-            end_idx = (i + 1) * segment_size if i < segment_count - 1 else n
-
-            segment_data = envelope_data[start_idx:end_idx]
-
-            if len(segment_data) == 0:
-                continue
-
-            segment_mean = np.mean(segment_data)
-            sum_segment = np.sum((segment_data - segment_mean) ** 2) / len(segment_data)
-            total_sum_segment += sum_segment
-
-        # 計算 NB4
-        if total_sum_segment == 0:
+        if len(envelope_data) == 0:
             return 0.0
 
-        division_total_sum_segment = (total_sum_segment / segment_count) ** 2
-        total_sum_all = np.sum((envelope_data - amp_mean) ** 4) / n
-
-        nb4 = total_sum_all / division_total_sum_segment
-
-        return float(nb4)
+        # 原始：逐段 Python 迴圈計算分段變異數
+        # 修改：analytic_signal.nb4 → segment_kernels.nb4（Numba 編譯核心或 NumPy 實作，結果相同）
+        return float(nb4(envelope_data, segment_count))
 
     def hilbert_transform(self, signal):
         """
         計算希爾伯特轉換及包絡線
 
         Args:
-            signal: numpy array of input signal
+            signal: numpy array of input signal, or an AnalyticSignal
+                    that was already computed for it
 
         Returns:
             dict containing:
@@ -74,23 +50,15 @@ class HilbertTransform:
                 - instantaneous_phase: instantaneous phase
                 - instantaneous_frequency: instantaneous frequency
         """
-        # 計算希爾伯特轉換
-        analytic_signal = hilbert(signal)
-
-        # 提取包絡線（振幅）
-        envelope = np.abs(analytic_signal)
-
-        # 瞬時相位
-        instantaneous_phase = np.angle(analytic_signal)
-
-        # 瞬時頻率（相位對時間的導數）
-        instantaneous_frequency = np.diff(np.unwrap(instantaneous_phase)) / (2.0 * np.pi)
+        # 計算希爾伯特轉換（每個信號只計算一次，其餘由解析信號導出）
+        analytic = signal if isinstance(signal, AnalyticSignal) else AnalyticSignal(signal)
 
         return {
-            'analytic_signal': analytic_signal,
-            'envelope': envelope,
-            'instantaneous_phase': instantaneous_phase,
-            'instantaneous_frequency': instantaneous_frequency
+            'analytic_signal': analytic.analytic,
+            'envelope': analytic.envelope,
+            'instantaneous_phase': analytic.phase,
+            # 瞬時頻率（相位對時間的導數，單位：cycles/sample）
+            'instantaneous_frequency': analytic.instantaneous_frequency
         }
 
     def analyze_signal(self, signal, segment_count=10):
@@ -104,31 +72,68 @@ class HilbertTransform:
         Returns:
             dict containing analysis results
         """
-        # 執行希爾伯特轉換
-        ht_result = self.hilbert_transform(signal)
-
-        # 計算 NB4
-        nb4 = self.calculate_nb4(ht_result['envelope'], segment_count)
-
-        # 計算包絡線統計特徵
-        envelope = ht_result['envelope']
-        envelope_stats = {
-            'mean': float(np.mean(envelope)),
-            'std': float(np.std(envelope)),
-            'max': float(np.max(envelope)),
-            'min': float(np.min(envelope)),
-            'rms': float(np.sqrt(np.mean(envelope ** 2))),
-            'peak_to_peak': float(np.max(envelope) - np.min(envelope))
-        }
+        return self.analyze_signals(np.asarray(signal)[None, :], segment_count)[0]
+
+    def analyze_signals(self, signals, segment_count=10):
+        """
+        多個信號的希爾伯特轉換分析（一次轉換所有信號）
+
+        Args:
+            signals: 2D numpy array (signals x samples)
+            segment_count: NB4 計算的分段數
+
+        Returns:
+            list of dict, one analyze_signal result per signal
+        """
+        analytic = AnalyticSignal(signals)
+        envelope = analytic.envelope
+        nb4_values = analytic.nb4(segment_count)
+
+        # 計算包絡線統計特徵（所有信號一次計算）
+        env_mean = np.mean(envelope, axis=-1)
+        env_std = np.std(envelope, axis=-1)
+        env_max = np.max(envelope, axis=-1)
+        env_min = np.min(envelope, axis=-1)
+        env_rms = np.sqrt(np.mean(envelope ** 2, axis=-1))
+
+        return [
+            {
+                'nb4': float(nb4_values[i]),
+                'envelope': envelope[i],
+                'envelope_stats': {
+                    'mean': float(env_mean[i]),
+                    'std': float(env_std[i]),
+                    'max': float(env_max[i]),
+                    'min': float(env_min[i]),
+                    'rms': float(env_rms[i]),
+                    'peak_to_peak': float(env_max[i] - env_min[i])
+                },
+                'instantaneous_phase': analytic.phase[i],
+                'instantaneous_frequency': analytic.instantaneous_frequency[i],
+                'analytic_real': analytic.analytic[i].real,
+                'analytic_imag': analytic.analytic[i].imag
+            }
+            for i in range(envelope.shape[0])
+        ]
+
+    def nb4_trend(self, signals, segment_count=10):
+        """
+        NB4 與包絡特徵趨勢（多個檔案、多個通道一次計算）
+
+        Args:
+            signals: numpy array (..., samples), e.g. (files, 2, 2560)
+            segment_count: NB4 計算的分段數
+
+        Returns:
+            dict of arrays shaped signals.shape[:-1]: nb4, envelope_rms, envelope_max
+        """
+        analytic = AnalyticSignal(signals)
+        envelope = analytic.envelope
 
         return {
-            'nb4': nb4,
-            'envelope': ht_result['envelope'],
-            'envelope_stats': envelope_stats,
-            'instantaneous_phase': ht_result['instantaneous_phase'],
-            'instantaneous_frequency': ht_result['instantaneous_frequency'],
-            'analytic_real': ht_result['analytic_signal'].real,
-            'analytic_imag': ht_result['analytic_signal'].imag
+            'nb4': analytic.nb4(segment_count),
+            'envelope_rms': np.sqrt(np.mean(envelope ** 2, axis=-1)),
+            'envelope_max': np.max(envelope, axis=-1)
         }
 
     def analyze_dual_channel(self, horizontal_signal, vertical_signal, segment_count=10):
@@ -143,8 +148,9 @@ class HilbertTransform:
         Returns:
             dict containing results for both channels
         """
-        horiz_result = self.analyze_signal(horizontal_signal, segment_count)
-        vert_result = self.analyze_signal(vertical_signal, segment_count)
+        horiz_result, vert_result = self.analyze_signals(
+            np.vstack([horizontal_signal, vertical_signal]), segment_count
+        )
 
         return {
             'horizontal': horiz_result,
@@ -10,7 +10,7 @@ from pydantic import BaseModel
 from typing import List, Optional, Dict
 import numpy as np
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timezone
 import os
 import json
 import sys
@@ -20,7 +20,6 @@ from datetime import timedelta
 
 # Scipy imports (used in frequency domain and envelope analysis)
 from scipy import signal as scipy_signal
-from scipy.fft import fft, fftfreq
 
 # ========================================
 # 先設置路徑，再導入模組
@@ -43,6 +42,11 @@ try:
     from websocket_manager import manager
     from buffer_manager import buffer_manager
     from realtime_analyzer import analyzer
+    from feature_registry import feature_registry
+    from partition_manager import partition_manager
+    from raw_archiver import raw_archiver
+    from alert_engine import alert_engine
+    from feature_rollup import ROLLUP_LEVELS, clamp_rollup_start, select_rollup_level
     REALTIME_AVAILABLE = True
     logging.info("Real-time components loaded successfully")
 except ImportError as e:
@@ -50,6 +54,7 @@ except ImportError as e:
     REALTIME_AVAILABLE = False
 
 # 使用直接導入（適合兩種環境）
+from fft_backend import fft, fftfreq
 from phm_processor import PHMDataProcessor
 from phm_query import PHMDatabaseQuery
 from phm_temperature_query import PHMTemperatureQuery
@@ -62,13 +67,18 @@ from config import (
     ENVELOPE_FILTER_HIGHCUT,
     SIGNAL_DISPLAY_LIMIT,
     SPECTRUM_DISPLAY_LIMIT,
-    ENVELOPE_SPECTRUM_DISPLAY_LIMIT
+    ENVELOPE_SPECTRUM_DISPLAY_LIMIT,
+    TIME_FREQUENCY_TREND_CHUNK_FILES,
+    TIME_FREQUENCY_TREND_SEGMENT_DURATION
 )
 from timefrequency import TimeFrequency
 from hilberttransform import HilbertTransform
 from filterprocess import FilterProcess
 from timedomain import TimeDomain
 from frequencydomain import FrequencyDomain
+from tsa_engine import shaft_frequency as tsa_shaft_frequency, tsa as tsa_average
+from bearing_kinematics import fault_frequencies
+from precision import resolve_precision, real_dtype
 
 # ========================================
 # Database Connection Manager
@@ -118,6 +128,34 @@ def close_db_connection():
         conn.close()
         _db_local.conn = None
 
+
+def iter_bearing_signal_chunks(bearing_name: str, max_files: Optional[int] = None,
+                               dtype=np.float64):
+    """
+    依序產生軸承檔案的信號批次（供趨勢端點批次計算）
+
+    每批最多 TIME_FREQUENCY_TREND_CHUNK_FILES 個檔案，
+    以 PHMDatabaseQuery.get_bearing_signal_matrix 一次查詢載入，
+    dtype 為信號精度（float32 供單精度批次計算）
+
+    Yields:
+        (file_numbers, signals)：signals 形狀為 (檔案數, 2, 樣本數)
+    """
+    query = PHMDatabaseQuery()
+    offset = 0
+    while max_files is None or offset < max_files:
+        chunk_size = TIME_FREQUENCY_TREND_CHUNK_FILES
+        if max_files is not None:
+            chunk_size = min(chunk_size, max_files - offset)
+
+        chunk = query.get_bearing_signal_matrix(bearing_name, offset, chunk_size, dtype)
+        if chunk is None:
+            return
+        offset += chunk_size
+
+        if chunk["file_numbers"]:
+            yield chunk["file_numbers"], chunk["signals"]
+
 # ========================================
 # Lifespan event handler (replaces deprecated on_event)
 # ========================================
@@ -146,6 +184,26 @@ async def lifespan(app: FastAPI):
             await manager.start_pubsub_listener()
             logger.info("Redis Pub/Sub listener started")
 
+            # 原程式碼重啟後緩衝區皆為空，需重新累積 10000 點才能分析
+            # 從 Redis chunk stream 重建緩衝區，並恢復重啟前仍在執行的分析任務
+            # 多實例部署時只重建 / 恢復本實例取得租約的感測器
+            if partition_manager.enabled:
+                await partition_manager.start()
+                logger.info(f"Instance {partition_manager.instance_id} owns sensors: "
+                            f"{sorted(partition_manager.owned)}")
+            else:
+                recovered = await buffer_manager.recover_from_redis()
+                logger.info(f"Recovered buffers for sensors: {list(recovered.keys())}")
+
+                resumed = await analyzer.resume_analyses()
+                logger.info(f"Resumed analysis for sensors: {resumed}")
+
+            # 背景封存原始資料（Redis chunk stream → PostgreSQL COPY）
+            await raw_archiver.start()
+
+            # 批次評估警報規則（遲滯、持續時間、變化率與去重）
+            await alert_engine.start()
+
             logger.info("Real-time components initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize real-time components: {e}")
@@ -166,6 +224,17 @@ async def lifespan(app: FastAPI):
             await manager.stop_pubsub_listener()
             logger.info("Redis Pub/Sub listener stopped")
 
+            # 將擁有的感測器移交給其他實例
+            await partition_manager.stop()
+
+            # 取消分析任務但保留 Redis 中的 active 記錄，供下次啟動恢復
+            await analyzer.shutdown()
+            logger.info("Real-time analysis tasks stopped")
+
+            await raw_archiver.stop()
+
+            await alert_engine.stop()
+
             await async_db.close_pool()
             logger.info("PostgreSQL connection pool closed")
 
@@ -631,8 +700,8 @@ async def calculate_frequency_domain(bearing_name: str, file_number: int, sampli
         n = len(horiz)
         freq = fftfreq(n, 1/sampling_rate)[:n//2]
 
-        horiz_fft = fft(horiz)
-        vert_fft = fft(vert)
+        # 兩個通道一次 FFT（fft_backend 依 FFT_WORKERS 平行計算）
+        horiz_fft, vert_fft = fft(np.vstack([horiz, vert]), axis=-1)
 
         horiz_magnitude = 2.0/n * np.abs(horiz_fft[:n//2])
         vert_magnitude = 2.0/n * np.abs(vert_fft[:n//2])
@@ -744,52 +813,31 @@ async def calculate_envelope_spectrum(
         horiz = df['horizontal_acceleration'].values
         vert = df['vertical_acceleration'].values
 
-        # 設計帶通濾波器
-        nyquist = sampling_rate / 2
-        low = lowcut / nyquist
-        high = highcut / nyquist
-        b, a = scipy_signal.butter(4, [low, high], btype='band')
-
-        # 帶通濾波
-        horiz_filtered = scipy_signal.filtfilt(b, a, horiz)
-        vert_filtered = scipy_signal.filtfilt(b, a, vert)
-
-        # 希爾伯特轉換提取包絡
-        horiz_envelope = np.abs(scipy_signal.hilbert(horiz_filtered))
-        vert_envelope = np.abs(scipy_signal.hilbert(vert_filtered))
-
-        # 對包絡做 FFT
-        n = len(horiz_envelope)
-        freq = fftfreq(n, 1/sampling_rate)[:n//2]
-
-        horiz_env_fft = fft(horiz_envelope)
-        vert_env_fft = fft(vert_envelope)
-
-        horiz_env_magnitude = 2.0/n * np.abs(horiz_env_fft[:n//2])
-        vert_env_magnitude = 2.0/n * np.abs(vert_env_fft[:n//2])
-
-        # 找出峰值
-        horiz_peaks_idx = np.argsort(horiz_env_magnitude)[-10:][::-1]
-        vert_peaks_idx = np.argsort(vert_env_magnitude)[-10:][::-1]
+        # 原始：每次請求重新設計 (b, a) 濾波器，逐通道 filtfilt + hilbert
+        # 優化：快取的 SOS 濾波器，兩個通道一次 sosfiltfilt 與 FFT 希爾伯特轉換
+        horiz_env, vert_env = TimeFrequency.envelope_analysis_batch(
+            np.vstack([horiz, vert]), fs=sampling_rate, lowcut=lowcut, highcut=highcut
+        )
+        freq = horiz_env['frequencies']
 
         features = {
             "bearing_name": bearing_name,
             "file_number": file_number,
             "filter_band": {"lowcut": lowcut, "highcut": highcut},
             "horizontal": {
-                "peak_frequencies": [float(freq[i]) for i in horiz_peaks_idx if freq[i] > 0],
-                "peak_magnitudes": [float(horiz_env_magnitude[i]) for i in horiz_peaks_idx if freq[i] > 0],
-                "envelope_rms": float(np.sqrt(np.mean(horiz_envelope**2)))
+                "peak_frequencies": horiz_env['peak_frequencies'],
+                "peak_magnitudes": horiz_env['peak_magnitudes'],
+                "envelope_rms": horiz_env['envelope_rms']
             },
             "vertical": {
-                "peak_frequencies": [float(freq[i]) for i in vert_peaks_idx if freq[i] > 0],
-                "peak_magnitudes": [float(vert_env_magnitude[i]) for i in vert_peaks_idx if freq[i] > 0],
-                "envelope_rms": float(np.sqrt(np.mean(vert_envelope**2)))
+                "peak_frequencies": vert_env['peak_frequencies'],
+                "peak_magnitudes": vert_env['peak_magnitudes'],
+                "envelope_rms": vert_env['envelope_rms']
             },
             "envelope_spectrum": {
                 "frequency": freq[:ENVELOPE_SPECTRUM_DISPLAY_LIMIT].tolist(),
-                "horizontal_magnitude": horiz_env_magnitude[:ENVELOPE_SPECTRUM_DISPLAY_LIMIT].tolist(),
-                "vertical_magnitude": vert_env_magnitude[:ENVELOPE_SPECTRUM_DISPLAY_LIMIT].tolist()
+                "horizontal_magnitude": horiz_env['magnitude'][:ENVELOPE_SPECTRUM_DISPLAY_LIMIT].tolist(),
+                "vertical_magnitude": vert_env['magnitude'][:ENVELOPE_SPECTRUM_DISPLAY_LIMIT].tolist()
             }
         }
 
@@ -799,6 +847,52 @@ async def calculate_envelope_spectrum(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/algorithms/envelope-trend/{bearing_name}", response_model=Dict)
+async def calculate_envelope_trend(
+    bearing_name: str,
+    max_files: Optional[int] = None,
+    sampling_rate: int = DEFAULT_SAMPLING_RATE,
+    lowcut: float = ENVELOPE_FILTER_LOWCUT,
+    highcut: float = ENVELOPE_FILTER_HIGHCUT
+):
+    """計算包絡特徵趨勢（預設為所有檔案，批次濾波與希爾伯特轉換）"""
+    try:
+        feature_keys = ["envelope_rms", "total_power", "peak_frequency"]
+
+        trend_data = {
+            "bearing_name": bearing_name,
+            "file_count": 0,
+            "filter_band": {"lowcut": lowcut, "highcut": highcut},
+            "horizontal": {key: [] for key in feature_keys},
+            "vertical": {key: [] for key in feature_keys},
+            "file_numbers": []
+        }
+
+        for file_numbers, signals in iter_bearing_signal_chunks(bearing_name, max_files):
+            features = TimeFrequency.envelope_trend(
+                signals, fs=sampling_rate, lowcut=lowcut, highcut=highcut
+            )
+
+            trend_data["file_numbers"].extend(file_numbers)
+            for key in feature_keys:
+                trend_data["horizontal"][key].extend(features[key][:, 0].tolist())
+                trend_data["vertical"][key].extend(features[key][:, 1].tolist())
+
+        if not trend_data["file_numbers"]:
+            raise HTTPException(status_code=404, detail="No files found")
+
+        trend_data["file_count"] = len(trend_data["file_numbers"])
+        return trend_data
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        import traceback
+        error_detail = f"{str(e)}\n{traceback.format_exc()}"
+        print(f"Error in calculate_envelope_trend: {error_detail}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # ========================================
 # Time-Frequency Analysis Endpoints
 # ========================================
@@ -837,8 +931,9 @@ async def calculate_stft(
         tf = TimeFrequency()
 
         # 計算水平和垂直方向的 STFT
-        horiz_stft = tf.stft_analysis(horiz, fs=sampling_rate, window=window, nperseg=nperseg)
-        vert_stft = tf.stft_analysis(vert, fs=sampling_rate, window=window, nperseg=nperseg)
+        horiz_stft, vert_stft = tf.stft_analysis_batch(
+            np.vstack([horiz, vert]), fs=sampling_rate, window=window, nperseg=nperseg
+        )
 
         # 限制返回的數據量（用於繪圖）
         freq_limit = min(100, len(horiz_stft['frequencies']))
@@ -914,9 +1009,11 @@ async def calculate_cwt(
         tf = TimeFrequency()
 
         # 計算 CWT
+        # 兩個通道共用快取的濾波器組，一次批次轉換
         scales = np.arange(1, 65)
-        horiz_cwt = tf.cwt_analysis(horiz, fs=sampling_rate, wavelet=wavelet, scales=scales)
-        vert_cwt = tf.cwt_analysis(vert, fs=sampling_rate, wavelet=wavelet, scales=scales)
+        horiz_cwt, vert_cwt = tf.cwt_analysis_batch(
+            np.vstack([horiz, vert]), fs=sampling_rate, wavelet=wavelet, scales=scales
+        )
 
         # 限制返回的數據量
         scale_limit = min(64, len(scales))
@@ -1049,8 +1146,9 @@ async def calculate_spectrogram(
         tf = TimeFrequency()
 
         # 計算頻譜圖
-        horiz_spec = tf.spectrogram_features(horiz, fs=sampling_rate)
-        vert_spec = tf.spectrogram_features(vert, fs=sampling_rate)
+        horiz_spec, vert_spec = tf.spectrogram_features_batch(
+            np.vstack([horiz, vert]), fs=sampling_rate
+        )
 
         # 限制返回的數據量
         freq_limit = min(100, len(horiz_spec['frequencies']))
@@ -1091,6 +1189,30 @@ async def calculate_spectrogram(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/algorithms/fault-frequencies/{bearing_name}", response_model=Dict)
+async def get_fault_frequencies(bearing_name: str, harmonics: int = 5):
+    """依軸承操作條件（轉速）計算故障特徵頻率與倍頻"""
+    condition = PHMDataProcessor.OPERATING_CONDITIONS.get(bearing_name)
+    if not condition:
+        raise HTTPException(status_code=404, detail=f"Unknown bearing: {bearing_name}")
+    if harmonics < 1:
+        raise HTTPException(status_code=400, detail="harmonics must be >= 1")
+
+    fault = fault_frequencies(tsa_shaft_frequency(bearing_name))
+    frequencies = fault.to_dict()
+
+    return {
+        "bearing_name": bearing_name,
+        "condition": condition['condition'],
+        "speed_rpm": condition['speed'],
+        "frequencies": frequencies,
+        "harmonics": {
+            name: fault.harmonics(name, harmonics).tolist()
+            for name in frequencies
+        }
+    }
+
+
 @app.get("/api/algorithms/frequency-fft/{bearing_name}/{file_number}", response_model=Dict)
 async def calculate_frequency_fft(bearing_name: str, file_number: int, sampling_rate: int = DEFAULT_SAMPLING_RATE):
     """計算低頻FFT特徵（FM0）"""
@@ -1119,9 +1241,10 @@ async def calculate_frequency_fft(bearing_name: str, file_number: int, sampling_
 
         fd = FrequencyDomain()
 
-        # 計算低頻FM0特徵
-        horiz_fftoutput, horiz_total_fft_mgs, horiz_total_fft_bi, horiz_low_fm0 = fd.fft_fm0_si(horiz, sampling_rate)
-        vert_fftoutput, vert_total_fft_mgs, vert_total_fft_bi, vert_low_fm0 = fd.fft_fm0_si(vert, sampling_rate)
+        # 計算低頻FM0特徵（故障頻率依軸承操作條件）
+        fault = fault_frequencies(tsa_shaft_frequency(bearing_name))
+        horiz_fftoutput, horiz_total_fft_mgs, horiz_total_fft_bi, horiz_low_fm0 = fd.fft_fm0_si(horiz, sampling_rate, fault)
+        vert_fftoutput, vert_total_fft_mgs, vert_total_fft_bi, vert_low_fm0 = fd.fft_fm0_si(vert, sampling_rate, fault)
 
         features = {
             "bearing_name": bearing_name,
@@ -1181,18 +1304,26 @@ async def calculate_frequency_tsa(bearing_name: str, file_number: int, sampling_
 
         fd = FrequencyDomain()
 
+        # 轉軸頻率與故障頻率（依軸承操作條件）
+        shaft_frequency = tsa_shaft_frequency(bearing_name)
+        fault = fault_frequencies(shaft_frequency)
+
         # 首先計算基本FFT（用於TSA）
-        horiz_fftoutput, _, _, horiz_low_fm0 = fd.fft_fm0_si(horiz, sampling_rate)
-        vert_fftoutput, _, _, vert_low_fm0 = fd.fft_fm0_si(vert, sampling_rate)
+        horiz_fftoutput, _, _, horiz_low_fm0 = fd.fft_fm0_si(horiz, sampling_rate, fault)
+        vert_fftoutput, _, _, vert_low_fm0 = fd.fft_fm0_si(vert, sampling_rate, fault)
 
-        # 計算TSA高頻特徵
-        horiz_tsa_fftoutput, horiz_total_tsa_fft_mgs, horiz_total_tsa_fft_bi, horiz_high_fm0 = fd.tsa_fft_fm0_slf(horiz, sampling_rate, horiz_fftoutput)
-        vert_tsa_fftoutput, vert_total_tsa_fft_mgs, vert_total_tsa_fft_bi, vert_high_fm0 = fd.tsa_fft_fm0_slf(vert, sampling_rate, vert_fftoutput)
+        # 計算TSA高頻特徵（依軸承轉速重採樣到角度域並平均完整轉圈，兩個通道一次計算）
+        horiz_tsa, vert_tsa = tsa_average(np.vstack([horiz, vert]), sampling_rate, shaft_frequency)
+        horiz_tsa_fftoutput, horiz_total_tsa_fft_mgs, horiz_total_tsa_fft_bi, horiz_high_fm0 = fd.tsa_fft_fm0_slf(
+            horiz, sampling_rate, horiz_fftoutput, shaft_frequency, horiz_tsa, fault)
+        vert_tsa_fftoutput, vert_total_tsa_fft_mgs, vert_total_tsa_fft_bi, vert_high_fm0 = fd.tsa_fft_fm0_slf(
+            vert, sampling_rate, vert_fftoutput, shaft_frequency, vert_tsa, fault)
 
         features = {
             "bearing_name": bearing_name,
             "file_number": file_number,
             "sampling_rate": sampling_rate,
+            "shaft_frequency": shaft_frequency,
             "horizontal": {
                 "low_fm0": float(horiz_low_fm0),
                 "high_fm0": float(horiz_high_fm0),
@@ -1253,9 +1384,10 @@ async def calculate_hilbert_transform(
 
         ht = HilbertTransform()
 
-        # 計算水平和垂直方向的希爾伯特轉換
-        horiz_result = ht.analyze_signal(horiz, segment_count)
-        vert_result = ht.analyze_signal(vert, segment_count)
+        # 計算水平和垂直方向的希爾伯特轉換（兩個通道一次轉換）
+        dual_result = ht.analyze_dual_channel(horiz, vert, segment_count)
+        horiz_result = dual_result['horizontal']
+        vert_result = dual_result['vertical']
 
         features = {
             "bearing_name": bearing_name,
@@ -1300,6 +1432,50 @@ async def calculate_hilbert_transform(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/algorithms/hilbert-trend/{bearing_name}", response_model=Dict)
+async def calculate_hilbert_trend(
+    bearing_name: str,
+    max_files: Optional[int] = None,
+    segment_count: int = 10
+):
+    """計算 NB4 與包絡特徵趨勢（預設為所有檔案，批次希爾伯特轉換）"""
+    try:
+        feature_keys = ["nb4", "envelope_rms", "envelope_max"]
+
+        trend_data = {
+            "bearing_name": bearing_name,
+            "file_count": 0,
+            "segment_count": segment_count,
+            "horizontal": {key: [] for key in feature_keys},
+            "vertical": {key: [] for key in feature_keys},
+            "file_numbers": []
+        }
+
+        ht = HilbertTransform()
+
+        for file_numbers, signals in iter_bearing_signal_chunks(bearing_name, max_files):
+            features = ht.nb4_trend(signals, segment_count)
+
+            trend_data["file_numbers"].extend(file_numbers)
+            for key in feature_keys:
+                trend_data["horizontal"][key].extend(features[key][:, 0].tolist())
+                trend_data["vertical"][key].extend(features[key][:, 1].tolist())
+
+        if not trend_data["file_numbers"]:
+            raise HTTPException(status_code=404, detail="No files found")
+
+        trend_data["file_count"] = len(trend_data["file_numbers"])
+        return trend_data
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        import traceback
+        error_detail = f"{str(e)}\n{traceback.format_exc()}"
+        print(f"Error in calculate_hilbert_trend: {error_detail}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # ========================================
 # Advanced Filter Process Endpoints (NA4, FM4, M6A, M8A, ER)
 # ========================================
@@ -1367,91 +1543,120 @@ async def calculate_filter_features(
 async def calculate_filter_trend(
     bearing_name: str,
     max_files: int = 50,
-    sampling_rate: int = DEFAULT_SAMPLING_RATE
+    sampling_rate: int = DEFAULT_SAMPLING_RATE,
+    precision: Optional[str] = None
 ):
-    """計算進階濾波特徵趨勢（多個檔案）"""
+    """
+    計算進階濾波特徵趨勢（多個檔案）
+
+    原始：逐檔查詢並逐通道呼叫 FilterProcess.calculate_all_features
+    修改：每批檔案以一次查詢載入成 (檔案, 通道, 樣本) 陣列，以 FilterProcess.features_batch 一次計算；
+          precision="float32" 以單精度載入與轉換，高階動差仍以 float64 累加
+    """
     try:
-        # 原始：import sqlite3 在此處重複導入
-        # 優化：已移除，因為檔案頂部 (第16行) 已經導入過
-        # 連接資料庫
-        conn = sqlite3.connect(PHM_DATABASE_PATH)
+        try:
+            precision = resolve_precision(precision)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
-        # 獲取檔案列表
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT mf.file_number, mf.file_id
-            FROM measurement_files mf
-            JOIN bearings b ON mf.bearing_id = b.bearing_id
-            WHERE b.bearing_name = ?
-            ORDER BY mf.file_number
-            LIMIT ?
-        """, (bearing_name, max_files))
+        feature_keys = ["na4", "fm4", "m6a", "m8a", "er"]
+
+        trend_data = {
+            "bearing_name": bearing_name,
+            "file_count": 0,
+            "precision": precision,
+            "horizontal": {key: [] for key in feature_keys},
+            "vertical": {key: [] for key in feature_keys},
+            "file_numbers": []
+        }
 
-        files = cursor.fetchall()
+        for file_numbers, signals in iter_bearing_signal_chunks(bearing_name, max_files,
+                                                                real_dtype(precision)):
+            features = FilterProcess.features_batch(signals, sampling_rate)
 
-        if not files:
+            trend_data["file_numbers"].extend(file_numbers)
+            for key in feature_keys:
+                trend_data["horizontal"][key].extend(features[key][:, 0].tolist())
+                trend_data["vertical"][key].extend(features[key][:, 1].tolist())
+
+        if not trend_data["file_numbers"]:
             raise HTTPException(status_code=404, detail="No files found")
 
+        trend_data["file_count"] = len(trend_data["file_numbers"])
+        return trend_data
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        import traceback
+        error_detail = f"{str(e)}\n{traceback.format_exc()}"
+        print(f"Error in calculate_filter_trend: {error_detail}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/algorithms/time-frequency-trend/{bearing_name}", response_model=Dict)
+async def calculate_time_frequency_trend(
+    bearing_name: str,
+    max_files: Optional[int] = None,
+    sampling_rate: int = DEFAULT_SAMPLING_RATE,
+    nperseg: int = 256,
+    wavelet: str = 'morl',
+    freq_low: float = 800,
+    freq_high: float = 2500,
+    precision: Optional[str] = None
+):
+    """
+    計算時頻特徵趨勢（STFT / CWT 的 NP4 與 NE，預設為所有檔案）
+
+    每批 TIME_FREQUENCY_TREND_CHUNK_FILES 個檔案以一次查詢載入成
+    (檔案, 通道, 樣本) 陣列，並以批次 STFT / CWT 一次計算；
+    precision="float32" 以單精度載入並以 complex64 轉換（預設 COMPUTE_PRECISION）
+    """
+    try:
+        try:
+            precision = resolve_precision(precision)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        feature_keys = ["stft_np4", "stft_ne_max", "cwt_np4", "cwt_ne_max"]
+
         trend_data = {
             "bearing_name": bearing_name,
-            "file_count": len(files),
-            "horizontal": {
-                "na4": [],
-                "fm4": [],
-                "m6a": [],
-                "m8a": [],
-                "er": []
-            },
-            "vertical": {
-                "na4": [],
-                "fm4": [],
-                "m6a": [],
-                "m8a": [],
-                "er": []
-            },
+            "file_count": 0,
+            "precision": precision,
+            "horizontal": {key: [] for key in feature_keys},
+            "vertical": {key: [] for key in feature_keys},
             "file_numbers": []
         }
 
-        for file_num, file_id in files:
-            # 查詢該檔案的數據
-            query = f"""
-            SELECT horizontal_acceleration, vertical_acceleration
-            FROM measurements
-            WHERE file_id = {file_id}
-            """
-            df = pd.read_sql_query(query, conn)
-
-            if not df.empty:
-                horiz = df['horizontal_acceleration'].values
-                vert = df['vertical_acceleration'].values
-
-                horiz_features = FilterProcess.calculate_all_features(
-                    horiz, sampling_rate
-                )
-                vert_features = FilterProcess.calculate_all_features(
-                    vert, sampling_rate
-                )
+        for file_numbers, signals in iter_bearing_signal_chunks(bearing_name, max_files,
+                                                                real_dtype(precision)):
+            features = TimeFrequency.time_frequency_trend(
+                signals,
+                fs=sampling_rate,
+                nperseg=nperseg,
+                wavelet=wavelet,
+                freq_range=(freq_low, freq_high),
+                time_segment_duration=TIME_FREQUENCY_TREND_SEGMENT_DURATION
+            )
 
-                trend_data["file_numbers"].append(file_num)
-                trend_data["horizontal"]["na4"].append(horiz_features["na4"])
-                trend_data["horizontal"]["fm4"].append(horiz_features["fm4"])
-                trend_data["horizontal"]["m6a"].append(horiz_features["m6a"])
-                trend_data["horizontal"]["m8a"].append(horiz_features["m8a"])
-                trend_data["horizontal"]["er"].append(horiz_features["er"])
+            trend_data["file_numbers"].extend(file_numbers)
+            for key in feature_keys:
+                trend_data["horizontal"][key].extend(features[key][:, 0].tolist())
+                trend_data["vertical"][key].extend(features[key][:, 1].tolist())
 
-                trend_data["vertical"]["na4"].append(vert_features["na4"])
-                trend_data["vertical"]["fm4"].append(vert_features["fm4"])
-                trend_data["vertical"]["m6a"].append(vert_features["m6a"])
-                trend_data["vertical"]["m8a"].append(vert_features["m8a"])
-                trend_data["vertical"]["er"].append(vert_features["er"])
+        if not trend_data["file_numbers"]:
+            raise HTTPException(status_code=404, detail="No files found")
 
-        conn.close()
+        trend_data["file_count"] = len(trend_data["file_numbers"])
         return trend_data
 
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         error_detail = f"{str(e)}\n{traceback.format_exc()}"
-        print(f"Error in calculate_filter_trend: {error_detail}")
+        print(f"Error in calculate_time_frequency_trend: {error_detail}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -1585,6 +1790,9 @@ if REALTIME_AVAILABLE:
         h_acc: float
         v_acc: float
 
+    class FeatureSelection(BaseModel):
+        features: List[str]
+
     class SensorDataBatch(BaseModel):
         """批量感測器數據"""
         sensor_id: int
@@ -1601,7 +1809,7 @@ if REALTIME_AVAILABLE:
 
         支持批量推送以提高效率。數據會自動存入：
         1. 記憶體循環緩衝區（用於即時分析）
-        2. Redis Streams（臨時持久化，24h TTL）
+        2. Redis Streams（臨時持久化，整批打包為單一 entry，MAXLEN ~ 裁剪）
 
         請求格式：
         {
@@ -1635,15 +1843,18 @@ if REALTIME_AVAILABLE:
                 for point in batch.data
             ]
 
-            # 添加到 Buffer Manager
-            await buffer_manager.add_data(batch.sensor_id, data_list)
+            # 添加到 Buffer Manager（非擁有者實例則轉送至擁有者）
+            owner = await partition_manager.ingest(batch.sensor_id, data_list)
 
-            return {
+            response = {
                 "status": "success",
                 "sensor_id": batch.sensor_id,
                 "processed": len(batch.data),
                 "message": f"Successfully processed {len(batch.data)} data points"
             }
+            if owner:
+                response["forwarded_to"] = owner
+            return response
         except Exception as e:
             logger = logging.getLogger(__name__)
             logger.error(f"Error ingesting sensor data: {e}")
@@ -1704,10 +1915,10 @@ if REALTIME_AVAILABLE:
                 })
                 current_time += sample_interval
 
-            # 添加到 Buffer Manager
-            await buffer_manager.add_data(sensor_id, data_list)
+            # 添加到 Buffer Manager（非擁有者實例則轉送至擁有者）
+            owner = await partition_manager.ingest(sensor_id, data_list, sampling_rate=sampling_rate)
 
-            return {
+            response = {
                 "status": "success",
                 "sensor_id": sensor_id,
                 "processed": len(data_list),
@@ -1716,6 +1927,9 @@ if REALTIME_AVAILABLE:
                     data_list[-1]['timestamp'].isoformat()
                 ]
             }
+            if owner:
+                response["forwarded_to"] = owner
+            return response
         except HTTPException:
             raise
         except Exception as e:
@@ -1731,7 +1945,8 @@ if REALTIME_AVAILABLE:
     # ========================================
 
     @app.websocket("/ws/realtime/{sensor_id}")
-    async def websocket_realtime_sensor(websocket: WebSocket, sensor_id: int):
+    async def websocket_realtime_sensor(websocket: WebSocket, sensor_id: int,
+                                        max_rate: Optional[float] = None):
         """
         Real-time sensor data streaming via WebSocket
 
@@ -1740,13 +1955,16 @@ if REALTIME_AVAILABLE:
         - Alert notifications
         - Connection status
 
-        Example: ws://localhost:8081/ws/realtime/1
+        max_rate limits feature updates per second for this connection;
+        a client that falls behind only receives the newest update.
+
+        Example: ws://localhost:8081/ws/realtime/1?max_rate=4
         """
-        await manager.connect(websocket, sensor_id)
+        await manager.connect(websocket, sensor_id, max_rate=max_rate)
 
         try:
-            # Start analysis if not already running
-            await analyzer.start_analysis(sensor_id)
+            # Start analysis if not already running (on the sensor's owner instance)
+            await partition_manager.start_analysis(sensor_id)
 
             # Keep connection alive and handle client messages
             while True:
@@ -1754,14 +1972,17 @@ if REALTIME_AVAILABLE:
 
                 # Handle ping/pong for keep-alive
                 if data == "ping":
-                    await websocket.send_json({"type": "pong", "timestamp": datetime.now().isoformat()})
+                    # 經由連線的傳送佇列回覆，避免與 writer task 同時寫入
+                    await manager.send_personal_message(
+                        {"type": "pong", "timestamp": datetime.now().isoformat()}, websocket
+                    )
 
         except WebSocketDisconnect:
             await manager.disconnect(websocket)
 
             # Stop analysis if no more connections for this sensor
             if manager.get_connection_count(sensor_id) == 0:
-                await analyzer.stop_analysis(sensor_id)
+                await partition_manager.stop_analysis(sensor_id)
 
         except Exception as e:
             logging.getLogger(__name__).error(f"WebSocket error for sensor {sensor_id}: {e}")
@@ -1811,7 +2032,7 @@ if REALTIME_AVAILABLE:
             )
 
             # Start analysis
-            await analyzer.start_analysis(request.sensor_id)
+            await partition_manager.start_analysis(request.sensor_id)
 
             return {
                 "status": "started",
@@ -1829,7 +2050,7 @@ if REALTIME_AVAILABLE:
     async def stop_streaming(sensor_id: int):
         """Stop real-time data streaming for a sensor"""
         try:
-            await analyzer.stop_analysis(sensor_id)
+            await partition_manager.stop_analysis(sensor_id)
 
             # Deactivate sensor in database
             # (This would need to be implemented in database_async)
@@ -1856,7 +2077,12 @@ if REALTIME_AVAILABLE:
                 "active_streams": analyzer_status['sensor_count'],
                 "active_connections": connection_info['total_connections'],
                 "active_sensors": analyzer_status['active_sensors'],
-                "sensor_connections": connection_info['sensor_connections']
+                "sensor_connections": connection_info['sensor_connections'],
+                "partition": partition_manager.get_status(),
+                "table_partitions": async_db.get_partition_status(),
+                "feature_writes": async_db.get_feature_write_status(),
+                "archiver": raw_archiver.get_status(),
+                "alerts": alert_engine.get_status()
             }
         except Exception as e:
             raise HTTPException(
@@ -1886,6 +2112,114 @@ if REALTIME_AVAILABLE:
                 detail=f"Error getting features: {str(e)}"
             )
 
+    @app.get("/api/realtime/feature-registry")
+    async def get_feature_registry():
+        """
+        List realtime features with their inputs, cost and tier
+        """
+        return {
+            "features": feature_registry.describe(),
+            "defaults": sorted(feature_registry.default_features())
+        }
+
+    @app.get("/api/realtime/sensors/{sensor_id}/features")
+    async def get_sensor_feature_config(sensor_id: int):
+        """
+        Get the realtime features enabled for a sensor
+        """
+        enabled = sorted(await partition_manager.get_enabled_features(sensor_id))
+        return {
+            "sensor_id": sensor_id,
+            "features": enabled,
+            "estimated_cost": feature_registry.estimate_cost(enabled)
+        }
+
+    @app.put("/api/realtime/sensors/{sensor_id}/features")
+    async def set_sensor_feature_config(sensor_id: int, selection: FeatureSelection):
+        """
+        Enable realtime features for a sensor
+
+        Features sharing intermediates (FFT, Hilbert envelope, STFT)
+        are computed once per tick, so the estimated cost counts
+        shared work only once.
+
+        請求格式：
+        {
+            "features": ["rms", "kurtosis", "na4", "nb4", "fm0"]
+        }
+        """
+        try:
+            await partition_manager.set_enabled_features(sensor_id, selection.features)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        enabled = sorted(await partition_manager.get_enabled_features(sensor_id))
+        return {
+            "status": "success",
+            "sensor_id": sensor_id,
+            "features": enabled,
+            "estimated_cost": feature_registry.estimate_cost(enabled)
+        }
+
+    @app.get("/api/realtime/sensors/{sensor_id}/history")
+    async def get_feature_history(
+        sensor_id: int,
+        features: str = "rms_h,rms_v",
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        max_points: int = 2000,
+        level: Optional[str] = None
+    ):
+        """
+        Get realtime feature history from the 1s / 1m / 1h rollups
+
+        未指定 level 時，選擇在 max_points 以內的最細解析度
+
+        Query parameters:
+            features: Comma-separated feature names (e.g. rms_h,kurtosis_v)
+            start / end: Time range (default: the last hour); values
+                         without a timezone are taken as UTC
+            max_points: Maximum buckets per feature; longer ranges keep
+                        the most recent max_points buckets
+            level: Force a rollup level ('1s', '1m', '1h')
+        """
+        # 未帶時區的時間視為 UTC，避免與 aware 的預設值比較時出錯
+        if start is not None and start.tzinfo is None:
+            start = start.replace(tzinfo=timezone.utc)
+        if end is not None and end.tzinfo is None:
+            end = end.replace(tzinfo=timezone.utc)
+
+        end = end or datetime.now(timezone.utc)
+        start = start or end - timedelta(hours=1)
+        if start >= end:
+            raise HTTPException(status_code=400, detail="start must be before end")
+        if max_points < 1:
+            raise HTTPException(status_code=400, detail="max_points must be at least 1")
+        if level is not None and level not in ROLLUP_LEVELS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown level: {level} (expected one of {list(ROLLUP_LEVELS)})"
+            )
+
+        names = [name.strip() for name in features.split(',') if name.strip()]
+        level = level or select_rollup_level(start, end, max_points)
+        start = clamp_rollup_start(start, end, level, max_points)
+
+        try:
+            history = await async_db.get_feature_history(sensor_id, names, start, end, level)
+            return {
+                "sensor_id": sensor_id,
+                "level": level,
+                "start": start.isoformat(),
+                "end": end.isoformat(),
+                "features": history
+            }
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error getting feature history: {str(e)}"
+            )
+
     @app.get("/api/alerts/active")
     async def get_active_alerts(limit: int = 100):
         """Get all active (unacknowledged) alerts"""
@@ -2052,7 +2386,10 @@ if REALTIME_AVAILABLE:
         }
         """
         try:
-            await manager.publish_to_channel(manager.CHANNEL_ALERTS, alert)
+            # 頻道內容即為客戶端收到的訊息，訂閱者直接轉送不再包裝
+            await manager.publish_to_channel(
+                manager.CHANNEL_ALERTS, {"type": "alert", "data": alert}
+            )
             return {
                 "status": "published",
                 "channel": manager.CHANNEL_ALERTS
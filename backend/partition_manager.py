@@ -0,0 +1,445 @@
+"""
+Sensor ownership across backend instances
+
+Each sensor is buffered and analyzed by exactly one backend instance,
+the holder of the sensor's Redis lease (`lease:sensor:{id}`, SET NX PX).
+Instances publish a TTL heartbeat and renew their leases from a
+periodic sync loop; when an instance dies its leases expire and the
+sensors are claimed by the surviving instances.
+
+The preferred owner of a sensor is chosen by rendezvous hashing over
+the live instances, so when instances join or leave only the sensors
+whose preferred owner changed are handed over. Ingest requests that
+reach a non-owner are forwarded through the owner's Redis stream
+(`ingest:instance:{id}`).
+
+With PARTITIONING_ENABLED=false (single instance) every sensor is local.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import socket
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+from buffer_manager import BufferManager, buffer_manager, BUFFER_RECOVERY_MAX_AGE
+from feature_registry import feature_registry
+from realtime_analyzer import RealTimeAnalyzer, analyzer
+from redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+# 多實例部署時啟用感測器分區
+PARTITIONING_ENABLED = os.getenv("PARTITIONING_ENABLED", "false").lower() == "true"
+
+# 實例識別碼（預設為容器 hostname + pid）
+INSTANCE_ID = os.getenv("INSTANCE_ID") or f"{socket.gethostname()}-{os.getpid()}"
+
+# 租約與心跳的 TTL（毫秒），同步週期為 TTL 的 1/3
+SENSOR_LEASE_TTL_MS = int(os.getenv("SENSOR_LEASE_TTL_MS", "10000"))
+
+# 轉送次數上限，避免擁有者變動期間的轉送迴圈
+MAX_FORWARD_HOPS = 3
+
+
+def preferred_owner(sensor_id: int, instances: List[str]) -> Optional[str]:
+    """
+    Rendezvous (highest random weight) owner of a sensor
+
+    Args:
+        sensor_id: Sensor identifier
+        instances: Live instance identifiers
+
+    Returns:
+        Instance identifier, or None if there are no instances
+    """
+    if not instances:
+        return None
+    return max(
+        instances,
+        key=lambda instance: hashlib.md5(f"{sensor_id}:{instance}".encode()).digest()
+    )
+
+
+class PartitionManager:
+    """
+    Leases sensors to this instance and routes ingest to their owners
+    """
+
+    def __init__(self, buffer_manager: BufferManager, analyzer: RealTimeAnalyzer,
+                 instance_id: str = INSTANCE_ID, enabled: bool = PARTITIONING_ENABLED,
+                 lease_ttl_ms: int = SENSOR_LEASE_TTL_MS):
+        """
+        Initialize partition manager
+
+        Args:
+            buffer_manager: BufferManager holding the local sensor buffers
+            analyzer: RealTimeAnalyzer running the local analysis tasks
+            instance_id: Identifier of this instance
+            enabled: Partition sensors across instances
+            lease_ttl_ms: Lease and heartbeat time-to-live in milliseconds
+        """
+        self.buffer_manager = buffer_manager
+        self.analyzer = analyzer
+        self.instance_id = instance_id
+        self.enabled = enabled
+        self.lease_ttl_ms = lease_ttl_ms
+
+        self.owned: Set[int] = set()
+        # 最近一次同步時的租約與存活實例，供 ingest 路由使用
+        self.owners: Dict[int, str] = {}
+        self.live_instances: List[str] = [instance_id]
+
+        self.running = False
+        self._tasks: List[asyncio.Task] = []
+        self._lock = asyncio.Lock()
+
+    def is_local(self, sensor_id: int) -> bool:
+        """Whether the sensor is buffered and analyzed by this instance"""
+        return not self.enabled or sensor_id in self.owned
+
+    async def start(self):
+        """
+        Join the cluster: claim leases and start the sync / ingest loops
+        """
+        if not self.enabled or self.running:
+            return
+
+        self.running = True
+        await self.sync()
+        self._tasks = [
+            asyncio.create_task(self._sync_loop()),
+            asyncio.create_task(self._ingest_loop()),
+        ]
+        logger.info(f"Partition manager started as instance {self.instance_id}")
+
+    async def stop(self):
+        """
+        Leave the cluster, handing owned sensors to the other instances
+        """
+        if not self.running:
+            return
+
+        self.running = False
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        await redis_client.remove_instance(self.instance_id)
+        others = [i for i in await redis_client.get_live_instances() if i != self.instance_id]
+
+        for sensor_id in sorted(self.owned):
+            target = preferred_owner(sensor_id, others)
+            if target:
+                await redis_client.transfer_sensor_lease(
+                    sensor_id, self.instance_id, target, self.lease_ttl_ms
+                )
+            else:
+                await redis_client.release_sensor_lease(sensor_id, self.instance_id)
+        self.owned.clear()
+        logger.info(f"Partition manager stopped for instance {self.instance_id}")
+
+    # ==================== Ownership ====================
+
+    async def _adopt(self, sensor_id: int, active: Optional[Set[int]] = None):
+        """Take over a sensor whose lease this instance now holds"""
+        if sensor_id in self.owned:
+            return
+        self.owned.add(sensor_id)
+
+        try:
+            await self.buffer_manager.recover_sensor(sensor_id)
+        except Exception as e:
+            logger.error(f"Error recovering buffer for sensor {sensor_id}: {e}")
+
+        if active is None:
+            active = set(await redis_client.get_active_analyses())
+        if sensor_id in active and sensor_id not in self.analyzer.analysis_tasks:
+            await self.analyzer.start_analysis(sensor_id)
+        logger.info(f"Instance {self.instance_id} took ownership of sensor {sensor_id}")
+
+    async def _drop(self, sensor_id: int):
+        """Stop buffering / analyzing a sensor owned by another instance"""
+        self.owned.discard(sensor_id)
+        if sensor_id in self.analyzer.analysis_tasks:
+            await self.analyzer.stop_analysis(sensor_id, deactivate=False)
+        await self.buffer_manager.remove_buffer(sensor_id)
+        logger.info(f"Instance {self.instance_id} released sensor {sensor_id}")
+
+    async def sync(self):
+        """
+        Heartbeat, renew leases and rebalance sensors
+
+        1. Renew owned leases; drop sensors whose lease was lost
+        2. Adopt sensors whose lease was handed to this instance
+        3. Claim unowned sensors whose preferred owner is this instance
+        4. Hand owned sensors to their preferred owner if it changed
+        5. Start / stop local analysis to match the Redis active set
+        6. Reload feature sets changed through other instances
+        """
+        if not redis_client._is_connected:
+            return
+
+        async with self._lock:
+            await redis_client.heartbeat_instance(self.instance_id, self.lease_ttl_ms)
+            live = set(await redis_client.get_live_instances())
+            live.add(self.instance_id)
+            self.live_instances = sorted(live)
+
+            owners = await redis_client.get_sensor_owners()
+            active = set(await redis_client.get_active_analyses())
+
+            for sensor_id in sorted(self.owned):
+                if (owners.get(sensor_id) != self.instance_id or
+                        not await redis_client.renew_sensor_lease(
+                            sensor_id, self.instance_id, self.lease_ttl_ms)):
+                    await self._drop(sensor_id)
+
+            for sensor_id, owner in owners.items():
+                if owner == self.instance_id and sensor_id not in self.owned:
+                    await self._adopt(sensor_id, active)
+
+            known = active | set(await redis_client.get_recent_chunk_sensors(BUFFER_RECOVERY_MAX_AGE))
+            for sensor_id in sorted(known - set(owners)):
+                if preferred_owner(sensor_id, self.live_instances) != self.instance_id:
+                    continue
+                if await redis_client.acquire_sensor_lease(
+                        sensor_id, self.instance_id, self.lease_ttl_ms):
+                    owners[sensor_id] = self.instance_id
+                    await self._adopt(sensor_id, active)
+
+            for sensor_id in sorted(self.owned):
+                target = preferred_owner(sensor_id, self.live_instances)
+                if target != self.instance_id and await redis_client.transfer_sensor_lease(
+                        sensor_id, self.instance_id, target, self.lease_ttl_ms):
+                    owners[sensor_id] = target
+                    await self._drop(sensor_id)
+
+            for sensor_id in sorted(self.owned):
+                running = sensor_id in self.analyzer.analysis_tasks
+                if sensor_id in active and not running:
+                    await self.analyzer.start_analysis(sensor_id)
+                elif sensor_id not in active and running:
+                    await self.analyzer.stop_analysis(sensor_id)
+
+            configs = await redis_client.get_feature_configs(sorted(self.owned))
+            for sensor_id, features in configs.items():
+                self.analyzer.apply_feature_config(sensor_id, features)
+
+            self.owners = owners
+
+    async def _sync_loop(self):
+        interval = self.lease_ttl_ms / 3000
+        while self.running:
+            try:
+                await asyncio.sleep(interval)
+                await self.sync()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Error in partition sync loop: {e}")
+
+    # ==================== Ingest Routing ====================
+
+    async def route(self, sensor_id: int) -> Optional[str]:
+        """
+        Find where an ingest request for a sensor must be processed
+
+        Unowned sensors are leased to their preferred live instance.
+
+        Args:
+            sensor_id: Sensor identifier
+
+        Returns:
+            None if the data is processed locally, otherwise the owner
+            instance identifier to forward it to
+        """
+        if self.is_local(sensor_id):
+            return None
+
+        owner = self.owners.get(sensor_id)
+        if owner is None or owner not in self.live_instances:
+            owner = await redis_client.get_sensor_owner(sensor_id)
+
+        if owner is None:
+            target = preferred_owner(sensor_id, self.live_instances)
+            if await redis_client.acquire_sensor_lease(sensor_id, target, self.lease_ttl_ms):
+                owner = target
+            else:
+                owner = await redis_client.get_sensor_owner(sensor_id)
+            if owner is None:
+                # Redis 不可用時退回本地處理
+                return None
+
+        self.owners[sensor_id] = owner
+        if owner == self.instance_id:
+            await self._adopt(sensor_id)
+            return None
+        return owner
+
+    async def ingest(self, sensor_id: int, data: List[Dict],
+                     sampling_rate: Optional[float] = None) -> Optional[str]:
+        """
+        Add data locally or forward it to the sensor's owner
+
+        Args:
+            sensor_id: Sensor identifier
+            data: List of data samples
+            sampling_rate: Sampling rate in Hz (inferred when not given)
+
+        Returns:
+            None if processed locally, otherwise the owner instance identifier
+
+        Raises:
+            RuntimeError: If the batch could not be forwarded
+        """
+        owner = await self.route(sensor_id)
+        if owner is None:
+            await self.buffer_manager.add_data(sensor_id, data, sampling_rate=sampling_rate)
+            return None
+
+        if not data:
+            return owner
+        if sampling_rate is None:
+            sampling_rate = BufferManager._infer_sampling_rate(data)
+
+        h_acc = np.fromiter((s['h_acc'] for s in data), dtype=np.float32, count=len(data))
+        v_acc = np.fromiter((s['v_acc'] for s in data), dtype=np.float32, count=len(data))
+        if not await redis_client.forward_sensor_chunk(
+                owner, sensor_id, data[0]['timestamp'], sampling_rate, h_acc, v_acc):
+            raise RuntimeError(f"Failed to forward data to instance {owner}")
+        return owner
+
+    async def _ingest_loop(self):
+        last_id = '$'
+        while self.running:
+            try:
+                last_id, chunks = await redis_client.read_forwarded_chunks(
+                    self.instance_id, last_id
+                )
+                for chunk in chunks:
+                    await self._ingest_forwarded(chunk)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Error in forwarded ingest loop: {e}")
+                await asyncio.sleep(1)
+
+    async def _ingest_forwarded(self, chunk: Dict):
+        sensor_id = chunk['sensor_id']
+        owner = await self.route(sensor_id)
+
+        if owner is None:
+            await self.buffer_manager.add_chunk(
+                sensor_id, chunk['start_time'], chunk['sampling_rate'],
+                chunk['h_acc'], chunk['v_acc']
+            )
+        elif chunk['hops'] < MAX_FORWARD_HOPS:
+            # 擁有者在轉送期間變動，轉送至新的擁有者
+            await redis_client.forward_sensor_chunk(
+                owner, sensor_id, chunk['start_time'], chunk['sampling_rate'],
+                chunk['h_acc'], chunk['v_acc'], hops=chunk['hops'] + 1
+            )
+        else:
+            logger.error(
+                f"Dropped {chunk['sample_count']} samples for sensor {sensor_id}: "
+                f"too many forwarding hops"
+            )
+
+    # ==================== Analysis Control ====================
+
+    async def start_analysis(self, sensor_id: int):
+        """
+        Start analysis on the sensor's owner
+
+        Non-owners only record the sensor in the Redis active set; the
+        owner starts the task on its next sync.
+
+        Args:
+            sensor_id: Sensor identifier
+        """
+        if self.is_local(sensor_id):
+            await self.analyzer.start_analysis(sensor_id)
+        else:
+            await redis_client.add_active_analysis(sensor_id)
+
+    async def stop_analysis(self, sensor_id: int):
+        """
+        Stop analysis on the sensor's owner
+
+        Args:
+            sensor_id: Sensor identifier
+        """
+        if self.is_local(sensor_id):
+            await self.analyzer.stop_analysis(sensor_id)
+        else:
+            await redis_client.remove_active_analysis(sensor_id)
+
+    async def get_enabled_features(self, sensor_id: int) -> Set[str]:
+        """
+        Get the realtime features enabled for a sensor
+
+        Non-owners read the persisted set, so every instance answers
+        with the configuration the owner computes.
+
+        Args:
+            sensor_id: Sensor identifier
+
+        Returns:
+            Set of feature names
+        """
+        if self.is_local(sensor_id):
+            return self.analyzer.get_enabled_features(sensor_id)
+
+        saved = await redis_client.get_feature_config(sensor_id)
+        if saved and not feature_registry.validate(saved):
+            return set(saved)
+        return feature_registry.default_features()
+
+    async def set_enabled_features(self, sensor_id: int, features: Iterable[str]):
+        """
+        Set the realtime features computed by the sensor's owner
+
+        Non-owners only persist the set in Redis; the owner loads it on
+        its next sync.
+
+        Args:
+            sensor_id: Sensor identifier
+            features: Feature names from the feature registry
+
+        Raises:
+            ValueError: If a feature name is not registered
+        """
+        if self.is_local(sensor_id):
+            await self.analyzer.set_enabled_features(sensor_id, features)
+            return
+
+        features = set(features)
+        unknown = feature_registry.validate(features)
+        if unknown:
+            raise ValueError(f"Unknown features: {unknown}")
+        await redis_client.set_feature_config(sensor_id, sorted(features))
+        logger.info(f"Sensor {sensor_id}: saved enabled features {sorted(features)} "
+                    f"for owner {self.owners.get(sensor_id)}")
+
+    def get_status(self) -> Dict:
+        """
+        Get partitioning status
+
+        Returns:
+            Dictionary with instance, owned sensors and live instances
+        """
+        return {
+            'enabled': self.enabled,
+            'instance_id': self.instance_id,
+            'owned_sensors': sorted(self.owned),
+            'live_instances': self.live_instances,
+            'lease_ttl_ms': self.lease_ttl_ms,
+        }
+
+
+# Global partition manager instance
+partition_manager = PartitionManager(buffer_manager, analyzer)
@@ -8,6 +8,11 @@ import pandas as pd
 from typing import Dict, List, Tuple
 from pathlib import Path
 
+try:
+    from backend import fft_backend
+except ModuleNotFoundError:
+    import fft_backend
+
 
 class PHMDataProcessor:
     """PHM 數據處理器"""
@@ -86,9 +91,9 @@ class PHMDataProcessor:
         features['skewness'] = float(pd.Series(signal).skew())
 
         # 頻域特徵（簡化版）
-        fft_vals = np.fft.fft(signal)
+        fft_vals = fft_backend.fft(signal)
         fft_mag = np.abs(fft_vals[:len(fft_vals)//2])
-        freqs = np.fft.fftfreq(len(signal), 1/self.sampling_rate)[:len(fft_vals)//2]
+        freqs = fft_backend.fftfreq(len(signal), 1/self.sampling_rate)[:len(fft_vals)//2]
 
         features['spectral_energy'] = float(np.sum(fft_mag**2))
         features['dominant_freq'] = float(freqs[np.argmax(fft_mag)])
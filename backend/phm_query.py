@@ -7,6 +7,8 @@ import sqlite3
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 
+import numpy as np
+
 try:
     from backend.config import PHM_DATABASE_PATH
 except ModuleNotFoundError:
@@ -304,6 +306,76 @@ class PHMDatabaseQuery:
         finally:
             conn.close()
 
+    def get_bearing_signal_matrix(
+        self,
+        bearing_name: str,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        dtype=np.float64
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Get the signals of consecutive files as one array for batch analysis.
+
+        All rows of the selected files are fetched with a single query.
+        They are reshaped to (files, 2, samples), with channel 0
+        horizontal and channel 1 vertical. Longer files are truncated
+        to the shortest one so the array stays rectangular.
+
+        `dtype` selects the precision of the returned signals; float32
+        halves the memory of whole-bearing batch jobs.
+
+        Returns None when no files remain at the offset.
+        """
+        conn = self._get_connection()
+        try:
+            # 使用 tuple row（sqlite3.Row 對大量數值列較慢）
+            conn.row_factory = None
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                SELECT mf.file_number, mf.file_id
+                FROM measurement_files mf
+                JOIN bearings b ON mf.bearing_id = b.bearing_id
+                WHERE b.bearing_name = ?
+                ORDER BY mf.file_number
+                LIMIT ? OFFSET ?
+            """, (bearing_name, -1 if limit is None else limit, offset))
+            files = cursor.fetchall()
+
+            if not files:
+                return None
+
+            file_ids = [file_id for _, file_id in files]
+            placeholders = ",".join("?" * len(file_ids))
+            cursor.execute(f"""
+                SELECT file_id, horizontal_acceleration, vertical_acceleration
+                FROM measurements
+                WHERE file_id IN ({placeholders})
+                ORDER BY file_id, measurement_id
+            """, file_ids)
+            rows = np.array(cursor.fetchall(), dtype=np.float64).reshape(-1, 3)
+
+            # 依 file_id 切分（每個檔案的列在查詢結果中連續）
+            row_ids, starts, counts = np.unique(
+                rows[:, 0].astype(np.int64), return_index=True, return_counts=True
+            )
+            by_id = {int(i): (int(s), int(c)) for i, s, c in zip(row_ids, starts, counts)}
+
+            present = [(num, fid) for num, fid in files if fid in by_id]
+            n_samples = min((by_id[fid][1] for _, fid in present), default=0)
+            signals = np.empty((len(present), 2, n_samples), dtype=dtype)
+            for k, (_, fid) in enumerate(present):
+                start = by_id[fid][0]
+                signals[k] = rows[start:start + n_samples, 1:].T
+
+            return {
+                "bearing_name": bearing_name,
+                "file_numbers": [num for num, _ in present],
+                "signals": signals
+            }
+        finally:
+            conn.close()
+
     def get_bearing_file_statistics(
         self,
         bearing_name: str
@@ -0,0 +1,57 @@
+"""
+Computation precision for batch feature jobs
+
+"float64" (default) keeps the original behaviour. "float32" loads
+waveforms as float32, so FFT / STFT / CWT run in complex64 and the
+whole-dataset trend jobs move half the bytes; high-order moments
+(NP4, NA4, FM4, M6A, M8A) keep float64 accumulators.
+
+The engines are dtype-preserving: float32 input stays float32, any
+other input is promoted to float64, so callers choose the precision by
+the dtype of the array they pass in.
+"""
+import numpy as np
+
+try:
+    from backend.config import COMPUTE_PRECISION
+except ModuleNotFoundError:
+    from config import COMPUTE_PRECISION
+
+PRECISIONS = {
+    'float64': (np.float64, np.complex128),
+    'float32': (np.float32, np.complex64),
+}
+
+
+def resolve_precision(precision: str = None) -> str:
+    """
+    Validate a precision name
+
+    Args:
+        precision: "float64", "float32" or None (config.COMPUTE_PRECISION)
+
+    Returns:
+        Precision name
+    """
+    precision = precision or COMPUTE_PRECISION
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision: {precision} (expected one of {sorted(PRECISIONS)})")
+    return precision
+
+
+def real_dtype(precision: str = None):
+    """Real dtype of a precision"""
+    return PRECISIONS[resolve_precision(precision)][0]
+
+
+def complex_dtype(precision: str = None):
+    """Complex dtype of a precision"""
+    return PRECISIONS[resolve_precision(precision)][1]
+
+
+def working_array(x) -> np.ndarray:
+    """Signal(s) as float32 if already float32, otherwise float64"""
+    x = np.asarray(x)
+    if x.dtype == np.float32:
+        return x
+    return x.astype(np.float64, copy=False)
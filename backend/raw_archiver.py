@@ -0,0 +1,238 @@
+"""
+Background archiving of raw sensor samples to PostgreSQL
+
+Reads the packed chunks already written to the Redis chunk streams
+(`stream:sensor:{id}:chunks`) through a consumer group and archives
+them with COPY, so ingest and analysis never wait for the database.
+With several backend instances the consumer group hands every chunk
+to exactly one archiver. A chunk the database keeps rejecting for its
+data is retried until it has been delivered RAW_ARCHIVE_MAX_DELIVERIES
+times, then moved to `stream:sensor:{id}:chunks:dead` and acknowledged,
+so it cannot hold up the chunks behind it.
+
+RAW_ARCHIVE_MODE:
+    chunks  one row per chunk with REAL[] columns (sensor_data_chunks)
+    rows    one row per sample (sensor_data)
+    off     no archiving
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from redis_client import redis_client
+from database_async import db, REJECTED_DATA_ERRORS
+from buffer_manager import BUFFER_RECOVERY_MAX_AGE
+from partition_manager import INSTANCE_ID
+
+logger = logging.getLogger(__name__)
+
+RAW_ARCHIVE_MODE = os.getenv("RAW_ARCHIVE_MODE", "off").lower()
+
+# 每批最多讀取的 chunk 數（每個 stream）與等待時間
+RAW_ARCHIVE_BATCH_CHUNKS = int(os.getenv("RAW_ARCHIVE_BATCH_CHUNKS", "50"))
+RAW_ARCHIVE_BLOCK_MS = int(os.getenv("RAW_ARCHIVE_BLOCK_MS", "1000"))
+
+# 被資料庫拒絕的 chunk 最多投遞次數，超過後移入 dead-letter stream
+RAW_ARCHIVE_MAX_DELIVERIES = int(os.getenv("RAW_ARCHIVE_MAX_DELIVERIES", "5"))
+
+ARCHIVE_GROUP = "archiver"
+
+# 重新掃描 chunk stream 清單的間隔（秒）
+SENSOR_REFRESH_SECONDS = 10.0
+
+
+class RawDataArchiver:
+    """
+    Archives raw chunks from Redis streams to PostgreSQL
+    """
+
+    def __init__(self, mode: str = RAW_ARCHIVE_MODE, consumer: str = INSTANCE_ID,
+                 batch_chunks: int = RAW_ARCHIVE_BATCH_CHUNKS,
+                 block_ms: int = RAW_ARCHIVE_BLOCK_MS,
+                 max_deliveries: int = RAW_ARCHIVE_MAX_DELIVERIES):
+        """
+        Initialize archiver
+
+        Args:
+            mode: 'chunks', 'rows' or 'off'
+            consumer: Consumer name within the archive group
+            batch_chunks: Maximum chunks read per stream and batch
+            block_ms: Maximum time to wait for new chunks
+            max_deliveries: Deliveries after which a rejected chunk
+                            is dead-lettered
+        """
+        if mode not in ('chunks', 'rows', 'off'):
+            raise ValueError(f"Unknown archive mode: {mode}")
+
+        self.mode = mode
+        self.consumer = consumer
+        self.batch_chunks = batch_chunks
+        self.block_ms = block_ms
+        self.max_deliveries = max_deliveries
+
+        self.running = False
+        self.task: Optional[asyncio.Task] = None
+        self.sensor_ids: List[int] = []
+        self._sensors_refreshed_at = 0.0
+        self.archived_chunks = 0
+        self.archived_samples = 0
+        self.dead_lettered_chunks = 0
+
+    async def start(self):
+        """Start the background archiving task"""
+        if self.mode == 'off' or self.running:
+            return
+
+        self.running = True
+        self.task = asyncio.create_task(self._archive_loop())
+        logger.info(f"Raw data archiver started (mode={self.mode})")
+
+    async def stop(self):
+        """Stop the archiving task"""
+        if not self.running:
+            return
+
+        self.running = False
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        logger.info("Raw data archiver stopped")
+
+    async def _refresh_sensors(self):
+        if time.monotonic() - self._sensors_refreshed_at < SENSOR_REFRESH_SECONDS:
+            return
+
+        sensor_ids = await redis_client.get_recent_chunk_sensors(BUFFER_RECOVERY_MAX_AGE)
+        for sensor_id in set(sensor_ids) - set(self.sensor_ids):
+            await redis_client.ensure_chunk_group(sensor_id, ARCHIVE_GROUP)
+        self.sensor_ids = sensor_ids
+        self._sensors_refreshed_at = time.monotonic()
+
+    async def archive_batch(self, pending: bool = False) -> int:
+        """
+        Read one batch of chunks, archive it and acknowledge it
+
+        Chunks are only acknowledged after the COPY succeeded, so a
+        failed batch is retried from the pending entries. When a retried
+        batch fails again, its chunks are archived one at a time; chunks
+        the database rejects are dead-lettered once delivered
+        `max_deliveries` times, and the error is re-raised while any
+        rejected chunk is still below that limit.
+
+        Args:
+            pending: Retry this consumer's unacknowledged chunks
+
+        Returns:
+            Number of archived or dead-lettered chunks
+        """
+        chunks = await redis_client.read_chunk_group(
+            self.sensor_ids, ARCHIVE_GROUP, self.consumer, pending=pending,
+            count=self.batch_chunks, block_ms=self.block_ms
+        )
+        if not chunks:
+            return 0
+
+        try:
+            await self._archive(chunks)
+            return len(chunks)
+        except REJECTED_DATA_ERRORS:
+            if not pending:
+                raise
+
+        # 逐一重試，找出被拒絕的 chunk
+        handled = 0
+        rejected: Dict[int, List[str]] = defaultdict(list)
+        last_error = None
+        for chunk in chunks:
+            try:
+                await self._archive([chunk])
+                handled += 1
+            except REJECTED_DATA_ERRORS as e:
+                rejected[chunk['sensor_id']].append(chunk['entry_id'])
+                last_error = e
+
+        retrying = 0
+        for sensor_id, ids in rejected.items():
+            deliveries = await redis_client.get_chunk_deliveries(
+                sensor_id, ARCHIVE_GROUP, self.consumer, ids
+            )
+            exhausted = [i for i in ids if deliveries.get(i, 0) >= self.max_deliveries]
+            if exhausted:
+                moved = await redis_client.dead_letter_sensor_chunks(
+                    sensor_id, ARCHIVE_GROUP, exhausted, str(last_error)
+                )
+                self.dead_lettered_chunks += moved
+                handled += moved
+                logger.error(
+                    f"Moved {moved} chunks of sensor {sensor_id} to the dead-letter "
+                    f"stream after {self.max_deliveries} deliveries: {last_error}"
+                )
+            retrying += len(ids) - len(exhausted)
+
+        if retrying:
+            raise last_error
+        return handled
+
+    async def _archive(self, chunks: List[Dict]):
+        """COPY chunks to PostgreSQL and acknowledge them"""
+        if self.mode == 'chunks':
+            samples = await db.archive_sensor_chunks(chunks)
+        else:
+            samples = await db.archive_sensor_rows(chunks)
+
+        entry_ids: Dict[int, List[str]] = defaultdict(list)
+        for chunk in chunks:
+            entry_ids[chunk['sensor_id']].append(chunk['entry_id'])
+        for sensor_id, ids in entry_ids.items():
+            await redis_client.ack_sensor_chunks(sensor_id, ARCHIVE_GROUP, ids)
+
+        self.archived_chunks += len(chunks)
+        self.archived_samples += samples
+        logger.debug(f"Archived {len(chunks)} chunks ({samples} samples)")
+
+    async def _archive_loop(self):
+        retry_pending = True
+        while self.running:
+            try:
+                await self._refresh_sensors()
+                if not self.sensor_ids:
+                    await asyncio.sleep(self.block_ms / 1000)
+                    continue
+
+                if retry_pending:
+                    # 先處理上次未確認（寫入失敗或程序中止）的 chunk
+                    if await self.archive_batch(pending=True) == 0:
+                        retry_pending = False
+                    continue
+
+                await self.archive_batch()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Error archiving raw data: {e}")
+                retry_pending = True
+                await asyncio.sleep(1)
+
+    def get_status(self) -> Dict:
+        """
+        Get archiver status
+
+        Returns:
+            Dictionary with mode and archived counts
+        """
+        return {
+            'mode': self.mode,
+            'running': self.running,
+            'sensors': self.sensor_ids,
+            'archived_chunks': self.archived_chunks,
+            'archived_samples': self.archived_samples,
+            'dead_lettered_chunks': self.dead_lettered_chunks,
+        }
+
+
+# Global archiver instance
+raw_archiver = RawDataArchiver()
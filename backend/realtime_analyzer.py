@@ -5,8 +5,9 @@ This module orchestrates continuous real-time analysis of streaming
 sensor data, extracting features and detecting anomalies.
 """
 import asyncio
+import os
 import numpy as np
-from typing import Dict, Optional
+from typing import Dict, Iterable, List, Optional, Set
 from datetime import datetime
 import logging
 
@@ -14,6 +15,10 @@ from buffer_manager import BufferManager, buffer_manager
 from websocket_manager import manager
 from redis_client import redis_client
 from database_async import db
+from feature_registry import feature_registry
+from analysis_executor import AnalysisExecutor
+from alert_engine import alert_engine
+import fft_backend
 
 # Import existing analysis modules
 # These will need to be made async in a future iteration
@@ -30,6 +35,9 @@ except ImportError as e:
 
 logger = logging.getLogger(__name__)
 
+# 每累積多少秒的新樣本分析一次（hop size）
+ANALYSIS_HOP_SECONDS = float(os.getenv("ANALYSIS_HOP_SECONDS", "0.25"))
+
 
 class RealTimeAnalyzer:
     """
@@ -39,16 +47,23 @@ class RealTimeAnalyzer:
     handles alert detection, and broadcasts results via WebSocket.
     """
 
-    def __init__(self, buffer_manager: BufferManager):
+    def __init__(self, buffer_manager: BufferManager,
+                 hop_seconds: float = ANALYSIS_HOP_SECONDS):
         """
         Initialize analyzer
 
         Args:
             buffer_manager: BufferManager instance for data access
+            hop_seconds: Seconds of new samples required between analyses
         """
         self.buffer_manager = buffer_manager
+        self.hop_seconds = hop_seconds
         self.running = False
         self.analysis_tasks: Dict[int, asyncio.Task] = {}
+        # 特徵計算依感測器分片至 worker process（增量狀態保存在 worker 內）
+        self.executor = AnalysisExecutor()
+        # 每個感測器啟用的特徵（未設定時使用 registry 預設值）
+        self.enabled_features: Dict[int, Set[str]] = {}
 
         # Initialize analysis modules if available
         self.time_domain = TimeDomain() if TimeDomain else None
@@ -71,17 +86,24 @@ class RealTimeAnalyzer:
             logger.warning(f"Analysis already running for sensor {sensor_id}")
             return
 
+        # 設定可能在其他實例變更過，以 Redis 中保存的設定為準
+        self.apply_feature_config(sensor_id, await redis_client.get_feature_config(sensor_id))
+
         self.analysis_tasks[sensor_id] = asyncio.create_task(
             self._analysis_loop(sensor_id)
         )
+        # 記錄於 Redis，重啟後可恢復分析任務
+        await redis_client.add_active_analysis(sensor_id)
         logger.info(f"Started real-time analysis for sensor {sensor_id}")
 
-    async def stop_analysis(self, sensor_id: int):
+    async def stop_analysis(self, sensor_id: int, deactivate: bool = True):
         """
         Stop real-time analysis for a sensor
 
         Args:
             sensor_id: Sensor identifier
+            deactivate: Also remove the sensor from the Redis active set
+                        (False when the sensor moves to another instance)
         """
         if sensor_id not in self.analysis_tasks:
             logger.warning(f"No analysis running for sensor {sensor_id}")
@@ -96,52 +118,152 @@ class RealTimeAnalyzer:
             pass  # Expected when cancelled
 
         del self.analysis_tasks[sensor_id]
+        await self.executor.release(sensor_id)
+        if deactivate:
+            await redis_client.remove_active_analysis(sensor_id)
         logger.info(f"Stopped real-time analysis for sensor {sensor_id}")
 
+    def get_enabled_features(self, sensor_id: int) -> Set[str]:
+        """
+        Get the realtime features enabled for a sensor
+
+        Args:
+            sensor_id: Sensor identifier
+
+        Returns:
+            Set of feature names
+        """
+        return self.enabled_features.get(sensor_id, feature_registry.default_features())
+
+    async def set_enabled_features(self, sensor_id: int, features: Iterable[str]):
+        """
+        Set the realtime features computed for a sensor
+
+        Args:
+            sensor_id: Sensor identifier
+            features: Feature names from the feature registry
+
+        Raises:
+            ValueError: If a feature name is not registered
+        """
+        features = set(features)
+        unknown = feature_registry.validate(features)
+        if unknown:
+            raise ValueError(f"Unknown features: {unknown}")
+
+        self.enabled_features[sensor_id] = features
+        await redis_client.set_feature_config(sensor_id, sorted(features))
+        logger.info(f"Sensor {sensor_id}: enabled features {sorted(features)}")
+
+    def apply_feature_config(self, sensor_id: int, features: Optional[Iterable[str]]) -> bool:
+        """
+        Adopt a persisted feature set (e.g. one changed on another instance)
+
+        Args:
+            sensor_id: Sensor identifier
+            features: Saved feature names; None or sets with unregistered
+                      names are ignored
+
+        Returns:
+            True if the enabled features changed
+        """
+        if not features or feature_registry.validate(features):
+            return False
+
+        features = set(features)
+        if self.enabled_features.get(sensor_id) == features:
+            return False
+        self.enabled_features[sensor_id] = features
+        logger.info(f"Sensor {sensor_id}: loaded enabled features {sorted(features)}")
+        return True
+
+    async def resume_analyses(self) -> List[int]:
+        """
+        Restart analysis tasks that were active before a restart
+
+        Returns:
+            List of resumed sensor IDs
+        """
+        resumed = []
+        for sensor_id in await redis_client.get_active_analyses():
+            if sensor_id not in self.analysis_tasks:
+                await self.start_analysis(sensor_id)
+                resumed.append(sensor_id)
+        return resumed
+
+    async def shutdown(self):
+        """
+        Cancel all analysis tasks on shutdown
+
+        Unlike stop_analysis, the sensors stay in the Redis active
+        set so that they are resumed on the next startup.
+        """
+        tasks = list(self.analysis_tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.analysis_tasks.clear()
+        self.executor.shutdown()
+
     async def _analysis_loop(self, sensor_id: int):
         """
         Continuous analysis loop for a sensor
 
+        原程式碼每 0.1 秒輪詢一次，不論是否有新資料都重算整個 1 秒窗口，
+        導致閒置時仍有 10·N 次/秒的分析，且重複窗口會被重複儲存與廣播
+        改為等待 BufferManager 的資料到達事件，每累積 hop_seconds 的
+        新樣本才分析一次，CPU 用量隨資料速率而非時間成長
+        分析窗口即整個環形緩衝區 (buffer_size 個樣本)，每個 tick 不再複製
+        窗口資料，只將新到的樣本交給增量狀態
+
         Args:
             sensor_id: Sensor identifier
         """
-        window_seconds = 1.0  # 1 second window
         min_samples = 10000   # Minimum samples for analysis
 
         logger.info(f"Analysis loop started for sensor {sensor_id}")
+        analyzed_count = 0
         iteration_count = 0
 
         while True:
             try:
+                buffer = await self.buffer_manager.get_buffer(sensor_id)
+
+                # 緩衝區被清除時 sample_count 會歸零
+                if buffer.sample_count < analyzed_count:
+                    analyzed_count = 0
+
+                hop_samples = max(1, int(self.hop_seconds * buffer.sampling_rate))
+                new_samples = buffer.sample_count - analyzed_count
+
+                if new_samples < hop_samples or len(buffer) < min_samples:
+                    # 沒有足夠的新資料，等待下一批資料到達
+                    await self.buffer_manager.wait_for_data(sensor_id)
+                    continue
+
                 iteration_count += 1
+                analyzed_count = buffer.sample_count
 
-                # Get latest window data from buffer
-                window_data = await self.buffer_manager.get_window(
-                    sensor_id, window_seconds
-                )
+                # 只取窗口的時間範圍，樣本由 executor 直接從環形緩衝區讀取
+                window_data = buffer.window_info()
 
-                # 調試日誌：每 10 次循環打印一次狀態
-                if iteration_count % 10 == 0:
-                    if window_data:
-                        logger.info(
-                            f"Sensor {sensor_id}: Got window with "
-                            f"{window_data['sample_count']} samples "
-                            f"(need {min_samples})"
-                        )
-                    else:
-                        logger.warning(
-                            f"Sensor {sensor_id}: No data in buffer yet "
-                            f"(iteration {iteration_count})"
-                        )
+                # 調試日誌：每 10 次分析打印一次狀態
+                if iteration_count % 10 == 0 and window_data:
+                    logger.info(
+                        f"Sensor {sensor_id}: Got window with "
+                        f"{window_data['sample_count']} samples "
+                        f"({new_samples} new)"
+                    )
 
                 if window_data and window_data['sample_count'] >= min_samples:
                     # Extract features
-                    features = await self._extract_features(window_data)
+                    # 只將新到的樣本餵入增量狀態，成本與 hop 成正比
+                    features = await self._extract_features(window_data, new_samples)
 
                     logger.info(
                         f"Sensor {sensor_id}: Extracted features - "
-                        f"RMS_H={features.get('rms_h', 'N/A'):.4f}, "
-                        f"RMS_V={features.get('rms_v', 'N/A'):.4f}"
+                        f"RMS_H={features.get('rms_h', float('nan')):.4f}, "
+                        f"RMS_V={features.get('rms_v', float('nan')):.4f}"
                     )
 
                     # Save to database
@@ -158,9 +280,6 @@ class RealTimeAnalyzer:
                     # Check for alerts
                     await self._check_alerts(sensor_id, features)
 
-                # Wait before next analysis (10 Hz rate)
-                await asyncio.sleep(0.1)
-
             except asyncio.CancelledError:
                 logger.info(f"Analysis loop cancelled for sensor {sensor_id}")
                 break
@@ -172,7 +291,8 @@ class RealTimeAnalyzer:
                 # Wait before retrying
                 await asyncio.sleep(1)
 
-    async def _extract_features(self, window_data: Dict) -> Dict:
+    async def _extract_features(self, window_data: Dict,
+                                new_samples: Optional[int] = None) -> Dict:
         """
         Extract all features from window data
 
@@ -180,13 +300,16 @@ class RealTimeAnalyzer:
         feature extraction on the sensor data.
 
         Args:
-            window_data: Window data dictionary with h_data, v_data arrays
+            window_data: Window data dictionary (SensorBuffer.window_info, or
+                         SensorBuffer.get_window with h_data, v_data arrays)
+            new_samples: Samples added since the previous tick; when
+                         given, the sensor's enabled features are evaluated
+                         incrementally by the sharded AnalysisExecutor,
+                         reading the sensor's ring buffer directly
 
         Returns:
             Feature dictionary
         """
-        h_data = window_data['h_data']
-        v_data = window_data['v_data']
         sampling_rate = 25600  # Hz
 
         features = {
@@ -199,6 +322,18 @@ class RealTimeAnalyzer:
             'timestamp': window_data['window_end'].isoformat() if hasattr(window_data['window_end'], 'isoformat') else window_data['window_end']
         }
 
+        if new_samples is not None:
+            buffer = self.buffer_manager.buffers[window_data['sensor_id']]
+            features.update(await self.executor.process(
+                window_data['sensor_id'], buffer.samples, buffer.head, len(buffer),
+                new_samples, window_data.get('sampling_rate', sampling_rate),
+                self.get_enabled_features(window_data['sensor_id'])
+            ))
+            return features
+
+        h_data = window_data['h_data']
+        v_data = window_data['v_data']
+
         # Time domain features
         if self.time_domain:
             try:
@@ -280,8 +415,8 @@ class RealTimeAnalyzer:
             Dominant frequency in Hz
         """
         # Perform FFT
-        fft_result = np.fft.fft(data)
-        fft_freq = np.fft.fftfreq(len(data), 1/sampling_rate)
+        fft_result = fft_backend.fft(data)
+        fft_freq = fft_backend.fftfreq(len(data), 1/sampling_rate)
 
         # Get magnitude (only positive frequencies)
         magnitude = np.abs(fft_result[:len(fft_freq)//2])
@@ -298,6 +433,9 @@ class RealTimeAnalyzer:
         """
         Save features to database
 
+        原程式碼每個 tick 直接 INSERT 一筆，改為放入 write-behind 佇列，
+        由 AsyncDatabase 背景任務批次 COPY 寫入
+
         Args:
             sensor_id: Sensor identifier
             features: Feature dictionary
@@ -321,81 +459,23 @@ class RealTimeAnalyzer:
                         # 如果轉換失敗,保持原值
                         pass
 
-            await db.insert_features(sensor_id, features_for_db)
-            logger.debug(f"Saved features for sensor {sensor_id}")
+            db.enqueue_features(sensor_id, features_for_db)
+            logger.debug(f"Queued features for sensor {sensor_id}")
         except Exception as e:
             logger.error(f"Error saving features: {e}")
 
     async def _check_alerts(self, sensor_id: int, features: Dict):
         """
-        Check if any thresholds are exceeded and generate alerts
-
-        Args:
-            sensor_id: Sensor identifier
-            features: Feature dictionary
-        """
-        try:
-            # Get alert configurations for this sensor
-            configs = await db.get_alert_configurations(sensor_id)
-
-            for config in configs:
-                feature_name = config['feature_name']
-                value = features.get(feature_name)
-
-                if value is None:
-                    continue
+        Hand a feature update to the alert engine
 
-                # Check thresholds
-                threshold_min = config.get('threshold_min')
-                threshold_max = config.get('threshold_max')
-
-                if threshold_max and value > threshold_max:
-                    await self._create_alert(
-                        sensor_id, config, value, 'above', threshold_max
-                    )
-
-                if threshold_min and value < threshold_min:
-                    await self._create_alert(
-                        sensor_id, config, value, 'below', threshold_min
-                    )
-
-        except Exception as e:
-            logger.error(f"Error checking alerts: {e}")
-
-    async def _create_alert(self, sensor_id: int, config: Dict,
-                           value: float, direction: str, threshold: float):
-        """
-        Create and broadcast an alert
+        原程式碼每個 tick 逐一比對配置並為每次超過閾值建立警報，
+        改為由 alert_engine 批次評估（遲滯、持續時間、變化率與去重）
 
         Args:
             sensor_id: Sensor identifier
-            config: Alert configuration
-            value: Current feature value
-            direction: 'above' or 'below' threshold
-            threshold: Threshold value
+            features: Feature dictionary
         """
-        alert = {
-            'sensor_id': sensor_id,
-            'alert_type': 'threshold',
-            'severity': config['severity'],
-            'message': (
-                f"{config['feature_name']} is {direction} threshold "
-                f"({value:.4f} {direction} {threshold:.4f})"
-            ),
-            'feature_name': config['feature_name'],
-            'current_value': value,
-            'threshold_value': threshold
-        }
-
-        # Save to database
-        try:
-            await db.create_alert(alert)
-            logger.warning(f"Alert created for sensor {sensor_id}: {alert['message']}")
-        except Exception as e:
-            logger.error(f"Error creating alert: {e}")
-
-        # Broadcast to all clients
-        await manager.broadcast_alert(alert)
+        alert_engine.submit(sensor_id, features)
 
     def get_status(self) -> Dict:
         """
@@ -407,7 +487,8 @@ class RealTimeAnalyzer:
         return {
             'active_sensors': list(self.analysis_tasks.keys()),
             'sensor_count': len(self.analysis_tasks),
-            'running': self.running
+            'running': self.running,
+            'analysis_workers': self.executor.workers
         }
 
 
@@ -6,6 +6,7 @@ This module provides an asynchronous interface to Redis for:
 - Feature result caching
 - Pub/Sub messaging
 - Connection tracking
+- Sensor ownership leases across backend instances
 - Alert queuing
 """
 # 原始寫法: import aioredis
@@ -13,8 +14,16 @@ This module provides an asynchronous interface to Redis for:
 import redis.asyncio as aioredis
 import json
 import os
+import struct
 import logging
-from typing import Optional, Dict, List
+import numpy as np
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional, Dict, List, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +33,136 @@ REDIS_URL = os.getenv(
     "redis://:redis_pass@localhost:6379/0"
 )
 
+# 原始資料 chunk stream 的近似長度上限（每筆 entry 是一整個批次，而非單一樣本）
+# 以 MAXLEN ~ 裁剪取代原本每批次一次的 EXPIRE
+SENSOR_CHUNK_STREAM_MAXLEN = int(os.getenv("SENSOR_CHUNK_STREAM_MAXLEN", "3600"))
+
+# 無法封存的 chunk 移入的 dead-letter stream 近似長度上限
+SENSOR_CHUNK_DEAD_LETTER_MAXLEN = int(os.getenv("SENSOR_CHUNK_DEAD_LETTER_MAXLEN", "1000"))
+
+# 轉送至其他實例的 ingest stream 近似長度上限
+INGEST_FORWARD_MAXLEN = int(os.getenv("INGEST_FORWARD_MAXLEN", "1000"))
+
+# 只有租約持有者可以續約 / 釋放 / 移交（compare-and-set）
+_RENEW_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+_TRANSFER_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[2], 'PX', ARGV[3])
+    return 1
+end
+return 0
+"""
+
+# Chunk header: start time (epoch seconds), sampling rate (Hz),
+# UTC offset (seconds, or sentinel for naive datetimes), sample count
+_CHUNK_HEADER = struct.Struct("<ddiI")
+_NAIVE_UTC_OFFSET = -(2 ** 31)
+
+
+def pack_sensor_chunk(start_time: datetime, sampling_rate: float,
+                      h_acc: np.ndarray, v_acc: np.ndarray) -> bytes:
+    """
+    Pack a batch of samples into a single binary stream field
+
+    Layout: header (start time, sampling rate, UTC offset, count)
+    followed by the horizontal and vertical channels as
+    little-endian float32 arrays.
+
+    Args:
+        start_time: Timestamp of the first sample
+        sampling_rate: Sampling rate in Hz
+        h_acc: Horizontal acceleration samples
+        v_acc: Vertical acceleration samples
+
+    Returns:
+        Packed bytes
+    """
+    h = np.ascontiguousarray(h_acc, dtype="<f4")
+    v = np.ascontiguousarray(v_acc, dtype="<f4")
+    if h.shape != v.shape or h.ndim != 1:
+        raise ValueError("h_acc and v_acc must be 1-D arrays of equal length")
+
+    offset = start_time.utcoffset()
+    utc_offset = _NAIVE_UTC_OFFSET if offset is None else int(offset.total_seconds())
+
+    header = _CHUNK_HEADER.pack(start_time.timestamp(), float(sampling_rate),
+                                utc_offset, h.size)
+    return header + h.tobytes() + v.tobytes()
+
+
+def unpack_sensor_chunk(payload: bytes) -> Dict:
+    """
+    Reconstruct a packed chunk produced by `pack_sensor_chunk`
+
+    Args:
+        payload: Packed bytes
+
+    Returns:
+        Dict with start_time, sampling_rate, sample_count and
+        float32 NumPy arrays h_acc / v_acc
+    """
+    epoch, sampling_rate, utc_offset, count = _CHUNK_HEADER.unpack_from(payload)
+
+    if utc_offset == _NAIVE_UTC_OFFSET:
+        start_time = datetime.fromtimestamp(epoch)
+    else:
+        start_time = datetime.fromtimestamp(
+            epoch, timezone(timedelta(seconds=utc_offset))
+        )
+
+    arrays = np.frombuffer(payload, dtype="<f4", count=2 * count,
+                           offset=_CHUNK_HEADER.size)
+
+    return {
+        'start_time': start_time,
+        'sampling_rate': sampling_rate,
+        'sample_count': count,
+        'h_acc': arrays[:count],
+        'v_acc': arrays[count:]
+    }
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode_message(message: Dict) -> bytes:
+    """
+    Serialize a message to JSON bytes
+
+    Uses orjson when installed (NumPy scalars / arrays and datetimes
+    are serialized natively), otherwise the standard json module.
+
+    Args:
+        message: Message dictionary
+
+    Returns:
+        UTF-8 JSON bytes
+    """
+    if orjson is not None:
+        return orjson.dumps(
+            message, default=_json_default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        )
+    return json.dumps(message, default=_json_default).encode()
+
 
 class RedisClient:
     """
@@ -35,6 +174,8 @@ class RedisClient:
 
     def __init__(self):
         self.redis: Optional[aioredis.Redis] = None
+        # 二進位連線（decode_responses=False），用於 packed chunk stream
+        self.redis_binary: Optional[aioredis.Redis] = None
         self._is_connected = False
 
     async def connect(self):
@@ -49,6 +190,7 @@ class RedisClient:
                 encoding="utf-8",
                 decode_responses=True
             )
+            self.redis_binary = await aioredis.from_url(REDIS_URL)
             self._is_connected = True
             logger.info(f"Redis connected: {REDIS_URL}")
         except Exception as e:
@@ -59,6 +201,8 @@ class RedisClient:
         """Close Redis connection"""
         if self.redis:
             await self.redis.close()
+            if self.redis_binary:
+                await self.redis_binary.close()
             self._is_connected = False
             logger.info("Redis connection closed")
 
@@ -126,6 +270,315 @@ class RedisClient:
         except Exception as e:
             logger.error(f"Error batch adding to stream: {e}")
 
+    @staticmethod
+    def _chunk_stream_key(sensor_id: int) -> str:
+        return f"stream:sensor:{sensor_id}:chunks"
+
+    async def add_sensor_chunk(self, sensor_id: int, start_time: datetime,
+                               sampling_rate: float, h_acc: np.ndarray,
+                               v_acc: np.ndarray,
+                               maxlen: int = SENSOR_CHUNK_STREAM_MAXLEN) -> Optional[str]:
+        """
+        Add a whole batch of samples to the sensor chunk stream
+
+        原程式碼每個樣本一筆 XADD（25,600 筆/秒，附 ISO 字串）再加上每批次 EXPIRE，
+        改為一筆 XADD 攜帶整個批次的 packed float32 資料，並以 MAXLEN ~ 裁剪
+
+        Args:
+            sensor_id: Sensor identifier
+            start_time: Timestamp of the first sample
+            sampling_rate: Sampling rate in Hz
+            h_acc: Horizontal acceleration samples
+            v_acc: Vertical acceleration samples
+            maxlen: Approximate maximum number of chunks to keep
+
+        Returns:
+            Stream entry ID, or None on failure
+        """
+        if not self._is_connected:
+            logger.warning("Redis not connected, skipping chunk add")
+            return None
+
+        try:
+            payload = pack_sensor_chunk(start_time, sampling_rate, h_acc, v_acc)
+            entry_id = await self.redis_binary.xadd(
+                self._chunk_stream_key(sensor_id),
+                {'chunk': payload},
+                maxlen=maxlen,
+                approximate=True
+            )
+            logger.debug(
+                f"Added chunk of {len(h_acc)} samples to Redis stream for sensor {sensor_id}"
+            )
+            return entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+        except Exception as e:
+            logger.error(f"Error adding chunk to stream: {e}")
+            return None
+
+    async def get_sensor_chunks(self, sensor_id: int, count: int = 10) -> List[Dict]:
+        """
+        Read the most recent chunks from the sensor chunk stream
+
+        Args:
+            sensor_id: Sensor identifier
+            count: Number of chunks to read
+
+        Returns:
+            List of unpacked chunks in chronological order, each with
+            its stream 'entry_id'
+        """
+        if not self._is_connected:
+            return []
+
+        try:
+            entries = await self.redis_binary.xrevrange(
+                self._chunk_stream_key(sensor_id), count=count
+            )
+            chunks = []
+            for entry_id, fields in reversed(entries):
+                chunk = unpack_sensor_chunk(fields[b'chunk'])
+                chunk['entry_id'] = entry_id.decode()
+                chunks.append(chunk)
+            return chunks
+        except Exception as e:
+            logger.error(f"Error reading chunk stream: {e}")
+            return []
+
+    async def read_recent_sensor_chunks(self, sensor_id: int, min_samples: int,
+                                        page_size: int = 64) -> List[Dict]:
+        """
+        Read the newest chunks until at least `min_samples` samples are covered
+
+        Pages backwards through the chunk stream with XREVRANGE so
+        that only the tail of the stream is transferred.
+
+        Args:
+            sensor_id: Sensor identifier
+            min_samples: Number of samples to cover
+            page_size: Chunks fetched per XREVRANGE call
+
+        Returns:
+            List of unpacked chunks in chronological order
+        """
+        if not self._is_connected:
+            return []
+
+        try:
+            key = self._chunk_stream_key(sensor_id)
+            chunks = []
+            total = 0
+            max_id = '+'
+
+            while total < min_samples:
+                entries = await self.redis_binary.xrevrange(key, max=max_id, count=page_size)
+                for entry_id, fields in entries:
+                    chunk = unpack_sensor_chunk(fields[b'chunk'])
+                    chunk['entry_id'] = entry_id.decode()
+                    chunks.append(chunk)
+                    total += chunk['sample_count']
+                    if total >= min_samples:
+                        break
+
+                if len(entries) < page_size:
+                    break
+                # 下一頁從最後一筆之前開始（exclusive range）
+                max_id = '(' + chunks[-1]['entry_id']
+
+            chunks.reverse()
+            return chunks
+        except Exception as e:
+            logger.error(f"Error reading recent chunks: {e}")
+            return []
+
+    async def get_recent_chunk_sensors(self, max_age_seconds: float) -> List[int]:
+        """
+        Find sensors whose chunk stream received data recently
+
+        Args:
+            max_age_seconds: Maximum age of the newest entry
+
+        Returns:
+            List of sensor IDs
+        """
+        if not self._is_connected:
+            return []
+
+        try:
+            now_ms = (await self.redis.time())[0] * 1000
+            sensor_ids = []
+
+            async for key in self.redis.scan_iter(match="stream:sensor:*:chunks"):
+                # chunk 欄位為二進位資料，需使用 binary 連線讀取 stream 資訊
+                info = await self.redis_binary.xinfo_stream(key)
+                last_ms = int(info['last-generated-id'].split(b'-')[0])
+                if now_ms - last_ms <= max_age_seconds * 1000:
+                    sensor_ids.append(int(key.split(':')[2]))
+
+            return sorted(sensor_ids)
+        except Exception as e:
+            logger.error(f"Error scanning chunk streams: {e}")
+            return []
+
+    async def ensure_chunk_group(self, sensor_id: int, group: str):
+        """
+        Create a consumer group on a sensor chunk stream if missing
+
+        The group starts at the oldest retained chunk.
+
+        Args:
+            sensor_id: Sensor identifier
+            group: Consumer group name
+        """
+        if not self._is_connected:
+            return
+
+        try:
+            await self.redis_binary.xgroup_create(
+                self._chunk_stream_key(sensor_id), group, id='0', mkstream=True
+            )
+        except aioredis.ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                logger.error(f"Error creating chunk consumer group: {e}")
+        except Exception as e:
+            logger.error(f"Error creating chunk consumer group: {e}")
+
+    async def read_chunk_group(self, sensor_ids: List[int], group: str, consumer: str,
+                               pending: bool = False, count: int = 100,
+                               block_ms: Optional[int] = 1000) -> List[Dict]:
+        """
+        Read chunks of several sensors through a consumer group
+
+        Args:
+            sensor_ids: Sensor identifiers
+            group: Consumer group name
+            consumer: Consumer name
+            pending: Re-read this consumer's unacknowledged chunks
+                     instead of new ones
+            count: Maximum chunks per stream
+            block_ms: Maximum time to block waiting for new chunks
+
+        Returns:
+            List of unpacked chunks, each with 'sensor_id' and 'entry_id'
+        """
+        if not self._is_connected or not sensor_ids:
+            return []
+
+        try:
+            start = '0' if pending else '>'
+            response = await self.redis_binary.xreadgroup(
+                group, consumer,
+                {self._chunk_stream_key(sensor_id): start for sensor_id in sensor_ids},
+                count=count, block=None if pending else block_ms
+            )
+            chunks = []
+            for key, entries in response or []:
+                sensor_id = int(key.split(b':')[2])
+                trimmed = []
+                for entry_id, fields in entries:
+                    # 已被 MAXLEN 裁剪的 pending entry 沒有欄位，直接確認
+                    if not fields:
+                        trimmed.append(entry_id)
+                        continue
+                    chunk = unpack_sensor_chunk(fields[b'chunk'])
+                    chunk['sensor_id'] = sensor_id
+                    chunk['entry_id'] = entry_id.decode()
+                    chunks.append(chunk)
+                if trimmed:
+                    await self.redis_binary.xack(key, group, *trimmed)
+            return chunks
+        except Exception as e:
+            logger.error(f"Error reading chunk consumer group: {e}")
+            return []
+
+    async def ack_sensor_chunks(self, sensor_id: int, group: str, entry_ids: List[str]):
+        """
+        Acknowledge chunks processed by a consumer group
+
+        Args:
+            sensor_id: Sensor identifier
+            group: Consumer group name
+            entry_ids: Stream entry IDs
+        """
+        if not self._is_connected or not entry_ids:
+            return
+
+        try:
+            await self.redis_binary.xack(self._chunk_stream_key(sensor_id), group, *entry_ids)
+        except Exception as e:
+            logger.error(f"Error acknowledging chunks: {e}")
+
+    async def get_chunk_deliveries(self, sensor_id: int, group: str, consumer: str,
+                                   entry_ids: List[str]) -> Dict[str, int]:
+        """
+        Delivery counts of pending chunks (XPENDING)
+
+        Args:
+            sensor_id: Sensor identifier
+            group: Consumer group name
+            consumer: Consumer name
+            entry_ids: Stream entry IDs
+
+        Returns:
+            Dict of entry ID -> times delivered (IDs no longer pending are omitted)
+        """
+        if not self._is_connected or not entry_ids:
+            return {}
+
+        try:
+            ordered = sorted(entry_ids, key=lambda e: tuple(int(p) for p in e.split('-')))
+            pending = await self.redis_binary.xpending_range(
+                self._chunk_stream_key(sensor_id), group,
+                min=ordered[0], max=ordered[-1], count=len(entry_ids), consumername=consumer
+            )
+            wanted = set(entry_ids)
+            deliveries = {}
+            for entry in pending:
+                entry_id = entry['message_id']
+                entry_id = entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+                if entry_id in wanted:
+                    deliveries[entry_id] = int(entry['times_delivered'])
+            return deliveries
+        except Exception as e:
+            logger.error(f"Error reading pending chunk deliveries: {e}")
+            return {}
+
+    async def dead_letter_sensor_chunks(self, sensor_id: int, group: str,
+                                        entry_ids: List[str], reason: str,
+                                        maxlen: int = SENSOR_CHUNK_DEAD_LETTER_MAXLEN) -> int:
+        """
+        Move chunks to the sensor's dead-letter stream and acknowledge them
+
+        The original payload is copied to `stream:sensor:{id}:chunks:dead`
+        with its source entry ID and the error, then XACKed so the
+        consumer group stops redelivering it.
+
+        Args:
+            sensor_id: Sensor identifier
+            group: Consumer group name
+            entry_ids: Stream entry IDs
+            reason: Error message stored with each entry
+            maxlen: Approximate maximum length of the dead-letter stream
+
+        Returns:
+            Number of moved chunks
+        """
+        if not self._is_connected or not entry_ids:
+            return 0
+
+        key = self._chunk_stream_key(sensor_id)
+        moved = 0
+        for entry_id in entry_ids:
+            entries = await self.redis_binary.xrange(key, min=entry_id, max=entry_id)
+            fields = {b'source_id': entry_id, b'group': group, b'error': reason}
+            if entries:
+                fields[b'chunk'] = entries[0][1][b'chunk']
+            await self.redis_binary.xadd(
+                f"{key}:dead", fields, maxlen=maxlen, approximate=True
+            )
+            await self.redis_binary.xack(key, group, entry_id)
+            moved += 1
+        return moved
+
     async def get_sensor_stream(self, sensor_id: int, count: int = 100) -> List[Dict]:
         """
         Read recent data from sensor stream
@@ -229,29 +682,36 @@ class RedisClient:
 
     # ==================== Pub/Sub Operations ====================
 
-    async def publish(self, channel: str, message: Dict):
+    async def publish(self, channel: str, message: Union[Dict, bytes]):
         """
         Publish message to a channel
 
         Args:
             channel: Channel name
-            message: Message dictionary (will be JSON serialized)
+            message: Message dictionary (will be JSON serialized) or
+                     already encoded JSON bytes
         """
         if not self._is_connected:
             return
 
         try:
-            await self.redis.publish(channel, json.dumps(message))
+            if not isinstance(message, bytes):
+                message = encode_message(message)
+            await self.redis.publish(channel, message)
             logger.debug(f"Published to channel {channel}")
         except Exception as e:
             logger.error(f"Error publishing message: {e}")
 
-    async def subscribe(self, channel: str):
+    async def subscribe(self, *channels: str, patterns: Iterable[str] = ()):
         """
-        Subscribe to a channel
+        Subscribe to channels and channel patterns
+
+        Messages are received as bytes (binary connection), so payloads
+        can be forwarded without decoding and re-encoding.
 
         Args:
-            channel: Channel name
+            channels: Channel names
+            patterns: Glob-style channel patterns (PSUBSCRIBE)
 
         Returns:
             PubSub object for receiving messages
@@ -259,10 +719,14 @@ class RedisClient:
         if not self._is_connected:
             raise RuntimeError("Redis not connected")
 
+        patterns = list(patterns)
         try:
-            pubsub = self.redis.pubsub()
-            await pubsub.subscribe(channel)
-            logger.info(f"Subscribed to channel {channel}")
+            pubsub = self.redis_binary.pubsub()
+            if channels:
+                await pubsub.subscribe(*channels)
+            if patterns:
+                await pubsub.psubscribe(*patterns)
+            logger.info(f"Subscribed to channels {list(channels)} and patterns {patterns}")
             return pubsub
         except Exception as e:
             logger.error(f"Error subscribing to channel: {e}")
@@ -333,6 +797,390 @@ class RedisClient:
             logger.error(f"Error getting connection count: {e}")
             return 0
 
+    # ==================== Analysis Tracking ====================
+
+    async def add_active_analysis(self, sensor_id: int):
+        """
+        Record that real-time analysis is running for a sensor
+
+        Args:
+            sensor_id: Sensor identifier
+        """
+        if not self._is_connected:
+            return
+
+        try:
+            await self.redis.sadd("analysis:active", sensor_id)
+        except Exception as e:
+            logger.error(f"Error adding active analysis: {e}")
+
+    async def remove_active_analysis(self, sensor_id: int):
+        """
+        Remove a sensor from the active analysis set
+
+        Args:
+            sensor_id: Sensor identifier
+        """
+        if not self._is_connected:
+            return
+
+        try:
+            await self.redis.srem("analysis:active", sensor_id)
+        except Exception as e:
+            logger.error(f"Error removing active analysis: {e}")
+
+    async def get_active_analyses(self) -> List[int]:
+        """
+        Get sensors with active real-time analysis
+
+        Returns:
+            List of sensor IDs
+        """
+        if not self._is_connected:
+            return []
+
+        try:
+            members = await self.redis.smembers("analysis:active")
+            return sorted(int(m) for m in members) if members else []
+        except Exception as e:
+            logger.error(f"Error getting active analyses: {e}")
+            return []
+
+    async def set_feature_config(self, sensor_id: int, features: List[str]):
+        """
+        Persist the enabled realtime features of a sensor
+
+        Args:
+            sensor_id: Sensor identifier
+            features: Enabled feature names
+        """
+        if not self._is_connected:
+            return
+
+        try:
+            await self.redis.set(f"sensor:{sensor_id}:features", json.dumps(features))
+        except Exception as e:
+            logger.error(f"Error saving feature config: {e}")
+
+    async def get_feature_config(self, sensor_id: int) -> Optional[List[str]]:
+        """
+        Get the persisted realtime feature set of a sensor
+
+        Args:
+            sensor_id: Sensor identifier
+
+        Returns:
+            List of feature names, or None if not configured
+        """
+        if not self._is_connected:
+            return None
+
+        try:
+            data = await self.redis.get(f"sensor:{sensor_id}:features")
+            return json.loads(data) if data else None
+        except Exception as e:
+            logger.error(f"Error getting feature config: {e}")
+            return None
+
+    async def get_feature_configs(self, sensor_ids: List[int]) -> Dict[int, List[str]]:
+        """
+        Get the persisted realtime feature sets of several sensors
+
+        Args:
+            sensor_ids: Sensor identifiers
+
+        Returns:
+            Dict mapping sensor_id to feature names (configured sensors only)
+        """
+        if not self._is_connected or not sensor_ids:
+            return {}
+
+        try:
+            values = await self.redis.mget([f"sensor:{s}:features" for s in sensor_ids])
+            return {
+                sensor_id: json.loads(data)
+                for sensor_id, data in zip(sensor_ids, values) if data
+            }
+        except Exception as e:
+            logger.error(f"Error getting feature configs: {e}")
+            return {}
+
+    # ==================== Partition Leasing ====================
+
+    @staticmethod
+    def _lease_key(sensor_id: int) -> str:
+        return f"lease:sensor:{sensor_id}"
+
+    @staticmethod
+    def _ingest_stream_key(instance_id: str) -> str:
+        return f"ingest:instance:{instance_id}"
+
+    async def acquire_sensor_lease(self, sensor_id: int, instance_id: str,
+                                   ttl_ms: int) -> bool:
+        """
+        Acquire (or renew) the ownership lease of a sensor
+
+        Args:
+            sensor_id: Sensor identifier
+            instance_id: Owner instance identifier
+            ttl_ms: Lease time-to-live in milliseconds
+
+        Returns:
+            True if the instance owns the sensor after the call
+        """
+        if not self._is_connected:
+            return False
+
+        try:
+            if await self.redis.set(self._lease_key(sensor_id), instance_id, nx=True, px=ttl_ms):
+                return True
+            return await self.renew_sensor_lease(sensor_id, instance_id, ttl_ms)
+        except Exception as e:
+            logger.error(f"Error acquiring lease for sensor {sensor_id}: {e}")
+            return False
+
+    async def renew_sensor_lease(self, sensor_id: int, instance_id: str,
+                                 ttl_ms: int) -> bool:
+        """
+        Extend a lease held by the instance
+
+        Args:
+            sensor_id: Sensor identifier
+            instance_id: Owner instance identifier
+            ttl_ms: Lease time-to-live in milliseconds
+
+        Returns:
+            True if the lease is still held by the instance
+        """
+        if not self._is_connected:
+            return False
+
+        try:
+            renewed = await self.redis.eval(
+                _RENEW_LEASE_SCRIPT, 1, self._lease_key(sensor_id), instance_id, ttl_ms
+            )
+            return bool(renewed)
+        except Exception as e:
+            logger.error(f"Error renewing lease for sensor {sensor_id}: {e}")
+            return False
+
+    async def release_sensor_lease(self, sensor_id: int, instance_id: str) -> bool:
+        """
+        Release a lease held by the instance
+
+        Args:
+            sensor_id: Sensor identifier
+            instance_id: Owner instance identifier
+
+        Returns:
+            True if the lease was released
+        """
+        if not self._is_connected:
+            return False
+
+        try:
+            released = await self.redis.eval(
+                _RELEASE_LEASE_SCRIPT, 1, self._lease_key(sensor_id), instance_id
+            )
+            return bool(released)
+        except Exception as e:
+            logger.error(f"Error releasing lease for sensor {sensor_id}: {e}")
+            return False
+
+    async def transfer_sensor_lease(self, sensor_id: int, from_instance: str,
+                                    to_instance: str, ttl_ms: int) -> bool:
+        """
+        Hand a lease over to another instance
+
+        Args:
+            sensor_id: Sensor identifier
+            from_instance: Current owner instance identifier
+            to_instance: New owner instance identifier
+            ttl_ms: Lease time-to-live in milliseconds
+
+        Returns:
+            True if the lease was transferred
+        """
+        if not self._is_connected:
+            return False
+
+        try:
+            transferred = await self.redis.eval(
+                _TRANSFER_LEASE_SCRIPT, 1, self._lease_key(sensor_id),
+                from_instance, to_instance, ttl_ms
+            )
+            return bool(transferred)
+        except Exception as e:
+            logger.error(f"Error transferring lease for sensor {sensor_id}: {e}")
+            return False
+
+    async def get_sensor_owner(self, sensor_id: int) -> Optional[str]:
+        """
+        Get the instance owning a sensor
+
+        Args:
+            sensor_id: Sensor identifier
+
+        Returns:
+            Owner instance identifier, or None if the sensor is unowned
+        """
+        if not self._is_connected:
+            return None
+
+        try:
+            return await self.redis.get(self._lease_key(sensor_id))
+        except Exception as e:
+            logger.error(f"Error getting owner of sensor {sensor_id}: {e}")
+            return None
+
+    async def get_sensor_owners(self) -> Dict[int, str]:
+        """
+        Get all current sensor leases
+
+        Returns:
+            Dict mapping sensor_id to owner instance identifier
+        """
+        if not self._is_connected:
+            return {}
+
+        try:
+            keys = [key async for key in self.redis.scan_iter(match="lease:sensor:*")]
+            if not keys:
+                return {}
+            owners = await self.redis.mget(keys)
+            return {
+                int(key.split(':')[2]): owner
+                for key, owner in zip(keys, owners) if owner is not None
+            }
+        except Exception as e:
+            logger.error(f"Error getting sensor owners: {e}")
+            return {}
+
+    async def heartbeat_instance(self, instance_id: str, ttl_ms: int):
+        """
+        Mark an instance as alive for the next `ttl_ms` milliseconds
+
+        Args:
+            instance_id: Instance identifier
+            ttl_ms: Heartbeat time-to-live in milliseconds
+        """
+        if not self._is_connected:
+            return
+
+        try:
+            await self.redis.set(f"instance:{instance_id}:alive", "1", px=ttl_ms)
+        except Exception as e:
+            logger.error(f"Error sending instance heartbeat: {e}")
+
+    async def remove_instance(self, instance_id: str):
+        """
+        Remove an instance heartbeat and its ingest stream
+
+        Args:
+            instance_id: Instance identifier
+        """
+        if not self._is_connected:
+            return
+
+        try:
+            await self.redis.delete(
+                f"instance:{instance_id}:alive", self._ingest_stream_key(instance_id)
+            )
+        except Exception as e:
+            logger.error(f"Error removing instance: {e}")
+
+    async def get_live_instances(self) -> List[str]:
+        """
+        Get instances with a live heartbeat
+
+        Returns:
+            Sorted list of instance identifiers
+        """
+        if not self._is_connected:
+            return []
+
+        try:
+            return sorted([
+                key[len("instance:"):-len(":alive")]
+                async for key in self.redis.scan_iter(match="instance:*:alive")
+            ])
+        except Exception as e:
+            logger.error(f"Error getting live instances: {e}")
+            return []
+
+    async def forward_sensor_chunk(self, instance_id: str, sensor_id: int,
+                                   start_time: datetime, sampling_rate: float,
+                                   h_acc: np.ndarray, v_acc: np.ndarray,
+                                   hops: int = 1) -> Optional[str]:
+        """
+        Forward an ingested batch to the instance owning the sensor
+
+        Args:
+            instance_id: Owner instance identifier
+            sensor_id: Sensor identifier
+            start_time: Timestamp of the first sample
+            sampling_rate: Sampling rate in Hz
+            h_acc: Horizontal acceleration samples
+            v_acc: Vertical acceleration samples
+            hops: Number of times the batch has been forwarded
+
+        Returns:
+            Stream entry ID, or None on failure
+        """
+        if not self._is_connected:
+            return None
+
+        try:
+            entry_id = await self.redis_binary.xadd(
+                self._ingest_stream_key(instance_id),
+                {
+                    'sensor_id': str(sensor_id),
+                    'hops': str(hops),
+                    'chunk': pack_sensor_chunk(start_time, sampling_rate, h_acc, v_acc)
+                },
+                maxlen=INGEST_FORWARD_MAXLEN,
+                approximate=True
+            )
+            return entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+        except Exception as e:
+            logger.error(f"Error forwarding chunk to instance {instance_id}: {e}")
+            return None
+
+    async def read_forwarded_chunks(self, instance_id: str, last_id: str = '$',
+                                    block_ms: int = 1000, count: int = 100):
+        """
+        Read batches forwarded to an instance
+
+        Args:
+            instance_id: Instance identifier
+            last_id: Stream ID to read after ('$' = only new entries)
+            block_ms: Maximum time to block waiting for entries
+            count: Maximum number of entries
+
+        Returns:
+            Tuple of (last entry ID, list of chunks with 'sensor_id' and 'hops')
+        """
+        if not self._is_connected:
+            return last_id, []
+
+        try:
+            response = await self.redis_binary.xread(
+                {self._ingest_stream_key(instance_id): last_id},
+                count=count, block=block_ms
+            )
+            chunks = []
+            for _, entries in response:
+                for entry_id, fields in entries:
+                    chunk = unpack_sensor_chunk(fields[b'chunk'])
+                    chunk['sensor_id'] = int(fields[b'sensor_id'])
+                    chunk['hops'] = int(fields.get(b'hops', b'1'))
+                    chunks.append(chunk)
+                    last_id = entry_id.decode()
+            return last_id, chunks
+        except Exception as e:
+            logger.error(f"Error reading forwarded chunks: {e}")
+            return last_id, []
+
     # ==================== Sensor Status ====================
 
     async def update_sensor_status(self, sensor_id: int, status: Dict):
@@ -0,0 +1,277 @@
+"""
+Sliding-window incremental statistics for real-time features
+
+Maintains running power sums and a monotonic max-|x| deque over the
+last `window_size` samples of a channel, so that time-domain features
+(RMS, peak, kurtosis, crest factor, M6A, M8A) cost O(hop) per update
+instead of O(window).
+"""
+import numpy as np
+from collections import deque
+from math import comb
+from typing import Dict, Optional
+
+
+def ring_tail(values: np.ndarray, head: int, n: int) -> np.ndarray:
+    """
+    Newest `n` samples of a ring buffer in chronological order
+
+    Args:
+        values: Ring storage, samples along the last axis
+        head: Next write position
+        n: Number of samples (<= ring capacity)
+
+    Returns:
+        Copy of shape values.shape[:-1] + (n,)
+    """
+    capacity = values.shape[-1]
+    start = (head - n) % capacity
+    if start + n <= capacity:
+        return values[..., start:start + n].copy()
+    return np.concatenate((values[..., start:], values[..., :start + n - capacity]), axis=-1)
+
+
+def ring_write(values: np.ndarray, head: int, x: np.ndarray) -> int:
+    """
+    Write samples into a ring buffer (at most its capacity, newest kept)
+
+    Args:
+        values: Ring storage, samples along the last axis
+        head: Next write position
+        x: New samples along the last axis
+
+    Returns:
+        New head position
+    """
+    capacity = values.shape[-1]
+    n = x.shape[-1]
+    if n > capacity:
+        head = (head + n - capacity) % capacity
+        x = x[..., n - capacity:]
+        n = capacity
+    end = head + n
+    if end <= capacity:
+        values[..., head:end] = x
+    else:
+        split = capacity - head
+        values[..., head:] = x[..., :split]
+        values[..., :end - capacity] = x[..., split:]
+    return end % capacity
+
+
+class SlidingWindowStats:
+    """
+    Incremental statistics over a fixed-length sliding window
+
+    Power sums Σ(x - shift)^k (k = 0..max_order) are updated by adding
+    new samples and subtracting expired ones. `shift` is re-anchored to
+    the window mean periodically, which bounds floating point drift and
+    keeps the high-order sums well conditioned.
+    """
+
+    def __init__(self, window_size: int, max_order: int = 4,
+                 reanchor_interval: Optional[int] = None):
+        """
+        Initialize statistics engine
+
+        Args:
+            window_size: Number of samples in the sliding window
+            max_order: Highest power sum to maintain
+                       (4 for kurtosis, 6 for M6A, 8 for M8A)
+            reanchor_interval: Samples between full recomputations
+                               (default: window_size)
+        """
+        if max_order < 2:
+            raise ValueError("max_order must be at least 2")
+
+        self.window_size = window_size
+        self.max_order = max_order
+        self.reanchor_interval = reanchor_interval or window_size
+
+        self.values = np.zeros(window_size)   # ring buffer of samples
+        self.head = 0                          # next write position
+        self.count = 0                         # samples currently in window
+        self.total = 0                         # samples ever pushed
+        self.shift = 0.0
+        self.sums = np.zeros(max_order + 1)
+        # (absolute index, |x|) with strictly decreasing |x|
+        self.max_deque = deque()
+        self._since_reanchor = 0
+
+    def _power_sums(self, x: np.ndarray) -> np.ndarray:
+        sums = np.empty(self.max_order + 1)
+        sums[0] = x.size
+        d = x - self.shift
+        p = np.ones_like(d)
+        for k in range(1, self.max_order + 1):
+            p *= d
+            sums[k] = p.sum()
+        return sums
+
+    def _ring_read(self, start: int, n: int) -> np.ndarray:
+        idx = (start + np.arange(n)) % self.window_size
+        return self.values[idx]
+
+    def _ring_write(self, x: np.ndarray):
+        end = self.head + x.size
+        if end <= self.window_size:
+            self.values[self.head:end] = x
+        else:
+            split = self.window_size - self.head
+            self.values[self.head:] = x[:split]
+            self.values[:end - self.window_size] = x[split:]
+        self.head = end % self.window_size
+
+    def _push_max_candidates(self, x: np.ndarray, first_index: int):
+        """
+        Feed the max-|x| deque with the suffix maxima of a chunk
+
+        Only samples larger than every later sample in the chunk can
+        ever become the window maximum, so the rest are skipped.
+        """
+        a = np.abs(x)
+        suffix_max = np.maximum.accumulate(a[::-1])[::-1]
+        keep = np.empty(a.size, dtype=bool)
+        keep[:-1] = a[:-1] > suffix_max[1:]
+        keep[-1] = True
+        candidates = np.flatnonzero(keep)
+
+        head_value = a[candidates[0]]
+        while self.max_deque and self.max_deque[-1][1] <= head_value:
+            self.max_deque.pop()
+        self.max_deque.extend(zip((candidates + first_index).tolist(), a[candidates].tolist()))
+
+    def reset(self):
+        """Clear all samples and statistics"""
+        self.head = 0
+        self.count = 0
+        self.total = 0
+        self.shift = 0.0
+        self.sums[:] = 0.0
+        self.max_deque.clear()
+        self._since_reanchor = 0
+
+    def _reanchor(self):
+        window = self.window()
+        self.shift = float(window.mean()) if window.size else 0.0
+        self.sums = self._power_sums(window)
+        self._since_reanchor = 0
+
+    def update(self, samples: np.ndarray):
+        """
+        Add new samples, expiring the oldest ones beyond window_size
+
+        Args:
+            samples: New samples in chronological order
+        """
+        x = np.asarray(samples, dtype=np.float64).ravel()
+        if x.size == 0:
+            return
+
+        if x.size >= self.window_size:
+            # 新樣本已填滿整個窗口，直接重建
+            first_index = self.total + x.size - self.window_size
+            x = x[-self.window_size:]
+            self.values[:] = x
+            self.head = 0
+            self.count = self.window_size
+            self.total = first_index + x.size
+            self.max_deque.clear()
+            self._push_max_candidates(x, first_index)
+            self._reanchor()
+            return
+
+        if self.count == 0:
+            self.shift = float(x.mean())
+
+        expired = max(0, self.count + x.size - self.window_size)
+        if expired:
+            oldest = (self.head - self.count) % self.window_size
+            self.sums -= self._power_sums(self._ring_read(oldest, expired))
+
+        self.sums += self._power_sums(x)
+        self._ring_write(x)
+        self._push_max_candidates(x, self.total)
+        self.count = min(self.window_size, self.count + x.size)
+        self.total += x.size
+
+        window_first = self.total - self.count
+        while self.max_deque[0][0] < window_first:
+            self.max_deque.popleft()
+
+        self._since_reanchor += x.size
+        if self._since_reanchor >= self.reanchor_interval:
+            self._reanchor()
+
+    def window(self) -> np.ndarray:
+        """
+        Get the samples currently in the window
+
+        Returns:
+            Samples in chronological order
+        """
+        return self._ring_read((self.head - self.count) % self.window_size, self.count)
+
+    def mean(self) -> float:
+        if self.count == 0:
+            return 0.0
+        return self.shift + self.sums[1] / self.count
+
+    def central_moment(self, order: int) -> float:
+        """
+        Central moment E[(x - μ)^k] of the window
+
+        Expanded binomially from the shifted power sums.
+
+        Args:
+            order: Moment order (<= max_order)
+
+        Returns:
+            Central moment value
+        """
+        if order > self.max_order:
+            raise ValueError(f"order {order} exceeds max_order {self.max_order}")
+        if self.count == 0:
+            return 0.0
+
+        raw = self.sums[:order + 1] / self.count
+        d = raw[1]
+        return float(sum(
+            comb(order, j) * raw[j] * (-d) ** (order - j)
+            for j in range(order + 1)
+        ))
+
+    def rms(self) -> float:
+        if self.count == 0:
+            return 0.0
+        m = self.mean()
+        return float(np.sqrt(max(self.central_moment(2) + m * m, 0.0)))
+
+    def peak(self) -> float:
+        """Maximum absolute value in the window"""
+        return float(self.max_deque[0][1]) if self.max_deque else 0.0
+
+    def features(self) -> Dict[str, float]:
+        """
+        Time-domain features of the current window
+
+        Returns:
+            Dictionary with rms, peak, kurtosis, crest_factor and,
+            depending on max_order, m6a / m8a
+        """
+        rms = self.rms()
+        peak = self.peak()
+        m2 = self.central_moment(2)
+
+        features = {
+            'rms': rms,
+            'peak': peak,
+            'kurtosis': self.central_moment(4) / m2 ** 2 if m2 > 0 else 0.0,
+            'crest_factor': peak / rms if rms > 0 else 0.0,
+        }
+        if self.max_order >= 6:
+            features['m6a'] = self.central_moment(6) / m2 ** 3 if m2 > 0 else np.nan
+        if self.max_order >= 8:
+            features['m8a'] = self.central_moment(8) / m2 ** 4 if m2 > 0 else np.nan
+
+        return features
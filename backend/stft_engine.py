@@ -0,0 +1,143 @@
+"""
+Batched short-time Fourier transform
+
+Reproduces `scipy.signal.stft` and `scipy.signal.spectrogram` (default
+boundary / padding / detrend / scaling behaviour) for arrays of shape
+(..., n): both channels of a file, or (files, channels, n), are framed
+with one strided view and transformed with one real FFT. Window arrays
+and their scaling factors are cached per (window, nperseg); float32
+signals keep single precision (complex64 spectra).
+"""
+from functools import lru_cache
+from typing import Tuple
+
+import numpy as np
+from scipy import signal
+
+try:
+    from backend import fft_backend
+    from backend.precision import working_array
+except ModuleNotFoundError:
+    import fft_backend
+    from precision import working_array
+
+
+@lru_cache(maxsize=32)
+def _window(window, nperseg: int) -> Tuple[np.ndarray, float, float]:
+    win = signal.get_window(window, nperseg)
+    win.setflags(write=False)
+    return win, float(win.sum()), float((win * win).sum())
+
+
+def window_plan(window, nperseg: int) -> Tuple[np.ndarray, float, float]:
+    """
+    Cached window array and scaling sums
+
+    Args:
+        window: Window name or (name, parameter) tuple accepted by
+                scipy.signal.get_window
+        nperseg: Segment length
+
+    Returns:
+        (window array, sum(window), sum(window**2))
+    """
+    if isinstance(window, list):
+        window = tuple(window)
+    return _window(window, int(nperseg))
+
+
+def frames(x: np.ndarray, nperseg: int, step: int) -> np.ndarray:
+    """
+    Strided segment view (no copy)
+
+    Args:
+        x: Signal(s), shape (..., n)
+        nperseg: Segment length
+        step: Samples between segment starts
+
+    Returns:
+        View of shape (..., n_segments, nperseg)
+    """
+    return np.lib.stride_tricks.sliding_window_view(x, nperseg, axis=-1)[..., ::step, :]
+
+
+def stft(x, fs: float = 1.0, window='hann', nperseg: int = 256,
+         noverlap: int = None, workers: int = None):
+    """
+    STFT of one or more signals (same result as scipy.signal.stft)
+
+    Args:
+        x: Signal(s), shape (..., n)
+        fs: Sampling rate
+        window: Window specification
+        nperseg: Segment length (limited to the signal length)
+        noverlap: Overlapping samples (default nperseg // 2)
+        workers: Parallel FFT workers (None: config.FFT_WORKERS)
+
+    Returns:
+        (frequencies, times, Zxx of shape (..., n_freqs, n_times))
+    """
+    x = working_array(x)
+    nperseg = min(nperseg, x.shape[-1])
+    if noverlap is None:
+        noverlap = nperseg // 2
+    step = nperseg - noverlap
+    win, win_sum, _ = window_plan(window, nperseg)
+    win = win.astype(x.dtype, copy=False)
+
+    # boundary='zeros'：兩端補 nperseg//2 個零；padded=True：補齊最後一段
+    half = nperseg // 2
+    length = x.shape[-1] + 2 * half
+    extra = (-(length - nperseg) % step) % nperseg
+    pad = [(0, 0)] * (x.ndim - 1) + [(half, half + extra)]
+    padded = np.pad(x, pad)
+
+    spectrum = fft_backend.rfft(frames(padded, nperseg, step) * win, axis=-1, workers=workers)
+    spectrum *= 1.0 / win_sum
+
+    freqs = fft_backend.rfftfreq(nperseg, 1 / fs)
+    times = np.arange(nperseg / 2, padded.shape[-1] - nperseg / 2 + 1, step) / float(fs)
+    times -= (nperseg / 2) / fs
+    return freqs, times, np.swapaxes(spectrum, -1, -2)
+
+
+def spectrogram(x, fs: float = 1.0, window=('tukey', .25), nperseg: int = 256,
+                noverlap: int = None, workers: int = None):
+    """
+    PSD spectrogram of one or more signals (same result as
+    scipy.signal.spectrogram with detrend='constant', scaling='density')
+
+    Args:
+        x: Signal(s), shape (..., n)
+        fs: Sampling rate
+        window: Window specification
+        nperseg: Segment length (limited to the signal length)
+        noverlap: Overlapping samples (default nperseg // 8)
+        workers: Parallel FFT workers (None: config.FFT_WORKERS)
+
+    Returns:
+        (frequencies, times, Sxx of shape (..., n_freqs, n_times))
+    """
+    x = working_array(x)
+    nperseg = min(nperseg, x.shape[-1])
+    if noverlap is None:
+        noverlap = nperseg // 8
+    step = nperseg - noverlap
+    win, _, win_sq_sum = window_plan(window, nperseg)
+    win = win.astype(x.dtype, copy=False)
+
+    segments = frames(x, nperseg, step)
+    segments = segments - segments.mean(axis=-1, keepdims=True)
+    spectrum = fft_backend.rfft(segments * win, axis=-1, workers=workers)
+
+    power = spectrum.real ** 2 + spectrum.imag ** 2
+    power *= 1.0 / (fs * win_sq_sum)
+    # 單邊譜：DC（與偶數長度時的 Nyquist）以外乘 2
+    if nperseg % 2:
+        power[..., 1:] *= 2
+    else:
+        power[..., 1:-1] *= 2
+
+    freqs = fft_backend.rfftfreq(nperseg, 1 / fs)
+    times = np.arange(nperseg / 2, x.shape[-1] - nperseg / 2 + 1, step) / float(fs)
+    return freqs, times, np.swapaxes(power, -1, -2)
@@ -0,0 +1,175 @@
+"""
+Streaming spectral estimation for real-time analysis
+
+Welch-style running average of overlapped real-FFT frames. Each new
+frame is transformed once and kept in a ring of the frames covering the
+analysis window, so an update only costs the FFTs of the frames
+completed by the new samples.
+"""
+import numpy as np
+from collections import deque
+from typing import Dict, Optional
+from scipy import signal
+
+try:
+    from backend.initialization import InitParameter
+    from backend import fft_backend
+except ModuleNotFoundError:
+    from initialization import InitParameter
+    import fft_backend
+
+
+def default_tracked_frequencies() -> Dict[str, float]:
+    """
+    Bearing characteristic frequencies tracked by default
+
+    Returns:
+        Dict of name -> frequency (Hz) from InitParameter
+        (shaft Fr, BPFO, BPFI)
+    """
+    ip = InitParameter()
+    return {
+        'shaft': ip.mortor_gear,
+        'bpfo': ip.belt_si,
+        'bpfi': ip.mortor,
+    }
+
+
+class StreamingSpectrum:
+    """
+    Welch PSD over a sliding window of overlapped frames
+
+    Frames of `frame_size` samples with a Hann window are taken every
+    `hop` samples; the PSD is the average of the last `n_frames`
+    frame periodograms.
+    """
+
+    def __init__(self, sampling_rate: float, window_size: int = 25600,
+                 frame_size: int = 4096, hop: Optional[int] = None,
+                 tracked_frequencies: Optional[Dict[str, float]] = None,
+                 band_tolerance: float = 2.0):
+        """
+        Initialize streaming spectrum
+
+        Args:
+            sampling_rate: Sampling rate in Hz
+            window_size: Samples covered by the averaged frames
+            frame_size: FFT frame length
+            hop: Samples between frames (default: 50% overlap)
+            tracked_frequencies: Dict of name -> frequency (Hz) whose
+                                 band power is reported
+                                 (default: shaft / BPFO / BPFI)
+            band_tolerance: Half width (Hz) of each tracked band; at
+                            least one frequency bin is always included
+        """
+        self.sampling_rate = float(sampling_rate)
+        self.frame_size = min(frame_size, window_size)
+        self.hop = hop or self.frame_size // 2
+        self.n_frames = max(1, (window_size - self.frame_size) // self.hop + 1)
+
+        self.window = signal.get_window('hann', self.frame_size)
+        # PSD density scaling, one-sided
+        self.scale = 1.0 / (self.sampling_rate * np.sum(self.window ** 2))
+        self.freqs = fft_backend.rfftfreq(self.frame_size, 1.0 / self.sampling_rate)
+        self.df = self.freqs[1] - self.freqs[0]
+
+        self.frames = deque()
+        self.psd_sum = np.zeros(self.freqs.size)
+        self.pending = np.zeros(0)
+        self._frames_since_resum = 0
+
+        if tracked_frequencies is None:
+            tracked_frequencies = default_tracked_frequencies()
+        half_width = max(band_tolerance, self.df)
+        self.tracked_bands = {
+            name: (self.freqs >= freq - half_width) & (self.freqs <= freq + half_width)
+            for name, freq in tracked_frequencies.items()
+        }
+
+    def _frame_psd(self, frame: np.ndarray) -> np.ndarray:
+        spectrum = fft_backend.rfft((frame - frame.mean()) * self.window)
+        psd = (spectrum.real ** 2 + spectrum.imag ** 2) * self.scale
+        # 單邊頻譜：除 DC 與 Nyquist 外加倍
+        if self.frame_size % 2:
+            psd[1:] *= 2
+        else:
+            psd[1:-1] *= 2
+        return psd
+
+    def update(self, samples: np.ndarray) -> int:
+        """
+        Add new samples and transform any completed frames
+
+        Args:
+            samples: New samples in chronological order
+
+        Returns:
+            Number of new frames
+        """
+        x = np.asarray(samples, dtype=np.float64).ravel()
+        # 只保留可能進入平均的樣本
+        keep = self.frame_size + self.hop * self.n_frames
+        self.pending = np.concatenate((self.pending, x))[-keep:]
+
+        n_new = 0
+        while self.pending.size >= self.frame_size:
+            psd = self._frame_psd(self.pending[:self.frame_size])
+            self.frames.append(psd)
+            self.psd_sum += psd
+            if len(self.frames) > self.n_frames:
+                self.psd_sum -= self.frames.popleft()
+            self.pending = self.pending[self.hop:]
+            n_new += 1
+
+        self._frames_since_resum += n_new
+        if self._frames_since_resum >= self.n_frames:
+            # 定期重新加總，避免累計誤差
+            self.psd_sum = np.sum(self.frames, axis=0)
+            self._frames_since_resum = 0
+
+        return n_new
+
+    def psd(self) -> Optional[np.ndarray]:
+        """
+        Averaged power spectral density
+
+        Returns:
+            PSD array aligned with `freqs`, or None before the first frame
+        """
+        if not self.frames:
+            return None
+        return self.psd_sum / len(self.frames)
+
+    def dominant_frequency(self) -> float:
+        """Frequency of the largest PSD bin, excluding DC"""
+        psd = self.psd()
+        if psd is None or psd.size < 2:
+            return 0.0
+        return float(self.freqs[np.argmax(psd[1:]) + 1])
+
+    def band_powers(self) -> Dict[str, float]:
+        """
+        Power in each tracked frequency band
+
+        Returns:
+            Dict of name -> band power
+        """
+        psd = self.psd()
+        if psd is None:
+            return {name: 0.0 for name in self.tracked_bands}
+        return {
+            name: float(np.sum(psd[mask]) * self.df)
+            for name, mask in self.tracked_bands.items()
+        }
+
+    def features(self) -> Dict[str, float]:
+        """
+        Spectral features of the current window
+
+        Returns:
+            Dict with dominant_freq and <name>_power for each tracked band
+        """
+        features = {'dominant_freq': self.dominant_frequency()}
+        for name, power in self.band_powers().items():
+            features[f'{name}_power'] = power
+        return features
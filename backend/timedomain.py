@@ -3,6 +3,11 @@ import numpy as np
 from math import sqrt
 from scipy.stats import kurtosis
 
+try:
+    from backend import segment_kernels
+except ModuleNotFoundError:
+    import segment_kernels
+
 class TimeDomain:
     @staticmethod
     def peak(x):
@@ -28,12 +33,6 @@ class TimeDomain:
 
     @staticmethod
     def eo(num, label):
-        # 用 pd.concat 取代 append
-        num2 = pd.concat([num, num.iloc[[0]]], ignore_index=True)
-        pdatadelta1 = (num2[label].shift() ** 2) - (num2[label] ** 2)
-        pdatadelta1 = pdatadelta1.dropna()
-        # 原本使用 np.sum,改為字串 "sum" 以避免 pandas FutureWarning
-        pdatadelta2 = num[label].agg("sum") / len(num)
-        pdata_combine = pd.DataFrame({'delta1': pdatadelta1, 'delta2': pdatadelta2})
-        pdatadelta3 = pdata_combine['delta1'] - pdata_combine['delta2']
-        return ((len(pdatadelta3) ** 2) * np.sum(pdatadelta3 ** 4)) / (np.sum(pdatadelta3 ** 2) ** 2)
+        # 原始：pd.concat 補上第一筆後以 shift 計算 x[i]^2 - x[i+1]^2，再減去信號平均
+        # 修改：segment_kernels.eo 以環狀索引直接計算（Numba 編譯核心或 NumPy 實作，定義相同）
+        return float(segment_kernels.eo(num[label].to_numpy()))
@@ -3,10 +3,21 @@ Time-Frequency Analysis Module
 提供各種時頻域分析算法，包括 STFT、CWT、包絡分析等
 """
 import numpy as np
-from scipy import signal
-from scipy.fft import fft, fftfreq
 from scipy.stats import kurtosis
 
+try:
+    from backend.cwt_engine import cwt_magnitude
+    from backend import stft_engine
+    from backend import envelope_engine
+    from backend.analytic_signal import AnalyticSignal
+    from backend.precision import real_dtype, working_array
+except ModuleNotFoundError:
+    from cwt_engine import cwt_magnitude
+    import stft_engine
+    import envelope_engine
+    from analytic_signal import AnalyticSignal
+    from precision import real_dtype, working_array
+
 
 class TimeFrequency:
     """時頻域分析類"""
@@ -39,11 +50,45 @@ class TimeFrequency:
         if noverlap is None:
             noverlap = int(nperseg * 0.95)
 
-        f, t, Zxx = signal.stft(
+        # 原始：signal.stft；修改：批次 STFT 引擎（結果相同，窗函數快取）
+        f, t, Zxx = stft_engine.stft(
             x, fs=fs, window=window, nperseg=nperseg, noverlap=noverlap
         )
-        magnitude = np.abs(Zxx)
+        return TimeFrequency._stft_features(np.abs(Zxx), f, t, freq_range)
+
+    @staticmethod
+    def stft_analysis_batch(signals, fs=25600, window='hann', nperseg=256,
+                            noverlap=None, freq_range=None):
+        """
+        多個信號的 STFT（例如水平與垂直通道）
+
+        所有信號以同一個 strided frame view 與一次 FFT 轉換
 
+        Parameters:
+        -----------
+        signals : array_like
+            信號矩陣 (信號數 x 樣本數)
+        fs, window, nperseg, noverlap, freq_range :
+            同 stft_analysis
+
+        Returns:
+        --------
+        list of dict : 每個信號的 stft_analysis 結果
+        """
+        if noverlap is None:
+            noverlap = int(nperseg * 0.95)
+
+        f, t, Zxx = stft_engine.stft(
+            np.asarray(signals), fs=fs, window=window, nperseg=nperseg, noverlap=noverlap
+        )
+        return [
+            TimeFrequency._stft_features(magnitude, f, t, freq_range)
+            for magnitude in np.abs(Zxx)
+        ]
+
+    @staticmethod
+    def _stft_features(magnitude, f, t, freq_range):
+        """由 STFT 幅值矩陣計算 NP4、最大能量點與總能量"""
         # 頻率過濾（如果指定範圍）
         if freq_range is not None:
             low_freq, high_freq = freq_range
@@ -110,14 +155,43 @@ class TimeFrequency:
         if scales is None:
             scales = np.arange(1, 65)
 
-        # 使用 scipy.signal.cwt
-        if wavelet == 'morl':
-            wavelet_func = signal.morlet2
-        else:
-            wavelet_func = signal.ricker
+        # 原始：使用 scipy.signal.cwt（逐尺度時域卷積，新版 SciPy 已棄用）
+        # 修改：頻域 CWT，濾波器組快取，所有尺度一次反 FFT（結果相同）
+        magnitude = cwt_magnitude(x, scales, wavelet)
+        return TimeFrequency._cwt_features(magnitude, scales, fs, freq_range)
 
-        coefficients = signal.cwt(x, wavelet_func, scales)
-        magnitude = np.abs(coefficients)
+    @staticmethod
+    def cwt_analysis_batch(signals, fs=25600, wavelet='morl', scales=None,
+                           freq_range=None):
+        """
+        多個信號的連續小波轉換（例如水平與垂直通道）
+
+        所有信號共用同一組濾波器並一次轉換
+
+        Parameters:
+        -----------
+        signals : array_like
+            信號矩陣 (信號數 x 樣本數)
+        fs, wavelet, scales, freq_range :
+            同 cwt_analysis
+
+        Returns:
+        --------
+        list of dict : 每個信號的 cwt_analysis 結果
+        """
+        if scales is None:
+            scales = np.arange(1, 65)
+
+        magnitudes = cwt_magnitude(np.asarray(signals), scales, wavelet)
+        return [
+            TimeFrequency._cwt_features(magnitude, scales, fs, freq_range)
+            for magnitude in magnitudes
+        ]
+
+    @staticmethod
+    def _cwt_features(magnitude, scales, fs, freq_range):
+        """由 CWT 幅值矩陣計算頻率、NP4 與能量特徵"""
+        scales = np.asarray(scales)
 
         # 計算頻率（近似）
         frequencies = fs / (2 * scales)
@@ -186,24 +260,63 @@ class TimeFrequency:
         --------
         dict : 包含包絡信號、包絡頻譜和特徵
         """
-        # 設計帶通濾波器
-        nyquist = fs / 2
-        low = lowcut / nyquist
-        high = highcut / nyquist
-        b, a = signal.butter(4, [low, high], btype='band')
+        # 原始：每次呼叫 butter(...) 設計 (b, a) 並 filtfilt
+        # 修改：快取的 SOS 濾波器 + sosfiltfilt（低截止頻率時數值穩定）
+        envelope = AnalyticSignal(x, fs, band=(lowcut, highcut)).envelope
+        return TimeFrequency._envelope_features(envelope, fs)
+
+    @staticmethod
+    def envelope_analysis_batch(signals, fs=25600, lowcut=4000, highcut=10000):
+        """
+        多個信號的包絡分析（例如水平與垂直通道）
+
+        所有信號以一次 sosfiltfilt 與一次 FFT 希爾伯特轉換計算
+
+        Parameters:
+        -----------
+        signals : array_like
+            信號矩陣 (信號數 x 樣本數)
+        fs, lowcut, highcut :
+            同 envelope_analysis
+
+        Returns:
+        --------
+        list of dict : 每個信號的 envelope_analysis 結果
+        """
+        envelopes = AnalyticSignal(signals, fs, band=(lowcut, highcut)).envelope
+        return [TimeFrequency._envelope_features(envelope, fs) for envelope in envelopes]
 
-        # 帶通濾波
-        x_filtered = signal.filtfilt(b, a, x)
+    @staticmethod
+    def envelope_trend(signals, fs=25600, lowcut=4000, highcut=10000):
+        """
+        包絡特徵趨勢（多個檔案、多個通道一次計算）
 
-        # 希爾伯特轉換提取包絡
-        analytic_signal = signal.hilbert(x_filtered)
-        envelope = np.abs(analytic_signal)
+        Parameters:
+        -----------
+        signals : array_like
+            信號陣列 (..., 樣本數)，例如 (檔案數, 2, 2560)
+        fs, lowcut, highcut :
+            同 envelope_analysis
 
+        Returns:
+        --------
+        dict : envelope_rms, total_power, peak_frequency（不含 DC），
+               每個值的形狀為 signals.shape[:-1]
+        """
+        envelopes = AnalyticSignal(signals, fs, band=(lowcut, highcut)).envelope
+        freq, magnitude = envelope_engine.envelope_spectrum(envelopes, fs)
+
+        return {
+            'envelope_rms': np.sqrt(np.mean(envelopes ** 2, axis=-1)),
+            'total_power': np.sum(magnitude ** 2, axis=-1),
+            'peak_frequency': freq[1:][np.argmax(magnitude[..., 1:], axis=-1)]
+        }
+
+    @staticmethod
+    def _envelope_features(envelope, fs):
+        """由包絡信號計算包絡頻譜、峰值與 RMS"""
         # 對包絡做 FFT
-        n = len(envelope)
-        freq = fftfreq(n, 1/fs)[:n//2]
-        envelope_fft = fft(envelope)
-        envelope_magnitude = 2.0/n * np.abs(envelope_fft[:n//2])
+        freq, envelope_magnitude = envelope_engine.envelope_spectrum(envelope, fs)
 
         # 找出峰值頻率
         peaks_idx = np.argsort(envelope_magnitude)[-10:][::-1]
@@ -306,9 +419,34 @@ class TimeFrequency:
         --------
         dict : 頻譜圖數據和統計特徵
         """
-        f, t, Sxx = signal.spectrogram(x, fs=fs, window=window,
-                                        nperseg=nperseg)
+        # 原始：signal.spectrogram；修改：批次 STFT 引擎（結果相同）
+        f, t, Sxx = stft_engine.spectrogram(x, fs=fs, window=window,
+                                            nperseg=nperseg)
+        return TimeFrequency._spectrogram_stats(Sxx, f, t)
 
+    @staticmethod
+    def spectrogram_features_batch(signals, fs=25600, window='hann', nperseg=256):
+        """
+        多個信號的頻譜圖及統計特徵（一次轉換）
+
+        Parameters:
+        -----------
+        signals : array_like
+            信號矩陣 (信號數 x 樣本數)
+        fs, window, nperseg :
+            同 spectrogram_features
+
+        Returns:
+        --------
+        list of dict : 每個信號的 spectrogram_features 結果
+        """
+        f, t, Sxx = stft_engine.spectrogram(np.asarray(signals), fs=fs,
+                                            window=window, nperseg=nperseg)
+        return [TimeFrequency._spectrogram_stats(power, f, t) for power in Sxx]
+
+    @staticmethod
+    def _spectrogram_stats(Sxx, f, t):
+        """由功率頻譜圖計算 dB 統計與峰值"""
         # 轉換為 dB
         Sxx_db = 10 * np.log10(Sxx + 1e-10)
 
@@ -349,15 +487,8 @@ class TimeFrequency:
         --------
         dict : 瞬時頻率和相關特徵
         """
-        # 希爾伯特轉換
-        analytic_signal = signal.hilbert(x)
-
-        # 瞬時相位
-        instantaneous_phase = np.unwrap(np.angle(analytic_signal))
-
-        # 瞬時頻率
-        instantaneous_frequency = (np.diff(instantaneous_phase) /
-                                   (2.0 * np.pi) * fs)
+        # 希爾伯特轉換 -> 瞬時相位 -> 瞬時頻率（由同一個解析信號導出）
+        instantaneous_frequency = AnalyticSignal(x, fs).instantaneous_frequency
 
         # 統計特徵
         mean_freq = float(np.mean(instantaneous_frequency))
@@ -398,27 +529,157 @@ class TimeFrequency:
         --------
         dict : 包含兩種窗口的分析結果
         """
+        return TimeFrequency.dual_window_stft_analysis_batch(
+            np.asarray(x)[None, :], fs=fs, hann_nperseg=hann_nperseg,
+            flattop_nperseg=flattop_nperseg, freq_range=freq_range
+        )[0]
+
+    @staticmethod
+    def dual_window_stft_analysis_batch(signals, fs=25600, hann_nperseg=128,
+                                        flattop_nperseg=256,
+                                        freq_range=(800, 2500)):
+        """
+        多個信號的雙窗口 STFT 分析
+
+        每種窗口只對所有信號做一次 STFT
+
+        Parameters:
+        -----------
+        signals : array_like
+            信號矩陣 (信號數 x 樣本數)
+        fs, hann_nperseg, flattop_nperseg, freq_range :
+            同 dual_window_stft_analysis
+
+        Returns:
+        --------
+        list of dict : 每個信號的 dual_window_stft_analysis 結果
+        """
         # Hann 窗口分析
-        hann_result = TimeFrequency.stft_analysis(
-            x, fs=fs, window='hann',
+        hann_results = TimeFrequency.stft_analysis_batch(
+            signals, fs=fs, window='hann',
             nperseg=hann_nperseg,
             noverlap=int(hann_nperseg * 0.95),
             freq_range=freq_range
         )
 
         # Flattop 窗口分析
-        flattop_result = TimeFrequency.stft_analysis(
-            x, fs=fs, window='flattop',
+        flattop_results = TimeFrequency.stft_analysis_batch(
+            signals, fs=fs, window='flattop',
             nperseg=flattop_nperseg,
             noverlap=int(flattop_nperseg * 0.95),
             freq_range=freq_range
         )
 
+        return [
+            {
+                'hann': hann_result,
+                'flattop': flattop_result,
+                'hann_np4': hann_result['np4'],
+                'flattop_np4': flattop_result['np4']
+            }
+            for hann_result, flattop_result in zip(hann_results, flattop_results)
+        ]
+
+    @staticmethod
+    def _calculate_np4_batch(magnitudes):
+        """
+        批次計算 NP4（對最後兩軸，即每個時頻矩陣）
+
+        Parameters:
+        -----------
+        magnitudes : ndarray
+            時頻能量矩陣 (..., 頻率, 時間)
+
+        Returns:
+        --------
+        ndarray : 每個矩陣的 NP4 值，形狀 (...)；float32 輸入仍以 float64 累加
+        """
+        Z = magnitudes.reshape(*magnitudes.shape[:-2], -1)
+        N = Z.shape[-1]
+
+        mean = Z.mean(axis=-1, dtype=np.float64, keepdims=True)
+        centered = Z - mean.astype(Z.dtype)
+        squared = centered ** 2
+        sum_2 = squared.sum(axis=-1, dtype=np.float64)
+        sum_4 = (squared ** 2).sum(axis=-1, dtype=np.float64)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(sum_2 > 0, N * sum_4 / sum_2 ** 2, 0.0)
+
+    @staticmethod
+    def _frequency_bands(freq_range, band_width=200):
+        """NE 頻率分段（從高到低），回傳 [(low, high), ...]"""
+        low_freq, high_freq = freq_range
+        freq_segments = np.arange(high_freq, low_freq - band_width, -band_width)
+        if freq_segments[-1] != low_freq:
+            freq_segments = np.append(freq_segments, low_freq)
+        return list(zip(freq_segments[1:], freq_segments[:-1]))
+
+    @staticmethod
+    def normalized_energy_matrix(coefficients, frequencies, time,
+                                 freq_range=(800, 2500),
+                                 time_segment_duration=0.5):
+        """
+        標準化能量矩陣（NE 的向量化計算，支援批次）
+
+        以預先計算的頻段指示矩陣一次加總所有頻段，
+        再以 reshape + sum 加總所有時間分段
+
+        Parameters:
+        -----------
+        coefficients : ndarray
+            時頻係數 (..., 頻率, 時間)
+        frequencies, time, freq_range, time_segment_duration :
+            同 normalized_energy_analysis
+
+        Returns:
+        --------
+        dict : freq_bands (有頻率點的頻段), segment_size,
+               band_energy (..., 頻段), normalized_energy (..., 頻段, 時間段)；
+               頻段總能量為 0 時 NE 為 NaN
+        """
+        magnitude = np.abs(coefficients)
+        frequencies = np.asarray(frequencies)
+        time = np.asarray(time)
+
+        # 計算時間分段
+        time_mask = time <= time_segment_duration
+        if np.any(time_mask):
+            segment_size = int(np.sum(time_mask))
+        else:
+            segment_size = len(time)
+        n_time_segments = len(time) // segment_size
+
+        # 頻段指示矩陣（頻段 x 頻率），略過沒有頻率點的頻段
+        bands = []
+        rows = []
+        for freq_low, freq_high in TimeFrequency._frequency_bands(freq_range):
+            freq_mask = (frequencies > freq_low) & (frequencies <= freq_high)
+            if np.any(freq_mask):
+                bands.append((freq_low, freq_high))
+                rows.append(freq_mask)
+        indicator = np.array(rows, dtype=magnitude.dtype).reshape(len(bands), len(frequencies))
+
+        # (頻段, 頻率) @ (..., 頻率, 時間) -> (..., 頻段, 時間)
+        band_time_energy = indicator @ magnitude
+        band_energy = band_time_energy.sum(axis=-1)
+
+        segment_energy = band_time_energy[..., :n_time_segments * segment_size].reshape(
+            *band_time_energy.shape[:-1], n_time_segments, segment_size
+        ).sum(axis=-1)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            normalized_energy = np.where(
+                band_energy[..., None] > 0,
+                segment_energy / band_energy[..., None],
+                np.nan
+            )
+
         return {
-            'hann': hann_result,
-            'flattop': flattop_result,
-            'hann_np4': hann_result['np4'],
-            'flattop_np4': flattop_result['np4']
+            'freq_bands': bands,
+            'segment_size': segment_size,
+            'band_energy': band_energy,
+            'normalized_energy': normalized_energy
         }
 
     @staticmethod
@@ -448,54 +709,19 @@ class TimeFrequency:
         """
         import pandas as pd
 
-        magnitude = np.abs(coefficients)
-
-        # 計算時間分段
-        time_mask = time <= time_segment_duration
-        if np.any(time_mask):
-            segment_size = np.sum(time_mask)
-            n_time_segments = len(time) // segment_size
-        else:
-            segment_size = len(time)
-            n_time_segments = 1
-
-        # 定義頻率分段（從高到低）
-        low_freq, high_freq = freq_range
-        freq_segments = np.arange(high_freq, low_freq - 200, -200)
-        if freq_segments[-1] != low_freq:
-            freq_segments = np.append(freq_segments, low_freq)
+        # 原始：頻段 x 時間段的雙層 Python 迴圈
+        # 修改：normalized_energy_matrix 一次計算，僅在此組成 DataFrame
+        result = TimeFrequency.normalized_energy_matrix(
+            coefficients, frequencies, time, freq_range, time_segment_duration
+        )
 
         ne_results = []
-
-        # 對每個頻率段計算
-        for i in range(len(freq_segments) - 1):
-            freq_high = freq_segments[i]
-            freq_low = freq_segments[i + 1]
-
-            # 找出頻率範圍內的索引
-            freq_mask = (frequencies > freq_low) & (frequencies <= freq_high)
-            if not np.any(freq_mask):
+        for i, (freq_low, freq_high) in enumerate(result['freq_bands']):
+            # 該頻率段的總能量為 0 時略過
+            if result['band_energy'][i] == 0:
                 continue
 
-            # 該頻率段的總能量
-            freq_segment_energy = np.sum(magnitude[freq_mask, :])
-
-            if freq_segment_energy == 0:
-                continue
-
-            # 對每個時間段計算標準化能量
-            for j in range(n_time_segments):
-                time_start = j * segment_size
-                time_end = min((j + 1) * segment_size, len(time))
-
-                # 該時頻區域的能量
-                time_freq_energy = np.sum(
-                    magnitude[freq_mask, time_start:time_end]
-                )
-
-                # 標準化能量
-                ne = time_freq_energy / freq_segment_energy
-
+            for j, ne in enumerate(result['normalized_energy'][i]):
                 ne_results.append({
                     'freq_segment': f'{freq_low}-{freq_high}',
                     'time_segment': j,
@@ -505,3 +731,68 @@ class TimeFrequency:
                 })
 
         return pd.DataFrame(ne_results)
+
+    @staticmethod
+    def time_frequency_trend(signals, fs=25600, window='hann', nperseg=256,
+                             noverlap=None, wavelet='morl', scales=None,
+                             freq_range=(800, 2500),
+                             time_segment_duration=0.01, precision=None):
+        """
+        時頻特徵趨勢（多個檔案、多個通道一次計算）
+
+        STFT 與 CWT 皆以批次引擎轉換整個信號陣列，
+        NP4 與 NE 皆以向量化方式對最後兩軸計算
+
+        Parameters:
+        -----------
+        signals : array_like
+            信號陣列 (..., 樣本數)，例如 (檔案數, 2, 2560)
+        fs, window, nperseg, noverlap :
+            同 stft_analysis
+        wavelet, scales :
+            同 cwt_analysis
+        freq_range : tuple
+            NE 頻率範圍 (low_freq, high_freq)
+        time_segment_duration : float
+            NE 時間分段長度（秒）
+        precision : str, optional
+            "float64" 或 "float32"；None 時沿用 signals 的型別
+            （float32 陣列以 complex64 計算 STFT/CWT）
+
+        Returns:
+        --------
+        dict : stft_np4, stft_ne_max, cwt_np4, cwt_ne_max，
+               每個值的形狀為 signals.shape[:-1]
+        """
+        if precision is None:
+            signals = working_array(signals)
+        else:
+            signals = np.asarray(signals, dtype=real_dtype(precision))
+        if noverlap is None:
+            noverlap = int(nperseg * 0.95)
+        if scales is None:
+            scales = np.arange(1, 65)
+
+        # STFT（與 stft_analysis 相同參數）
+        f, t, Zxx = stft_engine.stft(
+            signals, fs=fs, window=window, nperseg=nperseg, noverlap=noverlap
+        )
+        stft_magnitude = np.abs(Zxx)
+        stft_ne = TimeFrequency.normalized_energy_matrix(
+            stft_magnitude, f, t, freq_range, time_segment_duration
+        )['normalized_energy']
+
+        # CWT（與 cwt_analysis 相同的近似頻率）
+        cwt_mag = cwt_magnitude(signals, scales, wavelet)
+        cwt_frequencies = fs / (2 * np.asarray(scales))
+        cwt_time = np.arange(signals.shape[-1]) / fs
+        cwt_ne = TimeFrequency.normalized_energy_matrix(
+            cwt_mag, cwt_frequencies, cwt_time, freq_range, time_segment_duration
+        )['normalized_energy']
+
+        return {
+            'stft_np4': TimeFrequency._calculate_np4_batch(stft_magnitude),
+            'stft_ne_max': np.max(np.nan_to_num(stft_ne, nan=0.0), axis=(-2, -1), initial=0.0),
+            'cwt_np4': TimeFrequency._calculate_np4_batch(cwt_mag),
+            'cwt_ne_max': np.max(np.nan_to_num(cwt_ne, nan=0.0), axis=(-2, -1), initial=0.0)
+        }
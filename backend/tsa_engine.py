@@ -0,0 +1,154 @@
+"""
+Time-synchronous averaging (TSA)
+
+Signals are resampled from the time domain to the shaft-angle domain
+using the known shaft speed of the bearing's operating condition
+(`PHMDataProcessor.OPERATING_CONDITIONS`, constant speed per test), the
+complete revolutions are averaged with one reshape, and the averaged
+revolution is what the high-frequency FM0 / sideband features are
+computed on.
+
+The resampling plan (interpolation indices and weights) depends only on
+(signal length, fs, shaft frequency, samples per revolution) and is
+cached, so a whole bearing of equal-length files, shape (..., n), is
+resampled with a single gather.
+"""
+from functools import lru_cache
+from typing import Optional, Tuple
+
+import numpy as np
+
+try:
+    from backend.phm_processor import PHMDataProcessor
+    from backend.initialization import InitParameter
+    from backend import fft_backend
+except ModuleNotFoundError:
+    from phm_processor import PHMDataProcessor
+    from initialization import InitParameter
+    import fft_backend
+
+# 未知軸承時使用的轉軸頻率（條件 1：1800 RPM → 30 Hz）
+DEFAULT_SHAFT_FREQUENCY = InitParameter().mortor_gear
+
+
+def shaft_frequency(bearing_name: Optional[str] = None) -> float:
+    """
+    Shaft rotation frequency of a bearing's operating condition
+
+    Args:
+        bearing_name: PHM bearing name (e.g. "Bearing1_1")
+
+    Returns:
+        Shaft frequency in Hz (RPM / 60); DEFAULT_SHAFT_FREQUENCY for
+        unknown bearings
+    """
+    condition = PHMDataProcessor.OPERATING_CONDITIONS.get(bearing_name or '')
+    if not condition:
+        return DEFAULT_SHAFT_FREQUENCY
+    return condition['speed'] / 60.0
+
+
+def samples_per_revolution(fs: float, shaft_hz: float) -> int:
+    """
+    Angular resolution for resampling
+
+    The next power of two at or above fs / shaft_hz, so the angle domain
+    is never coarser than the time domain (no aliasing from the
+    interpolation) and the per-revolution FFT has a fast length.
+    """
+    return int(2 ** np.ceil(np.log2(fs / shaft_hz)))
+
+
+@lru_cache(maxsize=32)
+def _plan(n: int, fs: float, shaft_hz: float, points: int) -> Tuple[np.ndarray, np.ndarray, int]:
+    revolutions = int(np.floor(n / fs * shaft_hz + 1e-9))
+    if revolutions < 1:
+        raise ValueError(f"Signal of {n} samples covers less than one revolution at {shaft_hz} Hz")
+
+    # 每個角度取樣點對應的時間位置（以原始取樣點為單位）
+    positions = np.arange(revolutions * points) * (fs / (shaft_hz * points))
+    positions = np.minimum(positions, n - 1)
+    index = np.minimum(np.floor(positions).astype(np.int64), n - 2)
+    weight = positions - index
+
+    index.setflags(write=False)
+    weight.setflags(write=False)
+    return index, weight, revolutions
+
+
+def resampling_plan(n: int, fs: float, shaft_hz: float,
+                    points: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    Cached angular resampling plan
+
+    Args:
+        n: Signal length
+        fs: Sampling rate
+        shaft_hz: Shaft frequency
+        points: Samples per revolution (default samples_per_revolution)
+
+    Returns:
+        (left sample index, linear interpolation weight, revolutions)
+    """
+    if points is None:
+        points = samples_per_revolution(fs, shaft_hz)
+    return _plan(int(n), float(fs), float(shaft_hz), int(points))
+
+
+def angular_resample(x, fs: float, shaft_hz: float, points: Optional[int] = None) -> np.ndarray:
+    """
+    Resample signals to the shaft-angle domain
+
+    Args:
+        x: Signal(s), shape (..., n)
+        fs: Sampling rate
+        shaft_hz: Shaft frequency
+        points: Samples per revolution
+
+    Returns:
+        Angle-domain signal(s), shape (..., revolutions, points)
+    """
+    x = np.asarray(x, dtype=np.float64)
+    if points is None:
+        points = samples_per_revolution(fs, shaft_hz)
+    index, weight, revolutions = resampling_plan(x.shape[-1], fs, shaft_hz, points)
+
+    resampled = x[..., index] * (1.0 - weight) + x[..., index + 1] * weight
+    return resampled.reshape(*x.shape[:-1], revolutions, points)
+
+
+def tsa(x, fs: float, shaft_hz: float, points: Optional[int] = None) -> np.ndarray:
+    """
+    Time-synchronous average over complete revolutions
+
+    Args:
+        x: Signal(s), shape (..., n)
+        fs: Sampling rate
+        shaft_hz: Shaft frequency
+        points: Samples per revolution
+
+    Returns:
+        Averaged revolution(s), shape (..., points)
+    """
+    return angular_resample(x, fs, shaft_hz, points).mean(axis=-2)
+
+
+def order_spectrum(averaged, revolutions: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    FFT of averaged revolution(s) on an order axis
+
+    Zero-padding to `revolutions` revolutions keeps the order resolution
+    (1 / revolutions) equal to that of the original record, so the
+    frequency tolerances used by the sideband features still apply.
+
+    Args:
+        averaged: TSA signal(s), shape (..., points)
+        revolutions: Revolutions the spectrum grid is padded to
+
+    Returns:
+        (orders in cycles/revolution, complex FFT of length points * revolutions)
+    """
+    averaged = np.asarray(averaged)
+    points = averaged.shape[-1]
+    nfft = points * revolutions
+    return fft_backend.fftfreq(nfft, 1.0 / points), fft_backend.fft(averaged, nfft, axis=-1)
@@ -5,17 +5,131 @@ This module manages WebSocket connections for broadcasting real-time
 sensor data, features, and alerts to connected clients.
 
 Now includes Redis Pub/Sub integration for multi-instance scaling.
+
+Every connection has its own writer task and bounded send queue, so a
+slow client only delays itself: broadcasts serialize the message once
+and enqueue it without awaiting any socket. Feature updates are
+conflated (a lagging client receives only the newest) and can be
+rate-limited per subscription.
+
+Messages are encoded once (orjson when available) into the exact text
+sent to clients; the same bytes are published to Redis and forwarded by
+other instances to their clients without re-parsing.
 """
 # 原始寫法: from fastapi import WebSocket
 from fastapi import WebSocket
-from typing import Dict, Set, Optional
-import json
+from collections import deque
+from typing import Callable, Deque, Dict, Set, Optional
 import logging
 import asyncio
-from redis_client import redis_client
+import os
+import uuid
+from redis_client import redis_client, encode_message
 
 logger = logging.getLogger(__name__)
 
+# 每個連線待送訊息上限（超過時丟棄最舊的訊息）
+WS_SEND_QUEUE_MAX = int(os.getenv("WS_SEND_QUEUE_MAX", "100"))
+
+# 單則訊息傳送逾時（秒），逾時視為斷線
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "5.0"))
+
+# 每個訂閱預設的特徵更新頻率上限（訊息/秒，0 = 不限制）
+WS_MAX_RATE = float(os.getenv("WS_MAX_RATE", "0"))
+
+# 客戶端落後時只保留最新一則的訊息類型
+CONFLATED_TYPES = ("feature_update",)
+
+
+class ClientWriter:
+    """
+    Send queue and writer task of one WebSocket connection
+    """
+
+    def __init__(self, websocket: WebSocket, max_rate: Optional[float] = None,
+                 queue_max: int = WS_SEND_QUEUE_MAX,
+                 on_error: Optional[Callable] = None):
+        """
+        Initialize writer
+
+        Args:
+            websocket: WebSocket connection
+            max_rate: Maximum conflated updates per second (0 = unlimited)
+            queue_max: Maximum queued messages
+            on_error: Coroutine function called with the websocket when
+                      sending fails
+        """
+        self.websocket = websocket
+        rate = WS_MAX_RATE if max_rate is None else max_rate
+        self.min_interval = 1.0 / rate if rate > 0 else 0.0
+        self.queue: Deque[str] = deque(maxlen=queue_max)
+        # 尚未送出的最新特徵更新（新訊息直接取代）
+        self.latest: Optional[str] = None
+        self.on_error = on_error
+
+        self._ready = asyncio.Event()
+        self._next_conflated_at = 0.0
+        self.task: Optional[asyncio.Task] = None
+
+        self.sent = 0
+        self.dropped = 0
+        self.conflated = 0
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task and self.task is not asyncio.current_task():
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
+
+    def enqueue(self, text: str, conflate: bool = False):
+        """
+        Queue a serialized message without waiting for the socket
+
+        Args:
+            text: JSON text
+            conflate: Replace a pending message of the same kind
+        """
+        if conflate:
+            if self.latest is not None:
+                self.conflated += 1
+            self.latest = text
+        else:
+            if len(self.queue) == self.queue.maxlen:
+                self.dropped += 1
+            self.queue.append(text)
+        self._ready.set()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                await self._ready.wait()
+                self._ready.clear()
+
+                while self.queue or self.latest is not None:
+                    if self.queue:
+                        text = self.queue.popleft()
+                    else:
+                        wait = self._next_conflated_at - loop.time()
+                        if wait > 0:
+                            # 等待期間較新的更新會取代 latest
+                            await asyncio.sleep(wait)
+                            continue
+                        text, self.latest = self.latest, None
+                        self._next_conflated_at = loop.time() + self.min_interval
+
+                    await asyncio.wait_for(self.websocket.send_text(text), WS_SEND_TIMEOUT)
+                    self.sent += 1
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"WebSocket send error: {e}")
+            if self.on_error:
+                await self.on_error(self.websocket)
+
 
 class ConnectionManager:
     """
@@ -37,12 +151,15 @@ class ConnectionManager:
     CHANNEL_DATA_SUFFIX = ":data"
     CHANNEL_ALERTS = "alerts:all"
     CHANNEL_BROADCAST = "broadcast:all"
+    CHANNEL_SENSOR_PATTERN = "sensor:*"
 
     def __init__(self, use_redis_pubsub: bool = True):
         # sensor_id -> set of WebSocket connections
         self.active_connections: Dict[int, Set[WebSocket]] = {}
         # websocket -> sensor_id mapping
         self.websocket_sensor_map: Dict[WebSocket, int] = {}
+        # websocket -> send queue / writer task
+        self.writers: Dict[WebSocket, ClientWriter] = {}
 
         # Redis Pub/Sub 相關
         self.use_redis_pubsub = use_redis_pubsub
@@ -53,6 +170,11 @@ class ConnectionManager:
         # 訂閱的頻道集合
         self._subscribed_channels: Set[str] = set()
 
+        # 本實例廣播的訊息以 origin 開頭，Pub/Sub 收到自己的訊息時略過
+        # （本地客戶端已直接送出），不需解析 JSON
+        self.origin = uuid.uuid4().hex[:12]
+        self._origin_prefix = encode_message({"origin": self.origin})[:-1]
+
     # ==================== Redis Pub/Sub Methods ====================
 
     async def start_pubsub_listener(self):
@@ -74,7 +196,8 @@ class ConnectionManager:
         self._running = False
 
         if self._pubsub:
-            await self._pubsub.unsubscribe(*list(self._subscribed_channels))
+            await self._pubsub.unsubscribe()
+            await self._pubsub.punsubscribe()
             self._subscribed_channels.clear()
 
         if self._pubsub_task:
@@ -124,15 +247,19 @@ class ConnectionManager:
             logger.error(f"PubSub listener error: {e}")
 
     async def _subscribe_to_global_channels(self):
-        """訂閱全域頻道（警報和廣播）"""
+        """訂閱全域頻道（警報和廣播）與感測器頻道"""
         if not self.use_redis_pubsub or not redis_client._is_connected:
             return
 
         try:
-            # 訂閱全域廣播和警報頻道
-            self._pubsub = await redis_client.subscribe(self.CHANNEL_BROADCAST)
-            self._subscribed_channels.add(self.CHANNEL_BROADCAST)
-            self._subscribed_channels.add(self.CHANNEL_ALERTS)
+            # 原程式碼只實際訂閱廣播頻道，警報與感測器頻道僅記錄於集合中
+            self._pubsub = await redis_client.subscribe(
+                self.CHANNEL_BROADCAST, self.CHANNEL_ALERTS,
+                patterns=[self.CHANNEL_SENSOR_PATTERN]
+            )
+            self._subscribed_channels.update(
+                {self.CHANNEL_BROADCAST, self.CHANNEL_ALERTS, self.CHANNEL_SENSOR_PATTERN}
+            )
             logger.info(f"Subscribed to global channels: {self.CHANNEL_BROADCAST}, {self.CHANNEL_ALERTS}")
         except Exception as e:
             logger.error(f"Error subscribing to global channels: {e}")
@@ -141,43 +268,45 @@ class ConnectionManager:
         """
         處理從 Redis 接收的 Pub/Sub 訊息
 
+        訊息內容即為送給客戶端的 JSON，直接轉送不重新解析 / 編碼。
+        原程式碼解析後再呼叫 broadcast_*，會把訊息再包一層並重新發布回 Redis
+
         Args:
-            message: Redis 訊息字典，包含 type, channel, data
+            message: Redis 訊息字典，包含 type, channel, data (bytes)
         """
         try:
-            if message.get('type') == 'message':
-                channel = message.get('channel', '')
-                data_str = message.get('data', '')
-
-                # 解析 JSON 數據
+            if message.get('type') not in ('message', 'pmessage'):
+                return
+
+            channel = message.get('channel', b'')
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            payload = message.get('data', b'')
+            if isinstance(payload, str):
+                payload = payload.encode()
+
+            # 本實例發出的訊息已送給本地客戶端
+            if payload.startswith(self._origin_prefix):
+                return
+
+            text = payload.decode()
+
+            # 根據頻道類型處理
+            if channel in (self.CHANNEL_BROADCAST, self.CHANNEL_ALERTS):
+                # 全域廣播 / 警報
+                self._fan_out(list(self.writers), text)
+            elif channel.startswith(self.CHANNEL_FEATURE_PREFIX):
+                # 感測器特定訊息
+                # 格式: sensor:{sensor_id}:features / sensor:{sensor_id}:data
                 try:
-                    data = json.loads(data_str)
-                except json.JSONDecodeError:
-                    logger.warning(f"Invalid JSON in pubsub message: {data_str}")
+                    _, sensor_id, msg_type = channel.split(':')
+                    connections = self.active_connections.get(int(sensor_id), ())
+                except ValueError:
+                    logger.warning(f"Invalid channel format: {channel}")
                     return
 
-                # 根據頻道類型處理
-                if channel == self.CHANNEL_BROADCAST:
-                    # 全域廣播
-                    await self.broadcast_to_all(data)
-                elif channel == self.CHANNEL_ALERTS:
-                    # 警報廣播
-                    await self.broadcast_alert(data)
-                elif channel.startswith(self.CHANNEL_FEATURE_PREFIX):
-                    # 感測器特定訊息
-                    # 格式: sensor:{sensor_id}:features
-                    try:
-                        sensor_id = int(
-                            channel.split(':')[1]
-                        )
-                        msg_type = channel.split(':')[2]
-
-                        if msg_type == 'features':
-                            await self.broadcast_feature_update(sensor_id, data)
-                        elif msg_type == 'data':
-                            await self._broadcast_sensor_data(sensor_id, data)
-                    except (ValueError, IndexError) as e:
-                        logger.warning(f"Invalid channel format: {channel}")
+                if msg_type in ('features', 'data'):
+                    self._fan_out(connections, text, conflate=msg_type == 'features')
 
         except Exception as e:
             logger.error(f"Error handling pubsub message: {e}")
@@ -205,6 +334,9 @@ class ConnectionManager:
         """
         發布訊息到 Redis 頻道
 
+        訊息內容應為客戶端收到的完整訊息（例如 {"type": "alert", "data": ...}），
+        訂閱的實例（包含本實例）會直接轉送給其客戶端
+
         Args:
             channel: 頻道名稱
             message: 訊息字典
@@ -213,20 +345,46 @@ class ConnectionManager:
             return
 
         try:
-            await redis_client.publish(channel, message)
+            await redis_client.publish(channel, encode_message(message))
         except Exception as e:
             logger.error(f"Error publishing to channel {channel}: {e}")
 
-    async def connect(self, websocket: WebSocket, sensor_id: int):
+    def _encode(self, message: dict) -> str:
+        """
+        Encode a locally broadcast message once, tagged with this
+        instance's origin
+
+        Returns:
+            JSON text sent to clients and published to Redis
+        """
+        return encode_message({"origin": self.origin, **message}).decode()
+
+    async def _publish_text(self, channel: str, text: str):
+        if not self.use_redis_pubsub:
+            return
+
+        try:
+            await redis_client.publish(channel, text.encode())
+        except Exception as e:
+            logger.error(f"Error publishing to channel {channel}: {e}")
+
+    async def connect(self, websocket: WebSocket, sensor_id: int,
+                      max_rate: Optional[float] = None):
         """
         Connect a WebSocket to a sensor
 
         Args:
             websocket: WebSocket connection object
             sensor_id: Sensor to subscribe to (use 0 for global)
+            max_rate: Maximum feature updates per second for this
+                      subscription (None = WS_MAX_RATE)
         """
         await websocket.accept()
 
+        writer = ClientWriter(websocket, max_rate=max_rate, on_error=self.disconnect)
+        writer.start()
+        self.writers[websocket] = writer
+
         if sensor_id not in self.active_connections:
             self.active_connections[sensor_id] = set()
 
@@ -258,7 +416,12 @@ class ConnectionManager:
         """
         sensor_id = self.websocket_sensor_map.get(websocket)
 
-        if sensor_id and sensor_id in self.active_connections:
+        writer = self.writers.pop(websocket, None)
+        if writer is not None:
+            await writer.stop()
+
+        # 原程式碼 sensor_id 為 0（全域訂閱）時不會移除連線
+        if sensor_id is not None and sensor_id in self.active_connections:
             self.active_connections[sensor_id].discard(websocket)
 
             # Remove empty sensor entries
@@ -298,11 +461,27 @@ class ConnectionManager:
             message: Message dictionary to send
             websocket: Target WebSocket connection
         """
-        try:
-            await websocket.send_json(message)
-        except Exception as e:
-            logger.error(f"Error sending personal message: {e}")
-            await self.disconnect(websocket)
+        writer = self.writers.get(websocket)
+        if writer is None:
+            logger.warning("Personal message for unknown WebSocket dropped")
+            return
+
+        writer.enqueue(encode_message(message).decode())
+
+    def _fan_out(self, connections, text: str, conflate: bool = False) -> int:
+        """
+        Queue an encoded message on each connection
+
+        Returns:
+            Number of connections the message was queued on
+        """
+        count = 0
+        for websocket in connections:
+            writer = self.writers.get(websocket)
+            if writer is not None:
+                writer.enqueue(text, conflate=conflate)
+                count += 1
+        return count
 
     async def broadcast_to_sensor(self, sensor_id: int, message: dict, use_redis: bool = True):
         """
@@ -316,43 +495,31 @@ class ConnectionManager:
             message: Message dictionary to broadcast
             use_redis: 是否透過 Redis 發布（預設 True）
         """
-        # 本地廣播
-        if sensor_id not in self.active_connections:
+        # 根據訊息類型決定頻道（其他類型不透過 Redis 發布）
+        msg_type = message.get("type", "")
+        channel = None
+        if msg_type == "feature_update":
+            channel = f"{self.CHANNEL_FEATURE_PREFIX}{sensor_id}{self.CHANNEL_FEATURE_SUFFIX}"
+        elif msg_type == "sensor_data":
+            channel = f"{self.CHANNEL_FEATURE_PREFIX}{sensor_id}{self.CHANNEL_DATA_SUFFIX}"
+
+        publish = use_redis and self.use_redis_pubsub and channel is not None
+        connections = self.active_connections.get(sensor_id)
+        if not connections and not publish:
             return
 
-        # Remove disconnected websockets
-        dead_connections = []
-        for websocket in self.active_connections[sensor_id]:
-            try:
-                await websocket.send_json(message)
-            except Exception as e:
-                logger.error(f"Broadcast error for sensor {sensor_id}: {e}")
-                dead_connections.append(websocket)
-
-        # Clean up dead connections
-        for ws in dead_connections:
-            await self.disconnect(ws)
-
-        if dead_connections:
-            logger.warning(
-                f"Removed {len(dead_connections)} dead connections "
-                f"for sensor {sensor_id}"
-            )
-
-        # 透過 Redis 發布到其他實例
-        if use_redis and self.use_redis_pubsub:
-            # 根據訊息類型決定頻道
-            msg_type = message.get("type", "")
-            if msg_type == "feature_update":
-                channel = f"{self.CHANNEL_FEATURE_PREFIX}{sensor_id}{self.CHANNEL_FEATURE_SUFFIX}"
-            elif msg_type == "sensor_data":
-                channel = f"{self.CHANNEL_FEATURE_PREFIX}{sensor_id}{self.CHANNEL_DATA_SUFFIX}"
-            else:
-                return  # 其他類型不透過 Redis 發布
+        # 原程式碼逐一 await send_json，慢速客戶端會拖慢所有客戶端與分析迴圈，
+        # 且每個客戶端各編碼一次；改為編碼一次後放入各連線的傳送佇列
+        text = self._encode(message)
+        if connections:
+            self._fan_out(connections, text, conflate=msg_type in CONFLATED_TYPES)
 
-            await self.publish_to_channel(channel, message)
+        # 透過 Redis 發布到其他實例（同一份 bytes）
+        if publish:
+            await self._publish_text(channel, text)
 
-    async def broadcast_to_all(self, message: dict, use_redis: bool = True):
+    async def broadcast_to_all(self, message: dict, use_redis: bool = True,
+                               channel: Optional[str] = None):
         """
         Broadcast message to all active connections
 
@@ -362,27 +529,14 @@ class ConnectionManager:
         Args:
             message: Message dictionary to broadcast
             use_redis: 是否透過 Redis 發布（預設 True）
+            channel: 發布的頻道（預設 broadcast:all）
         """
-        dead_connections = []
-
-        for sensor_id, connections in self.active_connections.items():
-            for websocket in connections:
-                try:
-                    await websocket.send_json(message)
-                except Exception as e:
-                    logger.error(f"Broadcast error: {e}")
-                    dead_connections.append(websocket)
-
-        # Clean up dead connections
-        for ws in dead_connections:
-            await self.disconnect(ws)
-
-        if dead_connections:
-            logger.warning(f"Removed {len(dead_connections)} dead connections")
+        text = self._encode(message)
+        self._fan_out(list(self.writers), text)
 
         # 透過 Redis 發布到其他實例
-        if use_redis and self.use_redis_pubsub:
-            await self.publish_to_channel(self.CHANNEL_BROADCAST, message)
+        if use_redis:
+            await self._publish_text(channel or self.CHANNEL_BROADCAST, text)
 
     async def broadcast_alert(self, alert: dict):
         """
@@ -399,10 +553,8 @@ class ConnectionManager:
             "data": alert
         }
 
-        await self.broadcast_to_all(message)
-        # 同時發布到警報頻道
-        if self.use_redis_pubsub:
-            await self.publish_to_channel(self.CHANNEL_ALERTS, alert)
+        # 原程式碼同時發布到 broadcast:all 與 alerts:all，其他實例會收到兩次
+        await self.broadcast_to_all(message, channel=self.CHANNEL_ALERTS)
 
         logger.info(f"Broadcast alert to all clients: {alert.get('message', 'N/A')}")
 
@@ -478,13 +630,17 @@ class ConnectionManager:
         Returns:
             Dictionary with connection stats
         """
+        writers = list(self.writers.values())
         return {
             "total_connections": len(self.websocket_sensor_map),
             "active_sensors": len(self.active_connections),
             "sensor_connections": {
                 sensor_id: len(connections)
                 for sensor_id, connections in self.active_connections.items()
-            }
+            },
+            "queued_messages": sum(len(w.queue) + (w.latest is not None) for w in writers),
+            "dropped_messages": sum(w.dropped for w in writers),
+            "conflated_messages": sum(w.conflated for w in writers)
         }
 
 
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+分段統計核心效能比較（NA4, NB4, EO）
+
+比較原始逐段迴圈 / pandas 實作與 segment_kernels 的 NumPy 與 Numba 實作
+（Numba 需另外安裝；首次編譯時間不計入），並確認結果一致。
+
+使用方式:
+    uv run python scripts/benchmark_segment_kernels.py --files 256
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import segment_kernels
+
+
+# ==================== 原始實作（改寫前的定義，作為基準） ====================
+
+def legacy_na4(signal, m=10):
+    n = len(signal)
+    segment_size = n // m
+    total_sum_segment = 0
+    for i in range(m):
+        end = (i + 1) * segment_size if i < m - 1 else n
+        segment = signal[i * segment_size:end]
+        total_sum_segment += np.sum((segment - np.mean(segment)) ** 2)
+    division = (total_sum_segment / m) ** 2
+    total_sum_all = np.sum((signal - np.mean(signal)) ** 4) * n
+    return total_sum_all / division if division != 0 else np.nan
+
+
+def legacy_nb4(envelope, m=10):
+    n = len(envelope)
+    segment_size = n // m
+    total_sum_segment = 0.0
+    for i in range(m):
+        end = (i + 1) * segment_size if i < m - 1 else n
+        segment = envelope[i * segment_size:end]
+        if len(segment):
+            total_sum_segment += np.var(segment)
+    total_sum_all = np.mean((envelope - np.mean(envelope)) ** 4)
+    return total_sum_all / (total_sum_segment / m) ** 2 if total_sum_segment > 0 else 0.0
+
+
+def legacy_eo(signal):
+    num = pd.DataFrame({'x': signal})
+    num2 = pd.concat([num, num.iloc[[0]]], ignore_index=True)
+    delta1 = ((num2['x'].shift() ** 2) - (num2['x'] ** 2)).dropna()
+    delta2 = num['x'].agg("sum") / len(num)
+    delta3 = pd.DataFrame({'delta1': delta1, 'delta2': delta2})
+    delta3 = delta3['delta1'] - delta3['delta2']
+    return ((len(delta3) ** 2) * np.sum(delta3 ** 4)) / (np.sum(delta3 ** 2) ** 2)
+
+
+def timed(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, np.asarray(result, dtype=np.float64)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='NA4 / NB4 / EO 分段統計核心效能比較')
+    parser.add_argument('--files', type=int, default=256, help='檔案數 (預設: 256，每檔 2 通道)')
+    parser.add_argument('--samples', type=int, default=2560, help='每個信號的樣本數 (預設: 2560)')
+    parser.add_argument('--repeat', type=int, default=3, help='重複次數（取最佳）')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    signals = rng.standard_normal((args.files, 2, args.samples))
+    envelopes = np.abs(signals)
+    rows = signals.reshape(-1, args.samples)
+    envelope_rows = envelopes.reshape(-1, args.samples)
+
+    backends = ["numpy"] + (["numba"] if segment_kernels.NUMBA_AVAILABLE else [])
+    if segment_kernels.NUMBA_AVAILABLE:
+        # 觸發編譯（不計入時間）
+        segment_kernels.na4(signals[:1], backend="numba")
+        segment_kernels.eo(signals[:1], backend="numba")
+
+    cases = {
+        "NA4": (lambda: [legacy_na4(r) for r in rows],
+                lambda b: segment_kernels.na4(signals, backend=b)[0].ravel()),
+        "NB4": (lambda: [legacy_nb4(r) for r in envelope_rows],
+                lambda b: segment_kernels.nb4(envelopes, backend=b).ravel()),
+        "EO": (lambda: [legacy_eo(r) for r in rows],
+               lambda b: segment_kernels.eo(signals, backend=b).ravel()),
+    }
+
+    print(f"\n{'='*72}")
+    print(f"分段統計核心  信號: {signals.shape}  Numba: {'available' if segment_kernels.NUMBA_AVAILABLE else 'not installed'}")
+    print(f"{'='*72}")
+    print(f"{'feature':<8}{'implementation':<16}{'time (ms)':>12}{'speedup':>10}{'max rel. diff':>16}")
+    for name, (legacy, kernel) in cases.items():
+        base_time, reference = timed(legacy, 1)
+        print(f"{name:<8}{'legacy':<16}{base_time * 1e3:>12.2f}{1.0:>10.1f}{0.0:>16.1e}")
+        for backend in backends:
+            elapsed, result = timed(lambda: kernel(backend), args.repeat)
+            diff = np.max(np.abs(result - reference) / np.abs(reference))
+            print(f"{'':<8}{backend:<16}{elapsed * 1e3:>12.2f}{base_time / elapsed:>10.1f}{diff:>16.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -166,38 +166,29 @@ async def check_redis_sensor_data(sensor_id: int):
         await redis_client.connect()
 
         # 檢查 stream 是否存在
-        # Redis key 格式: stream:sensor:{sensor_id} (參考 redis_client.py line 83)
-        stream_key = f"stream:sensor:{sensor_id}"
+        # Redis key 格式: stream:sensor:{sensor_id}:chunks (參考 redis_client.add_sensor_chunk)
+        # 每筆 entry 為一整個批次的 packed float32 資料
+        stream_key = f"stream:sensor:{sensor_id}:chunks"
 
         # 獲取 stream 資訊
         try:
-            stream_info = await redis_client.redis.xinfo_stream(stream_key)
+            stream_info = await redis_client.redis_binary.xinfo_stream(stream_key)
             print(f"✅ Stream 存在: {stream_key}")
-            print(f"   長度: {stream_info.get('length', 0)}")
-            print(f"   群組數: {stream_info.get('groups', 0)}")
-            print(f"   第一筆 ID: {stream_info.get('first-entry', 'N/A')}")
-            print(f"   最後一筆 ID: {stream_info.get('last-entry', 'N/A')}")
-
-            # 讀取最新的幾筆資料
-            entries = await redis_client.redis.xrevrange(
-                stream_key,
-                max='+',
-                count=5
-            )
-
-            if entries:
-                print(f"\n📝 最新 5 筆資料:")
-                for entry_id, data in entries:
-                    # entry_id 可能是字串或位元組,統一處理
-                    if isinstance(entry_id, bytes):
-                        entry_id = entry_id.decode()
-
-                    print(f"\n  🆔 Entry ID: {entry_id}")
-                    for key, value in data.items():
-                        # 處理字串/位元組
-                        key_str = key.decode() if isinstance(key, bytes) else key
-                        value_str = value.decode() if isinstance(value, bytes) else value
-                        print(f"     {key_str}: {value_str}")
+            print(f"   長度 (chunks): {stream_info.get('length', 0)}")
+
+            # 讀取最新的幾個 chunk
+            chunks = await redis_client.get_sensor_chunks(sensor_id, count=5)
+
+            if chunks:
+                print(f"\n📝 最新 {len(chunks)} 個 chunk:")
+                for chunk in chunks:
+                    print(f"\n  🆔 Entry ID: {chunk['entry_id']}")
+                    print(f"     start_time: {chunk['start_time'].isoformat()}")
+                    print(f"     sampling_rate: {chunk['sampling_rate']:.1f} Hz")
+                    print(f"     samples: {chunk['sample_count']}")
+                    if chunk['sample_count']:
+                        print(f"     h_acc[0]: {chunk['h_acc'][0]:.6f}")
+                        print(f"     v_acc[0]: {chunk['v_acc'][0]:.6f}")
             else:
                 print("⚠️  Stream 存在但沒有資料")
 
@@ -208,7 +199,7 @@ async def check_redis_sensor_data(sensor_id: int):
                 print(f"❌ Stream 不存在: {stream_key}")
                 print("   可能原因:")
                 print("   1. 尚未接收任何 sensor 資料")
-                print("   2. 資料已過期 (Redis TTL: 24小時)")
+                print("   2. 資料已被 MAXLEN 裁剪")
                 return False
             else:
                 raise
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+將即時分析的 PostgreSQL 資料表遷移為時間分區表
+
+sensor_data、sensor_data_chunks、realtime_features 轉為 range 分區表
+（既有資料成為 `<table>_legacy` 分區），並建立 DEFAULT 分區、未來分區、
+套用保留期限。可重複執行。
+
+使用方式:
+    uv run python scripts/migrate_partitions.py
+"""
+import asyncio
+import os
+import sys
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from database_async import db, PARTITIONED_TABLES
+
+
+async def main():
+    await db.init_pool()
+    try:
+        for table in PARTITIONED_TABLES:
+            migrated = await db.migrate_to_partitioned(table)
+            print(f"{table}: {'migrated' if migrated else 'already partitioned or missing'}")
+
+        await db.maintain_partitions()
+
+        async with db.get_connection() as conn:
+            for table in PARTITIONED_TABLES:
+                partitions = await db._list_partitions(conn, table)
+                print(f"{table}: {len(partitions)} partitions, "
+                      f"{db.default_partition_rows.get(table, 0)} rows in the DEFAULT partition")
+    finally:
+        await db.close_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
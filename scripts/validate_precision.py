@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+float32 計算模式驗證報告
+
+以 float64 為基準，比較 float32 模式（COMPUTE_PRECISION / precision="float32"）
+下每個批次特徵的相對誤差：
+- 進階濾波特徵：NA4, FM4, M6A, M8A, ER（FilterProcess.features_batch）
+- 時頻特徵：STFT / CWT 的 NP4 與 NE 最大值（TimeFrequency.time_frequency_trend）
+
+使用方式:
+    uv run python scripts/validate_precision.py --bearing Bearing1_1 --max-files 32
+    uv run python scripts/validate_precision.py --synthetic   # 無資料庫時使用合成信號
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from config import DEFAULT_SAMPLING_RATE, TIME_FREQUENCY_TREND_SEGMENT_DURATION
+from filterprocess import FilterProcess
+from timefrequency import TimeFrequency
+
+
+def load_signals(bearing_name: str, max_files: int) -> np.ndarray:
+    """從 PHM 資料庫載入 (檔案, 通道, 樣本) 的 float64 信號"""
+    from phm_query import PHMDatabaseQuery
+
+    chunk = PHMDatabaseQuery().get_bearing_signal_matrix(bearing_name, 0, max_files)
+    if chunk is None or not chunk["file_numbers"]:
+        raise ValueError(f"No files found for {bearing_name}")
+    return chunk["signals"]
+
+
+def synthetic_signals(files: int, fs: int, n: int = 2560, seed: int = 0) -> np.ndarray:
+    """合成信號：轉軸 / BPFO / BPFI 諧波 + 衝擊 + 雜訊，振幅隨檔案遞增"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(n) / fs
+    tones = (np.sin(2 * np.pi * 30 * t)
+             + 0.5 * np.sin(2 * np.pi * 156.57 * t)
+             + 0.3 * np.sin(2 * np.pi * 233.43 * t))
+    signals = np.empty((files, 2, n))
+    for k in range(files):
+        growth = 1 + 4 * k / max(files - 1, 1)
+        impacts = np.zeros(n)
+        impacts[rng.integers(0, n, size=int(2 * growth))] = growth * rng.standard_normal(int(2 * growth))
+        signals[k] = growth * tones + impacts + rng.standard_normal((2, n)) * 0.2
+    return signals
+
+
+def compute_features(signals: np.ndarray, fs: int, precision: str) -> dict:
+    """計算一種精度下的所有批次特徵（每個值形狀為 (檔案, 通道)）"""
+    signals = signals.astype(np.float32 if precision == "float32" else np.float64)
+    features = FilterProcess.features_batch(signals, fs)
+    features.update(TimeFrequency.time_frequency_trend(
+        signals, fs=fs, time_segment_duration=TIME_FREQUENCY_TREND_SEGMENT_DURATION
+    ))
+    return features
+
+
+def compare(baseline: dict, candidate: dict, tolerance: float) -> dict:
+    """每個特徵的最大 / 中位數相對誤差與是否通過"""
+    report = {}
+    for key, reference in baseline.items():
+        reference = np.asarray(reference, dtype=np.float64)
+        value = np.asarray(candidate[key], dtype=np.float64)
+        scale = np.maximum(np.abs(reference), np.finfo(np.float64).tiny)
+        relative = np.abs(value - reference) / scale
+        relative = relative[np.isfinite(relative)]
+        max_error = float(relative.max()) if relative.size else 0.0
+        report[key] = {
+            "max_relative_error": max_error,
+            "median_relative_error": float(np.median(relative)) if relative.size else 0.0,
+            "passed": max_error <= tolerance
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='float32 計算模式相對 float64 的特徵誤差報告')
+    parser.add_argument('--bearing', default='Bearing1_1', help='軸承名稱 (預設: Bearing1_1)')
+    parser.add_argument('--max-files', type=int, default=32, help='比較的檔案數 (預設: 32)')
+    parser.add_argument('--sampling-rate', type=int, default=DEFAULT_SAMPLING_RATE, help='採樣頻率')
+    parser.add_argument('--tolerance', type=float, default=1e-3, help='允許的最大相對誤差 (預設: 1e-3)')
+    parser.add_argument('--synthetic', action='store_true', help='使用合成信號（不讀取資料庫）')
+    parser.add_argument('--json', help='另存 JSON 報告的路徑')
+    args = parser.parse_args()
+
+    if args.synthetic:
+        source = "synthetic"
+        signals = synthetic_signals(args.max_files, args.sampling_rate)
+    else:
+        source = args.bearing
+        signals = load_signals(args.bearing, args.max_files)
+
+    timings = {}
+    results = {}
+    for precision in ("float64", "float32"):
+        start = time.perf_counter()
+        results[precision] = compute_features(signals, args.sampling_rate, precision)
+        timings[precision] = time.perf_counter() - start
+
+    report = compare(results["float64"], results["float32"], args.tolerance)
+
+    print(f"\n{'='*72}")
+    print(f"float32 驗證報告  來源: {source}  信號: {signals.shape}  容許誤差: {args.tolerance:g}")
+    print(f"{'='*72}")
+    print(f"{'feature':<14}{'max rel. error':>18}{'median rel. error':>20}{'result':>10}")
+    for key, row in report.items():
+        print(f"{key:<14}{row['max_relative_error']:>18.3e}{row['median_relative_error']:>20.3e}"
+              f"{'PASS' if row['passed'] else 'FAIL':>10}")
+    print(f"\n計算時間: float64 {timings['float64']:.3f}s, float32 {timings['float32']:.3f}s")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                "source": source,
+                "shape": list(signals.shape),
+                "tolerance": args.tolerance,
+                "timings": timings,
+                "features": report
+            }, f, indent=2)
+
+    return 0 if all(row["passed"] for row in report.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
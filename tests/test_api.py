@@ -1,101 +1,101 @@
-"""
-API Endpoint Tests
-
-測試 FastAPI 應用程式的各個端點。
-使用 TestClient 進行 HTTP 請求測試。
-
-參考文件:
-- FastAPI 測試: https://fastapi.tiangolo.com/tutorial/testing/
-"""
-import pytest
-from datetime import datetime
-
-
-# ========================================================================
-# Basic Endpoint Tests (基本端點測試)
-# ========================================================================
-
-@pytest.mark.api
-def test_read_root(client):
-    """測試根路徑 - 應返回 API 資訊"""
-    response = client.get("/")
-    assert response.status_code == 200
-
-    data = response.json()
-    assert "message" in data
-    assert "version" in data
-    assert "status" in data
-    assert data["status"] == "running"
-
-
-# ========================================================================
-# PHM Database Query Endpoints (PHM 資料庫查詢端點)
-# ========================================================================
-
-@pytest.mark.api
-def test_get_phm_database_bearings(client):
-    """測試獲取所有軸承列表"""
-    response = client.get("/api/phm/database/bearings")
-    assert response.status_code == 200
-
-    data = response.json()
-    assert "total_bearings" in data
-    assert "bearings" in data
-    assert isinstance(data["bearings"], list)
-
-
-@pytest.mark.api
-def test_get_phm_bearing_info(client, test_bearing_name):
-    """測試獲取特定軸承資訊"""
-    response = client.get(f"/api/phm/database/bearing/{test_bearing_name}")
-
-    # 如果軸承不存在，返回 404
-    if response.status_code == 404:
-        assert "not found" in response.json()["detail"].lower()
-    else:
-        assert response.status_code == 200
-        data = response.json()
-        assert "bearing_name" in data
-        assert data["bearing_name"] == test_bearing_name
-
-
-@pytest.mark.api
-def test_get_phm_bearing_files(client, test_bearing_name):
-    """測試獲取軸承檔案列表（分頁）"""
-    response = client.get(
-        f"/api/phm/database/bearing/{test_bearing_name}/files",
-        params={"offset": 0, "limit": 10}
-    )
-
-    # 如果軸承不存在，返回 404
-    if response.status_code == 404:
-        assert "not found" in response.json()["detail"].lower()
-    else:
-        assert response.status_code == 200
-        data = response.json()
-        assert "files" in data
-        assert "total_count" in data
-        assert isinstance(data["files"], list)
-
-
-@pytest.mark.api
-def test_get_phm_bearing_measurements(client, test_bearing_name):
-    """測試獲取軸承測量資料（分頁）"""
-    response = client.get(
-        f"/api/phm/database/bearing/{test_bearing_name}/measurements",
-        params={"offset": 0, "limit": 100}
-    )
-
-    # 如果軸承不存在，返回 404
-    if response.status_code == 404:
-        assert "not found" in response.json()["detail"].lower()
-    else:
-        assert response.status_code == 200
-        data = response.json()
-        assert "measurements" in data
-        assert "total_count" in data
-
-
+"""
+API Endpoint Tests
+
+測試 FastAPI 應用程式的各個端點。
+使用 TestClient 進行 HTTP 請求測試。
+
+參考文件:
+- FastAPI 測試: https://fastapi.tiangolo.com/tutorial/testing/
+"""
+import pytest
+from datetime import datetime, timedelta, timezone
+
+
+# ========================================================================
+# Basic Endpoint Tests (基本端點測試)
+# ========================================================================
+
+@pytest.mark.api
+def test_read_root(client):
+    """測試根路徑 - 應返回 API 資訊"""
+    response = client.get("/")
+    assert response.status_code == 200
+
+    data = response.json()
+    assert "message" in data
+    assert "version" in data
+    assert "status" in data
+    assert data["status"] == "running"
+
+
+# ========================================================================
+# PHM Database Query Endpoints (PHM 資料庫查詢端點)
+# ========================================================================
+
+@pytest.mark.api
+def test_get_phm_database_bearings(client):
+    """測試獲取所有軸承列表"""
+    response = client.get("/api/phm/database/bearings")
+    assert response.status_code == 200
+
+    data = response.json()
+    assert "total_bearings" in data
+    assert "bearings" in data
+    assert isinstance(data["bearings"], list)
+
+
+@pytest.mark.api
+def test_get_phm_bearing_info(client, test_bearing_name):
+    """測試獲取特定軸承資訊"""
+    response = client.get(f"/api/phm/database/bearing/{test_bearing_name}")
+
+    # 如果軸承不存在，返回 404
+    if response.status_code == 404:
+        assert "not found" in response.json()["detail"].lower()
+    else:
+        assert response.status_code == 200
+        data = response.json()
+        assert "bearing_name" in data
+        assert data["bearing_name"] == test_bearing_name
+
+
+@pytest.mark.api
+def test_get_phm_bearing_files(client, test_bearing_name):
+    """測試獲取軸承檔案列表（分頁）"""
+    response = client.get(
+        f"/api/phm/database/bearing/{test_bearing_name}/files",
+        params={"offset": 0, "limit": 10}
+    )
+
+    # 如果軸承不存在，返回 404
+    if response.status_code == 404:
+        assert "not found" in response.json()["detail"].lower()
+    else:
+        assert response.status_code == 200
+        data = response.json()
+        assert "files" in data
+        assert "total_count" in data
+        assert isinstance(data["files"], list)
+
+
+@pytest.mark.api
+def test_get_phm_bearing_measurements(client, test_bearing_name):
+    """測試獲取軸承測量資料（分頁）"""
+    response = client.get(
+        f"/api/phm/database/bearing/{test_bearing_name}/measurements",
+        params={"offset": 0, "limit": 100}
+    )
+
+    # 如果軸承不存在，返回 404
+    if response.status_code == 404:
+        assert "not found" in response.json()["detail"].lower()
+    else:
+        assert response.status_code == 200
+        data = response.json()
+        assert "measurements" in data
+        assert "total_count" in data
+
+
 @pytest.mark.api
 def test_get_phm_file_data(client, test_bearing_name, test_file_number):
     """測試獲取完整檔案資料"""
@@ -116,8 +116,8 @@ def test_get_phm_file_data(client, test_bearing_name, test_file_number):
         assert "horizontal_acceleration" in data or "data" in data
         assert "vertical_acceleration" in data or "data" in data
         assert "record_count" in data or "data" in data
-
-
+
+
 @pytest.mark.api
 def test_get_phm_bearing_statistics(client, test_bearing_name):
     """測試獲取軸承統計資訊"""
@@ -132,173 +132,173 @@ def test_get_phm_bearing_statistics(client, test_bearing_name):
         # 原程式碼問題：期望有 "file_count" 字段，但實際返回的是 "total_files"
         # 修復：檢查實際存在的字段名稱
         assert "file_count" in data or "total_files" in data
-
-
-@pytest.mark.api
-def test_search_phm_anomalies(client, test_bearing_name):
-    """測試搜尋異常振動資料"""
-    response = client.get(
-        f"/api/phm/database/bearing/{test_bearing_name}/anomalies",
-        params={"threshold_h": 10.0, "threshold_v": 10.0, "limit": 100}
-    )
-
-    # 如果軸承不存在，返回 404 或 500
-    if response.status_code in [404, 500]:
-        pass  # 軸承可能不存在
-    else:
-        assert response.status_code == 200
-        data = response.json()
-        assert "bearing_name" in data
-        assert "anomaly_count" in data
-        assert "anomalies" in data
-
-
-# ========================================================================
-# Algorithm Calculation Endpoints (算法計算端點)
-# ========================================================================
-
-@pytest.mark.api
-def test_calculate_time_domain_features(client, test_bearing_name, test_file_number):
-    """測試計算時域特徵"""
-    response = client.get(
-        f"/api/algorithms/time-domain/{test_bearing_name}/{test_file_number}"
-    )
-
-    # 如果資料不存在，返回 404
-    if response.status_code == 404:
-        assert "not found" in response.json()["detail"].lower()
-    else:
-        assert response.status_code == 200
-        data = response.json()
-        assert "bearing_name" in data
-        assert "file_number" in data
-        assert "horizontal" in data
-        assert "vertical" in data
-        # 檢查特徵是否存在
-        assert "rms" in data["horizontal"]
-        assert "peak" in data["horizontal"]
-        assert "kurtosis" in data["horizontal"]
-
-
-@pytest.mark.api
-def test_calculate_frequency_domain(client, test_bearing_name, test_file_number):
-    """測試計算頻域特徵（FFT）"""
-    response = client.get(
-        f"/api/algorithms/frequency-domain/{test_bearing_name}/{test_file_number}",
-        params={"sampling_rate": 25600}
-    )
-
-    # 如果資料不存在，返回 404
-    if response.status_code == 404:
-        assert "not found" in response.json()["detail"].lower()
-    else:
-        assert response.status_code == 200
-        data = response.json()
-        assert "bearing_name" in data
-        assert "horizontal" in data
-        assert "vertical" in data
-        # 檢查頻域特徵
-        assert "peak_frequencies" in data["horizontal"]
-        assert "peak_magnitudes" in data["horizontal"]
-
-
-@pytest.mark.api
-def test_calculate_envelope_spectrum(client, test_bearing_name, test_file_number):
-    """測試計算包絡頻譜"""
-    response = client.get(
-        f"/api/algorithms/envelope/{test_bearing_name}/{test_file_number}",
-        params={"sampling_rate": 25600}
-    )
-
-    # 如果資料不存在，返回 404
-    if response.status_code == 404:
-        assert "not found" in response.json()["detail"].lower()
-    else:
-        assert response.status_code == 200
-        data = response.json()
-        assert "bearing_name" in data
-        assert "filter_band" in data
-        assert "horizontal" in data
-        assert "envelope_rms" in data["horizontal"]
-
-
-@pytest.mark.api
-def test_calculate_stft(client, test_bearing_name, test_file_number):
-    """測試計算短時傅立葉轉換（STFT）"""
-    response = client.get(
-        f"/api/algorithms/stft/{test_bearing_name}/{test_file_number}",
-        params={"sampling_rate": 25600, "window": "hann", "nperseg": 256}
-    )
-
-    # 如果資料不存在，返回 404
-    if response.status_code == 404:
-        assert "not found" in response.json()["detail"].lower()
-    else:
-        assert response.status_code == 200
-        data = response.json()
-        assert "bearing_name" in data
-        assert "horizontal" in data
-        assert "spectrogram_data" in data
-
-
-@pytest.mark.api
-def test_calculate_hilbert_transform(client, test_bearing_name, test_file_number):
-    """測試計算希爾伯特轉換特徵"""
-    response = client.get(
-        f"/api/algorithms/hilbert/{test_bearing_name}/{test_file_number}",
-        params={"segment_count": 10}
-    )
-
-    # 如果資料不存在，返回 404
-    if response.status_code == 404:
-        assert "not found" in response.json()["detail"].lower()
-    else:
-        assert response.status_code == 200
-        data = response.json()
-        assert "bearing_name" in data
-        assert "horizontal" in data
-        assert "nb4" in data["horizontal"]
-        assert "envelope_mean" in data["horizontal"]
-
-
-@pytest.mark.api
-def test_calculate_filter_features(client, test_bearing_name, test_file_number):
-    """測試計算進階濾波特徵"""
-    response = client.get(
-        f"/api/algorithms/filter-features/{test_bearing_name}/{test_file_number}",
-        params={"sampling_rate": 25600}
-    )
-
-    # 如果資料不存在，返回 404
-    if response.status_code == 404:
-        assert "not found" in response.json()["detail"].lower()
-    else:
-        assert response.status_code == 200
-        data = response.json()
-        assert "bearing_name" in data
-        assert "horizontal" in data
-        # 檢查濾波特徵
-        assert "na4" in data["horizontal"]
-        assert "fm4" in data["horizontal"]
-        assert "m6a" in data["horizontal"]
-        assert "m8a" in data["horizontal"]
-
-
-# ========================================================================
-# Temperature API Endpoints (溫度 API 端點)
-# ========================================================================
-
-@pytest.mark.api
-def test_get_temperature_bearings(client):
-    """測試獲取所有有溫度資料的軸承"""
-    response = client.get("/api/temperature/bearings")
-    assert response.status_code == 200
-
-    data = response.json()
-    assert "bearings" in data
-    assert isinstance(data["bearings"], list)
-
-
+
+
+@pytest.mark.api
+def test_search_phm_anomalies(client, test_bearing_name):
+    """測試搜尋異常振動資料"""
+    response = client.get(
+        f"/api/phm/database/bearing/{test_bearing_name}/anomalies",
+        params={"threshold_h": 10.0, "threshold_v": 10.0, "limit": 100}
+    )
+
+    # 如果軸承不存在，返回 404 或 500
+    if response.status_code in [404, 500]:
+        pass  # 軸承可能不存在
+    else:
+        assert response.status_code == 200
+        data = response.json()
+        assert "bearing_name" in data
+        assert "anomaly_count" in data
+        assert "anomalies" in data
+
+
+# ========================================================================
+# Algorithm Calculation Endpoints (算法計算端點)
+# ========================================================================
+
+@pytest.mark.api
+def test_calculate_time_domain_features(client, test_bearing_name, test_file_number):
+    """測試計算時域特徵"""
+    response = client.get(
+        f"/api/algorithms/time-domain/{test_bearing_name}/{test_file_number}"
+    )
+
+    # 如果資料不存在，返回 404
+    if response.status_code == 404:
+        assert "not found" in response.json()["detail"].lower()
+    else:
+        assert response.status_code == 200
+        data = response.json()
+        assert "bearing_name" in data
+        assert "file_number" in data
+        assert "horizontal" in data
+        assert "vertical" in data
+        # 檢查特徵是否存在
+        assert "rms" in data["horizontal"]
+        assert "peak" in data["horizontal"]
+        assert "kurtosis" in data["horizontal"]
+
+
+@pytest.mark.api
+def test_calculate_frequency_domain(client, test_bearing_name, test_file_number):
+    """測試計算頻域特徵（FFT）"""
+    response = client.get(
+        f"/api/algorithms/frequency-domain/{test_bearing_name}/{test_file_number}",
+        params={"sampling_rate": 25600}
+    )
+
+    # 如果資料不存在，返回 404
+    if response.status_code == 404:
+        assert "not found" in response.json()["detail"].lower()
+    else:
+        assert response.status_code == 200
+        data = response.json()
+        assert "bearing_name" in data
+        assert "horizontal" in data
+        assert "vertical" in data
+        # 檢查頻域特徵
+        assert "peak_frequencies" in data["horizontal"]
+        assert "peak_magnitudes" in data["horizontal"]
+
+
+@pytest.mark.api
+def test_calculate_envelope_spectrum(client, test_bearing_name, test_file_number):
+    """測試計算包絡頻譜"""
+    response = client.get(
+        f"/api/algorithms/envelope/{test_bearing_name}/{test_file_number}",
+        params={"sampling_rate": 25600}
+    )
+
+    # 如果資料不存在，返回 404
+    if response.status_code == 404:
+        assert "not found" in response.json()["detail"].lower()
+    else:
+        assert response.status_code == 200
+        data = response.json()
+        assert "bearing_name" in data
+        assert "filter_band" in data
+        assert "horizontal" in data
+        assert "envelope_rms" in data["horizontal"]
+
+
+@pytest.mark.api
+def test_calculate_stft(client, test_bearing_name, test_file_number):
+    """測試計算短時傅立葉轉換（STFT）"""
+    response = client.get(
+        f"/api/algorithms/stft/{test_bearing_name}/{test_file_number}",
+        params={"sampling_rate": 25600, "window": "hann", "nperseg": 256}
+    )
+
+    # 如果資料不存在，返回 404
+    if response.status_code == 404:
+        assert "not found" in response.json()["detail"].lower()
+    else:
+        assert response.status_code == 200
+        data = response.json()
+        assert "bearing_name" in data
+        assert "horizontal" in data
+        assert "spectrogram_data" in data
+
+
+@pytest.mark.api
+def test_calculate_hilbert_transform(client, test_bearing_name, test_file_number):
+    """測試計算希爾伯特轉換特徵"""
+    response = client.get(
+        f"/api/algorithms/hilbert/{test_bearing_name}/{test_file_number}",
+        params={"segment_count": 10}
+    )
+
+    # 如果資料不存在，返回 404
+    if response.status_code == 404:
+        assert "not found" in response.json()["detail"].lower()
+    else:
+        assert response.status_code == 200
+        data = response.json()
+        assert "bearing_name" in data
+        assert "horizontal" in data
+        assert "nb4" in data["horizontal"]
+        assert "envelope_mean" in data["horizontal"]
+
+
+@pytest.mark.api
+def test_calculate_filter_features(client, test_bearing_name, test_file_number):
+    """測試計算進階濾波特徵"""
+    response = client.get(
+        f"/api/algorithms/filter-features/{test_bearing_name}/{test_file_number}",
+        params={"sampling_rate": 25600}
+    )
+
+    # 如果資料不存在，返回 404
+    if response.status_code == 404:
+        assert "not found" in response.json()["detail"].lower()
+    else:
+        assert response.status_code == 200
+        data = response.json()
+        assert "bearing_name" in data
+        assert "horizontal" in data
+        # 檢查濾波特徵
+        assert "na4" in data["horizontal"]
+        assert "fm4" in data["horizontal"]
+        assert "m6a" in data["horizontal"]
+        assert "m8a" in data["horizontal"]
+
+
+# ========================================================================
+# Temperature API Endpoints (溫度 API 端點)
+# ========================================================================
+
+@pytest.mark.api
+def test_get_temperature_bearings(client):
+    """測試獲取所有有溫度資料的軸承"""
+    response = client.get("/api/temperature/bearings")
+    assert response.status_code == 200
+
+    data = response.json()
+    assert "bearings" in data
+    assert isinstance(data["bearings"], list)
+
+
 @pytest.mark.api
 def test_get_temperature_database_info(client):
     """測試獲取溫度資料庫基本資訊"""
@@ -312,48 +312,48 @@ def test_get_temperature_database_info(client):
     else:
         # 如果溫度資料庫不存在，返回 404 或 500 是可接受的
         assert response.status_code in [404, 500]
-
-
-@pytest.mark.api
-def test_get_temperature_statistics(client):
-    """測試獲取溫度統計資訊"""
-    response = client.get("/api/temperature/statistics")
-    assert response.status_code == 200
-
-    data = response.json()
-    assert "statistics" in data
-
-
-@pytest.mark.api
-def test_get_temperature_bearing_info(client, test_bearing_name):
-    """測試獲取特定軸承的溫度資訊"""
-    response = client.get(f"/api/temperature/bearing/{test_bearing_name}")
-
-    # 如果軸承不存在，返回 404
-    if response.status_code == 404:
-        assert "not found" in response.json()["detail"].lower()
-    else:
-        assert response.status_code == 200
-        data = response.json()
-        assert "bearing_info" in data
-        assert "files" in data
-
-
-# ========================================================================
-# Real-time Streaming API Endpoints (即時串流 API 端點)
-# ========================================================================
-
-@pytest.mark.api
-def test_get_stream_status(client):
-    """測試獲取串流狀態"""
-    response = client.get("/api/stream/status")
-    assert response.status_code == 200
-
-    data = response.json()
-    assert "active_streams" in data
-    assert "active_connections" in data
-
-
+
+
+@pytest.mark.api
+def test_get_temperature_statistics(client):
+    """測試獲取溫度統計資訊"""
+    response = client.get("/api/temperature/statistics")
+    assert response.status_code == 200
+
+    data = response.json()
+    assert "statistics" in data
+
+
+@pytest.mark.api
+def test_get_temperature_bearing_info(client, test_bearing_name):
+    """測試獲取特定軸承的溫度資訊"""
+    response = client.get(f"/api/temperature/bearing/{test_bearing_name}")
+
+    # 如果軸承不存在，返回 404
+    if response.status_code == 404:
+        assert "not found" in response.json()["detail"].lower()
+    else:
+        assert response.status_code == 200
+        data = response.json()
+        assert "bearing_info" in data
+        assert "files" in data
+
+
+# ========================================================================
+# Real-time Streaming API Endpoints (即時串流 API 端點)
+# ========================================================================
+
+@pytest.mark.api
+def test_get_stream_status(client):
+    """測試獲取串流狀態"""
+    response = client.get("/api/stream/status")
+    assert response.status_code == 200
+
+    data = response.json()
+    assert "active_streams" in data
+    assert "active_connections" in data
+
+
 @pytest.mark.api
 def test_get_sensors(client):
     """測試獲取所有已註冊的感測器"""
@@ -368,8 +368,8 @@ def test_get_sensors(client):
     else:
         # 如果 async_db 未初始化或數據庫不可用，500 是可接受的
         assert response.status_code in [500, 503]
-
-
+
+
 @pytest.mark.api
 def test_get_sensor_status(client, test_sensor_id):
     """測試獲取特定感測器的狀態"""
@@ -385,91 +385,162 @@ def test_get_sensor_status(client, test_sensor_id):
     else:
         # 如果 async_db 未初始化或數據庫不可用，500 是可接受的
         assert response.status_code in [500, 503]
-
-
-@pytest.mark.api
-def test_get_pubsub_channels(client):
-    """測試獲取 Redis Pub/Sub 頻道資訊"""
-    response = client.get("/api/pubsub/channels")
-    assert response.status_code == 200
-
-    data = response.json()
-    assert "channels" in data
-    assert "description" in data
-
-
-@pytest.mark.api
-def test_get_pubsub_status(client):
-    """測試獲取 Redis Pub/Sub 狀態"""
-    response = client.get("/api/pubsub/status")
-    assert response.status_code == 200
-
-    data = response.json()
-    assert "pubsub_enabled" in data
-    assert "listener_running" in data
-
-
-# ========================================================================
-# Error Handling Tests (錯誤處理測試)
-# ========================================================================
-
-@pytest.mark.api
-def test_nonexistent_endpoint(client):
-    """測試不存在的端點返回 404"""
-    response = client.get("/api/nonexistent")
-    assert response.status_code == 404
-
-
-@pytest.mark.api
-def test_invalid_bearing_name(client):
-    """測試無效的軸承名稱"""
-    response = client.get("/api/phm/database/bearing/INVALID-999")
-    assert response.status_code == 404
-
-
-@pytest.mark.api
-def test_invalid_file_number(client, test_bearing_name):
-    """測試無效的檔案編號"""
-    response = client.get(
-        f"/api/phm/database/bearing/{test_bearing_name}/file/99999/data"
-    )
-    # 可能返回 404 或 500，取決於實現
-    assert response.status_code in [404, 500]
-
-
-# ========================================================================
-# POST Request Tests (POST 請求測試)
-# ========================================================================
-
-@pytest.mark.api
-def test_ingest_sensor_data(client, sample_sensor_data):
-    """測試接收感測器數據（批量）"""
-    response = client.post(
-        "/api/sensor/data",
-        json=sample_sensor_data
-    )
-
-    # 如果 real-time 組件未啟用，可能返回錯誤
-    if response.status_code != 200:
-        # 檢查是否是預期的錯誤（例如 real-time 未啟用）
-        assert response.status_code in [500, 422]
-    else:
-        assert response.status_code == 200
-        data = response.json()
-        assert "status" in data
-        assert data["status"] == "success"
-
-
-@pytest.mark.api
-def test_publish_message(client):
-    """測試發布訊息到 Redis 頻道"""
-    response = client.post(
-        "/api/pubsub/publish",
-        json={
-            "channel": "test:channel",
-            "message": {"type": "test", "data": "test message"}
-        }
-    )
-
-    # 可能返回成功或錯誤（取決於 Redis 連接）
-    assert response.status_code in [200, 500]
+
+
+@pytest.mark.api
+def test_get_feature_registry(client):
+    """測試獲取即時特徵 registry"""
+    response = client.get("/api/realtime/feature-registry")
+    assert response.status_code == 200
+
+    data = response.json()
+    names = {feature["name"] for feature in data["features"]}
+    assert {"rms", "kurtosis", "na4", "nb4", "fm0"} <= names
+    assert set(data["defaults"]) <= names
+
+
+@pytest.mark.api
+def test_set_sensor_features_rejects_unknown(client, test_sensor_id):
+    """測試設定未註冊的特徵時返回 400"""
+    response = client.put(
+        f"/api/realtime/sensors/{test_sensor_id}/features",
+        json={"features": ["rms", "not_a_feature"]}
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.api
+def test_feature_history_rejects_invalid_range(client, test_sensor_id):
+    """測試特徵歷史查詢的時間範圍或 rollup level 不合法時返回 400"""
+    response = client.get(
+        f"/api/realtime/sensors/{test_sensor_id}/history",
+        params={"start": "2026-01-21T00:00:00", "end": "2026-01-20T00:00:00"}
+    )
+    assert response.status_code == 400
+
+    response = client.get(
+        f"/api/realtime/sensors/{test_sensor_id}/history",
+        params={"level": "5m"}
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.api
+def test_feature_history_accepts_naive_start_only(client, test_sensor_id, monkeypatch):
+    """測試只給未帶時區的 start 時視為 UTC，超過 max_points 的範圍只保留最近的 bucket"""
+    import backend.main as main_module
+
+    calls = []
+
+    async def fake_history(sensor_id, names, start, end, level):
+        calls.append((start, end, level))
+        return {name: [] for name in names}
+
+    monkeypatch.setattr(main_module.async_db, "get_feature_history", fake_history)
+
+    naive_start = (datetime.now(timezone.utc) - timedelta(hours=2)).replace(tzinfo=None, microsecond=0)
+    response = client.get(
+        f"/api/realtime/sensors/{test_sensor_id}/history",
+        params={"start": naive_start.isoformat()}
+    )
+    assert response.status_code == 200
+    start, end, _ = calls[-1]
+    assert start == naive_start.replace(tzinfo=timezone.utc)
+    assert end.tzinfo is not None and start < end
+
+    response = client.get(
+        f"/api/realtime/sensors/{test_sensor_id}/history",
+        params={"start": "2020-01-01T00:00:00", "end": "2026-01-20T00:00:00+00:00", "max_points": 100}
+    )
+    assert response.status_code == 200
+    start, end, level = calls[-1]
+    assert level == "1h"
+    assert (end - start).total_seconds() == 100 * 3600
+
+
+@pytest.mark.api
+def test_get_pubsub_channels(client):
+    """測試獲取 Redis Pub/Sub 頻道資訊"""
+    response = client.get("/api/pubsub/channels")
+    assert response.status_code == 200
+
+    data = response.json()
+    assert "channels" in data
+    assert "description" in data
+
+
+@pytest.mark.api
+def test_get_pubsub_status(client):
+    """測試獲取 Redis Pub/Sub 狀態"""
+    response = client.get("/api/pubsub/status")
+    assert response.status_code == 200
+
+    data = response.json()
+    assert "pubsub_enabled" in data
+    assert "listener_running" in data
+
+
+# ========================================================================
+# Error Handling Tests (錯誤處理測試)
+# ========================================================================
+
+@pytest.mark.api
+def test_nonexistent_endpoint(client):
+    """測試不存在的端點返回 404"""
+    response = client.get("/api/nonexistent")
+    assert response.status_code == 404
+
+
+@pytest.mark.api
+def test_invalid_bearing_name(client):
+    """測試無效的軸承名稱"""
+    response = client.get("/api/phm/database/bearing/INVALID-999")
+    assert response.status_code == 404
+
+
+@pytest.mark.api
+def test_invalid_file_number(client, test_bearing_name):
+    """測試無效的檔案編號"""
+    response = client.get(
+        f"/api/phm/database/bearing/{test_bearing_name}/file/99999/data"
+    )
+    # 可能返回 404 或 500，取決於實現
+    assert response.status_code in [404, 500]
+
+
+# ========================================================================
+# POST Request Tests (POST 請求測試)
+# ========================================================================
+
+@pytest.mark.api
+def test_ingest_sensor_data(client, sample_sensor_data):
+    """測試接收感測器數據（批量）"""
+    response = client.post(
+        "/api/sensor/data",
+        json=sample_sensor_data
+    )
+
+    # 如果 real-time 組件未啟用，可能返回錯誤
+    if response.status_code != 200:
+        # 檢查是否是預期的錯誤（例如 real-time 未啟用）
+        assert response.status_code in [500, 422]
+    else:
+        assert response.status_code == 200
+        data = response.json()
+        assert "status" in data
+        assert data["status"] == "success"
+
+
+@pytest.mark.api
+def test_publish_message(client):
+    """測試發布訊息到 Redis 頻道"""
+    response = client.post(
+        "/api/pubsub/publish",
+        json={
+            "channel": "test:channel",
+            "message": {"type": "test", "data": "test message"}
+        }
+    )
+
+    # 可能返回成功或錯誤（取決於 Redis 連接）
+    assert response.status_code in [200, 500]
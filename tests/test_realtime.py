@@ -0,0 +1,1008 @@
+"""
+Real-time Pipeline Tests
+
+測試即時分析管線中不依賴 Redis / PostgreSQL 服務的部分：
+資料編碼、緩衝區與特徵計算。
+"""
+import pytest
+import numpy as np
+from datetime import datetime, timedelta, timezone
+
+# ========================================================================
+# Redis Chunk Encoding Tests (Redis chunk 編碼測試)
+# ========================================================================
+
+@pytest.mark.unit
+def test_sensor_chunk_round_trip():
+    """測試 packed chunk 編碼後可還原為相同的 NumPy 陣列"""
+    from backend.redis_client import pack_sensor_chunk, unpack_sensor_chunk
+
+    start = datetime(2026, 1, 20, 10, 30, 0, 123000)
+    h = np.random.randn(2560)
+    v = np.random.randn(2560)
+
+    chunk = unpack_sensor_chunk(pack_sensor_chunk(start, 25600.0, h, v))
+
+    assert chunk['start_time'] == start
+    assert chunk['sampling_rate'] == 25600.0
+    assert chunk['sample_count'] == 2560
+    assert chunk['h_acc'].dtype == np.float32
+    np.testing.assert_array_equal(chunk['h_acc'], h.astype(np.float32))
+    np.testing.assert_array_equal(chunk['v_acc'], v.astype(np.float32))
+
+
+@pytest.mark.unit
+def test_sensor_chunk_keeps_timezone():
+    """測試帶時區的起始時間在還原後保留 UTC offset"""
+    from backend.redis_client import pack_sensor_chunk, unpack_sensor_chunk
+
+    start = datetime(2026, 1, 20, 10, 30, tzinfo=timezone(timedelta(hours=8)))
+    chunk = unpack_sensor_chunk(pack_sensor_chunk(start, 1000, [0.5], [0.25]))
+
+    assert chunk['start_time'] == start
+    assert chunk['start_time'].utcoffset() == timedelta(hours=8)
+
+
+@pytest.mark.unit
+def test_sensor_chunk_rejects_mismatched_channels():
+    """測試水平 / 垂直通道長度不一致時拋出錯誤"""
+    from backend.redis_client import pack_sensor_chunk
+
+    with pytest.raises(ValueError):
+        pack_sensor_chunk(datetime.now(), 25600, np.zeros(10), np.zeros(9))
+
+
+@pytest.mark.unit
+def test_infer_sampling_rate_from_timestamps():
+    """測試由批次時間戳推算取樣率"""
+    from backend.buffer_manager import BufferManager
+
+    start = datetime(2026, 1, 20, 10, 30)
+    data = [
+        {'timestamp': start + timedelta(microseconds=i * 1000), 'h_acc': 0.0, 'v_acc': 0.0}
+        for i in range(101)
+    ]
+
+    assert BufferManager._infer_sampling_rate(data) == pytest.approx(1000.0)
+    assert BufferManager._infer_sampling_rate(data[:1]) == 25600.0
+
+
+# ========================================================================
+# Sensor Buffer Tests (感測器緩衝區測試)
+# ========================================================================
+
+@pytest.mark.unit
+def test_sensor_buffer_add_block_keeps_tail():
+    """測試以 chunk 重建緩衝區時只保留最後 buffer_size 個樣本與正確時間戳"""
+    from backend.buffer_manager import SensorBuffer
+
+    buffer = SensorBuffer(sensor_id=1, buffer_size=1000)
+    start = datetime(2026, 1, 20, 10, 30)
+    h = np.arange(1500, dtype=np.float32)
+    v = -h
+
+    buffer.add_block(start, 1000.0, h, v)
+
+    assert len(buffer) == 1000
+    assert buffer.sample_count == 1000
+    assert buffer.latest(1000)[0, 0] == 500.0
+    assert buffer.latest(1000)[1, -1] == -1499.0
+    info = buffer.window_info()
+    assert info['window_start'] == start + timedelta(seconds=0.5)
+    assert info['window_end'] == start + timedelta(seconds=1.499)
+    assert buffer.is_ready(min_samples=1000)
+
+
+@pytest.mark.unit
+def test_sensor_buffer_ring_wraps():
+    """測試環形緩衝區跨越尾端寫入時，最新樣本、時間範圍與窗口資料仍依時間排序"""
+    from datetime import timezone
+    from backend.buffer_manager import SensorBuffer
+
+    buffer = SensorBuffer(sensor_id=1, buffer_size=100)
+    start = datetime(2026, 1, 20, 10, 30, tzinfo=timezone.utc)
+    samples = [
+        {'timestamp': start + timedelta(milliseconds=i), 'h_acc': float(i), 'v_acc': -float(i)}
+        for i in range(250)
+    ]
+    buffer.add_batch(samples[:70])
+    buffer.add_batch(samples[70:130])
+    buffer.add_sample(samples[130]['timestamp'], 130.0, -130.0)
+    buffer.add_batch(samples[131:250])
+
+    assert len(buffer) == 100
+    assert buffer.sample_count == 250
+    np.testing.assert_array_equal(buffer.latest(5), [np.arange(245, 250), -np.arange(245, 250)])
+
+    window = buffer.get_window(0.05)
+    np.testing.assert_array_equal(window['h_data'], np.arange(199, 250))
+    assert window['window_start'] == start + timedelta(milliseconds=199)
+    assert window['window_end'] == start + timedelta(milliseconds=249)
+
+    # 窗口內樣本少於緩衝區一半時返回全部樣本
+    window = buffer.get_window(0.01)
+    np.testing.assert_array_equal(window['v_data'], -np.arange(150, 250))
+
+
+# ========================================================================
+# Real-time Analyzer Tests (即時分析引擎測試)
+# ========================================================================
+
+@pytest.mark.unit
+def test_analyzer_runs_once_per_hop():
+    """測試分析器由資料到達事件驅動，每累積一個 hop 的新樣本才分析一次"""
+    import asyncio
+    from backend.buffer_manager import BufferManager
+    from backend.realtime_analyzer import RealTimeAnalyzer
+
+    class RecordingAnalyzer(RealTimeAnalyzer):
+        async def _extract_features(self, window_data, new_samples=None):
+            windows.append(window_data['sample_count'])
+            return {}
+
+        async def _save_features(self, sensor_id, features):
+            pass
+
+        async def _check_alerts(self, sensor_id, features):
+            pass
+
+    windows = []
+    start = datetime(2026, 1, 20, 10, 30)
+
+    def batch(offset, n):
+        return [
+            {'timestamp': start + timedelta(milliseconds=offset + i), 'h_acc': 0.1, 'v_acc': 0.2}
+            for i in range(n)
+        ]
+
+    async def scenario():
+        buffers = BufferManager()
+        analyzer = RecordingAnalyzer(buffers, hop_seconds=0.5)
+
+        await buffers.add_data(1, batch(0, 10000), sampling_rate=1000)
+        await analyzer.start_analysis(1)
+        await asyncio.sleep(0.05)
+        first = len(windows)
+
+        # 沒有新資料時不應重複分析
+        await asyncio.sleep(0.05)
+        idle = len(windows)
+
+        # 新樣本不足一個 hop (500 點) 時不分析，累積足夠後才分析
+        await buffers.add_data(1, batch(10000, 300), sampling_rate=1000)
+        await asyncio.sleep(0.05)
+        partial = len(windows)
+        await buffers.add_data(1, batch(10300, 300), sampling_rate=1000)
+        await asyncio.sleep(0.05)
+        full = len(windows)
+
+        await analyzer.stop_analysis(1)
+        return first, idle, partial, full
+
+    assert asyncio.run(scenario()) == (1, 1, 1, 2)
+
+
+# ========================================================================
+# Sliding Window Statistics Tests (滑動窗口統計量測試)
+# ========================================================================
+
+@pytest.mark.unit
+def test_sliding_stats_match_full_recomputation():
+    """測試增量統計量與整個窗口重新計算的結果一致"""
+    from backend.sliding_stats import SlidingWindowStats
+    from backend.filterprocess import FilterProcess
+
+    rng = np.random.default_rng(0)
+    data = rng.standard_normal(20000) * 3 + 5
+    data[::997] *= 8
+
+    stats = SlidingWindowStats(4096, max_order=8, reanchor_interval=10000)
+    pos = 0
+    while pos < data.size:
+        chunk = data[pos:pos + int(rng.integers(1, 1500))]
+        pos += chunk.size
+        stats.update(chunk)
+
+        window = data[max(0, pos - 4096):pos]
+        features = stats.features()
+        deviation = window - window.mean()
+        m2 = np.mean(deviation ** 2)
+
+        assert features['rms'] == pytest.approx(np.sqrt(np.mean(window ** 2)), rel=1e-9)
+        assert features['peak'] == np.max(np.abs(window))
+        assert features['kurtosis'] == pytest.approx(np.mean(deviation ** 4) / m2 ** 2, rel=1e-9)
+        assert features['m6a'] == pytest.approx(FilterProcess.M6A(window), rel=1e-9)
+        assert features['m8a'] == pytest.approx(FilterProcess.M8A(window), rel=1e-9)
+
+
+@pytest.mark.unit
+def test_sliding_stats_large_update_replaces_window():
+    """測試一次更新超過窗口長度時只保留最後 window_size 個樣本"""
+    from backend.sliding_stats import SlidingWindowStats
+
+    stats = SlidingWindowStats(100)
+    stats.update(np.full(50, 100.0))
+    stats.update(np.arange(250, dtype=float))
+
+    np.testing.assert_array_equal(stats.window(), np.arange(150, 250, dtype=float))
+    assert stats.peak() == 249.0
+    assert stats.mean() == pytest.approx(199.5)
+
+
+# ========================================================================
+# Streaming Spectrum Tests (串流頻譜測試)
+# ========================================================================
+
+@pytest.mark.unit
+def test_streaming_spectrum_matches_welch():
+    """測試串流頻譜與 scipy.signal.welch 對相同窗口的結果一致"""
+    from scipy import signal
+    from backend.streaming_spectrum import StreamingSpectrum
+
+    fs = 25600
+    rng = np.random.default_rng(1)
+    t = np.arange(20 * 512) / fs
+    data = np.sin(2 * np.pi * 1500 * t) + 0.1 * rng.standard_normal(t.size)
+
+    spectrum = StreamingSpectrum(fs, window_size=1024 + 512 * 9, frame_size=1024)
+    pos = 0
+    while pos < data.size:
+        chunk = data[pos:pos + int(rng.integers(1, 900))]
+        pos += chunk.size
+        spectrum.update(chunk)
+
+    freqs, psd = signal.welch(data[-spectrum.frame_size - 512 * 9:], fs,
+                              nperseg=1024, noverlap=512)
+
+    assert spectrum.n_frames == 10
+    np.testing.assert_allclose(spectrum.freqs, freqs)
+    np.testing.assert_allclose(spectrum.psd(), psd, rtol=1e-9, atol=1e-15)
+    assert spectrum.dominant_frequency() == pytest.approx(1500, abs=spectrum.df)
+
+
+@pytest.mark.unit
+def test_streaming_spectrum_tracks_bearing_bands():
+    """測試追蹤頻帶能量集中在對應的軸承特徵頻率"""
+    from backend.streaming_spectrum import StreamingSpectrum
+
+    fs = 25600
+    t = np.arange(fs) / fs
+    data = 2.0 * np.sin(2 * np.pi * 156.59 * t)
+
+    spectrum = StreamingSpectrum(fs)
+    spectrum.update(data)
+    powers = spectrum.band_powers()
+
+    assert set(powers) == {'shaft', 'bpfo', 'bpfi'}
+    assert powers['bpfo'] > 100 * powers['bpfi']
+    assert powers['bpfo'] > 100 * powers['shaft']
+
+
+# ========================================================================
+# Feature Registry Tests (特徵 registry 測試)
+# ========================================================================
+
+@pytest.mark.unit
+def test_feature_registry_shares_intermediates():
+    """測試共用中間結果在 DAG 中只出現一次"""
+    from backend.feature_registry import feature_registry
+
+    plan = feature_registry.plan(['fm0', 'mgs', 'bi', 'er', 'nb4'])
+
+    assert plan.count('fm0_si') == 1
+    assert plan.count('spectrum') == 1
+    assert plan.index('fm0_si') < plan.index('fm0')
+    assert feature_registry.estimate_cost(['fm0', 'mgs']) < \
+        feature_registry.estimate_cost(['fm0']) + feature_registry.estimate_cost(['mgs'])
+
+
+@pytest.mark.unit
+def test_feature_registry_matches_batch_features():
+    """測試 registry 計算結果與批次端點使用的演算法一致"""
+    from backend.feature_registry import feature_registry
+    from backend.sliding_stats import SlidingWindowStats
+    from backend.streaming_spectrum import StreamingSpectrum
+    from backend.filterprocess import FilterProcess
+    from backend.hilberttransform import HilbertTransform
+
+    fs = 25600
+    x = np.random.default_rng(2).standard_normal(fs)
+    stats = SlidingWindowStats(x.size, max_order=8)
+    stats.update(x)
+    context = {
+        'window': x,
+        'stats': stats,
+        'welch': StreamingSpectrum(fs),
+        'sampling_rate': fs,
+    }
+    context['welch'].update(x)
+
+    values = feature_registry.compute(['fm4', 'm6a', 'm8a', 'na4', 'er', 'nb4'], context)
+
+    assert values['fm4'] == pytest.approx(FilterProcess.FM4(x))
+    assert values['m6a'] == pytest.approx(FilterProcess.M6A(x))
+    assert values['m8a'] == pytest.approx(FilterProcess.M8A(x))
+    assert values['na4'] == pytest.approx(FilterProcess.NA4(x)[0])
+    assert values['er'] == pytest.approx(FilterProcess.ER_simple(x, fs))
+    assert values['nb4'] == pytest.approx(
+        HilbertTransform().analyze_signal(x)['nb4']
+    )
+
+
+@pytest.mark.unit
+def test_feature_registry_tiers():
+    """測試 slow tier 特徵只在到期的 tick 計算"""
+    from backend.feature_registry import feature_registry, TIER_INTERVALS
+
+    enabled = ['rms', 'na4']
+    assert feature_registry.due_features(enabled, 0) == ['na4', 'rms']
+    if TIER_INTERVALS['slow'] > 1:
+        assert feature_registry.due_features(enabled, 1) == ['rms']
+    assert feature_registry.validate(['rms', 'bogus']) == ['bogus']
+
+
+# ========================================================================
+# Analysis Executor Tests (分析執行器測試)
+# ========================================================================
+
+@pytest.mark.unit
+def test_analysis_executor_workers_match_inline():
+    """測試分片 worker (shared memory) 與 event loop 內計算的特徵一致"""
+    import asyncio
+    from backend.analysis_executor import AnalysisExecutor
+    from backend.buffer_manager import SensorBuffer
+
+    data = np.random.default_rng(3).standard_normal((2, 40000))
+    enabled = {'rms', 'kurtosis', 'm6a', 'na4', 'nb4', 'dominant_freq'}
+
+    buffer = SensorBuffer(sensor_id=1, buffer_size=25600)
+    start = datetime(2026, 1, 20, 10, 30)
+    buffer.add_block(start, 25600.0, data[0, :19200], data[1, :19200])
+
+    async def scenario():
+        inline = AnalysisExecutor(workers=0)
+        sharded = AnalysisExecutor(workers=2)
+        try:
+            for end in range(25600, 40000, 6400):
+                buffer.add_block(start, 25600.0, data[0, end - 6400:end], data[1, end - 6400:end])
+                args = (buffer.samples, buffer.head, len(buffer), 6400, 25600.0, enabled)
+                expected = await inline.process(1, *args)
+                for sensor_id in (1, 2):
+                    result = await sharded.process(sensor_id, *args)
+                    assert result == expected
+                # 之後的 tick 只複製新樣本，shared memory 仍與環形緩衝區一致
+                mirror = np.ndarray((2, 25600), dtype=np.float64, buffer=sharded.segments[2].buf)
+                np.testing.assert_array_equal(mirror, buffer.samples)
+            await sharded.release(1)
+            return expected
+        finally:
+            sharded.shutdown()
+
+    features = asyncio.run(scenario())
+    assert set(features) == {f'{name}_{c}' for name in enabled for c in ('h', 'v')}
+
+
+# ========================================================================
+# Partition Manager Tests (感測器分區測試)
+# ========================================================================
+
+@pytest.mark.unit
+def test_preferred_owner_moves_few_sensors():
+    """測試新增實例時只有改由新實例負責的感測器會移動"""
+    from backend.partition_manager import preferred_owner
+
+    sensors = range(300)
+    before = {s: preferred_owner(s, ['a', 'b', 'c']) for s in sensors}
+    after = {s: preferred_owner(s, ['a', 'b', 'c', 'd']) for s in sensors}
+
+    moved = [s for s in sensors if before[s] != after[s]]
+    assert all(after[s] == 'd' for s in moved)
+    assert 40 < len(moved) < 110
+    assert preferred_owner(1, []) is None
+
+
+@pytest.mark.unit
+def test_partition_manager_disabled_processes_locally():
+    """測試未啟用分區時所有感測器都在本實例處理"""
+    import asyncio
+    from backend.buffer_manager import BufferManager
+    from backend.partition_manager import PartitionManager
+
+    buffers = BufferManager()
+    partitions = PartitionManager(buffers, analyzer=None, instance_id='a', enabled=False)
+    start = datetime(2026, 1, 20, 10, 30)
+    data = [{'timestamp': start, 'h_acc': 0.1, 'v_acc': 0.2}]
+
+    assert partitions.is_local(7)
+    assert asyncio.run(partitions.ingest(7, data)) is None
+    assert len(buffers.buffers[7]) == 1
+
+
+class _ClusterRedis:
+    """兩個實例共用的假 Redis：只實作租約同步與特徵設定"""
+
+    _is_connected = True
+
+    def __init__(self, owners):
+        self.owners = dict(owners)
+        self.features = {}
+
+    async def heartbeat_instance(self, instance_id, ttl_ms):
+        pass
+
+    async def get_live_instances(self):
+        return ['a', 'b']
+
+    async def get_sensor_owners(self):
+        return dict(self.owners)
+
+    async def get_active_analyses(self):
+        return []
+
+    async def get_recent_chunk_sensors(self, max_age_seconds):
+        return []
+
+    async def renew_sensor_lease(self, sensor_id, instance_id, ttl_ms):
+        return self.owners.get(sensor_id) == instance_id
+
+    async def set_feature_config(self, sensor_id, features):
+        self.features[sensor_id] = list(features)
+
+    async def get_feature_config(self, sensor_id):
+        return self.features.get(sensor_id)
+
+    async def get_feature_configs(self, sensor_ids):
+        return {s: self.features[s] for s in sensor_ids if s in self.features}
+
+
+@pytest.mark.unit
+def test_feature_config_set_on_non_owner_reaches_owner(monkeypatch):
+    """測試在非擁有者實例設定特徵時，擁有者於下次同步載入新設定，兩個實例查詢結果一致"""
+    import asyncio
+    import backend.partition_manager as partition_module
+    from backend.buffer_manager import BufferManager
+
+    sensor_id = next(s for s in range(100) if partition_module.preferred_owner(s, ['a', 'b']) == 'a')
+    redis = _ClusterRedis({sensor_id: 'a'})
+    monkeypatch.setattr(partition_module, 'redis_client', redis)
+
+    def instance(instance_id):
+        partitions = partition_module.PartitionManager(
+            BufferManager(), partition_module.RealTimeAnalyzer(BufferManager()),
+            instance_id=instance_id, enabled=True
+        )
+        partitions.owned = {sensor_id} if instance_id == 'a' else set()
+        partitions.owners = dict(redis.owners)
+        partitions.live_instances = ['a', 'b']
+        return partitions
+
+    owner, other = instance('a'), instance('b')
+
+    async def scenario():
+        await other.set_enabled_features(sensor_id, ['rms', 'na4'])
+        with pytest.raises(ValueError):
+            await other.set_enabled_features(sensor_id, ['bogus'])
+        assert await other.get_enabled_features(sensor_id) == {'rms', 'na4'}
+        assert other.analyzer.enabled_features == {}
+
+        await owner.sync()
+        return await owner.get_enabled_features(sensor_id)
+
+    assert asyncio.run(scenario()) == {'rms', 'na4'}
+    assert owner.analyzer.get_enabled_features(sensor_id) == {'rms', 'na4'}
+
+
+# ========================================================================
+# Batched Persistence Tests (批次寫入與警報配置快取測試)
+# ========================================================================
+
+class _FakeConnection:
+    """記錄 COPY / 查詢呼叫的假連線"""
+
+    def __init__(self):
+        self.copies = []
+        self.queries = 0
+
+    async def copy_records_to_table(self, table, records, columns):
+        self.copies.append((table, list(records), columns))
+
+    async def fetch(self, query, *args):
+        self.queries += 1
+        return [
+            {'sensor_id': 1, 'feature_name': 'rms_h', 'threshold_max': 1.0},
+            {'sensor_id': 2, 'feature_name': 'kurtosis_v', 'threshold_max': 6.0},
+        ]
+
+
+class _FakePool:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def acquire(self):
+        pool = self
+
+        class _Acquire:
+            async def __aenter__(self):
+                return pool.connection
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return _Acquire()
+
+
+def _fake_database():
+    from backend.database_async import AsyncDatabase
+
+    database = AsyncDatabase()
+    connection = _FakeConnection()
+    database.pool = _FakePool(connection)
+    database._is_connected = True
+    return database, connection
+
+
+@pytest.mark.unit
+def test_feature_rows_flushed_with_single_copy():
+    """測試多個 tick 的特徵累積後以一次 COPY 寫入"""
+    import asyncio
+    from backend.database_async import FEATURE_COLUMNS
+
+    database, connection = _fake_database()
+    start = datetime(2026, 1, 20, 10, 30)
+
+    for i in range(20):
+        database.enqueue_features(i % 2, {
+            'window_start': start, 'window_end': start + timedelta(seconds=1),
+            'rms_h': float(i), 'dominant_freq_v': 100.0
+        })
+
+    assert asyncio.run(database.flush_features()) == 20
+    assert asyncio.run(database.flush_features()) == 0
+
+    assert len(connection.copies) == 1
+    table, records, columns = connection.copies[0]
+    assert table == 'realtime_features'
+    assert columns == FEATURE_COLUMNS
+    assert records[3][0] == 1
+    assert records[3][columns.index('rms_h')] == 3.0
+    assert records[3][columns.index('fm0_h')] is None
+    assert records[3][columns.index('extra_features')] is None
+
+
+@pytest.mark.unit
+def test_feature_flush_splits_rejected_batches():
+    """測試被拒絕的批次會分割重試，只有壞掉的列進入 dead letter；registry 額外特徵存入 JSONB"""
+    import asyncio
+    import json
+    import asyncpg
+    from backend.database_async import FEATURE_COLUMNS
+
+    database, connection = _fake_database()
+    start = datetime(2026, 1, 20, 10, 30)
+    written = []
+
+    async def copy_records_to_table(table, records, columns):
+        if any(record[columns.index('rms_h')] < 0 for record in records):
+            raise asyncpg.exceptions.NumericValueOutOfRangeError('numeric field overflow')
+        written.extend(records)
+
+    connection.copy_records_to_table = copy_records_to_table
+
+    for i in range(10):
+        database.enqueue_features(1, {
+            'window_start': start, 'window_end': start + timedelta(seconds=1),
+            'rms_h': -1.0 if i == 6 else float(i), 'm6a_h': 2.5, 'na4_v': float('nan')
+        })
+
+    assert asyncio.run(database.flush_features()) == 9
+    assert asyncio.run(database.flush_features()) == 0
+    assert sorted(record[FEATURE_COLUMNS.index('rms_h')] for record in written) == [0, 1, 2, 3, 4, 5, 7, 8, 9]
+    assert database.get_feature_write_status() == {'queued_rows': 0, 'dead_lettered_rows': 1}
+    assert database.dead_letter_features[0][0][FEATURE_COLUMNS.index('rms_h')] == -1.0
+    assert json.loads(written[0][FEATURE_COLUMNS.index('extra_features')]) == {'m6a_h': 2.5, 'na4_v': None}
+
+
+@pytest.mark.unit
+def test_feature_flush_requeues_only_unsent_rows_after_connection_loss():
+    """測試分割重試時前半批已寫入、後半批連線中斷，只有未寫入的列放回佇列"""
+    import asyncio
+    import asyncpg
+    from backend.database_async import FEATURE_COLUMNS
+
+    database, connection = _fake_database()
+    start = datetime(2026, 1, 20, 10, 30)
+    written = []
+    outage = {'copies_left': 2}
+
+    async def copy_records_to_table(table, records, columns):
+        if any(record[columns.index('rms_h')] < 0 for record in records):
+            raise asyncpg.exceptions.NumericValueOutOfRangeError('numeric field overflow')
+        if outage['copies_left'] is not None:
+            if outage['copies_left'] == 0:
+                raise ConnectionError('connection lost')
+            outage['copies_left'] -= 1
+        written.extend(records)
+
+    connection.copy_records_to_table = copy_records_to_table
+
+    for i in range(10):
+        database.enqueue_features(1, {
+            'window_start': start, 'window_end': start + timedelta(seconds=1),
+            'rms_h': -1.0 if i == 8 else float(i)
+        })
+
+    # 0-9 被拒 → 0-4 寫入 → 5-9 被拒 → 5-6 寫入 → 7-9 連線中斷
+    assert asyncio.run(database.flush_features()) == 7
+    assert database.get_feature_write_status() == {'queued_rows': 3, 'dead_lettered_rows': 0}
+
+    outage['copies_left'] = None
+    assert asyncio.run(database.flush_features()) == 2
+    assert [record[FEATURE_COLUMNS.index('rms_h')] for record in written] == [0, 1, 2, 3, 4, 5, 6, 7, 9]
+    assert database.get_feature_write_status() == {'queued_rows': 0, 'dead_lettered_rows': 1}
+
+
+@pytest.mark.unit
+def test_alert_configurations_cached_until_notify():
+    """測試警報配置由快取提供，收到 NOTIFY 後才重新查詢"""
+    import asyncio
+
+    database, connection = _fake_database()
+
+    async def scenario():
+        first = await database.get_alert_configurations(1)
+        for _ in range(10):
+            await database.get_alert_configurations(2)
+        cached_queries = connection.queries
+
+        database._on_alert_config_notify(None, 0, 'alert_config_changed', '')
+        await database.get_alert_configurations(1)
+        return first, cached_queries, connection.queries, await database.get_alert_configurations(3)
+
+    first, cached_queries, reloaded_queries, missing = asyncio.run(scenario())
+    assert [c['feature_name'] for c in first] == ['rms_h']
+    assert cached_queries == 1
+    assert reloaded_queries == 2
+    assert missing == []
+
+
+# ========================================================================
+# Raw Archiving Tests (原始資料封存測試)
+# ========================================================================
+
+@pytest.mark.unit
+def test_sample_timestamps_match_timedelta_loop():
+    """測試向量化時間戳與逐樣本 timedelta 計算一致（含時區）"""
+    from backend.database_async import sample_timestamps
+
+    for start in (datetime(2026, 1, 20, 10, 30, 0, 123000),
+                  datetime(2026, 1, 20, 10, 30, tzinfo=timezone(timedelta(hours=8)))):
+        expected = [start + timedelta(microseconds=i * (1e6 / 25600)) for i in range(100, 3000)]
+        assert sample_timestamps(start, 25600, 2900, first=100) == expected
+
+
+@pytest.mark.unit
+def test_archive_chunks_and_rows_use_copy():
+    """測試原始資料以 COPY 封存：chunk 模式一列一個 chunk，row 模式一列一個樣本"""
+    import asyncio
+
+    database, connection = _fake_database()
+    start = datetime(2026, 1, 20, 10, 30)
+    chunks = [
+        {'sensor_id': s, 'start_time': start, 'sampling_rate': 1000.0,
+         'h_acc': np.arange(4, dtype=np.float32), 'v_acc': -np.arange(4, dtype=np.float32)}
+        for s in (1, 2)
+    ]
+
+    assert asyncio.run(database.archive_sensor_chunks(chunks)) == 8
+    assert asyncio.run(database.archive_sensor_rows(chunks)) == 8
+
+    (chunk_table, chunk_records, _), (row_table, row_records, _) = connection.copies
+    assert chunk_table == 'sensor_data_chunks'
+    assert chunk_records[1] == (2, start, 1000.0, 4, [0.0, 1.0, 2.0, 3.0], [0.0, -1.0, -2.0, -3.0])
+    assert row_table == 'sensor_data'
+    assert len(row_records) == 8
+    assert row_records[5] == (2, start + timedelta(milliseconds=1), 1.0, -1.0)
+
+
+@pytest.mark.unit
+def test_archiver_dead_letters_chunks_rejected_too_often(monkeypatch):
+    """測試被資料庫拒絕的 chunk 達到投遞上限後移入 dead-letter stream，其他 chunk 照常封存"""
+    import asyncio
+    import asyncpg
+    from backend import raw_archiver as archiver_module
+
+    chunks = [{'sensor_id': 1, 'entry_id': f'1-{i}', 'bad': i == 1} for i in range(3)]
+    pending_entries = {chunk['entry_id']: chunk for chunk in chunks}
+    deliveries = {chunk['entry_id']: 0 for chunk in chunks}
+    archived, dead = [], []
+
+    class FakeRedis:
+        async def read_chunk_group(self, sensor_ids, group, consumer, pending=False, **kwargs):
+            for entry_id in pending_entries:
+                deliveries[entry_id] += 1
+            return [pending_entries[e] for e in sorted(pending_entries)]
+
+        async def ack_sensor_chunks(self, sensor_id, group, entry_ids):
+            for entry_id in entry_ids:
+                pending_entries.pop(entry_id)
+
+        async def get_chunk_deliveries(self, sensor_id, group, consumer, entry_ids):
+            return {e: deliveries[e] for e in entry_ids}
+
+        async def dead_letter_sensor_chunks(self, sensor_id, group, entry_ids, reason):
+            dead.extend(entry_ids)
+            for entry_id in entry_ids:
+                pending_entries.pop(entry_id)
+            return len(entry_ids)
+
+    class FakeDatabase:
+        async def archive_sensor_chunks(self, batch):
+            if any(chunk['bad'] for chunk in batch):
+                raise asyncpg.exceptions.NumericValueOutOfRangeError('value out of range')
+            archived.extend(chunk['entry_id'] for chunk in batch)
+            return len(batch)
+
+    monkeypatch.setattr(archiver_module, 'redis_client', FakeRedis())
+    monkeypatch.setattr(archiver_module, 'db', FakeDatabase())
+    archiver = archiver_module.RawDataArchiver(mode='chunks', max_deliveries=3)
+    archiver.sensor_ids = [1]
+
+    async def scenario():
+        with pytest.raises(asyncpg.exceptions.DataError):
+            await archiver.archive_batch()
+        attempts = 0
+        while pending_entries:
+            attempts += 1
+            try:
+                await archiver.archive_batch(pending=True)
+            except asyncpg.exceptions.DataError:
+                pass
+        return attempts
+
+    assert asyncio.run(scenario()) == 2
+    assert sorted(archived) == ['1-0', '1-2']
+    assert dead == ['1-1']
+    assert archiver.get_status()['dead_lettered_chunks'] == 1
+
+
+# ========================================================================
+# Partition Management Tests (時間分區管理測試)
+# ========================================================================
+
+@pytest.mark.unit
+def test_planned_partitions_cover_now_and_ahead():
+    """測試預先建立的分區涵蓋目前時間與未來區間，名稱可反解析出邊界"""
+    from backend.database_async import planned_partitions, parse_partition_name
+
+    now = datetime(2026, 1, 20, 10, 30, tzinfo=timezone(timedelta(hours=8)))
+    hourly = planned_partitions('sensor_data', now, 'hour', ahead=2)
+    daily = planned_partitions('realtime_features', now, 'day', ahead=1)
+
+    assert [name for name, _, _ in hourly] == [
+        'sensor_data_p2026012002', 'sensor_data_p2026012003', 'sensor_data_p2026012004'
+    ]
+    assert hourly[0][1] <= now < hourly[0][2]
+    assert daily[1][0] == 'realtime_features_p20260121'
+    assert parse_partition_name('realtime_features', daily[1][0]) == daily[1][1:]
+    assert parse_partition_name('sensor_data', 'sensor_data_legacy') is None
+
+
+@pytest.mark.unit
+def test_expired_partitions_respect_retention():
+    """測試只有整個區間都超過保留期限的分區會被移除"""
+    from backend.database_async import expired_partitions
+
+    names = [
+        'sensor_data_p2026011300', 'sensor_data_p2026011309', 'sensor_data_p2026011310',
+        'sensor_data_p2026012010', 'sensor_data_legacy', 'sensor_data_chunks_p20260101'
+    ]
+    now = datetime(2026, 1, 20, 10, 30, tzinfo=timezone.utc)
+
+    assert expired_partitions('sensor_data', names, now, retention_days=7) == [
+        'sensor_data_p2026011300', 'sensor_data_p2026011309'
+    ]
+
+
+class _PartitionConnection:
+    """記錄 DDL 的假連線：DEFAULT 分區內只有 `waiting_start` 區間有資料"""
+
+    def __init__(self, existing, waiting_start):
+        self.existing = existing
+        self.waiting_start = waiting_start
+        self.statements = []
+
+    async def fetchval(self, query, *args):
+        if 'relkind' in query:
+            return 'p'
+        return args[0] == self.waiting_start
+
+    async def fetch(self, query, *args):
+        return [{'relname': name} for name in self.existing]
+
+    async def execute(self, query, *args):
+        self.statements.append(query)
+        return 'INSERT 0 3'
+
+    def transaction(self):
+        connection = self
+
+        class _Transaction:
+            async def __aenter__(self):
+                connection.statements.append('BEGIN')
+
+            async def __aexit__(self, *exc):
+                connection.statements.append('COMMIT')
+                return False
+
+        return _Transaction()
+
+
+@pytest.mark.unit
+def test_ensure_partitions_adds_default_and_moves_waiting_rows():
+    """測試建立 DEFAULT 分區；DEFAULT 內已有資料的區間先搬移資料再 ATTACH"""
+    import asyncio
+    from backend.database_async import planned_partitions
+
+    now = datetime(2026, 1, 20, 10, 30, tzinfo=timezone.utc)
+    planned = planned_partitions('sensor_data', now, 'hour', ahead=1)
+    database, _ = _fake_database()
+    connection = _PartitionConnection(existing=[], waiting_start=planned[1][1])
+    database.pool = _FakePool(connection)
+
+    created = asyncio.run(database.ensure_partitions('sensor_data', now))
+
+    assert created[0] == 'sensor_data_default'
+    assert planned[0][0] in created and planned[1][0] in created
+    assert connection.statements[0].endswith('PARTITION OF "sensor_data" DEFAULT')
+
+    current, waiting = planned[0][0], planned[1][0]
+    assert any(f'"{current}" PARTITION OF "sensor_data" FOR VALUES' in s for s in connection.statements)
+    start = connection.statements.index('BEGIN')
+    moved = connection.statements[start:connection.statements.index('COMMIT') + 1]
+    assert f'CREATE TABLE "{waiting}" (LIKE "sensor_data"' in moved[1]
+    assert 'DELETE FROM "sensor_data_default"' in moved[2]
+    assert f'ATTACH PARTITION "{waiting}"' in moved[3]
+
+
+@pytest.mark.unit
+def test_apply_retention_detaches_without_concurrently_when_default_exists():
+    """測試有 DEFAULT 分區時以一般 DETACH 移除過期分區，沒有時才使用 CONCURRENTLY"""
+    import asyncio
+
+    now = datetime(2026, 1, 20, 10, 30, tzinfo=timezone.utc)
+    expired, kept = 'sensor_data_p2026011300', 'sensor_data_p2026012010'
+
+    database, _ = _fake_database()
+    connection = _PartitionConnection(existing=[expired, kept, 'sensor_data_default'], waiting_start=None)
+    database.pool = _FakePool(connection)
+
+    assert asyncio.run(database.apply_retention('sensor_data', now)) == [expired]
+    assert connection.statements[:2] == [
+        f'ALTER TABLE "sensor_data" DETACH PARTITION "{expired}"',
+        f'DROP TABLE "{expired}"',
+    ]
+    assert connection.statements[2].startswith('DELETE FROM "sensor_data_default"')
+    assert not any(kept in s for s in connection.statements)
+
+    connection = _PartitionConnection(existing=[expired, kept], waiting_start=None)
+    database.pool = _FakePool(connection)
+
+    assert asyncio.run(database.apply_retention('sensor_data', now)) == [expired]
+    assert connection.statements == [
+        f'ALTER TABLE "sensor_data" DETACH PARTITION "{expired}" CONCURRENTLY',
+        f'DROP TABLE "{expired}"',
+    ]
+
+
+# ========================================================================
+# Feature Rollup Tests (特徵 rollup 測試)
+# ========================================================================
+
+@pytest.mark.unit
+def test_feature_rollups_merge_ticks_into_buckets():
+    """測試各 tick 的特徵合併為 1s / 1m / 1h bucket 的 min/max/sum/count/last"""
+    from backend.feature_rollup import FeatureRollups
+
+    rollups = FeatureRollups()
+    start = datetime(2026, 1, 20, 10, 30, 59)
+    for i, value in enumerate([3.0, 1.0, 2.0, 5.0]):
+        rollups.add(1, start + timedelta(milliseconds=300 * i + 100),
+                    {'rms_h': value, 'sample_count': 25600, 'm6a_h': float('nan')})
+
+    drained = rollups.drain()
+    assert len(rollups) == 0
+    assert [row[2] for row in drained['1h']] == ['rms_h']
+
+    by_bucket = {row[1]: row[3:8] for row in drained['1s']}
+    assert by_bucket[datetime(2026, 1, 20, 10, 30, 59)] == (1.0, 3.0, 6.0, 3, 2.0)
+    assert by_bucket[datetime(2026, 1, 20, 10, 31, 0)] == (5.0, 5.0, 5.0, 1, 5.0)
+
+    (_, bucket, _, low, high, total, count, last, _), = drained['1m'][:1]
+    assert bucket == datetime(2026, 1, 20, 10, 30)
+    assert (low, high, total, count, last) == (1.0, 3.0, 6.0, 3, 2.0)
+
+    # 寫入失敗時放回佇列，與之後的 tick 合併
+    rollups.restore(drained)
+    rollups.add(1, start, {'rms_h': 0.5})
+    merged = {row[1]: row[3:7] for row in rollups.drain()['1h']}
+    assert merged[datetime(2026, 1, 20, 10)] == (0.5, 5.0, 11.5, 5)
+
+
+@pytest.mark.unit
+def test_select_rollup_level_limits_points():
+    """測試依查詢範圍選擇不超過 max_points 的最細 rollup 等級"""
+    from backend.feature_rollup import select_rollup_level
+
+    end = datetime(2026, 1, 20)
+    assert select_rollup_level(end - timedelta(minutes=30), end, 2000) == '1s'
+    assert select_rollup_level(end - timedelta(days=1), end, 2000) == '1m'
+    assert select_rollup_level(end - timedelta(days=7), end, 2000) == '1h'
+    assert select_rollup_level(end - timedelta(days=365), end, 2000) == '1h'
+
+
+@pytest.mark.unit
+def test_clamp_rollup_start_caps_points():
+    """測試最粗的 rollup 等級仍超過 max_points 時，起點移到最近 max_points 個 bucket"""
+    from backend.feature_rollup import clamp_rollup_start
+
+    end = datetime(2026, 1, 20, 10, 30, tzinfo=timezone.utc)
+    start = end - timedelta(days=365)
+    assert clamp_rollup_start(start, end, '1h', 2000) == end - timedelta(hours=2000)
+    assert clamp_rollup_start(end - timedelta(days=7), end, '1h', 2000) == end - timedelta(days=7)
+
+
+# ========================================================================
+# Alert Engine Tests (警報規則引擎測試)
+# ========================================================================
+
+@pytest.mark.unit
+def test_alert_engine_hysteresis_duration_and_dedup():
+    """測試警報需持續 min_duration 才發出，開啟期間不重複，越過遲滯帶後才可再次觸發"""
+    from backend.alert_engine import AlertEngine
+
+    engine = AlertEngine()
+    engine.compile({1: [{
+        'config_id': 10, 'feature_name': 'rms_h', 'threshold_max': 1.0,
+        'hysteresis': 0.2, 'min_duration_ms': 500, 'severity': 'critical'
+    }]})
+
+    fired = []
+    for t, value in enumerate([1.1, 1.2, 1.1, 1.05, 0.9, 1.1, 0.7, 1.2, 1.2, 1.2]):
+        alerts = engine.evaluate_batch([(1, {'rms_h': value}, t * 0.25)])
+        fired.extend((t, alert['current_value']) for alert in alerts)
+
+    # t=2 持續 0.5 秒後發出；0.9 仍在遲滯帶內；0.7 解除後於 t=9 再次觸發
+    assert fired == [(2, 1.1), (9, 1.2)]
+    assert engine.alerts_cleared == 1
+
+
+@pytest.mark.unit
+def test_alert_engine_evaluates_sensors_in_one_batch():
+    """測試同一批次內多個感測器的規則一起評估，含變化率規則與缺值"""
+    from backend.alert_engine import AlertEngine
+
+    engine = AlertEngine()
+    engine.compile({
+        1: [{'config_id': 1, 'feature_name': 'rms_h', 'threshold_max': 1.0, 'threshold_min': 0.1}],
+        2: [{'config_id': 2, 'feature_name': 'kurtosis_v', 'rate_max': 10.0, 'severity': 'info'}],
+    })
+
+    assert engine.evaluate_batch([
+        (1, {'rms_h': 0.5}, 0.0), (2, {'kurtosis_v': 3.0}, 0.0), (3, {'rms_h': 9.0}, 0.0),
+    ]) == []
+
+    alerts = engine.evaluate_batch([
+        (1, {'rms_h': 0.05}, 1.0), (2, {'kurtosis_v': 20.0}, 1.0),
+        # 缺少特徵值時維持原狀態，不會重複觸發
+        (1, {}, 1.5), (1, {'rms_h': 0.05}, 2.0),
+    ])
+
+    assert [(a['sensor_id'], a['alert_type']) for a in alerts] == [(1, 'threshold'), (2, 'rate_of_change')]
+    assert 'below' in alerts[0]['message']
+    assert alerts[1]['current_value'] == 17.0
+    assert alerts[1]['threshold_value'] == 10.0
+
+    # 規則重新編譯後保留未變更規則的開啟狀態
+    engine.compile({1: [{'config_id': 1, 'feature_name': 'rms_h', 'threshold_max': 1.0, 'threshold_min': 0.1}]})
+    assert engine.evaluate_batch([(1, {'rms_h': 0.05}, 3.0)]) == []
+    assert engine.get_status()['open'] == 1
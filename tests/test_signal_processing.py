@@ -0,0 +1,522 @@
+"""
+Signal Processing Tests
+
+測試振動信號分析模組（時頻分析等）的數值結果。
+"""
+import warnings
+
+import pytest
+import numpy as np
+
+# ========================================================================
+# CWT Engine Tests (頻域 CWT 測試)
+# ========================================================================
+
+@pytest.mark.unit
+@pytest.mark.parametrize("wavelet", ["morl", "ricker"])
+def test_cwt_engine_matches_scipy_cwt(wavelet):
+    """測試頻域 CWT 與 scipy.signal.cwt（時域卷積）結果一致"""
+    signal = pytest.importorskip("scipy.signal")
+    if not hasattr(signal, "cwt"):
+        pytest.skip("scipy.signal.cwt 已在此 SciPy 版本移除")
+
+    from backend.cwt_engine import cwt
+
+    rng = np.random.default_rng(0)
+    x = rng.standard_normal((2, 2560))
+    scales = np.arange(1, 65)
+    wavelet_func = signal.morlet2 if wavelet == "morl" else signal.ricker
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        expected = np.stack([signal.cwt(channel, wavelet_func, scales) for channel in x])
+
+    result = cwt(x, scales, wavelet)
+
+    assert result.shape == (2, 64, 2560)
+    np.testing.assert_allclose(result, expected, rtol=0, atol=1e-12 * np.abs(expected).max())
+
+
+@pytest.mark.unit
+def test_cwt_analysis_batch_matches_single():
+    """測試批次 CWT 分析與逐通道分析的特徵相同，且濾波器組被重複使用"""
+    from backend.cwt_engine import _filter_bank
+    from backend.timefrequency import TimeFrequency
+
+    rng = np.random.default_rng(1)
+    horiz, vert = rng.standard_normal((2, 2560))
+
+    batch = TimeFrequency.cwt_analysis_batch(np.vstack([horiz, vert]), fs=25600)
+    hits = _filter_bank.cache_info().hits
+    single = TimeFrequency.cwt_analysis(vert, fs=25600)
+
+    np.testing.assert_allclose(batch[1]['magnitude'], single['magnitude'])
+    assert batch[1]['np4'] == pytest.approx(single['np4'])
+    assert batch[1]['max_scale'] == single['max_scale']
+    assert _filter_bank.cache_info().hits == hits + 1
+
+
+# ========================================================================
+# STFT Engine Tests (批次 STFT / Spectrogram 測試)
+# ========================================================================
+
+@pytest.mark.unit
+@pytest.mark.parametrize("window,nperseg", [("hann", 128), ("flattop", 256)])
+def test_stft_engine_matches_scipy_stft(window, nperseg):
+    """測試批次 STFT 與 scipy.signal.stft 逐通道結果一致"""
+    from scipy import signal
+    from backend.stft_engine import stft
+
+    rng = np.random.default_rng(2)
+    x = rng.standard_normal((2, 2560))
+    noverlap = int(nperseg * 0.95)
+
+    f, t, Zxx = stft(x, fs=25600, window=window, nperseg=nperseg, noverlap=noverlap)
+
+    for channel, result in zip(x, Zxx):
+        f_ref, t_ref, expected = signal.stft(channel, fs=25600, window=window,
+                                             nperseg=nperseg, noverlap=noverlap)
+        np.testing.assert_allclose(f, f_ref)
+        np.testing.assert_allclose(t, t_ref)
+        np.testing.assert_allclose(result, expected, rtol=0, atol=1e-12)
+
+
+@pytest.mark.unit
+def test_stft_engine_short_signal_matches_scipy_stft():
+    """測試信號短於 nperseg 時與 scipy.signal.stft 相同，將 nperseg 限制為信號長度"""
+    from scipy import signal
+    from backend.stft_engine import stft
+
+    x = np.random.default_rng(4).standard_normal((2, 100))
+
+    f, t, Zxx = stft(x, fs=25600, nperseg=256)
+    with pytest.warns(UserWarning):
+        f_ref, t_ref, expected = signal.stft(x, fs=25600, nperseg=256)
+
+    assert Zxx.shape == expected.shape == (2, 51, 3)
+    np.testing.assert_allclose(f, f_ref)
+    np.testing.assert_allclose(t, t_ref)
+    np.testing.assert_allclose(Zxx, expected, rtol=0, atol=1e-12)
+
+
+@pytest.mark.unit
+def test_spectrogram_engine_matches_scipy_spectrogram():
+    """測試批次 Spectrogram 與 scipy.signal.spectrogram 逐通道結果一致"""
+    from scipy import signal
+    from backend.stft_engine import spectrogram
+
+    rng = np.random.default_rng(3)
+    x = rng.standard_normal((2, 2560))
+
+    f, t, Sxx = spectrogram(x, fs=25600, nperseg=256, noverlap=128)
+
+    for channel, result in zip(x, Sxx):
+        f_ref, t_ref, expected = signal.spectrogram(channel, fs=25600, nperseg=256, noverlap=128)
+        np.testing.assert_allclose(f, f_ref)
+        np.testing.assert_allclose(t, t_ref)
+        np.testing.assert_allclose(result, expected, rtol=1e-10, atol=1e-18)
+
+
+@pytest.mark.unit
+def test_dual_window_stft_batch_matches_single():
+    """測試雙窗 STFT 批次分析與單通道分析結果相同"""
+    from backend.timefrequency import TimeFrequency
+
+    rng = np.random.default_rng(4)
+    horiz, vert = rng.standard_normal((2, 2560))
+
+    batch = TimeFrequency.dual_window_stft_analysis_batch(np.vstack([horiz, vert]), fs=25600)
+    single = TimeFrequency.dual_window_stft_analysis(horiz, fs=25600)
+
+    assert batch[0].keys() == single.keys()
+    for window in ("hann", "flattop"):
+        np.testing.assert_allclose(batch[0][window]['magnitude'], single[window]['magnitude'])
+        assert batch[0][f"{window}_np4"] == pytest.approx(single[f"{window}_np4"])
+
+
+# ========================================================================
+# Time-Frequency Trend Tests (時頻特徵趨勢測試)
+# ========================================================================
+
+@pytest.mark.unit
+def test_normalized_energy_matrix_matches_band_segment_sums():
+    """測試向量化 NE 與逐頻段、逐時間段加總的結果一致"""
+    from backend.timefrequency import TimeFrequency
+
+    rng = np.random.default_rng(5)
+    result = TimeFrequency.stft_analysis(rng.standard_normal(2560), fs=25600)
+    magnitude, f, t = result['magnitude'], result['frequencies'], result['time']
+
+    ne = TimeFrequency.normalized_energy_matrix(magnitude, f, t, (800, 2500), 0.01)
+    segment_size = ne['segment_size']
+
+    assert segment_size == np.sum(t <= 0.01)
+    for i, (freq_low, freq_high) in enumerate(ne['freq_bands']):
+        freq_mask = (f > freq_low) & (f <= freq_high)
+        band_energy = magnitude[freq_mask, :].sum()
+        for j in range(ne['normalized_energy'].shape[-1]):
+            segment = magnitude[freq_mask, j * segment_size:(j + 1) * segment_size].sum()
+            assert ne['normalized_energy'][i, j] == pytest.approx(segment / band_energy)
+
+    frame = TimeFrequency.normalized_energy_analysis(magnitude, f, t, (800, 2500), 0.01)
+    assert len(frame) == ne['normalized_energy'].size
+
+
+@pytest.mark.unit
+def test_time_frequency_trend_matches_single_file_analysis():
+    """測試時頻趨勢（檔案 x 通道批次）與單檔 STFT / CWT 分析的 NP4 相同"""
+    from backend.timefrequency import TimeFrequency
+
+    rng = np.random.default_rng(6)
+    signals = rng.standard_normal((3, 2, 2560))
+
+    trend = TimeFrequency.time_frequency_trend(signals, fs=25600)
+
+    assert trend['stft_np4'].shape == (3, 2)
+    assert trend['stft_np4'][2, 1] == pytest.approx(
+        TimeFrequency.stft_analysis(signals[2, 1], fs=25600)['np4'])
+    assert trend['cwt_np4'][1, 0] == pytest.approx(
+        TimeFrequency.cwt_analysis(signals[1, 0], fs=25600)['np4'])
+    assert np.all((trend['cwt_ne_max'] > 0) & (trend['cwt_ne_max'] <= 1))
+
+
+# ========================================================================
+# Envelope Engine Tests (包絡分析測試)
+# ========================================================================
+
+@pytest.mark.unit
+def test_envelope_engine_matches_scipy_and_caches_design():
+    """測試包絡管線與 filtfilt + hilbert 一致，且濾波器設計被快取"""
+    from scipy import signal
+    from backend.envelope_engine import _bandpass_sos, analytic_signal, bandpass_sos, envelope
+
+    rng = np.random.default_rng(7)
+    x = rng.standard_normal((2, 2560))
+
+    np.testing.assert_allclose(analytic_signal(x), signal.hilbert(x), atol=1e-12)
+
+    b, a = signal.butter(4, [4000 / 12800, 10000 / 12800], btype='band')
+    expected = np.abs(signal.hilbert(signal.filtfilt(b, a, x)))
+    np.testing.assert_allclose(envelope(x, 25600, 4000, 10000), expected, atol=1e-10)
+
+    sos = bandpass_sos(25600, 10, 500)
+    hits = _bandpass_sos.cache_info().hits
+    assert bandpass_sos(25600, 10, 500) is sos
+    assert _bandpass_sos.cache_info().hits == hits + 1
+
+    # 10 Hz 低截止頻率：SOS 設計在截止頻率處為 -3 dB
+    _, response = signal.sosfreqz(sos, worN=[10.0, 500.0], fs=25600)
+    np.testing.assert_allclose(np.abs(response), np.sqrt(0.5), rtol=1e-6)
+
+
+@pytest.mark.unit
+def test_envelope_trend_matches_single_analysis():
+    """測試包絡趨勢（批次）與單通道 envelope_analysis 結果相同"""
+    from backend.timefrequency import TimeFrequency
+
+    rng = np.random.default_rng(8)
+    signals = rng.standard_normal((3, 2, 2560))
+
+    trend = TimeFrequency.envelope_trend(signals, fs=25600, lowcut=10, highcut=500)
+    single = TimeFrequency.envelope_analysis(signals[2, 1], fs=25600, lowcut=10, highcut=500)
+
+    assert trend['envelope_rms'].shape == (3, 2)
+    assert trend['envelope_rms'][2, 1] == pytest.approx(single['envelope_rms'])
+    assert trend['total_power'][2, 1] == pytest.approx(single['total_power'])
+    assert trend['peak_frequency'][2, 1] == single['peak_frequencies'][0]
+
+
+# ========================================================================
+# Analytic Signal Tests (解析信號與 NB4 測試)
+# ========================================================================
+
+@pytest.mark.unit
+@pytest.mark.parametrize("n,segment_count", [(2560, 10), (2563, 10), (25, 4), (7, 10)])
+def test_vectorized_nb4_matches_segment_loop(n, segment_count):
+    """測試向量化 NB4 與逐段迴圈的定義一致（含最後一段較長與空分段）"""
+    from backend.analytic_signal import nb4
+
+    rng = np.random.default_rng(9)
+    envelope = np.abs(rng.standard_normal((2, n)))
+
+    for channel, result in zip(envelope, nb4(envelope, segment_count)):
+        segment_size = n // segment_count
+        total = 0.0
+        for i in range(segment_count):
+            end = (i + 1) * segment_size if i < segment_count - 1 else n
+            segment = channel[i * segment_size:end]
+            if len(segment):
+                total += np.var(segment)
+        expected = np.mean((channel - channel.mean()) ** 4) / (total / segment_count) ** 2
+        assert result == pytest.approx(expected)
+
+
+@pytest.mark.unit
+def test_analytic_signal_derives_hilbert_quantities_once():
+    """測試解析信號與 scipy.signal.hilbert 一致，且導出量只計算一次"""
+    from scipy import signal
+    from backend.analytic_signal import AnalyticSignal
+    from backend.hilberttransform import HilbertTransform
+
+    rng = np.random.default_rng(10)
+    x = rng.standard_normal((2, 2560))
+
+    analytic = AnalyticSignal(x, fs=25600)
+    expected = signal.hilbert(x)
+    np.testing.assert_allclose(analytic.envelope, np.abs(expected), atol=1e-12)
+    np.testing.assert_allclose(
+        analytic.instantaneous_frequency,
+        np.diff(np.unwrap(np.angle(expected)), axis=-1) / (2 * np.pi) * 25600,
+        atol=1e-6
+    )
+    assert analytic.envelope is analytic.envelope
+
+    ht = HilbertTransform()
+    trend = ht.nb4_trend(x[None, :, :])
+    single = ht.analyze_signal(x[1])
+    assert trend['nb4'][0, 1] == pytest.approx(single['nb4'])
+    assert trend['envelope_rms'][0, 1] == pytest.approx(single['envelope_stats']['rms'])
+
+
+# ========================================================================
+# TSA Engine Tests (時間同步平均測試)
+# ========================================================================
+
+@pytest.mark.unit
+def test_tsa_keeps_shaft_synchronous_component():
+    """測試 TSA 保留轉軸同步分量（整數階次）並在頻譜上對應到正確頻率"""
+    from backend.tsa_engine import order_spectrum, resampling_plan, shaft_frequency, tsa
+
+    fs = 25600
+    shaft_hz = shaft_frequency('Bearing1_1')
+    t = np.arange(2560) / fs
+    x = np.sin(2 * np.pi * 8 * shaft_hz * t)
+
+    averaged = tsa(x, fs, shaft_hz)
+    _, _, revolutions = resampling_plan(2560, fs, shaft_hz)
+    orders, spectrum = order_spectrum(averaged, revolutions)
+    magnitude = np.abs(spectrum) / averaged.size * 2
+
+    assert shaft_hz == 30.0
+    assert revolutions == 3
+    assert orders[np.argmax(magnitude[:len(magnitude) // 2])] == pytest.approx(8.0)
+    assert magnitude.max() == pytest.approx(1.0, rel=1e-2)
+
+
+@pytest.mark.unit
+def test_tsa_batch_matches_single_and_reuses_plan():
+    """測試批次 TSA（檔案 x 通道）與單一信號相同，且重採樣計畫被快取"""
+    from backend.tsa_engine import _plan, tsa
+
+    rng = np.random.default_rng(11)
+    signals = rng.standard_normal((4, 2, 2560))
+
+    batch = tsa(signals, 25600, 27.5)
+    hits = _plan.cache_info().hits
+    single = tsa(signals[3, 0], 25600, 27.5)
+
+    assert batch.shape == (4, 2, 1024)
+    np.testing.assert_allclose(batch[3, 0], single)
+    assert _plan.cache_info().hits == hits + 1
+
+
+# ========================================================================
+# Bearing Kinematics Tests (軸承故障頻率測試)
+# ========================================================================
+
+@pytest.mark.unit
+def test_fault_frequencies_follow_operating_condition():
+    """測試依軸承轉速計算的故障頻率與各操作條件的參考值一致"""
+    from backend.bearing_kinematics import bearing_fault_frequencies
+    from backend.initialization import InitParameter
+
+    ip = InitParameter()
+    for bearing, condition in [('Bearing1_1', 1), ('Bearing2_1', 2), ('Bearing3_1', 3)]:
+        fault = bearing_fault_frequencies(bearing)
+        assert fault.shaft == pytest.approx(getattr(ip, f'fr_condition{condition}'))
+        assert fault.bpfo == pytest.approx(getattr(ip, f'bpfo_condition{condition}'), abs=0.05)
+        assert fault.bpfi == pytest.approx(getattr(ip, f'bpfi_condition{condition}'), abs=0.05)
+        assert fault.ftf == pytest.approx(getattr(ip, f'ftf_condition{condition}'), abs=0.05)
+
+    fault = bearing_fault_frequencies('Bearing1_1')
+    assert fault.bsf == pytest.approx(ip.bsf_condition1, abs=0.05)
+    np.testing.assert_allclose(fault.harmonics('bpfi', 3), fault.bpfi * np.array([1, 2, 3]))
+
+
+@pytest.mark.unit
+def test_spectrum_bins_match_masks_and_are_cached():
+    """測試頻窗索引與布林遮罩選到相同頻率，且同一頻率網格只建立一次"""
+    from backend.bearing_kinematics import fft_bins
+
+    fs, n = 25600, 2560
+    freqs = np.round(np.fft.fftfreq(n, 1. / fs), 3)
+    bins = fft_bins(fs, n)
+
+    for closed, mask in [
+        ('both', (freqs >= 220) & (freqs <= 250)),
+        ('left', (freqs >= 220) & (freqs < 250)),
+        ('right', (freqs > 220) & (freqs <= 250)),
+    ]:
+        np.testing.assert_array_equal(bins.window(220, 250, closed), np.flatnonzero(mask))
+
+    assert fft_bins(fs, n) is bins
+    assert bins.window(220, 250) is bins.window(220, 250)
+
+
+# ========================================================================
+# FFT Backend Tests (FFT 後端測試)
+# ========================================================================
+
+@pytest.mark.unit
+def test_fft_backend_matches_numpy_on_batches():
+    """測試 FFT 後端的批次轉換結果與 numpy 相同"""
+    from backend import fft_backend
+
+    rng = np.random.default_rng(12)
+    x = rng.standard_normal((3, 2, 2560))
+
+    np.testing.assert_allclose(fft_backend.fft(x), np.fft.fft(x), atol=1e-9)
+    np.testing.assert_allclose(fft_backend.rfft(x, workers=2), np.fft.rfft(x), atol=1e-9)
+    np.testing.assert_allclose(fft_backend.irfft(fft_backend.rfft(x), 2560), x, atol=1e-12)
+    np.testing.assert_array_equal(fft_backend.fftfreq(2560, 1 / 25600), np.fft.fftfreq(2560, 1 / 25600))
+    assert fft_backend.backend_name() in ('scipy', 'pyfftw')
+
+
+@pytest.mark.unit
+def test_fft_backend_selection():
+    """測試 FFT 後端選擇：未知名稱報錯，scipy 可隨時切換並設定預設 workers"""
+    from backend import fft_backend
+
+    with pytest.raises(ValueError):
+        fft_backend.set_backend('mkl')
+
+    current, workers = fft_backend.backend_name(), fft_backend._workers
+    try:
+        assert fft_backend.set_backend('scipy', workers=2) == 'scipy'
+        assert fft_backend._resolve(None) == 2
+        assert fft_backend._resolve(1) == 1
+        if fft_backend.pyfftw is None:
+            with pytest.raises(ImportError):
+                fft_backend.set_backend('pyfftw')
+    finally:
+        fft_backend.set_backend(current, workers=workers)
+
+
+@pytest.mark.unit
+def test_fft_backend_default_workers(monkeypatch):
+    """測試 FFT_WORKERS=0 時主程序使用全部 CPU，子程序只使用 1 個執行緒"""
+    from backend import fft_backend
+
+    monkeypatch.setattr(fft_backend.os, 'cpu_count', lambda: 8)
+    assert fft_backend.default_workers(3) == 3
+    assert fft_backend.default_workers(0) == 8
+
+    monkeypatch.setattr(fft_backend.multiprocessing, 'parent_process', lambda: object())
+    assert fft_backend.default_workers(0) == 1
+    assert fft_backend.default_workers(3) == 3
+
+
+# ========================================================================
+# Precision Tests (float32 計算模式測試)
+# ========================================================================
+
+@pytest.mark.unit
+def test_float32_mode_keeps_single_precision_transforms():
+    """測試 float32 信號以 complex64 計算 STFT / CWT，且時頻趨勢接近 float64 基準"""
+    from backend import stft_engine
+    from backend.cwt_engine import cwt
+    from backend.timefrequency import TimeFrequency
+
+    rng = np.random.default_rng(13)
+    signals = rng.standard_normal((2, 2, 2560))
+    single = signals.astype(np.float32)
+
+    assert stft_engine.stft(single, 25600)[2].dtype == np.complex64
+    assert cwt(single, np.arange(1, 9)).dtype == np.complex64
+
+    baseline = TimeFrequency.time_frequency_trend(signals)
+    trend = TimeFrequency.time_frequency_trend(signals, precision='float32')
+    for key, value in baseline.items():
+        np.testing.assert_allclose(trend[key], value, rtol=1e-4)
+
+    with pytest.raises(ValueError):
+        TimeFrequency.time_frequency_trend(signals, precision='float16')
+
+
+@pytest.mark.unit
+def test_filter_features_batch_matches_single_and_float32():
+    """測試批次 NA4/FM4/M6A/M8A/ER 與逐信號計算相同，float32 輸入以 float64 累加高階動差"""
+    from backend.filterprocess import FilterProcess
+
+    rng = np.random.default_rng(14)
+    signals = rng.standard_normal((3, 2, 2561)) * 2 + 0.5
+
+    batch = FilterProcess.features_batch(signals, 25600)
+    single = FilterProcess.calculate_all_features(signals[2, 1], 25600)
+    for key in ['na4', 'fm4', 'm6a', 'm8a', 'er']:
+        assert batch[key][2, 1] == pytest.approx(single[key], rel=1e-12)
+
+    single_precision = FilterProcess.features_batch(signals.astype(np.float32), 25600)
+    assert single_precision['m8a'].dtype == np.float64
+    for key, value in batch.items():
+        np.testing.assert_allclose(single_precision[key], value, rtol=1e-5)
+
+
+# ========================================================================
+# Segment Kernel Tests (分段統計核心測試)
+# ========================================================================
+
+@pytest.mark.unit
+@pytest.mark.parametrize("n,segment_count", [(2560, 10), (2563, 10), (7, 10)])
+def test_segment_kernels_match_original_definitions(n, segment_count):
+    """測試批次 NA4 / EO 核心與原始逐段迴圈、pandas shift 定義一致"""
+    import pandas as pd
+    from backend import segment_kernels
+    from backend.filterprocess import FilterProcess
+    from backend.timedomain import TimeDomain
+
+    rng = np.random.default_rng(15)
+    signals = rng.standard_normal((2, 2, n)) + 0.3
+
+    na4 = segment_kernels.na4(signals, segment_count)[0]
+    eo = segment_kernels.eo(signals)
+    for index in np.ndindex(signals.shape[:-1]):
+        x = signals[index]
+        segment_size = n // segment_count
+        total = 0.0
+        for i in range(segment_count):
+            end = (i + 1) * segment_size if i < segment_count - 1 else n
+            segment = x[i * segment_size:end]
+            if len(segment):
+                total += np.sum((segment - segment.mean()) ** 2)
+        expected = np.sum((x - x.mean()) ** 4) * n / (total / segment_count) ** 2
+        assert na4[index] == pytest.approx(expected, rel=1e-12)
+        assert FilterProcess.NA4(x, segment_count)[0] == pytest.approx(expected, rel=1e-12)
+
+        delta = x ** 2 - np.append(x[1:], x[0]) ** 2 - x.mean()
+        expected_eo = n ** 2 * np.sum(delta ** 4) / np.sum(delta ** 2) ** 2
+        assert eo[index] == pytest.approx(expected_eo, rel=1e-12)
+        assert TimeDomain.eo(pd.DataFrame({'x': x}), 'x') == pytest.approx(expected_eo, rel=1e-12)
+
+    with pytest.raises(ValueError):
+        segment_kernels.eo(signals, backend='cython')
+
+
+@pytest.mark.unit
+def test_segment_kernels_numba_matches_numpy():
+    """測試 Numba 編譯核心與 NumPy 實作結果逐位元相同（未安裝 Numba 時略過）"""
+    from backend import segment_kernels
+
+    if not segment_kernels.NUMBA_AVAILABLE:
+        pytest.skip("numba not installed")
+
+    rng = np.random.default_rng(16)
+    for shape, segment_count in (((3, 2, 2563), 10), ((4, 2560), 3), ((2, 7), 10)):
+        signals = rng.standard_normal(shape) * 5 + 3
+        for key, value in segment_kernels.segment_moments(signals, segment_count, backend='numpy').items():
+            np.testing.assert_array_equal(
+                segment_kernels.segment_moments(signals, segment_count, backend='numba')[key], value
+            )
+        np.testing.assert_array_equal(
+            segment_kernels.eo(signals, backend='numba'), segment_kernels.eo(signals, backend='numpy')
+        )
@@ -359,3 +359,159 @@ def test_websocket_connection_latency(client, test_sensor_id):
         # 平均延遲應該小於某個閾值
         avg_latency = sum(latencies) / len(latencies)
         # assert avg_latency < 100  # 平均延遲小於 100ms
+
+
+# ========================================================================
+# Broadcast Queue Tests (廣播佇列測試)
+# ========================================================================
+
+class _FakeWebSocket:
+    """記錄送出訊息的假 WebSocket，可設定每則訊息的傳送延遲"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        await asyncio.sleep(self.delay)
+        self.sent.append(text)
+
+
+@pytest.mark.unit
+def test_broadcast_not_blocked_by_slow_client():
+    """測試慢速客戶端不會拖慢廣播，落後時只收到最新的特徵更新"""
+    import json
+    import time
+    from backend.websocket_manager import ConnectionManager
+
+    async def scenario():
+        manager = ConnectionManager(use_redis_pubsub=False)
+        fast, slow = _FakeWebSocket(), _FakeWebSocket(delay=0.2)
+        await manager.connect(fast, 1)
+        await manager.connect(slow, 1)
+
+        started = time.perf_counter()
+        for i in range(10):
+            await manager.broadcast_feature_update(1, {'rms_h': i})
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - started
+
+        await asyncio.sleep(0.5)
+        info = manager.get_connection_info()
+        await manager.disconnect(fast)
+        await manager.disconnect(slow)
+        return elapsed, fast.sent, slow.sent, info
+
+    elapsed, fast_sent, slow_sent, info = asyncio.run(scenario())
+
+    assert elapsed < 0.5
+    assert [json.loads(m)['data']['rms_h'] for m in fast_sent] == list(range(10))
+    slow_values = [json.loads(m)['data']['rms_h'] for m in slow_sent]
+    assert len(slow_values) < 10
+    assert slow_values[-1] == 9
+    assert info['conflated_messages'] > 0
+
+
+@pytest.mark.unit
+def test_broadcast_respects_max_rate():
+    """測試每個訂閱的特徵更新頻率上限，警報不受限制"""
+    import json
+    from backend.websocket_manager import ConnectionManager
+
+    async def scenario():
+        manager = ConnectionManager(use_redis_pubsub=False)
+        limited = _FakeWebSocket()
+        await manager.connect(limited, 1, max_rate=5)
+
+        for i in range(20):
+            await manager.broadcast_feature_update(1, {'rms_h': i})
+            await asyncio.sleep(0.025)
+        await manager.broadcast_alert({'message': 'test'})
+        await asyncio.sleep(0.3)
+        await manager.disconnect(limited)
+        return [json.loads(m) for m in limited.sent]
+
+    messages = asyncio.run(scenario())
+    updates = [m for m in messages if m['type'] == 'feature_update']
+
+    # 0.5 秒內最多約 3 則，且最後一則為最新值
+    assert 2 <= len(updates) <= 4
+    assert updates[-1]['data']['rms_h'] == 19
+    assert any(m['type'] == 'alert' for m in messages)
+
+
+@pytest.mark.unit
+def test_broadcast_encodes_message_once(monkeypatch):
+    """測試廣播只編碼一次，所有客戶端收到同一份文字"""
+    import backend.websocket_manager as websocket_manager
+    from backend.websocket_manager import ConnectionManager
+
+    calls = []
+    encode = websocket_manager.encode_message
+
+    def counting_encode(message):
+        calls.append(message)
+        return encode(message)
+
+    monkeypatch.setattr(websocket_manager, "encode_message", counting_encode)
+
+    async def scenario():
+        manager = ConnectionManager(use_redis_pubsub=False)
+        clients = [_FakeWebSocket() for _ in range(100)]
+        for websocket in clients:
+            await manager.connect(websocket, 1)
+
+        calls.clear()
+        await manager.broadcast_feature_update(1, {'rms_h': 0.5})
+        await asyncio.sleep(0.05)
+        for websocket in clients:
+            await manager.disconnect(websocket)
+        return clients
+
+    clients = asyncio.run(scenario())
+
+    assert len(calls) == 1
+    first = clients[0].sent[0]
+    assert all(len(c.sent) == 1 and c.sent[0] is first for c in clients)
+
+
+@pytest.mark.unit
+def test_pubsub_messages_forwarded_without_rewrap():
+    """測試 Pub/Sub 訊息原樣轉送給本地客戶端，略過本實例發出的訊息"""
+    import json
+    from backend.websocket_manager import ConnectionManager
+
+    async def scenario():
+        manager = ConnectionManager(use_redis_pubsub=False)
+        sensor, other, global_ = _FakeWebSocket(), _FakeWebSocket(), _FakeWebSocket()
+        await manager.connect(sensor, 1)
+        await manager.connect(other, 2)
+        await manager.connect(global_, 0)
+
+        remote = b'{"origin":"remote","type":"feature_update","sensor_id":1,"data":{"rms_h":0.5}}'
+        own = manager._encode({"type": "feature_update", "sensor_id": 1, "data": {}}).encode()
+        alert = b'{"type":"alert","data":{"message":"test"}}'
+
+        await manager._handle_pubsub_message(
+            {'type': 'pmessage', 'channel': b'sensor:1:features', 'data': remote})
+        await manager._handle_pubsub_message(
+            {'type': 'pmessage', 'channel': b'sensor:1:features', 'data': own})
+        await manager._handle_pubsub_message(
+            {'type': 'message', 'channel': b'alerts:all', 'data': alert})
+        await asyncio.sleep(0.05)
+
+        for websocket in (sensor, other, global_):
+            await manager.disconnect(websocket)
+        return remote, alert, sensor.sent, other.sent, global_.sent
+
+    remote, alert, sensor_sent, other_sent, global_sent = asyncio.run(scenario())
+
+    # 警報佇列優先於合併中的特徵更新
+    assert sorted(sensor_sent) == sorted([remote.decode(), alert.decode()])
+    assert other_sent == [alert.decode()]
+    assert global_sent == [alert.decode()]
+    forwarded = next(m for m in sensor_sent if 'feature_update' in m)
+    assert json.loads(forwarded)['data'] == {'rms_h': 0.5}